@@ -3,24 +3,188 @@
 Snowflake Query Monitor
 Monitor running and recent queries, identify performance issues.
 
+Reports are answered from a local Parquet mirror of QUERY_HISTORY that is
+synced incrementally before each run (about the last hour is re-read).
+Creating the mirror backfills 30 days account-wide, so it happens only with
+--sync-history; until then reports are queried live. --live always queries
+ACCOUNT_USAGE directly.
+
 Usage:
     python scripts/monitor_queries.py
     python scripts/monitor_queries.py --running-only
     python scripts/monitor_queries.py --user my_username --hours 24
     python scripts/monitor_queries.py --expensive --min-credits 0.1
+    python scripts/monitor_queries.py --hours 24 --sync-history
+    python scripts/monitor_queries.py --hours 24 --no-sync
+    python scripts/monitor_queries.py --fingerprints --hours 168 --top 30
+    python scripts/monitor_queries.py --profile --hours 24 --top 10
+    python scripts/monitor_queries.py --sizing --hours 168
+    python scripts/monitor_queries.py --timeline concurrency.png --hours 168
+    python scripts/monitor_queries.py --exporter --port 9464 --warehouses RISK_WH,ETL_WH
+    python scripts/monitor_queries.py --watchdog --max-elapsed 1800 --max-credits 5 --dry-run
+    python scripts/monitor_queries.py --live
+    python scripts/monitor_queries.py --live --consolidated --slow --failed --warehouse-stats
+    python scripts/monitor_queries.py --live --compare --hours 24
 """
 
+import sys
+import math
+import time
+import uuid
 import argparse
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import numpy as np
 import pandas as pd
 from src.sf_utils import SnowflakeUtils
+from src.history_store import QueryHistoryStore
+from src.sql_parse import query_fingerprint
+from src.cost_model import credits_per_hour
+from src.credit_attribution import CreditAttributor
+from src.query_profile import ProfileStore, operator_stats_sql, build_profile
+from src.warehouse_sizing import sizing_report
+from src.concurrency_timeline import concurrency_report, plot_timeline
+from src.metrics_exporter import QueryHealthExporter
+from src.query_watchdog import QueryWatchdog, DEFAULT_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+# Mirror columns the local reports read
+MIRROR_COLUMNS = [
+    'query_text', 'user_name', 'role_name', 'warehouse_name', 'warehouse_size', 'warehouse_type',
+    'query_type', 'session_id', 'execution_status', 'error_code', 'error_message', 'start_time',
+    'total_elapsed_time', 'queued_provisioning_time', 'queued_overload_time', 'compilation_time',
+    'execution_time', 'bytes_scanned', 'bytes_spilled_to_local_storage', 'bytes_spilled_to_remote_storage',
+    'rows_produced', 'credits_used_cloud_services',
+]
+
+# Days copied on the first sync of an empty mirror
+MIRROR_BACKFILL_DAYS = 30
+
+# Per-warehouse and total aggregates computed by the consolidated query
+ROLLUP_COLUMNS = [
+    'grouping_id', 'total_queries', 'successful_queries', 'failed_queries', 'running_queries',
+    'avg_elapsed_seconds', 'total_credits', 'unique_users', 'warehouses_used', 'success_credits',
+    'success_avg_elapsed_seconds', 'success_bytes_scanned', 'success_rows_produced',
+]
+SUMMARY_COLUMNS = ROLLUP_COLUMNS[1:9]
 
 class QueryMonitor:
     """Monitor Snowflake queries and identify performance issues."""
     
-    def __init__(self):
+    def __init__(self, store: Optional[QueryHistoryStore] = None, live: bool = False):
+        """
+        Args:
+            store: Local QUERY_HISTORY mirror (default: QueryHistoryStore())
+            live: Query ACCOUNT_USAGE.QUERY_HISTORY directly instead of the mirror
+        """
         self.utils = SnowflakeUtils()
+        self.live = live
+        self.store = None if live else (store or QueryHistoryStore())
+        self.attributor = None if live else CreditAttributor(self.store)
+        self._history = None
+        self._credits = None
+
+    def sync(self, hours: int = 24) -> Dict[str, Any]:
+        """
+        Fetch QUERY_HISTORY rows newer than the mirror's end_time watermark,
+        then warehouse metering, and attribute newly settled hours to queries.
+
+        Returns:
+            The history sync result plus metering_rows and attributed_hours
+        """
+        days = max(MIRROR_BACKFILL_DAYS, math.ceil(hours / 24))
+        result = self.store.sync(self.utils, days=days)
+        metering = self.attributor.sync_metering(self.utils, days=days)
+        attributed = self.attributor.update()
+        result['metering_rows'] = metering['rows_fetched']
+        result['attributed_hours'] = attributed['hours']
+        result['elapsed_seconds'] += metering['elapsed_seconds'] + attributed['elapsed_seconds']
+        return result
+
+    def history(self, hours: int) -> pd.DataFrame:
+        """
+        Mirror rows for queries that started in the last `hours` hours.
+
+        The widest window requested so far is read from Parquet once and
+        narrower windows are sliced from it, so several reports cost one read.
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        if self._history is None or self._history[0] > cutoff:
+            # A query that started after the cutoff also ended after it
+            self._history = (cutoff, self.store.load(MIRROR_COLUMNS, since=cutoff))
+        df = self._history[1]
+        return df[df['start_time'] >= cutoff]
+
+    def with_attributed_credits(self, df: pd.DataFrame, hours: int) -> Optional[pd.DataFrame]:
+        """
+        Add attributed_credits (metered compute share + cloud services) to mirror rows.
+
+        Returns:
+            The rows with attributed_credits, or None when no metering has been synced
+        """
+        if self.attributor is None or self.attributor.metering().empty:
+            return None
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        if self._credits is None or self._credits[0] > cutoff:
+            credits = self.attributor.query_credits(cutoff)
+            self._credits = (cutoff, credits.groupby('query_id')['compute_credits'].sum())
+        compute = df['query_id'].map(self._credits[1]).fillna(0.0)
+        return df.assign(attributed_credits=compute + df['credits_used_cloud_services'].fillna(0.0))
+
+    def _uses_live(self, report: str, kwargs: Dict[str, Any]) -> bool:
+        # The mirror only holds finished queries, so running queries are always fetched live
+        return self.live or (report == 'recent_queries' and kwargs.get('running_only', False))
+
+    def run_reports(self, reports: Dict[str, Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Produce several reports, from the mirror where possible.
+
+        Args:
+            reports: Mapping of result name to (report, kwargs), where report is
+                one of recent_queries, expensive_queries, slow_queries,
+                failed_queries, warehouse_utilization or query_stats
+
+        Returns:
+            Mapping of name to {'data', 'error', 'elapsed_seconds'} (as SnowflakeUtils.run_many)
+        """
+        live = {name: getattr(self, f"{report}_sql")(**kwargs)
+                for name, (report, kwargs) in reports.items() if self._uses_live(report, kwargs)}
+        results = self.utils.run_many(live) if live else {}
+        for name, (report, kwargs) in reports.items():
+            if name in results:
+                continue
+            started = time.perf_counter()
+            try:
+                data, error = getattr(self, f"{report}_local")(**kwargs), None
+            except Exception as e:
+                data, error = None, str(e)
+            results[name] = {'data': data, 'error': error, 'elapsed_seconds': time.perf_counter() - started}
+        return {name: results[name] for name in reports}
+
+    def _fetch(self, report: str, **kwargs) -> pd.DataFrame:
+        if self._uses_live(report, kwargs):
+            return self.utils.query_to_df(getattr(self, f"{report}_sql")(**kwargs))
+        return getattr(self, f"{report}_local")(**kwargs)
+
+    @staticmethod
+    def _with_seconds(df: pd.DataFrame) -> pd.DataFrame:
+        # Same derived columns as the SQL reports (QUERY_HISTORY times are milliseconds)
+        return df.assign(
+            elapsed_seconds=df['total_elapsed_time'] / 1000,
+            queue_seconds=df['queued_provisioning_time'] / 1000,
+            compile_seconds=df['compilation_time'] / 1000,
+            execution_seconds=df['execution_time'] / 1000,
+            query_preview=df['query_text'].str[:100],
+        )
+
+    @staticmethod
+    def _fingerprints(df: pd.DataFrame) -> np.ndarray:
+        # Each distinct text is normalized once; repeated executions reuse its fingerprint
+        codes, texts = pd.factorize(df['query_text'].fillna(''))
+        fingerprints = np.array([query_fingerprint(text) for text in texts], dtype=object)
+        return fingerprints[codes]
         
     def get_recent_queries(self, hours: int = 4, user_name: str = None, 
                           running_only: bool = False, min_credits: float = 0) -> pd.DataFrame:
@@ -36,6 +200,12 @@ class QueryMonitor:
         Returns:
             DataFrame with query information
         """
+        return self._fetch('recent_queries', hours=hours, user_name=user_name,
+                           running_only=running_only, min_credits=min_credits)
+    
+    def recent_queries_sql(self, hours: int = 4, user_name: str = None,
+                           running_only: bool = False, min_credits: float = 0) -> str:
+        """Build the recent query history SQL (see get_recent_queries)."""
         
         # Base query for query history
         query = f"""
@@ -78,10 +248,32 @@ class QueryMonitor:
         # Order by start time
         query += " ORDER BY start_time DESC LIMIT 100"
         
-        return self.utils.query_to_df(query)
+        return query
+    
+    def recent_queries_local(self, hours: int = 4, user_name: str = None,
+                             running_only: bool = False, min_credits: float = 0,
+                             frame: pd.DataFrame = None) -> pd.DataFrame:
+        """Recent query history from the mirror, or from `frame` (see get_recent_queries)."""
+        df = self._with_seconds(self.history(hours) if frame is None else frame)
+        if user_name:
+            df = df[df['user_name'].str.upper() == user_name.upper()]
+        if running_only:
+            df = df[df['execution_status'] == 'RUNNING']
+        if min_credits > 0:
+            df = df[df['credits_used_cloud_services'] >= min_credits]
+        columns = ['query_id', 'query_text', 'user_name', 'role_name', 'warehouse_name', 'warehouse_size',
+                   'execution_status', 'error_code', 'error_message', 'start_time', 'end_time',
+                   'elapsed_seconds', 'queue_seconds', 'compile_seconds', 'execution_seconds',
+                   'bytes_scanned', 'rows_produced', 'credits_used_cloud_services', 'warehouse_type',
+                   'query_type', 'session_id']
+        return df.sort_values('start_time', ascending=False).head(100)[columns].reset_index(drop=True)
     
     def get_expensive_queries(self, hours: int = 24, min_credits: float = 0.01) -> pd.DataFrame:
         """Get queries that consumed significant credits."""
+        return self._fetch('expensive_queries', hours=hours, min_credits=min_credits)
+    
+    def expensive_queries_sql(self, hours: int = 24, min_credits: float = 0.01) -> str:
+        """Build the SQL for get_expensive_queries."""
         
         query = f"""
         SELECT 
@@ -104,10 +296,38 @@ class QueryMonitor:
         LIMIT 20
         """
         
-        return self.utils.query_to_df(query)
+        return query
+    
+    def expensive_queries_local(self, hours: int = 24, min_credits: float = 0.01,
+                                frame: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        get_expensive_queries answered from the mirror.
+
+        Once warehouse metering is synced, queries are ranked by attributed
+        credits (their share of metered warehouse compute plus cloud services)
+        rather than cloud services credits alone.
+        """
+        df = self.history(hours) if frame is None else frame
+        attributed = self.with_attributed_credits(df, hours) if frame is None else None
+        credits = 'credits_used_cloud_services'
+        if attributed is not None:
+            df, credits = attributed, 'attributed_credits'
+        df = df[(df[credits] >= min_credits) & (df['execution_status'] == 'SUCCESS')]
+        df = self._with_seconds(df.nlargest(20, credits))
+        df['estimated_cost_usd'] = (df[credits] * 2).round(4)
+        columns = ['query_id', 'query_preview', 'user_name', 'warehouse_name', 'warehouse_size', 'start_time',
+                   'elapsed_seconds', 'credits_used_cloud_services', 'bytes_scanned', 'rows_produced',
+                   'estimated_cost_usd']
+        if attributed is not None:
+            columns.insert(columns.index('credits_used_cloud_services'), 'attributed_credits')
+        return df[columns].reset_index(drop=True)
     
     def get_slow_queries(self, hours: int = 24, min_seconds: int = 30) -> pd.DataFrame:
         """Get queries that took a long time to execute."""
+        return self._fetch('slow_queries', hours=hours, min_seconds=min_seconds)
+    
+    def slow_queries_sql(self, hours: int = 24, min_seconds: int = 30) -> str:
+        """Build the SQL for get_slow_queries."""
         
         query = f"""
         SELECT 
@@ -130,10 +350,24 @@ class QueryMonitor:
         LIMIT 20
         """
         
-        return self.utils.query_to_df(query)
+        return query
+    
+    def slow_queries_local(self, hours: int = 24, min_seconds: int = 30,
+                           frame: pd.DataFrame = None) -> pd.DataFrame:
+        """get_slow_queries answered from the mirror."""
+        df = self.history(hours) if frame is None else frame
+        df = df[(df['total_elapsed_time'] >= min_seconds * 1000) & (df['execution_status'] == 'SUCCESS')]
+        df = self._with_seconds(df.nlargest(20, 'total_elapsed_time'))
+        columns = ['query_id', 'query_preview', 'user_name', 'warehouse_name', 'warehouse_size', 'start_time',
+                   'elapsed_seconds', 'queue_seconds', 'execution_seconds', 'bytes_scanned', 'rows_produced']
+        return df[columns].reset_index(drop=True)
     
     def get_failed_queries(self, hours: int = 24) -> pd.DataFrame:
         """Get queries that failed with errors."""
+        return self._fetch('failed_queries', hours=hours)
+    
+    def failed_queries_sql(self, hours: int = 24) -> str:
+        """Build the SQL for get_failed_queries."""
         
         query = f"""
         SELECT 
@@ -152,10 +386,22 @@ class QueryMonitor:
         LIMIT 20
         """
         
-        return self.utils.query_to_df(query)
+        return query
+    
+    def failed_queries_local(self, hours: int = 24, frame: pd.DataFrame = None) -> pd.DataFrame:
+        """get_failed_queries answered from the mirror."""
+        df = self.history(hours) if frame is None else frame
+        df = self._with_seconds(df[df['execution_status'] == 'FAIL'].nlargest(20, 'start_time'))
+        columns = ['query_id', 'query_preview', 'user_name', 'warehouse_name', 'start_time',
+                   'error_code', 'error_message', 'elapsed_seconds']
+        return df[columns].reset_index(drop=True)
     
     def get_warehouse_utilization(self, hours: int = 24) -> pd.DataFrame:
         """Get warehouse utilization statistics."""
+        return self._fetch('warehouse_utilization', hours=hours)
+    
+    def warehouse_utilization_sql(self, hours: int = 24) -> str:
+        """Build the SQL for get_warehouse_utilization."""
         
         query = f"""
         WITH warehouse_stats AS (
@@ -185,10 +431,259 @@ class QueryMonitor:
         ORDER BY total_credits DESC
         """
         
-        return self.utils.query_to_df(query)
+        return query
+    
+    def warehouse_utilization_local(self, hours: int = 24) -> pd.DataFrame:
+        """get_warehouse_utilization answered from the mirror (attributed credits once metering is synced)."""
+        df = self.history(hours)
+        df = df[df['execution_status'] == 'SUCCESS']
+        attributed = self.with_attributed_credits(df, hours)
+        credits = 'credits_used_cloud_services'
+        if attributed is not None:
+            df, credits = attributed, 'attributed_credits'
+        stats = df.groupby(['warehouse_name', 'warehouse_size'], dropna=False).agg(
+            query_count=('query_id', 'size'),
+            total_credits=(credits, 'sum'),
+            avg_elapsed_seconds=('total_elapsed_time', 'mean'),
+            total_bytes_scanned=('bytes_scanned', 'sum'),
+            total_rows_produced=('rows_produced', 'sum'),
+        ).reset_index()
+        stats['avg_elapsed_seconds'] = (stats['avg_elapsed_seconds'] / 1000).round(1)
+        stats['estimated_cost_usd'] = (stats['total_credits'] * 2).round(4)
+        stats['total_credits'] = stats['total_credits'].round(4)
+        stats['total_gb_scanned'] = (stats['total_bytes_scanned'] / (1024 ** 3)).round(2)
+        columns = ['warehouse_name', 'warehouse_size', 'query_count', 'total_credits', 'estimated_cost_usd',
+                   'avg_elapsed_seconds', 'total_gb_scanned', 'total_rows_produced']
+        return stats.sort_values('total_credits', ascending=False)[columns].reset_index(drop=True)
+    
+    def fingerprint_rows_sql(self, hours: int = 24) -> str:
+        """Build the SQL for the per-query rows that get_query_fingerprints aggregates."""
+        
+        query = f"""
+        SELECT 
+            query_id,
+            query_text,
+            user_name,
+            warehouse_name,
+            warehouse_size,
+            total_elapsed_time,
+            execution_time,
+            bytes_scanned,
+            credits_used_cloud_services
+        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+        WHERE start_time >= DATEADD('hour', -{hours}, CURRENT_TIMESTAMP())
+        """
+        
+        return query
+    
+    def get_query_fingerprints(self, hours: int = 24, top: int = 20) -> pd.DataFrame:
+        """
+        Aggregate executions by query pattern (see query_fingerprints_local).
+
+        Args:
+            hours: Hours to look back
+            top: Number of fingerprints returned, by estimated credits
+
+        Returns:
+            DataFrame with one row per fingerprint
+        """
+        frame = self.utils.query_to_df(self.fingerprint_rows_sql(hours)) if self.live else None
+        return self.query_fingerprints_local(hours, top, frame=frame)
+    
+    def query_fingerprints_local(self, hours: int = 24, top: int = 20,
+                                 frame: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Group executions whose text differs only in literals, IN-lists, comments
+        or whitespace (see sql_parse.parameterize_sql).
+
+        Estimated credits are attributed credits once warehouse metering is
+        synced (see with_attributed_credits). Otherwise they are execution time
+        at the warehouse's hourly rate plus cloud services credits, which
+        charges concurrent queries in full and is an upper bound on their share.
+
+        Returns:
+            DataFrame with fingerprint, executions, total/p50/p95 elapsed seconds,
+            bytes scanned, estimated credits, credit share, users, warehouses and
+            a sample query text, ordered by estimated credits
+        """
+        df = self.history(hours) if frame is None else frame
+        if df.empty:
+            return pd.DataFrame(columns=['fingerprint', 'executions', 'total_elapsed_seconds', 'p50_seconds',
+                                         'p95_seconds', 'bytes_scanned', 'estimated_credits', 'credit_share_pct',
+                                         'users', 'warehouses', 'sample_query'])
+
+        attributed = self.with_attributed_credits(df, hours) if frame is None else None
+        if attributed is not None:
+            estimated = attributed['attributed_credits']
+        else:
+            rates = df['warehouse_size'].map(credits_per_hour).where(df['warehouse_name'].notna(), 0)
+            estimated = df['execution_time'].fillna(0) / 3_600_000 * rates + df['credits_used_cloud_services'].fillna(0)
+        df = df.assign(
+            fingerprint=self._fingerprints(df),
+            elapsed_seconds=df['total_elapsed_time'] / 1000,
+            estimated_credits=estimated,
+        )
+
+        groups = df.groupby('fingerprint', sort=False)
+        stats = groups.agg(
+            executions=('query_id', 'size'),
+            total_elapsed_seconds=('elapsed_seconds', 'sum'),
+            bytes_scanned=('bytes_scanned', 'sum'),
+            estimated_credits=('estimated_credits', 'sum'),
+            users=('user_name', 'nunique'),
+            warehouses=('warehouse_name', 'nunique'),
+            sample_query=('query_text', 'last'),
+        )
+        latency = groups['elapsed_seconds'].quantile([0.5, 0.95]).unstack()
+        stats['p50_seconds'] = latency[0.5]
+        stats['p95_seconds'] = latency[0.95]
+        total_credits = stats['estimated_credits'].sum()
+        stats['credit_share_pct'] = stats['estimated_credits'] / total_credits * 100 if total_credits else 0.0
+        columns = ['executions', 'total_elapsed_seconds', 'p50_seconds', 'p95_seconds', 'bytes_scanned',
+                   'estimated_credits', 'credit_share_pct', 'users', 'warehouses', 'sample_query']
+        return stats.sort_values('estimated_credits', ascending=False)[columns].head(top).reset_index()
+    
+    def sizing_rows_sql(self, hours: int = 24) -> str:
+        """Build the SQL for the per-query rows that get_warehouse_sizing aggregates."""
+        
+        query = f"""
+        SELECT 
+            query_id,
+            query_text,
+            warehouse_name,
+            warehouse_size,
+            total_elapsed_time,
+            queued_overload_time,
+            execution_time,
+            bytes_spilled_to_local_storage,
+            bytes_spilled_to_remote_storage
+        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+        WHERE start_time >= DATEADD('hour', -{hours}, CURRENT_TIMESTAMP())
+            AND execution_status = 'SUCCESS'
+            AND warehouse_name IS NOT NULL
+        """
+        
+        return query
+    
+    def get_warehouse_sizing(self, hours: int = 24, top: int = 20) -> Dict[str, pd.DataFrame]:
+        """
+        Recommend warehouse sizes per warehouse and per query fingerprint
+        (see warehouse_sizing_local).
+        """
+        frame = self.utils.query_to_df(self.sizing_rows_sql(hours)) if self.live else None
+        return self.warehouse_sizing_local(hours, top, frame=frame)
+    
+    def warehouse_sizing_local(self, hours: int = 24, top: int = 20,
+                               frame: pd.DataFrame = None) -> Dict[str, pd.DataFrame]:
+        """
+        Aggregate spill, overload queueing and execution time of successful
+        queries and recommend a size for each warehouse and for its top
+        workloads (see warehouse_sizing.sizing_report).
+
+        Returns:
+            Dictionary with 'warehouses' and 'workloads' DataFrames
+        """
+        df = self.history(hours) if frame is None else frame
+        df = df[df['execution_status'] == 'SUCCESS'] if 'execution_status' in df else df
+        return sizing_report(df.assign(fingerprint=self._fingerprints(df)), top)
+    
+    def timeline_rows_sql(self, hours: int = 24) -> str:
+        """Build the SQL for the per-query rows that get_concurrency_timeline sweeps."""
+        
+        query = f"""
+        SELECT 
+            query_id,
+            query_text,
+            user_name,
+            warehouse_name,
+            end_time,
+            queued_overload_time,
+            execution_time
+        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+        WHERE start_time >= DATEADD('hour', -{hours}, CURRENT_TIMESTAMP())
+            AND warehouse_name IS NOT NULL
+            AND end_time IS NOT NULL
+        """
+        
+        return query
+    
+    def get_concurrency_timeline(self, hours: int = 24, windows: int = 10) -> Dict[str, Any]:
+        """
+        Per-second running and overload-queued query counts for each warehouse
+        over the last `hours` hours (see concurrency_timeline.concurrency_report).
+
+        Args:
+            hours: Hours to look back
+            windows: Number of queueing windows reported, by queued query-seconds
+
+        Returns:
+            Dictionary with timeline, warehouses (peaks) and windows (with the
+            users and query patterns occupying the warehouse)
+        """
+        if self.live:
+            df = self.utils.query_to_df(self.timeline_rows_sql(hours))
+            df['end_time'] = pd.to_datetime(df['end_time'], utc=True).dt.tz_localize(None)
+        else:
+            df = self.history(hours)
+        start = datetime.utcnow() - timedelta(hours=hours)
+        return concurrency_report(df, query_fingerprint, windows, start=start, end=datetime.utcnow())
+    
+    def profile_slow_queries(self, hours: int = 24, min_seconds: int = 30, limit: int = 10,
+                             profiles: Optional[ProfileStore] = None) -> List[Dict[str, Any]]:
+        """
+        Capture operator profiles for the slowest queries and rank them by fixable waste.
+
+        Operator stats are fetched concurrently and only for queries without a
+        stored profile. Each profile is compared with the previous stored run of
+        the same query fingerprint.
+
+        Args:
+            hours: Hours to look back
+            min_seconds: Minimum elapsed seconds (as get_slow_queries)
+            limit: Number of slow queries profiled
+            profiles: Profile store (default: ProfileStore())
+
+        Returns:
+            Profiles (see query_profile.build_profile) with 'previous' set to the
+            prior run's profile or None, ordered by waste_seconds
+        """
+        profiles = profiles or ProfileStore()
+        slow = self.get_slow_queries(hours, min_seconds).head(limit)
+        texts = {}
+        if not self.live:
+            history = self.history(hours)
+            texts = dict(zip(history['query_id'], history['query_text']))
+
+        stored = {query_id: profiles.get(query_id) for query_id in slow['query_id']}
+        missing = {query_id: operator_stats_sql(query_id) for query_id, profile in stored.items() if profile is None}
+        fetched = self.utils.run_many(missing) if missing else {}
+
+        captured = []
+        for row in slow.to_dict('records'):
+            profile = stored[row['query_id']]
+            if profile is None:
+                result = fetched[row['query_id']]
+                if result['error']:
+                    logger.warning(f"No operator stats for {row['query_id']}: {result['error']}")
+                    continue
+                text = texts.get(row['query_id']) or row['query_preview']
+                row['query_text'] = text
+                profile = build_profile(row, result['data'], query_fingerprint(text))
+                profiles.put(profile)
+            captured.append(profile)
+
+        runs = profiles.by_fingerprint()
+        for profile in captured:
+            earlier = [p for p in runs.get(profile['fingerprint'], []) if p['start_time'] < profile['start_time']]
+            profile['previous'] = earlier[-1] if earlier else None
+        return sorted(captured, key=lambda p: p['waste_seconds'], reverse=True)
     
     def analyze_query_patterns(self, hours: int = 24) -> Dict[str, Any]:
         """Analyze query patterns and provide insights."""
+        return self.summarize_stats(self._fetch('query_stats', hours=hours))
+    
+    def query_stats_sql(self, hours: int = 24) -> str:
+        """Build the summary statistics SQL for analyze_query_patterns."""
         
         # Get basic statistics
         stats_query = f"""
@@ -205,8 +700,27 @@ class QueryMonitor:
         WHERE start_time >= DATEADD('hour', -{hours}, CURRENT_TIMESTAMP())
         """
         
-        stats_df = self.utils.query_to_df(stats_query)
-        stats = stats_df.iloc[0].to_dict()
+        return stats_query
+    
+    def query_stats_local(self, hours: int = 24) -> pd.DataFrame:
+        """The query_stats_sql summary row computed from the mirror."""
+        df = self.history(hours)
+        status = df['execution_status']
+        return pd.DataFrame([{
+            'total_queries': len(df),
+            'successful_queries': int((status == 'SUCCESS').sum()),
+            'failed_queries': int((status == 'FAIL').sum()),
+            # The mirror only holds finished queries, so it cannot count running ones
+            'running_queries': None,
+            'avg_elapsed_seconds': df['total_elapsed_time'].mean() / 1000 if len(df) else None,
+            'total_credits': df['credits_used_cloud_services'].sum(),
+            'unique_users': df['user_name'].nunique(),
+            'warehouses_used': df['warehouse_name'].nunique(),
+        }])
+    
+    def summarize_stats(self, stats_df: pd.DataFrame) -> Dict[str, Any]:
+        """Turn the summary statistics row into the report dictionary."""
+        stats = stats_df.to_dict('records')[0]  # keeps per-column dtypes, unlike iloc[0]
         
         # Calculate success rate
         stats['success_rate'] = (stats['successful_queries'] / stats['total_queries']) * 100 if stats['total_queries'] > 0 else 0
@@ -214,6 +728,190 @@ class QueryMonitor:
         
         return stats
 
+    def _detail_filter(self, report: str, kwargs: Dict[str, Any]) -> Tuple[str, str, int]:
+        """(condition, ORDER BY, limit) matching one of the row-level *_sql reports."""
+        if report == 'expensive_queries':
+            return (f"execution_status = 'SUCCESS' AND credits_used_cloud_services >= {kwargs.get('min_credits', 0.01)}",
+                    "credits_used_cloud_services DESC", 20)
+        if report == 'slow_queries':
+            return (f"execution_status = 'SUCCESS' AND total_elapsed_time >= {kwargs.get('min_seconds', 30) * 1000}",
+                    "total_elapsed_time DESC", 20)
+        if report == 'failed_queries':
+            return "execution_status = 'FAIL'", "start_time DESC", 20
+        conditions = []
+        if kwargs.get('user_name'):
+            conditions.append(f"UPPER(user_name) = UPPER('{kwargs['user_name']}')")
+        if kwargs.get('running_only'):
+            conditions.append("execution_status = 'RUNNING'")
+        if kwargs.get('min_credits', 0) > 0:
+            conditions.append(f"credits_used_cloud_services >= {kwargs['min_credits']}")
+        return ' AND '.join(conditions) or 'TRUE', "start_time DESC", 100
+
+    def consolidated_sql(self, reports: Dict[str, Tuple[str, Dict[str, Any]]]) -> str:
+        """
+        One QUERY_HISTORY scan that answers every report in `reports` (see run_reports).
+
+        Row-level reports become a flag per row plus a ROW_NUMBER() rank within
+        the flagged rows; rows outside every top-N are dropped with QUALIFY.
+        Summary and warehouse figures come from GROUPING SETS over the same
+        scan. Both are returned as one result, tagged by row_kind.
+        """
+        hours = max(kwargs.get('hours', 24) for _, kwargs in reports.values())
+        details = {name: self._detail_filter(report, kwargs) for name, (report, kwargs) in reports.items()
+                   if report not in ('query_stats', 'warehouse_utilization')}
+
+        flags = ''.join(f",\n                {condition} AS is_{name}"
+                        for name, (condition, _, _) in details.items())
+        qualify = '\n                OR '.join(
+            f"(is_{name} AND ROW_NUMBER() OVER (PARTITION BY is_{name} ORDER BY {order_by}) <= {limit})"
+            for name, (_, order_by, limit) in details.items()) or 'FALSE'
+
+        detail_columns = ['query_id'] + MIRROR_COLUMNS + ['end_time']
+        union_columns = detail_columns + ROLLUP_COLUMNS
+        separator = ',\n            '
+        detail_select = separator.join(c if c in detail_columns else f"NULL AS {c}" for c in union_columns)
+        rollup_select = separator.join(c if c in ROLLUP_COLUMNS or c in ('warehouse_name', 'warehouse_size')
+                                       else f"NULL AS {c}" for c in union_columns)
+
+        return f"""
+        WITH base AS (
+            SELECT {', '.join(detail_columns)}{flags}
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE start_time >= DATEADD('hour', -{hours}, CURRENT_TIMESTAMP())
+        ),
+        detail AS (
+            SELECT *
+            FROM base
+            QUALIFY {qualify}
+        ),
+        rollup AS (
+            SELECT
+                GROUPING(warehouse_name, warehouse_size) AS grouping_id,
+                warehouse_name,
+                warehouse_size,
+                COUNT(*) AS total_queries,
+                COUNT_IF(execution_status = 'SUCCESS') AS successful_queries,
+                COUNT_IF(execution_status = 'FAIL') AS failed_queries,
+                COUNT_IF(execution_status = 'RUNNING') AS running_queries,
+                AVG(total_elapsed_time / 1000) AS avg_elapsed_seconds,
+                SUM(credits_used_cloud_services) AS total_credits,
+                COUNT(DISTINCT user_name) AS unique_users,
+                COUNT(DISTINCT warehouse_name) AS warehouses_used,
+                SUM(IFF(execution_status = 'SUCCESS', credits_used_cloud_services, 0)) AS success_credits,
+                AVG(IFF(execution_status = 'SUCCESS', total_elapsed_time / 1000, NULL)) AS success_avg_elapsed_seconds,
+                SUM(IFF(execution_status = 'SUCCESS', bytes_scanned, 0)) AS success_bytes_scanned,
+                SUM(IFF(execution_status = 'SUCCESS', rows_produced, 0)) AS success_rows_produced
+            FROM base
+            GROUP BY GROUPING SETS ((), (warehouse_name, warehouse_size))
+        )
+        SELECT
+            'detail' AS row_kind,
+            {detail_select}
+        FROM detail
+        UNION ALL
+        SELECT
+            'rollup' AS row_kind,
+            {rollup_select}
+        FROM rollup
+        """
+
+    def split_consolidated(self, df: pd.DataFrame,
+                           reports: Dict[str, Tuple[str, Dict[str, Any]]]) -> Dict[str, pd.DataFrame]:
+        """Split a consolidated_sql result into the report sections requested in `reports`."""
+        df = df.copy()
+        df.columns = [c.lower() for c in df.columns]
+        detail = df[df['row_kind'] == 'detail'].reset_index(drop=True)
+        rollup = df[df['row_kind'] == 'rollup'].reset_index(drop=True)
+        total = rollup[rollup['grouping_id'] == 3]
+
+        sections = {}
+        for name, (report, kwargs) in reports.items():
+            if report == 'query_stats':
+                sections[name] = total[SUMMARY_COLUMNS].reset_index(drop=True)
+            elif report == 'warehouse_utilization':
+                stats = rollup[(rollup['grouping_id'] == 0) & (rollup['successful_queries'] > 0)]
+                sections[name] = pd.DataFrame({
+                    'warehouse_name': stats['warehouse_name'],
+                    'warehouse_size': stats['warehouse_size'],
+                    'query_count': stats['successful_queries'],
+                    'total_credits': stats['success_credits'].astype(float).round(4),
+                    'estimated_cost_usd': (stats['success_credits'].astype(float) * 2).round(4),
+                    'avg_elapsed_seconds': stats['success_avg_elapsed_seconds'].astype(float).round(1),
+                    'total_gb_scanned': (stats['success_bytes_scanned'].astype(float) / (1024 ** 3)).round(2),
+                    'total_rows_produced': stats['success_rows_produced'],
+                }).sort_values('total_credits', ascending=False).reset_index(drop=True)
+            else:
+                # The detail rows hold every report's top-N, so the local report
+                # code picks the same rows it would from the full window
+                sections[name] = getattr(self, f"{report}_local")(**kwargs, frame=detail)
+        return sections
+
+    def run_consolidated(self, reports: Dict[str, Tuple[str, Dict[str, Any]]],
+                         utils: Optional[SnowflakeUtils] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Answer `reports` live with a single consolidated_sql query.
+
+        Returns:
+            Mapping of name to {'data', 'error', 'elapsed_seconds'} (as run_reports);
+            every section shares the elapsed time of the one query
+        """
+        utils = utils or self.utils
+        started = time.perf_counter()
+        try:
+            sections, error = self.split_consolidated(utils.query_to_df(self.consolidated_sql(reports)), reports), None
+        except Exception as e:
+            sections, error = {}, str(e)
+        elapsed = time.perf_counter() - started
+        return {name: {'data': sections.get(name), 'error': error, 'elapsed_seconds': elapsed}
+                for name in reports}
+
+    def compare_live_modes(self, reports: Dict[str, Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Run `reports` live both as separate queries and as one consolidated query.
+
+        Each approach runs with the result cache off under its own QUERY_TAG.
+        Bytes scanned and server time are then read back from
+        INFORMATION_SCHEMA.QUERY_HISTORY, which has no ingest latency.
+
+        Returns:
+            {'separate': {...}, 'consolidated': {...}} with queries, bytes_scanned,
+            server_seconds and wall_seconds for each
+        """
+        run_id = uuid.uuid4().hex[:12]
+        tags = {mode: f"monitor_queries:{mode}:{run_id}" for mode in ('separate', 'consolidated')}
+        measured = {mode: SnowflakeUtils(session_params={'USE_CACHED_RESULT': False, 'QUERY_TAG': tag})
+                    for mode, tag in tags.items()}
+
+        wall = {}
+        started = time.perf_counter()
+        measured['separate'].run_many({name: getattr(self, f"{report}_sql")(**kwargs)
+                                       for name, (report, kwargs) in reports.items()})
+        wall['separate'] = time.perf_counter() - started
+        started = time.perf_counter()
+        self.run_consolidated(reports, utils=measured['consolidated'])
+        wall['consolidated'] = time.perf_counter() - started
+
+        tag_list = ', '.join(f"'{tag}'" for tag in tags.values())
+        usage = self.utils.query_to_df(f"""
+        SELECT
+            query_tag,
+            COUNT(*) AS queries,
+            SUM(bytes_scanned) AS bytes_scanned,
+            SUM(total_elapsed_time) / 1000 AS server_seconds
+        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY(
+            END_TIME_RANGE_START => DATEADD('hour', -1, CURRENT_TIMESTAMP()),
+            RESULT_LIMIT => 10000))
+        WHERE query_tag IN ({tag_list})
+        GROUP BY query_tag
+        """)
+        usage = {row['query_tag']: row for row in usage.to_dict('records')}
+        return {mode: {
+            'queries': int(usage.get(tag, {}).get('queries') or 0),
+            'bytes_scanned': int(usage.get(tag, {}).get('bytes_scanned') or 0),
+            'server_seconds': float(usage.get(tag, {}).get('server_seconds') or 0),
+            'wall_seconds': wall[mode],
+        } for mode, tag in tags.items()}
+
 def format_monitor_output(queries_df: pd.DataFrame, title: str) -> str:
     """Format monitoring results for console output."""
     output = [f"\n📊 {title}"]
@@ -241,8 +939,13 @@ def format_monitor_output(queries_df: pd.DataFrame, title: str) -> str:
         if 'elapsed_seconds' in row:
             output.append(f"   Duration: {row['elapsed_seconds']:.1f}s")
             
-        if 'credits_used_cloud_services' in row and pd.notna(row['credits_used_cloud_services']):
+        if 'attributed_credits' in row and pd.notna(row['attributed_credits']):
+            output.append(f"   Credits: {row['attributed_credits']:.4f} "
+                          f"(cloud services {row['credits_used_cloud_services']:.4f})")
+        elif 'credits_used_cloud_services' in row and pd.notna(row['credits_used_cloud_services']):
             output.append(f"   Credits: {row['credits_used_cloud_services']:.4f}")
+        elif 'total_credits' in row and pd.notna(row['total_credits']):
+            output.append(f"   Queries: {row['query_count']:,}  Credits: {row['total_credits']:.4f}")
             
         if 'error_message' in row and pd.notna(row['error_message']):
             error_msg = str(row['error_message'])[:100] + ('...' if len(str(row['error_message'])) > 100 else '')
@@ -253,6 +956,120 @@ def format_monitor_output(queries_df: pd.DataFrame, title: str) -> str:
     
     return '\n'.join(output)
 
+def format_fingerprint_output(fingerprints: pd.DataFrame, hours: int) -> str:
+    """Format query fingerprint aggregates for console output."""
+    output = [f"\n🧬 TOP QUERY PATTERNS (last {hours} hours, by estimated credits)"]
+    output.append("=" * 60)
+    
+    if fingerprints.empty:
+        output.append("No queries found.")
+        return '\n'.join(output)
+    
+    for _, row in fingerprints.iterrows():
+        output.append(f"\n🔑 {row['fingerprint']}  ({row['credit_share_pct']:.1f}% of credits)")
+        preview = ' '.join(str(row['sample_query']).split())
+        output.append(f"   Query: {preview[:100]}{'...' if len(preview) > 100 else ''}")
+        output.append(f"   Executions: {row['executions']:,}  Users: {row['users']}  Warehouses: {row['warehouses']}")
+        output.append(f"   Elapsed: {row['total_elapsed_seconds']:,.0f}s total, p50 {row['p50_seconds']:.1f}s, "
+                      f"p95 {row['p95_seconds']:.1f}s")
+        output.append(f"   Scanned: {row['bytes_scanned'] / (1024**3):,.2f} GB  "
+                      f"Est. Credits: {row['estimated_credits']:.4f}")
+    
+    return '\n'.join(output)
+
+def format_sizing_output(sizing: Dict[str, pd.DataFrame], hours: int) -> str:
+    """Format warehouse sizing recommendations for console output."""
+    output = [f"\n📐 WAREHOUSE SIZING (last {hours} hours, successful queries)"]
+    output.append("=" * 60)
+    
+    if sizing['warehouses'].empty:
+        output.append("No warehouse queries found.")
+        return '\n'.join(output)
+    
+    def trade_off(row) -> str:
+        return (f"   Projected: {row['credits']:.2f} -> {row['projected_credits']:.2f} credits "
+                f"({row['credit_change_pct']:+.0f}%), p95 execution {row['p95_execution_seconds']:.1f}s -> "
+                f"{row['projected_p95_execution_seconds']:.1f}s")
+    
+    for _, row in sizing['warehouses'].iterrows():
+        action = (f"{row['warehouse_size']} -> {row['recommended_size']}" if row['steps']
+                  else f"keep {row['warehouse_size']}")
+        output.append(f"\n🏭 {row['warehouse_name']}: {action}")
+        output.append(f"   {row['executions']:,} queries, {row['execution_hours']:,.1f} execution hours, "
+                      f"queued {row['queue_share_pct']:.1f}%, spilling {row['local_spill_share_pct']:.1f}% local / "
+                      f"{row['remote_spill_share_pct']:.1f}% remote")
+        output.append(f"   Why: {row['reason']}")
+        if row['steps']:
+            output.append(trade_off(row))
+    
+    resized = sizing['workloads'][sizing['workloads']['steps'] != 0]
+    output.append(f"\n🧬 Workloads to move ({len(resized)} of the top {len(sizing['workloads'])} by execution hours)")
+    for _, row in resized.iterrows():
+        preview = ' '.join(str(row['sample_query']).split())
+        output.append(f"\n🔑 {row['fingerprint']} on {row['warehouse_name']}: "
+                      f"{row['warehouse_size']} -> {row['recommended_size']}")
+        output.append(f"   Query: {preview[:100]}{'...' if len(preview) > 100 else ''}")
+        output.append(f"   {row['executions']:,} queries. Why: {row['reason']}")
+        output.append(trade_off(row))
+    
+    return '\n'.join(output)
+
+def format_timeline_output(report: Dict[str, Any], hours: int) -> str:
+    """Format warehouse concurrency peaks and queueing windows for console output."""
+    output = [f"\n⏳ WAREHOUSE CONCURRENCY (last {hours} hours, per second)"]
+    output.append("=" * 60)
+    
+    if report['warehouses'].empty:
+        output.append("No warehouse queries found.")
+        return '\n'.join(output)
+    
+    for _, row in report['warehouses'].iterrows():
+        output.append(f"🏭 {row['warehouse_name']}: peak {row['peak_running']} running at {row['peak_running_at']}, "
+                      f"avg {row['avg_running_when_active']:.1f} when active, peak {row['peak_queued']} queued, "
+                      f"{row['queued_seconds'] / 60:,.0f} min with queueing")
+    
+    output.append(f"\n🚦 Worst queueing windows ({len(report['windows'])})")
+    for window in report['windows']:
+        output.append(f"\n{window['warehouse_name']} {window['start']} -> {window['end']:%H:%M:%S} "
+                      f"({window['seconds'] / 60:.1f} min): peak {window['peak_queued']} queued, "
+                      f"{window['peak_running']} running, {window['queries']:,} queries")
+        users = ', '.join(f"{u['name']} {u['seconds'] / 60:,.0f} min" for u in window['users'])
+        output.append(f"   Users: {users}")
+        for item in window['fingerprints']:
+            preview = ' '.join(str(item['sample_query']).split())
+            output.append(f"   🔑 {item['name']} {item['seconds'] / 60:,.0f} min: "
+                          f"{preview[:80]}{'...' if len(preview) > 80 else ''}")
+    
+    return '\n'.join(output)
+
+def format_profile_output(profiles: List[Dict[str, Any]]) -> str:
+    """Format operator profiles, ranked by fixable waste, for console output."""
+    output = [f"\n🩺 SLOW QUERY PROFILES (ranked by fixable waste)"]
+    output.append("=" * 60)
+    
+    if not profiles:
+        output.append("No slow queries profiled.")
+        return '\n'.join(output)
+    
+    for profile in profiles:
+        output.append(f"\n🔍 Query ID: {profile['query_id']}  (fingerprint {profile['fingerprint']})")
+        preview = ' '.join(profile['query_text'].split())
+        output.append(f"   Query: {preview[:100]}{'...' if len(preview) > 100 else ''}")
+        output.append(f"   Execution: {profile['execution_seconds']:.1f}s, fixable waste: "
+                      f"{profile['waste_seconds']:.1f}s")
+        if profile['pruning_ratio'] is not None:
+            output.append(f"   Partitions read: {profile['pruning_ratio'] * 100:.1f}% of total")
+        top = ', '.join(f"{op['type']} #{op['operator_id']} {op['time_pct']:.0f}%" for op in profile['top_operators'])
+        output.append(f"   Top operators: {top}")
+        for finding in profile['findings']:
+            output.append(f"   ⚠️  {finding['detail']} (~{finding['waste_seconds']:.1f}s)")
+        previous = profile.get('previous')
+        if previous:
+            output.append(f"   Previous run {previous['start_time']}: {previous['execution_seconds']:.1f}s, "
+                          f"waste {previous['waste_seconds']:.1f}s")
+    
+    return '\n'.join(output)
+
 def main():
     parser = argparse.ArgumentParser(
         description='Monitor Snowflake queries and identify performance issues',
@@ -308,50 +1125,288 @@ def main():
         help='Minimum credits for expensive query filter (default: 0.001)'
     )
     
+    parser.add_argument(
+        '--fingerprints',
+        action='store_true',
+        help='Aggregate cost by query pattern (text with literals and IN-lists normalized)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Capture operator stats for the slowest queries and rank them by fixable waste'
+    )
+    
+    parser.add_argument(
+        '--sizing',
+        action='store_true',
+        help='Recommend warehouse sizes from spill, queueing and execution time per warehouse and query pattern'
+    )
+    
+    parser.add_argument(
+        '--timeline',
+        nargs='?',
+        const='concurrency_timeline.png',
+        metavar='PNG',
+        help='Per-second concurrency and queueing per warehouse, charted to PNG (default: concurrency_timeline.png)'
+    )
+    
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=20,
+        help='Query patterns listed with --fingerprints / --sizing, queries profiled with --profile (default: 20)'
+    )
+    
+    parser.add_argument(
+        '--live',
+        action='store_true',
+        help='Query ACCOUNT_USAGE.QUERY_HISTORY directly instead of the local mirror'
+    )
+    
+    parser.add_argument(
+        '--sync-history',
+        action='store_true',
+        help=f'Create the local mirror if it does not exist yet, backfilling {MIRROR_BACKFILL_DAYS} days '
+             f'account-wide (an existing mirror is synced incrementally on every run)'
+    )
+    
+    parser.add_argument(
+        '--no-sync',
+        action='store_true',
+        help='Report from the existing local mirror without fetching new history first'
+    )
+    
+    parser.add_argument(
+        '--consolidated',
+        action='store_true',
+        help='With --live, fetch every report in one QUERY_HISTORY scan'
+    )
+    
+    parser.add_argument(
+        '--compare',
+        action='store_true',
+        help='With --live, measure bytes scanned and time for separate vs consolidated queries'
+    )
+    
+    parser.add_argument(
+        '--exporter',
+        action='store_true',
+        help='Run until interrupted, serving OpenMetrics query/warehouse health on http://127.0.0.1:PORT/metrics'
+    )
+    
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=9464,
+        help='HTTP port for --exporter (default: 9464)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=60,
+        help='Seconds between --exporter polls / --watchdog checks (default: 60)'
+    )
+    
+    parser.add_argument(
+        '--warehouses',
+        help='Comma-separated warehouses polled by --exporter, one query each (default: the session user\'s history)'
+    )
+    
+    parser.add_argument(
+        '--watchdog',
+        action='store_true',
+        help='Run until interrupted, cancelling your running queries (current role) that exceed the budgets'
+    )
+    
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='With --watchdog, log the queries that would be cancelled without cancelling them'
+    )
+    
+    parser.add_argument(
+        '--max-elapsed',
+        type=float,
+        default=DEFAULT_BUDGETS['max_elapsed_seconds'],
+        help='Watchdog budget: elapsed seconds (default: 3600)'
+    )
+    
+    parser.add_argument(
+        '--max-gb',
+        type=float,
+        default=DEFAULT_BUDGETS['max_gb_scanned'],
+        help='Watchdog budget: GB scanned (default: 1024)'
+    )
+    
+    parser.add_argument(
+        '--max-credits',
+        type=float,
+        default=DEFAULT_BUDGETS['max_credits'],
+        help='Watchdog budget: estimated credits at the warehouse rate (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--max-rows-per-mb',
+        type=float,
+        default=DEFAULT_BUDGETS['max_rows_per_mb'],
+        help='Watchdog budget: rows produced per MB scanned, a join explosion signal (default: 1000000)'
+    )
+    
     args = parser.parse_args()
+    if (args.consolidated or args.compare) and not args.live:
+        parser.error('--consolidated and --compare query Snowflake directly; add --live')
     
     try:
-        monitor = QueryMonitor()
+        if args.watchdog:
+            monitor = QueryMonitor(live=True)
+            budgets = {'max_elapsed_seconds': args.max_elapsed, 'max_gb_scanned': args.max_gb,
+                       'max_credits': args.max_credits, 'max_rows_per_mb': args.max_rows_per_mb}
+            watchdog = QueryWatchdog(monitor.utils, budgets, dry_run=args.dry_run)
+            mode = "dry run, nothing is cancelled" if args.dry_run else "offenders are cancelled"
+            print(f"🐕 Watching your running queries every {args.interval:g}s ({mode}; log: {watchdog.log_path})")
+            
+            def report(decision):
+                icon = {'cancelled': '🛑', 'would_cancel': '⚠️ ', 'cancel_failed': '❌'}[decision['action']]
+                print(f"{icon} {decision['action']} {decision['query_id']} on {decision['warehouse_name']}: "
+                      f"{'; '.join(decision['violations'])}")
+                print(f"   Query: {decision['query_preview'][:100]}")
+            
+            try:
+                watchdog.run(args.interval, on_decision=report)
+            except KeyboardInterrupt:
+                print("\n👋 Watchdog stopped")
+            return
+        
+        if args.exporter:
+            # The exporter reads INFORMATION_SCHEMA directly; no mirror sync is needed
+            monitor = QueryMonitor(live=True)
+            warehouses = [w.strip() for w in (args.warehouses or '').split(',') if w.strip()]
+            exporter = QueryHealthExporter(monitor.utils, warehouses)
+            print(f"📡 Serving query health on http://127.0.0.1:{args.port}/metrics "
+                  f"(polling every {args.interval:g}s, Ctrl+C to stop)")
+            try:
+                exporter.serve(args.port, interval=args.interval)
+            except KeyboardInterrupt:
+                print("\n👋 Exporter stopped")
+            return
         
         print(f"🔍 Monitoring Snowflake queries (last {args.hours} hours)")
         
+        store = None if args.live else QueryHistoryStore()
+        watermark = store.watermark if store is not None else None
+        if store is not None and watermark is None and not args.sync_history:
+            # Backfilling a new mirror is opt-in; until then the reports are queried live
+            print(f"⚠️  No local mirror yet: reporting live from ACCOUNT_USAGE "
+                  f"(add --sync-history to create it, backfilling {MIRROR_BACKFILL_DAYS} days account-wide)")
+            store = None
+        monitor = QueryMonitor(store=store, live=store is None)
+        
+        if store is not None and args.no_sync:
+            print(f"📦 Reporting from the local mirror without syncing (synced up to {watermark})")
+        elif store is not None:
+            synced = monitor.sync(args.hours)
+            print(f"🔄 Mirror synced: {synced['rows_fetched']:,} new rows, {synced['metering_rows']:,} metering rows, "
+                  f"{synced['attributed_hours']} hours attributed in {synced['elapsed_seconds']:.1f}s "
+                  f"(watermark {synced['watermark']})")
+        
+        # Collect every requested report; mirror reports are computed locally,
+        # live ones are fetched concurrently
+        no_filter = not any([args.expensive, args.slow, args.failed, args.running_only, args.warehouse_stats])
+        reports = {'summary': ('query_stats', {'hours': args.hours})}
+        if args.expensive or not any([args.running_only, args.slow, args.failed, args.warehouse_stats]):
+            reports['expensive'] = ('expensive_queries', {'hours': args.hours, 'min_credits': args.min_credits})
+        if args.slow:
+            reports['slow'] = ('slow_queries', {'hours': args.hours, 'min_seconds': 30})
+        if args.failed:
+            reports['failed'] = ('failed_queries', {'hours': args.hours})
+        if args.running_only:
+            reports['running'] = ('recent_queries', {'hours': args.hours, 'user_name': args.user,
+                                                     'running_only': True})
+        if args.warehouse_stats:
+            reports['warehouse'] = ('warehouse_utilization', {'hours': args.hours})
+        if no_filter:
+            reports['recent'] = ('recent_queries', {'hours': args.hours, 'user_name': args.user,
+                                                    'min_credits': args.min_credits})
+        
+        if args.compare:
+            comparison = monitor.compare_live_modes(reports)
+            print(f"\n⚖️  SEPARATE vs CONSOLIDATED ({len(reports)} reports, result cache off)")
+            print("=" * 60)
+            for mode, m in comparison.items():
+                print(f"{mode.capitalize():<13} {m['queries']:>3} queries  {m['bytes_scanned'] / (1024**2):>10.1f} MB scanned  "
+                      f"{m['server_seconds']:>6.1f}s server  {m['wall_seconds']:>6.1f}s wall")
+            return
+        
+        started = time.perf_counter()
+        if args.consolidated:
+            results = monitor.run_consolidated(reports)
+        else:
+            results = monitor.run_reports(reports)
+        wall_seconds = time.perf_counter() - started
+        
+        failed_reports = {name: r['error'] for name, r in results.items() if r['error']}
+        if 'summary' in failed_reports:
+            raise RuntimeError(failed_reports['summary'])
+        
         # Show summary statistics
-        stats = monitor.analyze_query_patterns(args.hours)
+        stats = monitor.summarize_stats(results['summary']['data'])
         print(f"\n📈 SUMMARY STATISTICS")
         print("=" * 40)
         print(f"Total Queries: {stats['total_queries']}")
         print(f"Success Rate: {stats['success_rate']:.1f}%")
         print(f"Total Credits: {stats['total_credits']:.4f}")
         print(f"Estimated Cost: ${stats['estimated_cost_usd']:.4f}")
-        print(f"Avg Duration: {stats['avg_elapsed_seconds']:.1f}s")
+        print(f"Avg Duration: {stats['avg_elapsed_seconds'] or 0:.1f}s")
+        running = stats['running_queries']
+        print(f"Running Queries: {'n/a from the mirror (use --live or --running-only)' if running is None else running}")
         print(f"Active Users: {stats['unique_users']}")
         print(f"Warehouses Used: {stats['warehouses_used']}")
         
         # Show specific query types based on flags
-        if args.expensive or not any([args.running_only, args.slow, args.failed, args.warehouse_stats]):
-            expensive_df = monitor.get_expensive_queries(args.hours, args.min_credits)
-            print(format_monitor_output(expensive_df, f"EXPENSIVE QUERIES (>{args.min_credits} credits)"))
-            
-        if args.slow:
-            slow_df = monitor.get_slow_queries(args.hours, 30)
-            print(format_monitor_output(slow_df, "SLOW QUERIES (>30 seconds)"))
-            
-        if args.failed:
-            failed_df = monitor.get_failed_queries(args.hours)
-            print(format_monitor_output(failed_df, "FAILED QUERIES"))
-            
-        if args.running_only:
-            running_df = monitor.get_recent_queries(args.hours, args.user, running_only=True)
-            print(format_monitor_output(running_df, "CURRENTLY RUNNING QUERIES"))
-            
-        if args.warehouse_stats:
-            warehouse_df = monitor.get_warehouse_utilization(args.hours)
-            print(format_monitor_output(warehouse_df, "WAREHOUSE UTILIZATION"))
-            
-        # Show recent queries if no specific filter
-        if not any([args.expensive, args.slow, args.failed, args.running_only, args.warehouse_stats]):
-            recent_df = monitor.get_recent_queries(args.hours, args.user, min_credits=args.min_credits)
-            print(format_monitor_output(recent_df, "RECENT QUERIES"))
+        titles = {
+            'expensive': f"EXPENSIVE QUERIES (>{args.min_credits} credits)",
+            'slow': "SLOW QUERIES (>30 seconds)",
+            'failed': "FAILED QUERIES",
+            'running': "CURRENTLY RUNNING QUERIES",
+            'warehouse': "WAREHOUSE UTILIZATION",
+            'recent': "RECENT QUERIES",
+        }
+        for name, title in titles.items():
+            if name not in results:
+                continue
+            if results[name]['error']:
+                print(f"\n❌ {title}: {results[name]['error']}")
+            else:
+                print(format_monitor_output(results[name]['data'], title))
+        
+        if args.fingerprints:
+            started = time.perf_counter()
+            fingerprints = monitor.get_query_fingerprints(args.hours, args.top)
+            print(format_fingerprint_output(fingerprints, args.hours))
+            print(f"   (aggregated in {(time.perf_counter() - started) * 1000:.0f}ms)")
+        
+        if args.sizing:
+            started = time.perf_counter()
+            sizing = monitor.get_warehouse_sizing(args.hours, args.top)
+            print(format_sizing_output(sizing, args.hours))
+            print(f"   (computed in {(time.perf_counter() - started) * 1000:.0f}ms)")
+        
+        if args.timeline:
+            started = time.perf_counter()
+            timeline = monitor.get_concurrency_timeline(args.hours)
+            print(format_timeline_output(timeline, args.hours))
+            print(f"   (swept in {(time.perf_counter() - started) * 1000:.0f}ms)")
+            print(f"📊 Chart saved to {plot_timeline(timeline, args.timeline)}")
+        
+        if args.profile:
+            print(format_profile_output(monitor.profile_slow_queries(args.hours, 30, args.top)))
+        
+        slowest = max(results, key=lambda name: results[name]['elapsed_seconds'])
+        source = "local mirror" if not monitor.live else "one Snowflake query" if args.consolidated else "Snowflake"
+        print(f"\n⏱️  Built {len(results)} reports from {source} in {wall_seconds * 1000:.0f}ms "
+              f"(slowest: {slowest} {results[slowest]['elapsed_seconds'] * 1000:.0f}ms)")
             
     except Exception as e:
         print(f"❌ Error monitoring queries: {e}")
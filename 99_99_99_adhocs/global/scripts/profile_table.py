@@ -7,6 +7,7 @@ Usage:
     python scripts/profile_table.py DATABASE.SCHEMA.TABLE_NAME
     python scripts/profile_table.py DATABASE.SCHEMA.TABLE_NAME --sample-size 5000
     python scripts/profile_table.py DATABASE.SCHEMA.TABLE_NAME --output profile_report.json
+    python scripts/profile_table.py DATABASE.SCHEMA.TABLE_NAME --refresh
 """
 
 import sys
@@ -81,6 +82,7 @@ Examples:
   python scripts/profile_table.py ANALYTICS.PUBLIC.SALES
   python scripts/profile_table.py ANALYTICS.PUBLIC.SALES --sample-size 10000
   python scripts/profile_table.py ANALYTICS.PUBLIC.SALES --output profile.json
+  python scripts/profile_table.py ANALYTICS.PUBLIC.SALES --no-cache
         """
     )
     
@@ -107,13 +109,25 @@ Examples:
         help='Suppress console output (useful when saving to file)'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always query Snowflake and do not store results in the local cache'
+    )
+    
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Ignore cached results and overwrite them with fresh ones'
+    )
+    
     args = parser.parse_args()
     
     try:
         print(f"🔍 Profiling table: {args.table_name}")
         print(f"📊 Sample size: {args.sample_size:,} rows")
         
-        utils = SnowflakeUtils()
+        utils = SnowflakeUtils(use_cache=not args.no_cache, refresh_cache=args.refresh and not args.no_cache)
         profile = utils.profile_table(args.table_name, args.sample_size)
         
         # Save to file if requested
@@ -130,6 +144,10 @@ Examples:
         if not args.quiet:
             print(format_profile_output(profile))
         
+        if utils.use_cache:
+            cache_stats = utils.cache.stats()
+            print(f"🗄️  Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        
         print(f"\n✅ Profiling completed successfully!")
         
     except Exception as e:
@@ -6,34 +6,98 @@ Analyze query patterns and estimate compute costs before execution.
 Usage:
     python scripts/query_cost_estimator.py sql/query.sql
     python scripts/query_cost_estimator.py sql/query.sql --warehouse LARGE_WH
+    python scripts/query_cost_estimator.py sql/query.sql --explain
+    python scripts/query_cost_estimator.py sql/query.sql --explain --model
+    python scripts/query_cost_estimator.py sql/ --workers 8 --top 25
+    python scripts/query_cost_estimator.py sql/query.sql --rewrite sql/query_pruned.sql --verify
     echo "SELECT * FROM large_table" | python scripts/query_cost_estimator.py -
 """
 
+import os
 import sys
 import argparse
-import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, List
+from sqlalchemy import text
 from src.sf_client import get_connection
+from src.sf_explain import ExplainCache, explain_plan, summarize_plan
+from src.sql_parse import split_sql, split_sql_with_lines, normalize_sql, is_session_statement
+from src.sql_ast import analyze_sql
+from src.sql_pruning import pruning_report, verify_rewrite
+from src.cost_model import WAREHOUSE_CREDITS, DEFAULT_MODEL_PATH, RuntimeModel
+from src.table_metadata import TableMetadataCache
 
-# Warehouse size to credits per hour mapping (approximate)
-WAREHOUSE_CREDITS = {
-    'X-SMALL': 1,
-    'SMALL': 2,
-    'MEDIUM': 4,
-    'LARGE': 8,
-    'X-LARGE': 16,
-    '2X-LARGE': 32,
-    '3X-LARGE': 64,
-    '4X-LARGE': 128
-}
+# Approximate compressed bytes an X-SMALL warehouse scans per second; larger
+# warehouses scale linearly with their credits per hour
+SCAN_MB_PER_SECOND = float(os.getenv('SNOWFLAKE_SCAN_MB_PER_SECOND', '100'))
 
 class QueryCostEstimator:
     """Estimate Snowflake query costs and provide optimization recommendations."""
     
-    def __init__(self, warehouse_size: str = 'MEDIUM'):
+    def __init__(self, warehouse_size: str = 'MEDIUM', use_explain: bool = False,
+                 explain_cache: ExplainCache = None, model: RuntimeModel = None,
+                 metadata: TableMetadataCache = None):
+        """
+        Args:
+            warehouse_size: Warehouse size used for credit calculations
+            use_explain: Base runtime on EXPLAIN USING JSON scan sizes instead of a fixed 30 seconds
+            explain_cache: Optional plan cache (created when use_explain is set)
+            model: Optional trained RuntimeModel; its prediction replaces the heuristic estimate
+            metadata: Optional table metadata cache (shared across estimators)
+        """
         self.warehouse_size = warehouse_size.upper()
         self.credits_per_hour = WAREHOUSE_CREDITS.get(self.warehouse_size, 4)
+        self.use_explain = use_explain
+        self.explain_cache = explain_cache or (ExplainCache() if use_explain else None)
+        self.model = model
+        self.metadata = metadata or TableMetadataCache()
+
+    def explain_statements(self, query: str) -> Dict[str, Any]:
+        """
+        Run EXPLAIN USING JSON on each statement and total the planned scans.
+
+        USE/SET statements are executed so later statements resolve names the
+        same way; plans after them are not cached. Statements that cannot be
+        explained (DDL, tables created earlier in the same file) are listed in
+        'errors'.
+
+        Returns:
+            Dictionary with partition/byte totals, per-table 'scans' and scan_minutes
+        """
+        result = {
+            'statements': 0, 'explained': 0, 'errors': [], 'scans': [],
+            'partitions_total': 0, 'partitions_assigned': 0, 'bytes_assigned': 0,
+        }
+        cache = self.explain_cache
+        conn = get_connection()
+        try:
+            for stmt in split_sql(query):
+                if is_session_statement(stmt):
+                    conn.execute(text(stmt))
+                    cache = None
+                    continue
+                result['statements'] += 1
+                try:
+                    summary = summarize_plan(explain_plan(stmt, conn, cache))
+                except Exception as e:
+                    result['errors'].append(f"{stmt[:60]!r}: {str(e).splitlines()[0]}")
+                    continue
+                result['explained'] += 1
+                result['scans'].extend(summary['scans'])
+                for field in ('partitions_total', 'partitions_assigned', 'bytes_assigned'):
+                    result[field] += summary[field]
+        finally:
+            conn.close()
+
+        total = result['partitions_total']
+        result['pruning_pct'] = (1 - result['partitions_assigned'] / total) * 100 if total else 0
+        scan_rate = SCAN_MB_PER_SECOND * 1024 * 1024 * self.credits_per_hour
+        result['scan_minutes'] = result['bytes_assigned'] / scan_rate / 60
+        if self.explain_cache is not None:
+            result['cache_hits'] = self.explain_cache.hits
+            result['cache_misses'] = self.explain_cache.misses
+        return result
         
     def analyze_query(self, query: str) -> Dict[str, Any]:
         """
@@ -56,53 +120,114 @@ class QueryCostEstimator:
             'complexity_score': 0
         }
         
-        # Analyze query patterns
-        query_lower = query.lower()
-        
+        # Structural analysis from the parsed AST
+        structure = analyze_sql(query)
+        analysis['structure'] = structure
+
+        if structure['parse_errors']:
+            analysis['risk_factors'].append(
+                f"{len(structure['parse_errors'])} statements could not be parsed - estimate covers the rest")
+
         # Risk factor detection
-        if 'select *' in query_lower:
-            analysis['risk_factors'].append("SELECT * detected - may scan unnecessary columns")
+        if structure['select_star_tables']:
+            analysis['risk_factors'].append(
+                f"SELECT * on {', '.join(sorted(structure['select_star_tables']))} - may scan unnecessary columns")
             analysis['recommendations'].append("Replace SELECT * with explicit column list")
             analysis['complexity_score'] += 2
             
-        if 'cross join' in query_lower:
-            analysis['risk_factors'].append("CROSS JOIN detected - potential cartesian product")
+        if structure['cross_joins']:
+            analysis['risk_factors'].append(
+                f"{structure['cross_joins']} joins without a condition - potential cartesian product")
             analysis['recommendations'].append("Review CROSS JOIN necessity, consider proper JOIN conditions")
             analysis['complexity_score'] += 5
             
-        if 'distinct' in query_lower and 'order by' in query_lower:
+        if structure['distinct_with_order_by']:
             analysis['risk_factors'].append("DISTINCT with ORDER BY - expensive sorting operation")
             analysis['recommendations'].append("Consider using QUALIFY with window functions instead")
             analysis['complexity_score'] += 3
+
+        if structure['inner_order_by']:
+            analysis['risk_factors'].append(
+                f"{structure['inner_order_by']} ORDER BY clauses inside CTEs/subqueries - sort is discarded")
+            analysis['recommendations'].append("Move ORDER BY to the outermost query")
+            analysis['complexity_score'] += 1
             
-        # Check for missing WHERE clauses on large table operations
-        if re.search(r'from\s+\w+\.\w+\.\w+', query_lower) and 'where' not in query_lower:
-            analysis['risk_factors'].append("No WHERE clause - full table scan likely")
+        # Check for physical tables read without any filter
+        if structure['unfiltered_tables']:
+            analysis['risk_factors'].append(
+                f"No WHERE clause on {', '.join(sorted(structure['unfiltered_tables']))} - full table scan likely")
             analysis['recommendations'].append("Add WHERE clause to filter data and improve performance")
             analysis['complexity_score'] += 4
             
         # Check for subqueries
-        subquery_count = len(re.findall(r'\bselect\b', query_lower)) - 1
+        subquery_count = structure['subqueries']
         if subquery_count > 0:
             analysis['risk_factors'].append(f"{subquery_count} subqueries detected")
             analysis['recommendations'].append("Consider converting subqueries to CTEs for better readability")
             analysis['complexity_score'] += subquery_count
+
+        # Filter columns wrapped in casts/functions block micro-partition pruning
+        pruning = pruning_report(query)
+        analysis['pruning'] = pruning
+        for issue in pruning['issues']:
+            analysis['risk_factors'].append(f"Line {issue['line']}: {issue['reason']}")
+            if issue['rewrite']:
+                analysis['recommendations'].append(
+                    f"Rewrite `{issue['predicate']}` as `{issue['rewrite']}` so partitions can be pruned")
+            else:
+                analysis['recommendations'].append(
+                    f"Filter on {issue['column']} directly instead of `{issue['predicate']}`")
+        if pruning['issues']:
+            analysis['complexity_score'] += 3
+
+        for cte in structure['reused_ctes']:
+            analysis['recommendations'].append(
+                f"CTE {cte['name']} (statement {cte['statement']}) is referenced {cte['references']} times - "
+                f"consider materializing it as a temp table")
             
         # Check for window functions
-        if 'over(' in query_lower:
-            window_count = len(re.findall(r'over\s*\(', query_lower))
+        window_count = structure['window_functions']
+        if window_count:
             analysis['complexity_score'] += window_count * 2
             if window_count > 3:
                 analysis['recommendations'].append("Multiple window functions - consider materialization")
                 
-        # Estimate runtime based on complexity
+        # Planned scan sizes replace the fixed base runtime when available
         base_runtime = 0.5  # Base 30 seconds
+        if self.use_explain:
+            explain = self.explain_statements(query)
+            analysis['explain'] = explain
+            if explain['explained']:
+                base_runtime = explain['scan_minutes']
+            flagged = set()
+            for scan in explain['scans']:
+                if scan['partitions_total'] >= 100 and scan['pruning_pct'] < 10 and scan['table'] not in flagged:
+                    flagged.add(scan['table'])
+                    analysis['risk_factors'].append(
+                        f"Little partition pruning on {scan['table']} "
+                        f"({scan['partitions_assigned']:,}/{scan['partitions_total']:,} partitions)")
+                    analysis['recommendations'].append(
+                        f"Filter {scan['table']} on its date/clustering column so partitions can be pruned")
+
+        # Estimate runtime based on complexity
         complexity_multiplier = 1 + (analysis['complexity_score'] * 0.2)
         analysis['estimated_runtime_minutes'] = base_runtime * complexity_multiplier
         
         # Estimate credits (runtime in hours * credits per hour)
         runtime_hours = analysis['estimated_runtime_minutes'] / 60
         analysis['estimated_credits'] = runtime_hours * self.credits_per_hour
+
+        # A model trained on query history replaces the heuristic when available
+        if self.model is not None:
+            explain = analysis.get('explain') or {}
+            prediction = self.model.predict(
+                structure,
+                bytes_scanned=explain.get('bytes_assigned') if explain.get('explained') else None,
+                partitions_scanned=explain.get('partitions_assigned') if explain.get('explained') else None,
+                warehouse_size=self.warehouse_size)
+            analysis['prediction'] = prediction
+            analysis['estimated_runtime_minutes'] = prediction['expected_seconds'] / 60
+            analysis['estimated_credits'] = prediction['expected_credits']
         
         # Cost recommendations
         if analysis['estimated_credits'] > 0.1:  # More than 0.1 credits
@@ -116,6 +241,9 @@ class QueryCostEstimator:
     def get_table_stats(self, table_references: List[str]) -> Dict[str, Any]:
         """
         Get statistics for tables referenced in the query.
+
+        Uses one INFORMATION_SCHEMA.TABLES query per database for tables not
+        already in the local metadata cache (see TableMetadataCache).
         
         Args:
             table_references: List of table names found in query
@@ -126,66 +254,92 @@ class QueryCostEstimator:
         stats = {}
         
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            for table in table_references:
-                # Parse table name (handle fully qualified names)
-                parts = table.split('.')
-                if len(parts) == 3:
-                    database, schema, table_name = parts
-                elif len(parts) == 2:
-                    schema, table_name = parts
-                    database = None
-                else:
-                    table_name = parts[0]
-                    schema = database = None
-                
-                # Get table statistics
-                stats_query = f"""
-                SELECT 
-                    table_name,
-                    row_count,
-                    bytes,
-                    ROUND(bytes / (1024*1024*1024), 2) as size_gb
-                FROM INFORMATION_SCHEMA.TABLES 
-                WHERE table_name = '{table_name.upper()}'
-                """
-                
-                if schema:
-                    stats_query += f" AND table_schema = '{schema.upper()}'"
-                if database:
-                    stats_query += f" AND table_catalog = '{database.upper()}'"
-                    
-                cursor.execute(stats_query)
-                result = cursor.fetchone()
-                
-                if result:
-                    stats[table] = {
-                        'row_count': result[1] or 0,
-                        'size_bytes': result[2] or 0,
-                        'size_gb': result[3] or 0
-                    }
-                else:
-                    stats[table] = {'row_count': 'Unknown', 'size_gb': 'Unknown'}
-                    
+            metadata = self.metadata.get(table_references)
         except Exception as e:
             print(f"Warning: Could not retrieve table statistics: {e}")
-            
-        finally:
-            if 'conn' in locals():
-                conn.close()
+            return stats
+
+        for table, entry in metadata.items():
+            if entry and entry['row_count'] is not None:
+                stats[table] = {
+                    'row_count': entry['row_count'],
+                    'size_bytes': entry['bytes'] or 0,
+                    'size_gb': round((entry['bytes'] or 0) / (1024 ** 3), 2),
+                    'last_altered': entry['last_altered'],
+                }
+            else:
+                stats[table] = {'row_count': 'Unknown', 'size_gb': 'Unknown'}
                 
         return stats
         
+    def estimate_directory(self, directory: Path, workers: int = 4,
+                           table_stats: bool = True) -> Dict[str, Any]:
+        """
+        Estimate every statement in every .sql file under a directory.
+
+        Statements are analyzed on a thread pool (EXPLAIN round trips overlap);
+        parsed ASTs are memoized by normalized text, and table statistics for
+        all files are fetched in one batched lookup per database. A file that
+        cannot be read or a statement that cannot be analyzed is reported in
+        'errors' and the scan carries on.
+
+        Args:
+            directory: Root directory searched recursively for .sql files
+            workers: Number of statements analyzed concurrently
+            table_stats: Look up sizes of the referenced tables
+
+        Returns:
+            Dictionary with 'statements' (file, line, analysis, referenced_gb),
+            'errors' (file, line, error), file count, total credits and
+            metadata cache stats
+        """
+        files = sorted(directory.rglob('*.sql'))
+        items, errors = [], []
+        for path in files:
+            name = str(path.relative_to(directory))
+            try:
+                text_ = path.read_text(encoding='utf-8', errors='replace')
+            except OSError as e:
+                errors.append({'file': name, 'line': None, 'error': str(e)})
+                continue
+            for line, stmt in split_sql_with_lines(text_):
+                if normalize_sql(stmt) and not is_session_statement(stmt):
+                    items.append({'file': name, 'line': line, 'sql': stmt})
+
+        def analyze(item):
+            try:
+                return self.analyze_query(item['sql'])
+            except Exception as e:
+                errors.append({'file': item['file'], 'line': item['line'], 'error': f"{type(e).__name__}: {e}"})
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for item, analysis in zip(items, pool.map(analyze, items)):
+                item['analysis'] = analysis
+        items = [item for item in items if item['analysis'] is not None]
+
+        tables = sorted(set().union(*(item['analysis']['structure']['tables'] for item in items))) \
+            if table_stats and items else []
+        stats = self.get_table_stats(tables) if tables else {}
+        for item in items:
+            sizes = [stats.get(t, {}).get('size_gb') for t in item['analysis']['structure']['tables']]
+            item['referenced_gb'] = sum(size for size in sizes if isinstance(size, (int, float)))
+
+        items.sort(key=lambda item: item['analysis']['estimated_credits'], reverse=True)
+        return {
+            'files': len(files),
+            'statements': items,
+            'errors': sorted(errors, key=lambda error: (error['file'], error['line'] or 0)),
+            'total_credits': sum(item['analysis']['estimated_credits'] for item in items),
+            'metadata_stats': self.metadata.stats() if tables else None,
+        }
+
     def extract_table_references(self, query: str) -> List[str]:
-        """Extract table references from SQL query."""
-        # Simple regex to find table references after FROM and JOIN
-        pattern = r'(?:from|join)\s+([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)*)'
-        matches = re.findall(pattern, query.lower())
-        return list(set(matches))  # Remove duplicates
+        """Extract physical table references (CTE names and table functions excluded)."""
+        return sorted(analyze_sql(query)['tables'])
 
-def format_analysis_output(analysis: Dict[str, Any], table_stats: Dict[str, Any] = None) -> str:
+def format_analysis_output(analysis: Dict[str, Any], table_stats: Dict[str, Any] = None,
+                           metadata_stats: Dict[str, Any] = None) -> str:
     """Format analysis results for console output."""
     output = []
     
@@ -203,10 +357,36 @@ def format_analysis_output(analysis: Dict[str, Any], table_stats: Dict[str, Any]
     output.append(f"   Estimated Runtime: {analysis['estimated_runtime_minutes']:.1f} minutes")
     output.append(f"   Estimated Credits: {analysis['estimated_credits']:.4f}")
     output.append(f"   Estimated Cost: ${analysis['estimated_credits'] * 2:.4f}")  # Assuming $2/credit
+    prediction = analysis.get('prediction')
+    if prediction:
+        output.append(f"   Model 90% Interval: {prediction['low_seconds'] / 60:.1f}-{prediction['high_seconds'] / 60:.1f} "
+                      f"minutes, {prediction['low_credits']:.4f}-{prediction['high_credits']:.4f} credits "
+                      f"(trained on {prediction['trained_rows']:,} queries)")
     
+    # EXPLAIN scan figures
+    explain = analysis.get('explain')
+    if explain:
+        output.append(f"\n🧭 EXPLAIN Plan ({explain['explained']}/{explain['statements']} statements):")
+        output.append(f"   Partitions: {explain['partitions_assigned']:,} of {explain['partitions_total']:,} "
+                      f"({explain['pruning_pct']:.1f}% pruned)")
+        output.append(f"   Bytes Assigned: {explain['bytes_assigned'] / (1024**3):.2f} GB "
+                      f"(~{explain['scan_minutes']:.1f} scan minutes)")
+        for scan in sorted(explain['scans'], key=lambda s: s['bytes_assigned'], reverse=True):
+            output.append(f"   • {scan['table']}: {scan['partitions_assigned']:,}/{scan['partitions_total']:,} "
+                          f"partitions, {scan['bytes_assigned'] / (1024**3):.2f} GB")
+        for error in explain['errors']:
+            output.append(f"   ⚠️  Not explained: {error}")
+        if 'cache_hits' in explain:
+            output.append(f"   Plan cache: {explain['cache_hits']} hits, {explain['cache_misses']} misses")
+
     # Complexity analysis
+    structure = analysis['structure']
     output.append(f"\n🔍 Complexity Analysis:")
     output.append(f"   Complexity Score: {analysis['complexity_score']}/20")
+    output.append(f"   Statements: {structure['statements']}, joins: {len(structure['joins'])}, "
+                  f"CTEs: {len(structure['ctes'])}, window functions: {structure['window_functions']}")
+    for error in structure['parse_errors']:
+        output.append(f"   ⚠️  Statement {error['statement']} not parsed: {error['error']}")
     
     if analysis['complexity_score'] <= 5:
         output.append("   ✅ Low complexity - should run quickly")
@@ -215,6 +395,12 @@ def format_analysis_output(analysis: Dict[str, Any], table_stats: Dict[str, Any]
     else:
         output.append("   🚨 High complexity - test carefully")
     
+    # Join graph
+    if structure['join_graph']:
+        output.append(f"\n🔗 Join Graph:")
+        for left, right, kind in structure['join_graph']:
+            output.append(f"   • {left} —{kind}→ {right}")
+    
     # Risk factors
     if analysis['risk_factors']:
         output.append(f"\n⚠️  Risk Factors:")
@@ -229,6 +415,16 @@ def format_analysis_output(analysis: Dict[str, Any], table_stats: Dict[str, Any]
         for rec in analysis['recommendations']:
             output.append(f"   • {rec}")
     
+    # Pruning anti-patterns
+    pruning = analysis.get('pruning')
+    if pruning and pruning['issues']:
+        output.append(f"\n✂️  Partition Pruning:")
+        for issue in pruning['issues']:
+            output.append(f"   • Line {issue['line']}: {issue['predicate']}")
+            output.append(f"     → {issue['rewrite'] or 'no automatic rewrite'}")
+        if pruning['rewritten_statements']:
+            output.append(f"   {len(pruning['rewritten_statements'])} statements can be rewritten (use --rewrite)")
+
     # Table statistics
     if table_stats:
         output.append(f"\n📊 Referenced Tables:")
@@ -237,9 +433,62 @@ def format_analysis_output(analysis: Dict[str, Any], table_stats: Dict[str, Any]
                 output.append(f"   • {table}: {stats['row_count']:,} rows, {stats['size_gb']} GB")
             else:
                 output.append(f"   • {table}: Stats unavailable")
+    if metadata_stats:
+        output.append(f"   Metadata cache: {metadata_stats['hits']} fresh, {metadata_stats['revalidated']} "
+                      f"unchanged, {metadata_stats['misses']} fetched ({metadata_stats['hit_rate']:.0f}% hit rate, "
+                      f"{metadata_stats['round_trips']} round trips)")
     
     return '\n'.join(output)
 
+def format_directory_output(result: Dict[str, Any], top: int = 20) -> str:
+    """Format a directory scan as a ranked table of the most expensive statements."""
+    statements = result['statements']
+    output = [f"\n💰 SNOWFLAKE PIPELINE COST SCAN"]
+    output.append("=" * 50)
+    output.append(f"\n📁 {result['files']} files, {len(statements)} statements")
+    if statements:
+        warehouse = statements[0]['analysis']
+        output.append(f"   Warehouse: {warehouse['warehouse_size']} ({warehouse['credits_per_hour']} credits/hour)")
+    output.append(f"   Projected Credits (whole pipeline): {result['total_credits']:.4f}")
+    output.append(f"   Projected Cost: ${result['total_credits'] * 2:.4f}")  # Assuming $2/credit
+
+    output.append(f"\n🏆 Top {min(top, len(statements))} Statements by Estimated Credits:")
+    output.append(f"   {'#':>3}  {'Credits':>8}  {'Minutes':>7}  {'Tables GB':>9}  {'Score':>5}  {'Pruning':>7}  Location")
+    for rank, item in enumerate(statements[:top], 1):
+        analysis = item['analysis']
+        output.append(f"   {rank:>3}  {analysis['estimated_credits']:>8.4f}  "
+                      f"{analysis['estimated_runtime_minutes']:>7.1f}  {item['referenced_gb']:>9.2f}  "
+                      f"{analysis['complexity_score']:>5}  {len(analysis['pruning']['issues']):>7}  "
+                      f"{item['file']}:{item['line']}")
+        output.append(f"        {' '.join(normalize_sql(item['sql']).split())[:100]}")
+
+    unparsed = [item for item in statements if item['analysis']['structure']['parse_errors']]
+    if unparsed:
+        output.append(f"\n⚠️  {len(unparsed)} statements could not be parsed:")
+        for item in unparsed[:10]:
+            output.append(f"   • {item['file']}:{item['line']}")
+
+    blocked = [item for item in statements if item['analysis']['pruning']['issues']]
+    if blocked:
+        output.append(f"\n✂️  {len(blocked)} statements filter on wrapped columns (see --rewrite):")
+        for item in blocked[:10]:
+            issues = item['analysis']['pruning']['issues']
+            output.append(f"   • {item['file']}:{item['line']}: {', '.join(i['predicate'] for i in issues)[:100]}")
+
+    errors = result.get('errors') or []
+    if errors:
+        output.append(f"\n❌ {len(errors)} files/statements skipped:")
+        for error in errors[:10]:
+            location = f"{error['file']}:{error['line']}" if error['line'] else error['file']
+            output.append(f"   • {location}: {error['error'][:100]}")
+
+    stats = result['metadata_stats']
+    if stats:
+        output.append(f"\n📊 Metadata cache: {stats['hits']} fresh, {stats['revalidated']} unchanged, "
+                      f"{stats['misses']} fetched ({stats['hit_rate']:.0f}% hit rate, "
+                      f"{stats['round_trips']} round trips)")
+    return '\n'.join(output)
+
 def main():
     parser = argparse.ArgumentParser(
         description='Estimate Snowflake query costs and analyze performance risks',
@@ -248,7 +497,7 @@ def main():
     
     parser.add_argument(
         'query_file',
-        help='SQL file to analyze (use "-" for stdin)'
+        help='SQL file to analyze, a directory to scan every .sql file, or "-" for stdin'
     )
     
     parser.add_argument(
@@ -257,15 +506,73 @@ def main():
         help='Warehouse size for cost calculation (default: MEDIUM)'
     )
     
+    parser.add_argument(
+        '--explain',
+        action='store_true',
+        help='Estimate from EXPLAIN USING JSON partition and byte counts (plans are cached)'
+    )
+    
+    parser.add_argument(
+        '--model',
+        nargs='?',
+        const=str(DEFAULT_MODEL_PATH),
+        help='Predict runtime with a model trained by train_cost_model.py (default path if no value)'
+    )
+    
     parser.add_argument(
         '--no-table-stats',
         action='store_true',
         help='Skip table statistics lookup'
     )
     
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Statements analyzed concurrently in directory mode (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=20,
+        help='Statements listed in directory mode (default: 20)'
+    )
+    
+    parser.add_argument(
+        '--rewrite',
+        nargs='?',
+        const='-',
+        metavar='OUTPUT',
+        help='Write the SQL with pruning-friendly predicates to OUTPUT (stdout if no value)'
+    )
+    
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='Compare each rewritten statement with the original on sampled data in DuckDB'
+    )
+    
+    parser.add_argument(
+        '--sample-rows',
+        type=int,
+        default=10_000,
+        help='Rows sampled per table for --verify (default: 10000)'
+    )
+    
     args = parser.parse_args()
     
     try:
+        model = RuntimeModel.load(args.model) if args.model else None
+        estimator = QueryCostEstimator(args.warehouse, use_explain=args.explain, model=model)
+
+        # Directory mode: rank every statement under the directory
+        if args.query_file != '-' and Path(args.query_file).is_dir():
+            result = estimator.estimate_directory(Path(args.query_file), args.workers,
+                                                  table_stats=not args.no_table_stats)
+            print(format_directory_output(result, args.top))
+            return
+        
         # Read query
         if args.query_file == '-':
             query = sys.stdin.read()
@@ -278,18 +585,39 @@ def main():
             sys.exit(1)
         
         # Analyze query
-        estimator = QueryCostEstimator(args.warehouse)
         analysis = estimator.analyze_query(query)
         
         # Get table statistics unless disabled
-        table_stats = None
+        table_stats = metadata_stats = None
         if not args.no_table_stats:
-            table_refs = estimator.extract_table_references(query)
+            table_refs = sorted(analysis['structure']['tables'])
             if table_refs:
                 table_stats = estimator.get_table_stats(table_refs)
+                metadata_stats = estimator.metadata.stats()
         
         # Display results
-        print(format_analysis_output(analysis, table_stats))
+        print(format_analysis_output(analysis, table_stats, metadata_stats))
+        
+        # Pruning rewrites
+        rewritten = analysis['pruning']['rewritten_statements']
+        if args.rewrite:
+            if args.rewrite == '-':
+                print(f"\n✂️  Rewritten SQL:\n{analysis['pruning']['rewritten_sql']}")
+            else:
+                Path(args.rewrite).write_text(analysis['pruning']['rewritten_sql'], encoding='utf-8')
+                print(f"\n✂️  Rewritten SQL ({len(rewritten)} statements changed) written to {args.rewrite}")
+        if args.verify:
+            if not rewritten:
+                print(f"\n✂️  No statements to verify")
+            for n, (original, new) in rewritten.items():
+                try:
+                    check = verify_rewrite(original, new, sample_rows=args.sample_rows)
+                except Exception as e:
+                    print(f"   ⚠️  Statement {n}: not verified ({e})")
+                    continue
+                status = "✅ identical" if check['identical'] else "❌ DIFFERENT"
+                print(f"   Statement {n}: {status} ({check['original_rows']:,} vs {check['rewritten_rows']:,} rows "
+                      f"on {sum(check['sampled_rows'].values()):,} sampled rows)")
         
         # Exit with warning code if high cost/complexity
         if analysis['estimated_credits'] > 0.5 or analysis['complexity_score'] > 15:
@@ -1,52 +1,296 @@
-import sys, pathlib
-from typing import List
-from src.sf_client import get_connection
+import sys, os, re, json, hashlib, pathlib, argparse, time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from src.sf_client import get_connection, get_engine, connection_settings
+from src.sf_cache import QueryCache
+from src.sf_utils import SnowflakeUtils
+from src.sql_parse import (split_sql, starts_with, normalize_sql, is_session_statement,
+                           statement_tables, build_dependencies, critical_path)
 from sqlalchemy import text
 
-def split_sql(statements: str) -> List[str]:
-    parts, current, in_str = [], [], False
-    quote = None
-    for ch in statements:
-        if ch in ("'", '"'):
-            if in_str and ch == quote:
-                in_str = False
-                quote = None
-            elif not in_str:
-                in_str = True
-                quote = ch
-        if ch == ";" and not in_str:
-            parts.append("".join(current).strip())
-            current = []
-        else:
-            current.append(ch)
-    tail = "".join(current).strip()
-    if tail:
-        parts.append(tail)
-    return [p for p in parts if p]
+# Statements whose results can be served from the local cache
+READ_ONLY_PREFIXES = ("SELECT", "WITH", "SHOW", "DESCRIBE", "DESC")
+# Largest result run_sql will fetch in full to store in the cache
+CACHE_MAX_ROWS = 100_000
+# Pipeline checkpoint file, written inside the SQL directory by default
+STATE_FILENAME = ".run_sql_state.json"
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python scripts/run_sql.py path/to/file.sql")
-        sys.exit(1)
-    sql_path = pathlib.Path(sys.argv[1])
-    sql_text = sql_path.read_text(encoding="utf-8")
-    stmts = split_sql(sql_text)
-    print(f"Executing {len(stmts)} statements from {sql_path} ...")
+def _preview(stmt: str) -> str:
+    return stmt[:120].replace('\n', ' ') + ('...' if len(stmt) > 120 else '')
+
+def _print_rows(rows) -> None:
+    if rows:
+        print(f"  returned {len(rows)} rows (showing up to 5): {rows}")
+
+def stale_reads(stmts: List[str], database: Optional[str] = None, schema: Optional[str] = None) -> List[bool]:
+    """
+    Flag statements that read a table written by an earlier statement in the same run.
+
+    A cached result for such a statement may predate the write, so it is
+    re-run and its cache entry overwritten instead of being served.
+    """
+    flags, written = [], set()
+    for stmt in stmts:
+        reads, writes = statement_tables(stmt, database, schema)
+        flags.append(bool(reads & written))
+        written |= writes
+    return flags
+
+def execute_statement(conn, stmt: str, utils: SnowflakeUtils,
+                      cache: Optional[QueryCache] = None, refresh: bool = False) -> Dict:
+    """
+    Execute one statement, serving read-only statements from the cache when possible.
+
+    Returns:
+        Dictionary with the first rows returned, whether the cache was used and elapsed seconds
+    """
+    start = time.perf_counter()
+    if cache is not None and starts_with(stmt, READ_ONLY_PREFIXES):
+        key = utils.cache_key(stmt)
+        df = None if refresh else cache.get(key)
+        if df is not None:
+            return {'rows': list(df.head(5).itertuples(index=False, name=None)), 'cached': True,
+                    'total_rows': len(df), 'elapsed_seconds': time.perf_counter() - start}
+        result = conn.execute(text(stmt))
+        rows = result.fetchmany(CACHE_MAX_ROWS + 1)
+        if len(rows) <= CACHE_MAX_ROWS:
+            cache.put(key, pd.DataFrame(rows, columns=list(result.keys())), query=stmt)
+        return {'rows': rows[:5], 'cached': False, 'elapsed_seconds': time.perf_counter() - start}
+
+    result = conn.execute(text(stmt))
+    try:
+        rows = result.fetchmany(5)
+    except Exception:
+        rows = []
+    return {'rows': rows, 'cached': False, 'elapsed_seconds': time.perf_counter() - start}
+
+def _scope() -> Dict[str, Optional[str]]:
+    # Default database/schema used to qualify unqualified table names
+    settings = connection_settings()
+    return {'database': settings['database'], 'schema': settings['schema']}
+
+def _report(i: int, total: int, stmt: str, outcome: Dict) -> None:
+    print(f"--- [{i}/{total}] {_preview(stmt)}")
+    if outcome['cached']:
+        print(f"  (cached result, {outcome['total_rows']} rows)")
+    _print_rows(outcome['rows'])
+
+def run_sequential(stmts: List[str], utils: SnowflakeUtils, cache: Optional[QueryCache],
+                   refresh: bool) -> Dict[int, float]:
+    """Run statements one after another on a single connection; returns per-statement seconds."""
+    durations = {}
+    stale = stale_reads(stmts, **_scope()) if cache is not None else [False] * len(stmts)
     conn = get_connection()
     try:
-        for i, stmt in enumerate(stmts, 1):
-            preview = stmt[:120].replace('\n',' ')
-            print(f"--- [{i}/{len(stmts)}] {preview}{'...' if len(stmt)>120 else ''}")
-            result = conn.execute(text(stmt))
-            try:
-                rows = result.fetchmany(5)
-                if rows:
-                    print(f"  returned {len(rows)} rows (showing up to 5): {rows}")
-            except Exception:
-                pass
-        print("Done ✅")
+        for i, stmt in enumerate(stmts):
+            if is_session_statement(stmt) and cache is not None:
+                # Results after USE/SET depend on session state the cache key cannot see
+                print("  session statement: caching disabled for the rest of this file")
+                cache = None
+            outcome = execute_statement(conn, stmt, utils, cache, refresh or stale[i])
+            durations[i] = outcome['elapsed_seconds']
+            _report(i + 1, len(stmts), stmt, outcome)
     finally:
         conn.close()
+    return durations
+
+def run_parallel(stmts: List[str], deps: List[set], workers: int, utils: SnowflakeUtils,
+                 cache: Optional[QueryCache], refresh: bool) -> Dict[int, float]:
+    """
+    Run statements as soon as the statements they depend on have finished.
+
+    Each statement runs on its own pooled connection. After the first failure no
+    new statements are started; the error is re-raised once running ones finish.
+    """
+    engine = get_engine()
+    stale = stale_reads(stmts, **_scope()) if cache is not None else [False] * len(stmts)
+
+    def _run(i: int) -> Dict:
+        with engine.connect() as conn:
+            return execute_statement(conn, stmts[i], utils, cache, refresh or stale[i])
+
+    durations, done, failed = {}, set(), None
+    pending = set(range(len(stmts)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            if failed is None:
+                for i in sorted(pending):
+                    if deps[i] <= done and len(running) < workers:
+                        running[pool.submit(_run, i)] = i
+                        pending.discard(i)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    print(f"--- [{i + 1}/{len(stmts)}] ❌ {_preview(stmts[i])}\n  {e}")
+                    failed = failed or e
+                    continue
+                durations[i] = outcome['elapsed_seconds']
+                done.add(i)
+                _report(i + 1, len(stmts), stmts[i], outcome)
+    if failed is not None:
+        if pending:
+            print(f"Skipped {len(pending)} statements: {', '.join(str(i + 1) for i in sorted(pending))}")
+        raise failed
+    return durations
+
+def pipeline_files(directory: pathlib.Path) -> List[pathlib.Path]:
+    """Return the directory's .sql files ordered by their numeric prefix (010_, 020_, ...)."""
+    def _order(path: pathlib.Path):
+        match = re.match(r"(\d+)", path.name)
+        return (int(match.group(1)) if match else float("inf"), path.name)
+    return sorted(directory.glob("*.sql"), key=_order)
+
+def statement_hashes(stmts: List[str], deps: List[set]) -> List[str]:
+    """
+    Hash each statement's normalized SQL together with the hashes of its upstream statements.
+
+    A change to a statement therefore also changes the hash of everything
+    that (directly or transitively) reads what it writes.
+    """
+    hashes = []
+    for stmt, upstream in zip(stmts, deps):
+        payload = json.dumps({'sql': normalize_sql(stmt),
+                              'upstream': sorted(hashes[i] for i in upstream)})
+        hashes.append(hashlib.sha256(payload.encode('utf-8')).hexdigest())
+    return hashes
+
+def load_state(path: pathlib.Path) -> Dict:
+    """Read the pipeline checkpoints; a missing or unreadable state file means none."""
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, UnicodeDecodeError, json.JSONDecodeError):
+        return {'completed': {}}
+    if not isinstance(state, dict) or not isinstance(state.get('completed'), dict):
+        print(f"⚠️  Ignoring malformed pipeline state in {path}")
+        return {'completed': {}}
+    return state
+
+def save_state(path: pathlib.Path, state: Dict) -> None:
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def run_pipeline(directory: pathlib.Path, state_path: pathlib.Path, utils: SnowflakeUtils,
+                 cache: Optional[QueryCache], refresh: bool, restart: bool = False) -> Tuple[int, int]:
+    """
+    Run every numbered SQL file in a directory, checkpointing statements that write tables.
+
+    A table-writing statement is skipped when the state file records a successful
+    run of the same SQL with the same upstream hashes. Read-only and session
+    statements always run. Each file gets its own connection, as when files are
+    run one at a time. State is saved after every statement, so a failed run
+    resumes from the statement that failed.
+
+    Returns:
+        (statements executed, statements skipped)
+    """
+    settings = connection_settings()
+    files = pipeline_files(directory)
+    plan = [(path, stmt) for path in files for stmt in split_sql(path.read_text(encoding="utf-8"))]
+    stmts = [stmt for _, stmt in plan]
+    deps = build_dependencies(stmts, settings['database'], settings['schema'])
+    hashes = statement_hashes(stmts, deps)
+    stale = stale_reads(stmts, settings['database'], settings['schema'])
+    print(f"Pipeline: {len(files)} files, {len(stmts)} statements from {directory}")
+
+    previous = {} if restart else load_state(state_path).get('completed', {})
+    # Keep only checkpoints that still match the current pipeline
+    state = {'completed': {h: previous[h] for h in hashes if h in previous}}
+    executed = skipped = 0
+    position = 0
+    for path in files:
+        file_stmts = [stmt for p, stmt in plan if p == path]
+        print(f"=== {path.name} ({len(file_stmts)} statements)")
+        file_cache = cache
+        conn = get_connection()
+        try:
+            for n, stmt in enumerate(file_stmts, 1):
+                digest, restale = hashes[position], stale[position]
+                position += 1
+                checkpointed = bool(statement_tables(stmt, settings['database'], settings['schema'])[1])
+                if checkpointed and digest in state['completed']:
+                    skipped += 1
+                    print(f"--- [{n}/{len(file_stmts)}] ⏭️  unchanged, skipping: {_preview(stmt)}")
+                    continue
+                if is_session_statement(stmt) and file_cache is not None:
+                    file_cache = None
+                outcome = execute_statement(conn, stmt, utils, file_cache, refresh or restale)
+                executed += 1
+                _report(n, len(file_stmts), stmt, outcome)
+                if checkpointed:
+                    state['completed'][digest] = {
+                        'file': path.name,
+                        'statement': n,
+                        'completed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'elapsed_seconds': round(outcome['elapsed_seconds'], 3),
+                    }
+                    save_state(state_path, state)
+        finally:
+            conn.close()
+    save_state(state_path, state)
+    return executed, skipped
+
+def main():
+    parser = argparse.ArgumentParser(description="Execute the statements in a SQL file")
+    parser.add_argument("sql_file",
+                        help="Path to the .sql file, or a directory of numbered .sql files (pipeline mode)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Serve read-only statements from the local result cache (off by default)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="With --cache, re-run read-only statements and overwrite their cached results")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="Run up to N independent statements at once (default: 1)")
+    parser.add_argument("--state", help=f"Pipeline checkpoint file (default: <dir>/{STATE_FILENAME})")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore pipeline checkpoints and run every statement")
+    args = parser.parse_args()
+
+    sql_path = pathlib.Path(args.sql_file)
+    if sql_path.is_dir():
+        utils = SnowflakeUtils()
+        cache = QueryCache() if args.cache else None
+        state_path = pathlib.Path(args.state) if args.state else sql_path / STATE_FILENAME
+        executed, skipped = run_pipeline(sql_path, state_path, utils, cache, args.refresh, args.restart)
+        print(f"Executed {executed} statements, skipped {skipped} unchanged (state: {state_path})")
+        print("Done ✅")
+        return
+
+    sql_text = sql_path.read_text(encoding="utf-8")
+    stmts = split_sql(sql_text)
+    print(f"Executing {len(stmts)} statements from {sql_path} ...")
+    utils = SnowflakeUtils()
+    cache = QueryCache() if args.cache else None
+
+    parallel = args.parallel > 1
+    if parallel and any(is_session_statement(s) for s in stmts):
+        # Pooled connections do not share USE/SET state
+        print("⚠️  File contains session statements (USE/SET); running sequentially")
+        parallel = False
+
+    start = time.perf_counter()
+    if parallel:
+        settings = connection_settings()
+        deps = build_dependencies(stmts, settings['database'], settings['schema'])
+        durations = run_parallel(stmts, deps, args.parallel, utils, cache, args.refresh)
+        wall = time.perf_counter() - start
+        serial = sum(durations.values())
+        path_seconds, path = critical_path(deps, durations)
+        print(f"Critical path: {' -> '.join(str(i + 1) for i in path)} ({path_seconds:.1f}s)")
+        print(f"Serial time {serial:.1f}s, wall time {wall:.1f}s, "
+              f"speedup {serial / wall if wall else 1:.2f}x")
+    else:
+        run_sequential(stmts, utils, cache, args.refresh)
+
+    if cache is not None and (cache.hits or cache.misses):
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    print("Done ✅")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Train the Query Runtime Model
+Sync QUERY_HISTORY into the local store and fit the runtime/credit model
+used by query_cost_estimator.py --model.
+
+Usage:
+    python scripts/train_cost_model.py --sync
+    python scripts/train_cost_model.py --days 14 --evaluate
+    python scripts/train_cost_model.py --synthetic 5000 --evaluate
+"""
+
+import sys
+import argparse
+from datetime import datetime, timedelta
+from src.history_store import QueryHistoryStore
+from src.cost_model import RuntimeModel, DEFAULT_MODEL_PATH, synthetic_history
+
+# Columns the model reads from the history store
+TRAINING_COLUMNS = ['query_text', 'execution_status', 'warehouse_size', 'bytes_scanned',
+                    'partitions_scanned', 'total_elapsed_time']
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the query runtime/credit prediction model')
+    parser.add_argument('--sync', action='store_true',
+                        help='Fetch new QUERY_HISTORY rows into the local store before training')
+    parser.add_argument('--days', type=int, default=30,
+                        help='Train on the last N days of stored history (default: 30)')
+    parser.add_argument('--evaluate', action='store_true',
+                        help='Report held-out accuracy before saving')
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help='Use N synthetic history rows instead of the store (no Snowflake access)')
+    parser.add_argument('--output',
+                        help=f'Model file (default: {DEFAULT_MODEL_PATH}; '
+                             f'synthetic models are saved only when given)')
+    args = parser.parse_args()
+
+    try:
+        if args.synthetic:
+            history = synthetic_history(args.synthetic)
+            print(f"🧪 Generated {len(history):,} synthetic history rows")
+        else:
+            store = QueryHistoryStore()
+            if args.sync:
+                result = store.sync(days=args.days)
+                print(f"🔄 Synced {result['rows_fetched']:,} rows in {result['elapsed_seconds']:.1f}s "
+                      f"(watermark {result['watermark']})")
+            history = store.load(TRAINING_COLUMNS, since=datetime.utcnow() - timedelta(days=args.days))
+            print(f"📚 Loaded {len(history):,} history rows from {store.store_dir}")
+
+        model = RuntimeModel()
+        if args.evaluate:
+            metrics = model.evaluate(history)
+            print(f"\n📏 Evaluation ({metrics['train_rows']:,} train / {metrics['test_rows']:,} test rows):")
+            print(f"   Median abs % error: {metrics['median_abs_pct_error']:.1f}% "
+                  f"(median-runtime baseline: {metrics['baseline_median_abs_pct_error']:.1f}%)")
+            print(f"   Mean abs error: {metrics['mean_abs_error_seconds']:.1f}s")
+            print(f"   R² (log runtime): {metrics['r2_log']:.3f}")
+            print(f"   90% interval coverage: {metrics['interval_coverage']:.1f}%")
+
+        model.fit(history)
+        if args.synthetic and not args.output:
+            # Never let a synthetic run replace the model trained on real history
+            print(f"\n✅ Model trained on {model.trained_rows:,} synthetic queries (not saved; pass --output to keep it)")
+            return
+        path = model.save(args.output or DEFAULT_MODEL_PATH)
+        print(f"\n✅ Model trained on {model.trained_rows:,} queries, saved to {path}")
+
+    except Exception as e:
+        print(f"❌ Training failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Warehouse Concurrency Timeline
+Rebuilds per-second running and queued query counts for each warehouse from
+QUERY_HISTORY, finds overload queueing windows and the users and query
+patterns occupying the warehouse during them, and charts the result.
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Queueing windows separated by less than this many seconds are merged
+WINDOW_GAP_SECONDS = 30
+# Queueing windows shorter than this are ignored
+MIN_WINDOW_SECONDS = 60
+# Users and query patterns listed per window
+TOP_CONTRIBUTORS = 3
+# Warehouses drawn in the chart, by peak concurrency
+CHART_WAREHOUSES = 6
+# Points plotted per warehouse; longer timelines are reduced to per-bucket maxima
+CHART_POINTS = 5_000
+
+def query_intervals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Place each query's overload queueing and execution in time.
+
+    Execution runs from end_time - execution_time to end_time (as in
+    credit_attribution); overload queueing immediately precedes it.
+
+    Args:
+        df: History rows with warehouse_name, end_time, execution_time and
+            queued_overload_time (milliseconds)
+
+    Returns:
+        The rows with queue_start, run_start and run_end (datetime64) added
+    """
+    df = df[df['warehouse_name'].notna() & df['end_time'].notna()]
+    run_end = df['end_time'].to_numpy(dtype='datetime64[ns]')
+    run_start = run_end - df['execution_time'].fillna(0).to_numpy(dtype='int64').astype('timedelta64[ms]')
+    queue_start = run_start - df['queued_overload_time'].fillna(0).to_numpy(dtype='int64').astype('timedelta64[ms]')
+    return df.assign(queue_start=queue_start, run_start=run_start, run_end=run_end)
+
+def _sweep(codes: np.ndarray, starts: np.ndarray, ends: np.ndarray, warehouses: int, seconds: int) -> np.ndarray:
+    # +1 at each interval's first second and -1 after its last one, for all
+    # warehouses in one flat array, then a running sum along each row
+    keep = ends > starts
+    deltas = np.bincount(codes[keep] * (seconds + 1) + starts[keep], minlength=warehouses * (seconds + 1))
+    deltas -= np.bincount(codes[keep] * (seconds + 1) + ends[keep], minlength=warehouses * (seconds + 1))
+    return np.cumsum(deltas.reshape(warehouses, seconds + 1), axis=1)[:, :seconds].astype(np.int32)
+
+def build_timeline(intervals: pd.DataFrame, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Count running and queued queries per warehouse for every second.
+
+    A query counts in each second its interval touches. The sweep is two
+    bincounts and a cumulative sum, so its cost is linear in queries plus
+    warehouse-seconds.
+
+    Args:
+        intervals: Output of query_intervals
+        start: First second of the timeline (default: earliest queue_start)
+        end: End of the timeline (default: latest run_end)
+
+    Returns:
+        Dictionary with start (datetime64[s]), warehouses (names), running and
+        queued (int32 arrays of shape warehouses x seconds)
+    """
+    if intervals.empty:
+        return {'start': None, 'warehouses': [], 'running': np.zeros((0, 0), np.int32),
+                'queued': np.zeros((0, 0), np.int32)}
+    codes, warehouses = pd.factorize(intervals['warehouse_name'], sort=True)
+    origin = np.datetime64(start, 's') if start is not None else intervals['queue_start'].min().to_datetime64().astype('datetime64[s]')
+    finish = np.datetime64(end, 's') if end is not None else intervals['run_end'].max().to_datetime64().astype('datetime64[s]')
+    seconds = max(int((finish - origin) / np.timedelta64(1, 's')) + 1, 1)
+
+    def offsets(column: str, ceil: bool) -> np.ndarray:
+        # Seconds since origin, floored for starts and rounded up for ends, clipped to the timeline
+        ns = (intervals[column].to_numpy(dtype='datetime64[ns]') - origin.astype('datetime64[ns]')).astype('int64')
+        value = -(-ns // 1_000_000_000) if ceil else ns // 1_000_000_000
+        return np.clip(value, 0, seconds)
+
+    queue_start, run_start, run_end = offsets('queue_start', False), offsets('run_start', False), offsets('run_end', True)
+    # A query queued and running within one second is counted as running only
+    return {
+        'start': origin,
+        'warehouses': list(warehouses),
+        'running': _sweep(codes, run_start, run_end, len(warehouses), seconds),
+        'queued': _sweep(codes, queue_start, np.minimum(run_start, run_end), len(warehouses), seconds),
+    }
+
+def saturation_windows(queued: np.ndarray, gap: int = WINDOW_GAP_SECONDS,
+                       min_seconds: int = MIN_WINDOW_SECONDS) -> List[tuple]:
+    """
+    Runs of seconds with queued queries, as (first, end) second offsets.
+
+    Runs separated by fewer than `gap` idle seconds are merged; merged runs
+    shorter than `min_seconds` are dropped.
+    """
+    busy = np.concatenate([[False], queued > 0, [False]])
+    edges = np.flatnonzero(np.diff(busy.astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    if not len(starts):
+        return []
+    # A new window begins where the idle gap since the previous run is long enough
+    new = np.concatenate([[True], starts[1:] - ends[:-1] >= gap])
+    merged_starts = starts[new]
+    merged_ends = np.maximum.reduceat(ends, np.flatnonzero(new))
+    keep = merged_ends - merged_starts >= min_seconds
+    return list(zip(merged_starts[keep].tolist(), merged_ends[keep].tolist()))
+
+def _contributors(rows: pd.DataFrame, column: str, seconds: np.ndarray) -> List[Dict[str, Any]]:
+    totals = pd.Series(seconds, index=rows.index).groupby(rows[column].fillna('?')).sum()
+    return [{'name': name, 'seconds': float(value)}
+            for name, value in totals.sort_values(ascending=False).head(TOP_CONTRIBUTORS).items()]
+
+def concurrency_report(df: pd.DataFrame, fingerprint: Callable[[str], str], windows: int = 10,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Peak concurrency per warehouse and the worst overload queueing windows.
+
+    Each window lists the users and query patterns with the most queued plus
+    running seconds inside it. Only queries overlapping a reported window are
+    fingerprinted.
+
+    Args:
+        df: History rows with warehouse_name, user_name, query_text, end_time,
+            execution_time and queued_overload_time
+        fingerprint: Function mapping query text to its pattern id
+        windows: Number of windows reported, by queued query-seconds
+        start: Optional timeline start (UTC)
+        end: Optional timeline end (UTC)
+
+    Returns:
+        Dictionary with timeline (build_timeline output), warehouses (DataFrame
+        of peaks and averages) and windows (list of dicts)
+    """
+    intervals = query_intervals(df)
+    timeline = build_timeline(intervals, start, end)
+    origin = timeline['start']
+    stats, found = [], []
+    for i, warehouse in enumerate(timeline['warehouses']):
+        running, queued = timeline['running'][i], timeline['queued'][i]
+        active = running > 0
+        stats.append({
+            'warehouse_name': warehouse,
+            'peak_running': int(running.max()),
+            'peak_running_at': pd.Timestamp(origin + np.timedelta64(int(running.argmax()), 's')),
+            'avg_running_when_active': float(running[active].mean()) if active.any() else 0.0,
+            'peak_queued': int(queued.max()),
+            'queued_seconds': int((queued > 0).sum()),
+        })
+        for first, last in saturation_windows(queued):
+            found.append({
+                'warehouse_name': warehouse,
+                'start': pd.Timestamp(origin + np.timedelta64(first, 's')),
+                'end': pd.Timestamp(origin + np.timedelta64(last, 's')),
+                'seconds': last - first,
+                'peak_queued': int(queued[first:last].max()),
+                'peak_running': int(running[first:last].max()),
+                'queued_query_seconds': int(queued[first:last].sum()),
+            })
+
+    found = sorted(found, key=lambda w: w['queued_query_seconds'], reverse=True)[:windows]
+    for window in found:
+        w_start, w_end = window['start'].to_datetime64(), window['end'].to_datetime64()
+        rows = intervals[(intervals['warehouse_name'] == window['warehouse_name'])
+                         & (intervals['queue_start'] < w_end) & (intervals['run_end'] > w_start)]
+        queue_start = rows['queue_start'].to_numpy(dtype='datetime64[ns]')
+        run_end = rows['run_end'].to_numpy(dtype='datetime64[ns]')
+        overlap = (np.minimum(run_end, w_end) - np.maximum(queue_start, w_start)) / np.timedelta64(1, 's')
+        texts = rows['query_text'].fillna('')
+        codes, distinct = pd.factorize(texts)
+        rows = rows.assign(fingerprint=np.array([fingerprint(t) for t in distinct], dtype=object)[codes])
+        window['queries'] = len(rows)
+        window['users'] = _contributors(rows, 'user_name', overlap)
+        window['fingerprints'] = _contributors(rows, 'fingerprint', overlap)
+        samples = rows.groupby('fingerprint')['query_text'].last()
+        for item in window['fingerprints']:
+            item['sample_query'] = samples.get(item['name'], '')
+
+    warehouses = pd.DataFrame(stats, columns=['warehouse_name', 'peak_running', 'peak_running_at',
+                                              'avg_running_when_active', 'peak_queued', 'queued_seconds'])
+    return {
+        'timeline': timeline,
+        'warehouses': warehouses.sort_values('peak_running', ascending=False).reset_index(drop=True),
+        'windows': found,
+    }
+
+def _bucket_max(values: np.ndarray, size: int) -> np.ndarray:
+    padded = np.pad(values, (0, -len(values) % size))
+    return padded.reshape(-1, size).max(axis=1)
+
+def plot_timeline(report: Dict[str, Any], output_file: str) -> str:
+    """
+    Chart running and queued queries per warehouse as a PNG.
+
+    Args:
+        report: concurrency_report output
+        output_file: PNG path
+
+    Returns:
+        The PNG path
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    timeline = report['timeline']
+    names = report['warehouses']['warehouse_name'].head(CHART_WAREHOUSES).tolist()
+    fig, axes = plt.subplots(max(len(names), 1), 1, figsize=(16, 3 * max(len(names), 1)), sharex=True, squeeze=False)
+    fig.suptitle('Warehouse Concurrency and Overload Queueing', fontsize=16, fontweight='bold')
+
+    seconds = timeline['running'].shape[1]
+    bucket = max(1, -(-seconds // CHART_POINTS))
+    times = timeline['start'] + np.arange(0, seconds, bucket).astype('timedelta64[s]') if seconds else []
+    for ax, name in zip(axes[:, 0], names):
+        i = timeline['warehouses'].index(name)
+        ax.fill_between(times, _bucket_max(timeline['running'][i], bucket), step='post', color='#45B7D1',
+                        alpha=0.7, label='running')
+        ax.fill_between(times, _bucket_max(timeline['queued'][i], bucket), step='post', color='#FF6B6B',
+                        alpha=0.8, label='queued (overload)')
+        for window in report['windows']:
+            if window['warehouse_name'] == name:
+                ax.axvspan(window['start'], window['end'], color='#FD9853', alpha=0.5, lw=0)
+        ax.set_ylabel(name, fontweight='bold')
+        ax.grid(axis='y', alpha=0.3)
+        ax.legend(loc='upper right')
+    axes[-1, 0].xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
+    axes[-1, 0].set_xlabel(f"UTC ({bucket}s max per point)")
+
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=150, bbox_inches='tight')
+    plt.close()  # Free the figure's memory
+    return output_file
@@ -0,0 +1,267 @@
+"""
+Query Runtime and Credit Model
+Regression model that predicts elapsed time and credits from scan size,
+warehouse size and SQL structure, trained on locally stored QUERY_HISTORY.
+"""
+
+import json
+import hashlib
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+import numpy as np
+import pandas as pd
+from sqlglot.errors import SqlglotError
+from src.history_store import DEFAULT_HISTORY_DIR
+from src.sql_ast import parse_statement, analyze_tree
+
+logger = logging.getLogger(__name__)
+
+# Warehouse size to credits per hour mapping (approximate)
+WAREHOUSE_CREDITS = {
+    'X-SMALL': 1,
+    'SMALL': 2,
+    'MEDIUM': 4,
+    'LARGE': 8,
+    'X-LARGE': 16,
+    '2X-LARGE': 32,
+    '3X-LARGE': 64,
+    '4X-LARGE': 128
+}
+
+DEFAULT_MODEL_PATH = DEFAULT_HISTORY_DIR / "runtime_model.json"
+
+# QUERY_HISTORY column the model predicts: elapsed time, including queueing and compilation
+TARGET = 'total_elapsed_time'
+
+STRUCTURE_FEATURES = ['tables', 'joins', 'window_functions', 'subqueries', 'ctes',
+                      'cross_joins', 'unfiltered_tables']
+FEATURE_NAMES = (['intercept', 'log_mb_scanned', 'bytes_known', 'log_partitions_scanned',
+                  'log2_credits_per_hour', 'parse_failed'] + STRUCTURE_FEATURES)
+
+# Two-sided 90% normal quantile for the prediction interval
+Z_90 = 1.645
+# Queries shorter than this are dominated by overhead and excluded from training
+MIN_TRAINING_SECONDS = 0.1
+
+def credits_per_hour(warehouse_size: Optional[str]) -> float:
+    """Credits per hour for a warehouse size as written in QUERY_HISTORY ('X-Small', 'Large', ...)."""
+    return WAREHOUSE_CREDITS.get(str(warehouse_size or '').upper(), 4)
+
+def structure_counts(structure: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Reduce analyze_tree/analyze_sql output to the numeric structure features."""
+    if not structure:
+        return {name: 0.0 for name in STRUCTURE_FEATURES}
+    counts = {}
+    for name in STRUCTURE_FEATURES:
+        value = structure.get(name, 0)
+        counts[name] = float(len(value) if isinstance(value, (set, list, dict)) else value)
+    return counts
+
+@lru_cache(maxsize=50_000)
+def _text_counts(digest: str, query_text: str) -> Tuple[Tuple[float, ...], bool]:
+    # Keyed by digest so repeated texts in history parse once
+    try:
+        counts = structure_counts(analyze_tree(parse_statement(query_text)))
+        return tuple(counts[name] for name in STRUCTURE_FEATURES), False
+    except (SqlglotError, RecursionError, ValueError):
+        return tuple(0.0 for _ in STRUCTURE_FEATURES), True
+
+def text_counts(query_text: str) -> Tuple[Dict[str, float], bool]:
+    """Structure features of a single query text; (zeros, True) when it cannot be parsed."""
+    text = query_text or ''
+    values, failed = _text_counts(hashlib.sha1(text.encode('utf-8')).hexdigest(), text)
+    return dict(zip(STRUCTURE_FEATURES, values)), failed
+
+def feature_vector(structure_or_counts: Optional[Dict[str, Any]], bytes_scanned: Optional[float],
+                   partitions_scanned: Optional[float], warehouse_size: Optional[str],
+                   parse_failed: bool = False) -> np.ndarray:
+    """Build one model input row (see FEATURE_NAMES)."""
+    counts = structure_counts(structure_or_counts)
+    bytes_known = bytes_scanned is not None and not pd.isna(bytes_scanned)
+    mb = (bytes_scanned or 0) / (1024 * 1024) if bytes_known else 0.0
+    partitions = partitions_scanned if partitions_scanned is not None and not pd.isna(partitions_scanned) else 0
+    return np.array([
+        1.0,
+        np.log1p(mb),
+        1.0 if bytes_known else 0.0,
+        np.log1p(partitions),
+        np.log2(credits_per_hour(warehouse_size)),
+        1.0 if parse_failed else 0.0,
+    ] + [counts[name] for name in STRUCTURE_FEATURES])
+
+def history_matrix(history: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn QUERY_HISTORY rows into (features, elapsed seconds) for training.
+
+    Only successful queries on a sized warehouse with measurable elapsed
+    time are used.
+    """
+    usable = history[(history['execution_status'] == 'SUCCESS')
+                     & history['warehouse_size'].notna()
+                     & (history[TARGET] / 1000 >= MIN_TRAINING_SECONDS)]
+    rows = []
+    for text, scanned, partitions, size in zip(usable['query_text'], usable['bytes_scanned'],
+                                               usable['partitions_scanned'], usable['warehouse_size']):
+        counts, failed = text_counts(text)
+        rows.append(feature_vector(counts, scanned, partitions, size, failed))
+    features = np.vstack(rows) if rows else np.empty((0, len(FEATURE_NAMES)))
+    return features, usable[TARGET].to_numpy(dtype=float) / 1000
+
+class RuntimeModel:
+    """Ridge regression on log elapsed time with a residual-based prediction interval."""
+
+    def __init__(self, ridge: float = 1.0):
+        """
+        Args:
+            ridge: L2 penalty on all coefficients except the intercept
+        """
+        self.ridge = ridge
+        self.coefficients: Optional[np.ndarray] = None
+        self.residual_std = 0.0
+        self.trained_rows = 0
+
+    def fit(self, history: pd.DataFrame) -> 'RuntimeModel':
+        """Fit on QUERY_HISTORY rows (as returned by QueryHistoryStore.load)."""
+        features, seconds = history_matrix(history)
+        return self.fit_matrix(features, seconds)
+
+    def fit_matrix(self, features: np.ndarray, seconds: np.ndarray) -> 'RuntimeModel':
+        if len(seconds) < len(FEATURE_NAMES):
+            raise ValueError(f"Need at least {len(FEATURE_NAMES)} usable history rows, got {len(seconds)}")
+        target = np.log1p(seconds)
+        penalty = self.ridge * np.eye(features.shape[1])
+        penalty[0, 0] = 0.0
+        self.coefficients = np.linalg.solve(features.T @ features + penalty, features.T @ target)
+        residuals = target - features @ self.coefficients
+        self.residual_std = float(np.sqrt(np.mean(residuals ** 2)))
+        self.trained_rows = len(seconds)
+        return self
+
+    def predict_matrix(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (expected, low, high) elapsed seconds for each feature row (90% interval)."""
+        if self.coefficients is None:
+            raise RuntimeError("Model is not trained")
+        mean = features @ self.coefficients
+        spread = Z_90 * self.residual_std
+        return (np.expm1(mean).clip(min=0), np.expm1(mean - spread).clip(min=0),
+                np.expm1(mean + spread).clip(min=0))
+
+    def predict(self, structure: Optional[Dict[str, Any]] = None, bytes_scanned: Optional[float] = None,
+                partitions_scanned: Optional[float] = None, warehouse_size: str = 'MEDIUM') -> Dict[str, Any]:
+        """
+        Predict elapsed time and credits for one query.
+
+        Credits charge the warehouse rate for the whole elapsed time, as the
+        heuristic estimate does, so queueing and compilation are included.
+
+        Args:
+            structure: analyze_sql/analyze_tree output for the query
+            bytes_scanned: Expected bytes scanned (e.g. EXPLAIN bytesAssigned), if known
+            partitions_scanned: Expected partitions scanned, if known
+            warehouse_size: Warehouse size the query will run on
+
+        Returns:
+            Dictionary with expected/low/high seconds and credits (90% interval)
+        """
+        row = feature_vector(structure, bytes_scanned, partitions_scanned, warehouse_size)
+        expected, low, high = (float(v[0]) for v in self.predict_matrix(row[np.newaxis, :]))
+        rate = credits_per_hour(warehouse_size) / 3600
+        return {
+            'expected_seconds': expected, 'low_seconds': low, 'high_seconds': high,
+            'expected_credits': expected * rate, 'low_credits': low * rate, 'high_credits': high * rate,
+            'interval': 0.9, 'trained_rows': self.trained_rows,
+        }
+
+    def evaluate(self, history: pd.DataFrame, test_fraction: float = 0.2, seed: int = 0) -> Dict[str, Any]:
+        """
+        Hold out part of the history, train on the rest and score the held-out rows.
+
+        The baseline predicts the median elapsed time of the training rows.
+
+        Returns:
+            Dictionary with row counts, median absolute percentage error (model and
+            baseline), mean absolute error in seconds, R² of log runtime and
+            the share of held-out runtimes inside the 90% interval
+        """
+        features, seconds = history_matrix(history)
+        order = np.random.default_rng(seed).permutation(len(seconds))
+        n_test = max(1, int(len(seconds) * test_fraction))
+        test, train = order[:n_test], order[n_test:]
+
+        model = RuntimeModel(self.ridge).fit_matrix(features[train], seconds[train])
+        expected, low, high = model.predict_matrix(features[test])
+        actual = seconds[test]
+        baseline = np.full_like(actual, np.median(seconds[train]))
+        log_actual, log_expected = np.log1p(actual), np.log1p(expected)
+        total_var = np.sum((log_actual - log_actual.mean()) ** 2)
+        return {
+            'train_rows': len(train),
+            'test_rows': len(test),
+            'median_abs_pct_error': float(np.median(np.abs(expected - actual) / actual) * 100),
+            'baseline_median_abs_pct_error': float(np.median(np.abs(baseline - actual) / actual) * 100),
+            'mean_abs_error_seconds': float(np.mean(np.abs(expected - actual))),
+            'r2_log': float(1 - np.sum((log_actual - log_expected) ** 2) / total_var) if total_var else 0.0,
+            'interval_coverage': float(np.mean((actual >= low) & (actual <= high)) * 100),
+        }
+
+    def save(self, path: Optional[str] = None) -> Path:
+        path = Path(path or DEFAULT_MODEL_PATH).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            'features': FEATURE_NAMES,
+            'target': TARGET,
+            'coefficients': self.coefficients.tolist(),
+            'residual_std': self.residual_std,
+            'ridge': self.ridge,
+            'trained_rows': self.trained_rows,
+        }, indent=1), encoding='utf-8')
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'RuntimeModel':
+        data = json.loads(Path(path or DEFAULT_MODEL_PATH).expanduser().read_text(encoding='utf-8'))
+        if data['features'] != FEATURE_NAMES or data.get('target') != TARGET:
+            raise ValueError("Saved model uses a different feature set or target; retrain it")
+        model = cls(data['ridge'])
+        model.coefficients = np.array(data['coefficients'])
+        model.residual_std = data['residual_std']
+        model.trained_rows = data['trained_rows']
+        return model
+
+def synthetic_history(rows: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate QUERY_HISTORY-shaped rows with a known runtime law, for offline evaluation.
+
+    Runtime grows with bytes scanned and joins, shrinks with warehouse size,
+    and carries log-normal noise.
+    """
+    rng = np.random.default_rng(seed)
+    sizes = np.array(['X-Small', 'Small', 'Medium', 'Large'])
+    size = rng.choice(sizes, rows)
+    joins = rng.integers(0, 5, rows)
+    windows = rng.integers(0, 3, rows)
+    mb = np.exp(rng.uniform(0, 12, rows))
+    texts = []
+    for j, w in zip(joins, windows):
+        select = ', '.join(['a.id'] + [f"row_number() over (order by a.c{k})" for k in range(w)])
+        join_sql = ' '.join(f"join db.s.t{k} t{k} on t{k}.id = a.id" for k in range(j))
+        texts.append(f"select {select} from db.s.base a {join_sql} where a.d > '2025-01-01'")
+    rate = np.array([credits_per_hour(s) for s in size])
+    seconds = (0.5 + mb / (80 * rate)) * (1 + 0.3 * joins + 0.2 * windows) * rng.lognormal(0, 0.25, rows)
+    compile_seconds = rng.uniform(0.05, 0.3, rows)
+    end = pd.Timestamp('2025-01-01') + pd.to_timedelta(np.sort(rng.uniform(0, 30 * 86400, rows)), unit='s')
+    return pd.DataFrame({
+        'query_id': [f"synthetic-{i}" for i in range(rows)],
+        'query_text': texts,
+        'execution_status': 'SUCCESS',
+        'warehouse_size': size,
+        'bytes_scanned': mb * 1024 * 1024,
+        'partitions_scanned': np.ceil(mb / 16),
+        'compilation_time': compile_seconds * 1000,
+        'execution_time': seconds * 1000,
+        'total_elapsed_time': (seconds + compile_seconds) * 1000,
+        'start_time': end - pd.to_timedelta(seconds + compile_seconds, unit='s'),
+        'end_time': end,
+    })
@@ -0,0 +1,309 @@
+"""
+Per-Query Credit Attribution
+Apportions WAREHOUSE_METERING_HISTORY hourly compute credits to the queries
+that executed on each warehouse in that hour, by execution-time overlap.
+Settled hours are computed once and cached as Parquet next to the history store;
+a query that was still running when its hours were cached reaches QUERY_HISTORY
+only when it ends, and those hours are recomputed on the next update.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+import numpy as np
+import pandas as pd
+from src.history_store import QueryHistoryStore, LATE_ARRIVAL, MAX_PARTS
+
+logger = logging.getLogger(__name__)
+
+METERING_COLUMNS = ['warehouse_name', 'start_time', 'end_time', 'credits_used',
+                    'credits_used_compute', 'credits_used_cloud_services']
+CREDIT_COLUMNS = ['query_id', 'warehouse_name', 'hour', 'execution_seconds', 'compute_credits']
+# Query history columns needed to place each query's execution in time
+ATTRIBUTION_HISTORY_COLUMNS = ['warehouse_name', 'execution_time']
+
+# WAREHOUSE_METERING_HISTORY can be revised for up to ~3 hours (6 for cloud
+# services); hours younger than this are recomputed on every call, not cached
+SETTLE_WINDOW = timedelta(hours=6)
+# Metering rows re-read behind the watermark on each sync
+METERING_LOOKBACK = timedelta(days=1)
+HOUR = np.timedelta64(1, 'h')
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def attribute_credits(queries: pd.DataFrame, metering: pd.DataFrame) -> pd.DataFrame:
+    """
+    Split each warehouse-hour's compute credits across the queries executing in it.
+
+    A query executes from end_time - execution_time to end_time (queueing and
+    compilation use no warehouse compute). Its execution is cut at hour
+    boundaries and each piece gets credits_used_compute * piece / total
+    execution seconds on that warehouse-hour, so idle time in an hour is
+    charged to the queries that kept the warehouse running.
+
+    Args:
+        queries: History rows with query_id, warehouse_name, end_time and
+            execution_time (milliseconds)
+        metering: Metering rows with warehouse_name, start_time (hour) and
+            credits_used_compute
+
+    Returns:
+        DataFrame with CREDIT_COLUMNS, one row per query per hour it executed in
+    """
+    queries = queries[queries['warehouse_name'].notna() & (queries['execution_time'] > 0)]
+    if queries.empty or metering.empty:
+        return pd.DataFrame(columns=CREDIT_COLUMNS)
+
+    end = queries['end_time'].to_numpy(dtype='datetime64[ns]')
+    start = end - queries['execution_time'].to_numpy(dtype='int64').astype('timedelta64[ms]')
+    first_hour = start.astype('datetime64[h]')
+    pieces = (end - np.timedelta64(1, 'ns')).astype('datetime64[h]') - first_hour + 1
+    pieces = pieces.astype('int64')
+
+    # One row per (query, hour) piece, built with repeat/arange instead of a loop
+    index = np.repeat(np.arange(len(queries)), pieces)
+    offset = np.arange(len(index)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    hour = first_hour[index] + offset.astype('timedelta64[h]')
+    piece_start = np.maximum(start[index], hour.astype('datetime64[ns]'))
+    piece_end = np.minimum(end[index], (hour + HOUR).astype('datetime64[ns]'))
+
+    split = pd.DataFrame({
+        'query_id': queries['query_id'].to_numpy()[index],
+        'warehouse_name': queries['warehouse_name'].to_numpy()[index],
+        'hour': hour.astype('datetime64[ns]'),
+        'execution_seconds': (piece_end - piece_start) / np.timedelta64(1, 's'),
+    })
+    rates = metering.rename(columns={'start_time': 'hour'})[['warehouse_name', 'hour', 'credits_used_compute']]
+    split = split.merge(rates, on=['warehouse_name', 'hour'], how='inner')
+    totals = split.groupby(['warehouse_name', 'hour'])['execution_seconds'].transform('sum')
+    split['compute_credits'] = split['credits_used_compute'].astype(float) * split['execution_seconds'] / totals
+    return split[CREDIT_COLUMNS]
+
+class CreditAttributor:
+    """Cached per-query compute credits derived from warehouse metering."""
+
+    def __init__(self, store: Optional[QueryHistoryStore] = None, cache_dir: Optional[str] = None):
+        """
+        Initialize the attributor.
+
+        Args:
+            store: Query history mirror the queries are read from (default: QueryHistoryStore())
+            cache_dir: Directory for metering and attribution files
+                (default: <history store>/attribution)
+        """
+        self.store = store or QueryHistoryStore()
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else self.store.store_dir / "attribution"
+        self.metering_path = self.cache_dir / "metering.parquet"
+        self.state_path = self.cache_dir / "state.json"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        tmp_path = self.state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state, indent=1), encoding='utf-8')
+        os.replace(tmp_path, self.state_path)
+
+    def _parts(self) -> List[Path]:
+        return sorted(self.cache_dir.glob("credits-*.parquet"))
+
+    def metering_sql(self, since: datetime) -> str:
+        """SQL that fetches metering hours starting at or after `since` (UTC)."""
+        return f"""
+        SELECT {', '.join(METERING_COLUMNS)}
+        FROM SNOWFLAKE.ACCOUNT_USAGE.WAREHOUSE_METERING_HISTORY
+        WHERE start_time >= '{since:%Y-%m-%d %H:%M:%S} +00:00'::timestamp_tz
+        ORDER BY start_time
+        """
+
+    def sync_metering(self, utils=None, days: int = 30) -> Dict[str, Any]:
+        """
+        Fetch metering hours past the stored watermark (re-reading the last day,
+        which Snowflake may still revise) and merge them into the local copy.
+
+        Args:
+            utils: SnowflakeUtils instance (created on demand)
+            days: Initial backfill window for an empty cache
+
+        Returns:
+            Dictionary with rows fetched, new watermark and elapsed seconds
+        """
+        if utils is None:
+            from src.sf_utils import SnowflakeUtils
+            utils = SnowflakeUtils()
+
+        started = time.perf_counter()
+        state = self._load_state()
+        watermark = datetime.fromisoformat(state['metering_watermark']) if state.get('metering_watermark') else None
+        since = watermark - METERING_LOOKBACK if watermark else _floor_hour(datetime.utcnow() - timedelta(days=days))
+
+        fetched = utils.query_to_df(self.metering_sql(since))
+        fetched.columns = [c.lower() for c in fetched.columns]
+        if len(fetched):
+            for col in ('start_time', 'end_time'):
+                fetched[col] = pd.to_datetime(fetched[col], utc=True).dt.tz_localize(None)
+            merged = pd.concat([self.metering(), fetched], ignore_index=True)
+            merged = merged.drop_duplicates(['warehouse_name', 'start_time'], keep='last')
+            tmp_path = self.metering_path.with_suffix('.tmp')
+            merged.sort_values('start_time').to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.metering_path)
+            watermark = merged['start_time'].max().to_pydatetime(warn=False)
+            state['metering_watermark'] = watermark.isoformat()
+            self._save_state(state)
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Metering sync: {len(fetched)} rows since {since:%Y-%m-%d %H:%M} in {elapsed:.1f}s")
+        return {'rows_fetched': len(fetched), 'watermark': watermark, 'elapsed_seconds': elapsed}
+
+    def metering(self, since: Optional[datetime] = None) -> pd.DataFrame:
+        """Locally cached metering hours, optionally from `since` (UTC) on."""
+        if not self.metering_path.exists():
+            return pd.DataFrame(columns=METERING_COLUMNS)
+        df = pd.read_parquet(self.metering_path)
+        return df[df['start_time'] >= since] if since is not None else df
+
+    def _compute(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """Attribute the hours in [start, end) from the history store and metering cache."""
+        # Queries ending in the range, plus any that were still executing when it closed
+        queries = self.store.load(ATTRIBUTION_HISTORY_COLUMNS, since=start)
+        metering = self.metering(since=start)
+        metering = metering[metering['start_time'] < end]
+        credits = attribute_credits(queries, metering)
+        return credits[(credits['hour'] >= start) & (credits['hour'] < end)]
+
+    def settled_through(self) -> Optional[datetime]:
+        """
+        End of the last hour whose metering and query history are final.
+
+        Queries still running at that point are not in the history yet; update()
+        recomputes the hours they overlap once they land (see stale_from).
+        """
+        history_watermark = self.store.watermark
+        metering_watermark = self._load_state().get('metering_watermark')
+        if history_watermark is None or metering_watermark is None:
+            return None
+        limit = min(datetime.utcnow() - SETTLE_WINDOW, history_watermark - LATE_ARRIVAL,
+                    datetime.fromisoformat(metering_watermark) + timedelta(hours=1))
+        return _floor_hour(limit)
+
+    def stale_from(self, through: datetime) -> Optional[datetime]:
+        """
+        First cached hour (before `through`) missing a query the history store now holds.
+
+        Only queries ending after `through` can be missing: anything that ended
+        earlier was in the store when those hours were cached.
+        """
+        queries = self.store.load(ATTRIBUTION_HISTORY_COLUMNS, since=through)
+        metering = self.metering()
+        pieces = attribute_credits(queries, metering[metering['start_time'] < through])
+        if pieces.empty:
+            return None
+        first = pd.Timestamp(pieces['hour'].min())
+        cached = [pd.read_parquet(part, columns=['query_id', 'hour'], filters=[('hour', '>=', first)])
+                  for part in self._parts()]
+        cached = pd.concat(cached, ignore_index=True) if cached else pd.DataFrame(columns=['query_id', 'hour'])
+        cached['hour'] = cached['hour'].astype('datetime64[ns]')
+        missing = pieces.merge(cached, on=['query_id', 'hour'], how='left', indicator=True)
+        missing = missing[missing['_merge'] == 'left_only']
+        return None if missing.empty else missing['hour'].min().to_pydatetime()
+
+    def _drop_from(self, hour: datetime) -> None:
+        """Remove cached attribution rows for `hour` and later."""
+        for part in self._parts():
+            if pd.read_parquet(part, columns=['hour'], filters=[('hour', '>=', pd.Timestamp(hour))]).empty:
+                continue
+            df = pd.read_parquet(part)
+            kept = df[df['hour'] < hour]
+            if kept.empty:
+                part.unlink()
+                continue
+            tmp_path = part.with_suffix('.tmp')
+            kept.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, part)
+
+    def update(self) -> Dict[str, Any]:
+        """
+        Attribute newly settled hours and cache them.
+
+        Cached hours are not recomputed unless a query overlapping them has
+        landed in the history store since (see stale_from).
+
+        Returns:
+            Dictionary with hours computed, rows written, the first recomputed
+            cached hour (or None) and elapsed seconds
+        """
+        started = time.perf_counter()
+        state = self._load_state()
+        end = self.settled_through()
+        metering = self.metering()
+        if end is None or metering.empty:
+            return {'hours': 0, 'rows': 0, 'recomputed_from': None, 'elapsed_seconds': time.perf_counter() - started}
+
+        done = state.get('attributed_through')
+        start = datetime.fromisoformat(done) if done else metering['start_time'].min().to_pydatetime(warn=False)
+        stale = self.stale_from(start) if done else None
+        if stale is not None:
+            logger.info(f"Recomputing cached hours from {stale:%Y-%m-%d %H:%M} for queries that ended since")
+            self._drop_from(stale)
+            start, end = stale, max(end, start)
+        if end <= start:
+            return {'hours': 0, 'rows': 0, 'recomputed_from': None, 'elapsed_seconds': time.perf_counter() - started}
+
+        credits = self._compute(start, end)
+        if len(credits):
+            part = self.cache_dir / f"credits-{start:%Y%m%d%H}-{end:%Y%m%d%H}.parquet"
+            credits.to_parquet(part, index=False)
+        state['attributed_through'] = end.isoformat()
+        self._save_state(state)
+        if len(self._parts()) > MAX_PARTS:
+            self.compact()
+
+        hours = int((end - start) / timedelta(hours=1))
+        elapsed = time.perf_counter() - started
+        logger.info(f"Attributed {hours} warehouse hours ({len(credits)} query pieces) in {elapsed:.1f}s")
+        return {'hours': hours, 'rows': len(credits), 'recomputed_from': stale, 'elapsed_seconds': elapsed}
+
+    def compact(self) -> int:
+        """Merge the cached attribution parts into one. Returns the rows kept."""
+        parts = self._parts()
+        if not parts:
+            return 0
+        df = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+        merged = self.cache_dir / f"credits-{df['hour'].min():%Y%m%d%H}-{df['hour'].max():%Y%m%d%H}.parquet"
+        tmp_path = merged.with_suffix('.tmp')
+        df.sort_values('hour').to_parquet(tmp_path, index=False)
+        for part in parts:
+            part.unlink()
+        os.replace(tmp_path, merged)
+        return len(df)
+
+    def query_credits(self, since: datetime) -> pd.DataFrame:
+        """
+        Attributed compute credits per query for hours from `since` (UTC) on.
+
+        Settled hours come from the cache (call update() first to extend it);
+        newer hours are computed on the fly from whatever metering is available.
+
+        Returns:
+            DataFrame with query_id, warehouse_name, execution_seconds and compute_credits
+        """
+        since = _floor_hour(since)
+        frames = [pd.read_parquet(part, filters=[('hour', '>=', pd.Timestamp(since))]) for part in self._parts()]
+        done = self._load_state().get('attributed_through')
+        fresh_from = max(since, datetime.fromisoformat(done)) if done else since
+        frames.append(self._compute(fresh_from, _floor_hour(datetime.utcnow()) + timedelta(hours=1)))
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=['query_id', 'warehouse_name', 'execution_seconds', 'compute_credits'])
+        credits = pd.concat(frames, ignore_index=True)
+        return credits.groupby(['query_id', 'warehouse_name'], as_index=False)[
+            ['execution_seconds', 'compute_credits']].sum()
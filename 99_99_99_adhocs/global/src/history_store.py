@@ -0,0 +1,177 @@
+"""
+Local Query History Store
+Incrementally copies SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY into local Parquet
+files so history analysis and model training run offline.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = Path.home() / ".cache" / "sf_query_history"
+
+# Columns copied from QUERY_HISTORY (times are milliseconds, as in the view)
+HISTORY_COLUMNS = [
+    'query_id', 'query_text', 'query_type', 'query_tag', 'session_id',
+    'user_name', 'role_name', 'warehouse_name', 'warehouse_size', 'warehouse_type',
+    'database_name', 'schema_name', 'execution_status', 'error_code', 'error_message',
+    'start_time', 'end_time', 'total_elapsed_time', 'compilation_time', 'execution_time',
+    'queued_provisioning_time', 'queued_repair_time', 'queued_overload_time',
+    'bytes_scanned', 'percentage_scanned_from_cache', 'partitions_scanned', 'partitions_total',
+    'bytes_spilled_to_local_storage', 'bytes_spilled_to_remote_storage',
+    'rows_produced', 'credits_used_cloud_services',
+]
+TIMESTAMP_COLUMNS = ('start_time', 'end_time')
+
+# ACCOUNT_USAGE rows can land up to ~45 minutes late; each sync re-reads this
+# window behind the watermark and de-duplicates on query_id
+LATE_ARRIVAL = timedelta(hours=1)
+# Part files are merged into one once there are more than this many
+MAX_PARTS = 24
+# Rows are written in end_time order in groups of this size, so a load() with
+# a time window only decodes the row groups that overlap it
+ROW_GROUP_ROWS = 50_000
+
+class QueryHistoryStore:
+    """Parquet mirror of QUERY_HISTORY with an end_time watermark."""
+
+    def __init__(self, store_dir: Optional[str] = None, retention_days: int = 90):
+        """
+        Initialize the store.
+
+        Args:
+            store_dir: Directory for Parquet parts (default: SNOWFLAKE_HISTORY_DIR
+                or ~/.cache/sf_query_history)
+            retention_days: Rows whose end_time is older than this are dropped on compaction
+        """
+        self.store_dir = Path(store_dir or os.getenv("SNOWFLAKE_HISTORY_DIR") or DEFAULT_HISTORY_DIR).expanduser()
+        self.retention_days = retention_days
+        self.state_path = self.store_dir / "state.json"
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        tmp_path = self.state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state, indent=1), encoding='utf-8')
+        os.replace(tmp_path, self.state_path)
+
+    def _parts(self) -> List[Path]:
+        return sorted(self.store_dir.glob("part-*.parquet"))
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """Latest end_time (UTC) stored so far, or None for an empty store."""
+        value = self._load_state().get('watermark')
+        return datetime.fromisoformat(value) if value else None
+
+    def sync_sql(self, since: datetime) -> str:
+        """SQL that fetches history rows that ended after `since` (UTC)."""
+        return f"""
+        SELECT {', '.join(HISTORY_COLUMNS)}
+        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+        WHERE end_time > '{since:%Y-%m-%d %H:%M:%S.%f} +00:00'::timestamp_tz
+        ORDER BY end_time
+        """
+
+    def sync(self, utils=None, days: int = 30, batch_rows: int = 200_000) -> Dict[str, Any]:
+        """
+        Fetch rows newer than the watermark and append them as a new part.
+
+        The first sync copies the last `days` days. Later syncs only read rows
+        past the watermark (minus the late-arrival window).
+
+        Args:
+            utils: SnowflakeUtils instance (created on demand)
+            days: Initial backfill window for an empty store
+            batch_rows: Rows fetched per batch while streaming
+
+        Returns:
+            Dictionary with rows fetched, new watermark and elapsed seconds
+        """
+        if utils is None:
+            from src.sf_utils import SnowflakeUtils
+            utils = SnowflakeUtils()
+
+        started = time.perf_counter()
+        watermark = self.watermark
+        since = watermark - LATE_ARRIVAL if watermark else datetime.utcnow() - timedelta(days=days)
+
+        batches = [self._normalize(df) for df in utils.iter_query(self.sync_sql(since), batch_rows=batch_rows)]
+        fetched = sum(len(df) for df in batches)
+        if fetched:
+            new_rows = pd.concat(batches, ignore_index=True)
+            part = self.store_dir / f"part-{datetime.utcnow():%Y%m%d%H%M%S%f}.parquet"
+            new_rows.to_parquet(part, index=False, compression='snappy', row_group_size=ROW_GROUP_ROWS)
+            watermark = max(watermark or datetime.min, new_rows['end_time'].max().to_pydatetime(warn=False))
+            self._save_state({'watermark': watermark.isoformat(), 'synced_at': datetime.utcnow().isoformat()})
+            if len(self._parts()) > MAX_PARTS:
+                self.compact()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"History sync: {fetched} rows since {since:%Y-%m-%d %H:%M} in {elapsed:.1f}s")
+        return {'rows_fetched': fetched, 'since': since, 'watermark': watermark, 'elapsed_seconds': elapsed}
+
+    @staticmethod
+    def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+        df.columns = [c.lower() for c in df.columns]
+        for col in TIMESTAMP_COLUMNS:
+            # Store UTC without a zone so parts from different sessions compare equal
+            df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
+        return df
+
+    def load(self, columns: Optional[List[str]] = None, since: Optional[datetime] = None,
+             until: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Read stored history, de-duplicated on query_id (latest copy wins).
+
+        Args:
+            columns: Optional subset of HISTORY_COLUMNS to read
+            since: Optional lower bound on end_time (UTC)
+            until: Optional upper bound on end_time (UTC)
+
+        Returns:
+            DataFrame of history rows ordered by end_time
+        """
+        wanted = None
+        if columns is not None:
+            wanted = list(dict.fromkeys(['query_id', 'end_time'] + list(columns)))
+        # Bounds are pushed into the Parquet reader so row groups outside the window are skipped
+        filters = []
+        if since is not None:
+            filters.append(('end_time', '>', pd.Timestamp(since)))
+        if until is not None:
+            filters.append(('end_time', '<=', pd.Timestamp(until)))
+        frames = [pd.read_parquet(part, columns=wanted, filters=filters or None) for part in self._parts()]
+        if not frames:
+            return pd.DataFrame(columns=wanted or HISTORY_COLUMNS)
+
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates('query_id', keep='last')
+        return df.sort_values('end_time').reset_index(drop=True)
+
+    def compact(self) -> int:
+        """Merge all parts into one, applying retention. Returns the rows kept."""
+        parts = self._parts()
+        if not parts:
+            return 0
+        df = self.load()
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        df = df[df['end_time'] >= cutoff]
+        merged = self.store_dir / f"part-{datetime.utcnow():%Y%m%d%H%M%S%f}.parquet"
+        df.to_parquet(merged, index=False, compression='snappy', row_group_size=ROW_GROUP_ROWS)
+        for part in parts:
+            part.unlink()
+        return len(df)
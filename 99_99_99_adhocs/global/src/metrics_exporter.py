@@ -0,0 +1,376 @@
+"""
+Query Health Metrics Exporter
+Polls the INFORMATION_SCHEMA query history and warehouse metering table
+functions incrementally and serves the results as OpenMetrics / Prometheus
+text over a local HTTP endpoint.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Table functions return at most this many rows per call
+RESULT_LIMIT = 10_000
+# Calls per source and poll when a full page shows the history was truncated
+MAX_PAGES = 10
+# Each poll re-reads this far behind the end_time watermark; rows already
+# counted are skipped by query_id
+POLL_OVERLAP = timedelta(minutes=2)
+# Elapsed-time p95 gauges cover queries finished within this window
+P95_WINDOW = timedelta(minutes=15)
+QUEUE_BUCKETS = (0.1, 1, 5, 15, 60, 300, 900)
+ELAPSED_BUCKETS = (0.5, 1, 5, 15, 60, 300, 900, 3600)
+
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Statuses of queries that have not finished; their end_time is not final
+ACTIVE_STATUSES = ['RUNNING', 'QUEUED', 'RESUMING_WAREHOUSE', 'BLOCKED']
+
+HISTORY_FIELDS = ['query_id', 'warehouse_name', 'execution_status', 'error_code', 'start_time', 'end_time',
+                  'total_elapsed_time', 'queued_overload_time', 'queued_provisioning_time',
+                  'credits_used_cloud_services']
+
+def _timestamp(value: datetime) -> str:
+    return f"'{value:%Y-%m-%d %H:%M:%S.%f} +00:00'::timestamp_ltz"
+
+def history_sql(since: datetime, warehouse: Optional[str] = None, until: Optional[datetime] = None) -> str:
+    """
+    SQL for queries that ended after `since` (UTC) plus those still running or queued.
+
+    Without a warehouse the session's QUERY_HISTORY is read; with one,
+    QUERY_HISTORY_BY_WAREHOUSE. With `until`, only queries that ended by then
+    are returned (used to page back through a truncated result).
+    """
+    if warehouse:
+        function = f"QUERY_HISTORY_BY_WAREHOUSE(WAREHOUSE_NAME => '{warehouse}', "
+    else:
+        function = "QUERY_HISTORY("
+    end = f"END_TIME_RANGE_END => {_timestamp(until)}, " if until is not None else ""
+    return f"""
+    SELECT {', '.join(HISTORY_FIELDS)}
+    FROM TABLE(INFORMATION_SCHEMA.{function}END_TIME_RANGE_START => {_timestamp(since)},
+                                       {end}RESULT_LIMIT => {RESULT_LIMIT}))
+    """
+
+def metering_sql(since: datetime) -> str:
+    """SQL for warehouse metering hours starting at or after `since` (UTC)."""
+    return f"""
+    SELECT warehouse_name, start_time, credits_used
+    FROM TABLE(INFORMATION_SCHEMA.WAREHOUSE_METERING_HISTORY(DATE_RANGE_START => {_timestamp(since)}))
+    """
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class QueryHealthExporter:
+    """Incrementally polled query and warehouse health metrics."""
+
+    def __init__(self, source=None, warehouses: Optional[List[str]] = None,
+                 max_workers: Optional[int] = None, lookback: timedelta = timedelta(minutes=5)):
+        """
+        Initialize the exporter.
+
+        Args:
+            source: Object with SnowflakeUtils.run_many's signature that runs the
+                poll queries (default: SnowflakeUtils())
+            warehouses: Warehouses polled with one QUERY_HISTORY_BY_WAREHOUSE call
+                each (default: one QUERY_HISTORY call for the session's user)
+            max_workers: Concurrent poll queries (default: SNOWFLAKE_MAX_CONCURRENCY or 4)
+            lookback: History read on the first poll
+        """
+        if source is None:
+            from src.sf_utils import SnowflakeUtils
+            source = SnowflakeUtils()
+        self.source = source
+        self.warehouses = list(warehouses or [])
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        started = datetime.utcnow() - lookback
+        self.watermarks = {name: started for name in self._sources()}
+        # query_id -> end_time of finished queries already counted
+        self.seen: Dict[str, datetime] = {}
+        self.recent: Dict[str, deque] = {}
+        self.gauges: Dict[str, Dict[Tuple, float]] = {}
+        self.counters: Dict[str, Dict[Tuple, float]] = {}
+        self.histograms: Dict[str, Dict[Tuple, Dict[str, Any]]] = {}
+        self.polls = 0
+        self.poll_errors = 0
+        self.last_poll = None
+        self.last_poll_seconds = 0.0
+
+    def _sources(self) -> List[str]:
+        return [f"history:{w}" for w in self.warehouses] or ['history:']
+
+    @staticmethod
+    def _frame(data: pd.DataFrame) -> pd.DataFrame:
+        df = data.rename(columns=str.lower)
+        for col in ('start_time', 'end_time'):
+            df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
+        return df
+
+    def _page_back(self, frames: Dict[str, pd.DataFrame], since: Dict[str, datetime],
+                   errors: Dict[str, str]) -> None:
+        """
+        Fetch the rows a full page cut off, ending each further page at the
+        oldest end_time seen so far, until a page comes back short.
+        Sources whose later pages fail are dropped so the whole window is retried.
+        """
+        truncated = {name: df for name, df in frames.items() if len(df) >= RESULT_LIMIT}
+        pages = 1
+        while truncated and pages < MAX_PAGES:
+            until = {name: df['end_time'].min() for name, df in truncated.items()}
+            until = {name: end for name, end in until.items() if not pd.isna(end)}
+            if not until:
+                break
+            logger.warning(f"History for {', '.join(until)} hit RESULT_LIMIT={RESULT_LIMIT}; "
+                           f"fetching page {pages + 1}")
+            results = self.source.run_many(
+                {name: history_sql(since[name], name.split(':', 1)[1] or None, end.to_pydatetime())
+                 for name, end in until.items()}, max_workers=self.max_workers, use_cache=False)
+            pages += 1
+            truncated = {}
+            for name, result in results.items():
+                if result['error']:
+                    errors[name] = result['error']
+                    frames.pop(name, None)
+                    continue
+                df = self._frame(result['data'])
+                frames[name] = pd.concat([frames[name], df], ignore_index=True)
+                # A full page that reached further back may still hide older rows
+                if len(df) >= RESULT_LIMIT and df['end_time'].min() < until[name]:
+                    truncated[name] = df
+        if truncated:
+            logger.warning(f"History for {', '.join(truncated)} still truncated after {pages} pages; "
+                           f"older queries in the window were not counted")
+
+    def poll(self) -> Dict[str, Any]:
+        """
+        Fetch new history and metering concurrently and update the metrics.
+
+        Returns:
+            Dictionary with finished (newly counted), active and errors
+        """
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        since = {name: self.watermarks[name] - POLL_OVERLAP for name in self._sources()}
+        queries = {name: history_sql(since[name], name.split(':', 1)[1] or None) for name in self._sources()}
+        queries['metering'] = metering_sql(now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1))
+        results = self.source.run_many(queries, max_workers=self.max_workers, use_cache=False)
+
+        errors = {name: r['error'] for name, r in results.items() if r['error']}
+        frames = {}
+        for name in self._sources():
+            if name in errors:
+                continue
+            frames[name] = self._frame(results[name]['data'])
+        self._page_back(frames, since, errors)
+        history = pd.concat([df for df in frames.values() if len(df)] or [pd.DataFrame(columns=HISTORY_FIELDS)],
+                            ignore_index=True)
+
+        with self.lock:
+            finished = self._count_finished(history)
+            active = self._set_active(history)
+            if 'metering' not in errors:
+                self._set_credits(results['metering']['data'].rename(columns=str.lower))
+            for name, df in frames.items():
+                ended = df.loc[~df['execution_status'].isin(ACTIVE_STATUSES), 'end_time'].dropna()
+                if len(ended):
+                    self.watermarks[name] = max(self.watermarks[name], ended.max().to_pydatetime())
+            # Forget counted queries that the overlap window can no longer return
+            oldest = min(self.watermarks.values()) - POLL_OVERLAP
+            self.seen = {query_id: end for query_id, end in self.seen.items() if end >= oldest}
+            self.polls += 1
+            self.poll_errors += len(errors)
+            self.last_poll = now
+            self.last_poll_seconds = time.perf_counter() - started
+
+        for name, error in errors.items():
+            logger.warning(f"Poll of {name} failed: {error}")
+        return {'finished': finished, 'active': active, 'errors': errors,
+                'elapsed_seconds': self.last_poll_seconds}
+
+    def _count_finished(self, history: pd.DataFrame) -> int:
+        done = history[history['end_time'].notna() & ~history['execution_status'].isin(ACTIVE_STATUSES)]
+        done = done.drop_duplicates('query_id')
+        done = done[~done['query_id'].isin(self.seen.keys())]
+        if done.empty:
+            return 0
+        self.seen.update(zip(done['query_id'], done['end_time'].dt.to_pydatetime()))
+
+        warehouse = done['warehouse_name'].fillna('')
+        failed = done['execution_status'].str.startswith('FAIL')
+        elapsed = done['total_elapsed_time'].fillna(0).to_numpy(dtype=float) / 1000
+        queued = (done['queued_overload_time'].fillna(0) + done['queued_provisioning_time'].fillna(0)).to_numpy(dtype=float) / 1000
+        status = np.where(failed, 'failed', 'success')
+        for key, count in pd.Series(1, index=done.index).groupby([warehouse, status]).sum().items():
+            self._inc('snowflake_queries', ('warehouse', 'status'), key, count)
+        for key, count in pd.Series(1, index=done.index)[failed].groupby(
+                [warehouse[failed], done['error_code'][failed].fillna('').astype(str)]).sum().items():
+            self._inc('snowflake_query_failures', ('warehouse', 'error_code'), key, count)
+        for key, credits in done['credits_used_cloud_services'].fillna(0).groupby(warehouse).sum().items():
+            self._inc('snowflake_query_cloud_services_credits', ('warehouse',), (key,), credits)
+        for name in warehouse.unique():
+            rows = (warehouse == name).to_numpy()
+            self._observe('snowflake_query_queue_seconds', name, queued[rows], QUEUE_BUCKETS)
+            self._observe('snowflake_query_elapsed_seconds', name, elapsed[rows], ELAPSED_BUCKETS)
+            window = self.recent.setdefault(name, deque())
+            window.extend(zip(done['end_time'][rows], elapsed[rows]))
+
+        # Rolling p95 of elapsed time per warehouse
+        cutoff = datetime.utcnow() - P95_WINDOW
+        p95 = {}
+        for name, window in self.recent.items():
+            while window and window[0][0] < cutoff:
+                window.popleft()
+            if window:
+                p95[(name,)] = float(np.percentile([e for _, e in window], 95))
+        self.gauges['snowflake_query_elapsed_p95_seconds'] = p95
+        return len(done)
+
+    def _set_active(self, history: pd.DataFrame) -> int:
+        # Running and queued counts are replaced on every poll, not accumulated
+        active = history[history['execution_status'].isin(ACTIVE_STATUSES)]
+        active = active.drop_duplicates('query_id')
+        state = np.where(active['execution_status'] == 'RUNNING', 'running', 'queued')
+        counts = pd.Series(1, index=active.index).groupby([active['warehouse_name'].fillna('').to_numpy(), state]).sum()
+        warehouses = set(history['warehouse_name'].fillna('')) | {key[0] for key in self.gauges.get(
+            'snowflake_running_queries', {})}
+        self.gauges['snowflake_running_queries'] = {(w,): float(counts.get((w, 'running'), 0)) for w in warehouses}
+        self.gauges['snowflake_queued_queries'] = {(w,): float(counts.get((w, 'queued'), 0)) for w in warehouses}
+        return len(active)
+
+    def _set_credits(self, metering: pd.DataFrame) -> None:
+        if metering.empty:
+            return
+        metering = metering.assign(start_time=pd.to_datetime(metering['start_time'], utc=True))
+        latest = metering.sort_values('start_time').drop_duplicates('warehouse_name', keep='last')
+        self.gauges['snowflake_warehouse_credits_used_current_hour'] = {
+            (row['warehouse_name'],): float(row['credits_used']) for row in latest.to_dict('records')}
+
+    def _inc(self, name: str, labels: Tuple[str, ...], key: Tuple, value: float) -> None:
+        family = self.counters.setdefault(name, {})
+        family[(labels, key)] = family.get((labels, key), 0.0) + float(value)
+
+    def _observe(self, name: str, warehouse: str, values: np.ndarray, buckets: Tuple[float, ...]) -> None:
+        family = self.histograms.setdefault(name, {})
+        entry = family.setdefault((warehouse,), {'buckets': np.zeros(len(buckets) + 1), 'sum': 0.0, 'count': 0})
+        # Cumulative bucket counts, the last one being +Inf
+        entry['buckets'] += np.searchsorted(np.sort(values), list(buckets) + [np.inf], side='right')
+        entry['sum'] += float(values.sum())
+        entry['count'] += len(values)
+
+    def render(self, openmetrics: bool = True) -> str:
+        """Current metrics in OpenMetrics (or Prometheus 0.0.4) text format."""
+        help_text = {
+            'snowflake_running_queries': 'Queries executing at the last poll',
+            'snowflake_queued_queries': 'Queries queued, blocked or waiting for a resume at the last poll',
+            'snowflake_query_elapsed_p95_seconds': f'p95 elapsed time of queries finished in the last '
+                                                   f'{int(P95_WINDOW.total_seconds() // 60)} minutes',
+            'snowflake_warehouse_credits_used_current_hour': 'Credits used in the latest metering hour',
+            'snowflake_queries': 'Finished queries by status',
+            'snowflake_query_failures': 'Failed queries by error code',
+            'snowflake_query_cloud_services_credits': 'Cloud services credits of finished queries',
+            'snowflake_query_queue_seconds': 'Queued (overload + provisioning) seconds of finished queries',
+            'snowflake_query_elapsed_seconds': 'Elapsed seconds of finished queries',
+        }
+        lines = []
+        with self.lock:
+            for name, values in sorted(self.gauges.items()):
+                lines += [f"# HELP {name} {help_text[name]}", f"# TYPE {name} gauge"]
+                lines += [f"{name}{_labels(('warehouse',), key)} {_number(value)}" for key, value in sorted(values.items())]
+            for name, values in sorted(self.counters.items()):
+                family = name if openmetrics else f"{name}_total"
+                lines += [f"# HELP {family} {help_text[name]}", f"# TYPE {family} counter"]
+                lines += [f"{name}_total{_labels(labels, key)} {_number(value)}"
+                          for (labels, key), value in sorted(values.items())]
+            for name, values in sorted(self.histograms.items()):
+                buckets = QUEUE_BUCKETS if 'queue' in name else ELAPSED_BUCKETS
+                lines += [f"# HELP {name} {help_text[name]}", f"# TYPE {name} histogram"]
+                for key, entry in sorted(values.items()):
+                    for bound, count in zip(list(buckets) + [float('inf')], entry['buckets']):
+                        le = 'le="' + _number(bound) + '"'
+                        lines.append(f"{name}_bucket{_labels(('warehouse',), key, le)} {_number(count)}")
+                    lines.append(f"{name}_count{_labels(('warehouse',), key)} {entry['count']}")
+                    lines.append(f"{name}_sum{_labels(('warehouse',), key)} {_number(entry['sum'])}")
+            exporter = [
+                ('snowflake_exporter_polls', 'counter', 'Completed polls', self.polls),
+                ('snowflake_exporter_poll_errors', 'counter', 'Poll queries that failed', self.poll_errors),
+                ('snowflake_exporter_last_poll_seconds', 'gauge', 'Duration of the last poll', self.last_poll_seconds),
+                ('snowflake_exporter_last_poll_timestamp_seconds', 'gauge', 'Unix time of the last poll',
+                 (self.last_poll - datetime(1970, 1, 1)).total_seconds() if self.last_poll else 0),
+            ]
+            for name, kind, text, value in exporter:
+                family = f"{name}_total" if kind == 'counter' and not openmetrics else name
+                sample = f"{name}_total" if kind == 'counter' else name
+                lines += [f"# HELP {family} {text}", f"# TYPE {family} {kind}", f"{sample} {_number(value)}"]
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1', interval: float = 60,
+              polls: Optional[int] = None) -> None:
+        """
+        Serve /metrics over HTTP and poll every `interval` seconds until interrupted.
+
+        Args:
+            port: HTTP port
+            host: Bind address (local only by default)
+            interval: Seconds between poll starts
+            polls: Stop after this many polls (default: run until interrupted)
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                body = exporter.render(openmetrics).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        try:
+            count = 0
+            while polls is None or count < polls:
+                started = time.perf_counter()
+                try:
+                    result = self.poll()
+                    logger.info(f"Poll: {result['finished']} finished, {result['active']} active "
+                                f"in {result['elapsed_seconds']:.1f}s")
+                except Exception as e:
+                    logger.error(f"Poll failed: {e}")
+                count += 1
+                if polls is None or count < polls:
+                    time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        finally:
+            server.shutdown()
@@ -0,0 +1,209 @@
+"""
+Query Operator Profiles
+Captures GET_QUERY_OPERATOR_STATS for finished queries, stores the operator
+trees locally, and scores each profile by the time spent in operators that
+can be fixed: exploding joins, spills and scans with poor pruning.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+import pandas as pd
+from src.history_store import DEFAULT_HISTORY_DIR
+
+logger = logging.getLogger(__name__)
+
+# A join whose output exceeds its input rows by this factor is "exploding"
+EXPLOSION_FACTOR = 10
+# Scans of at least this many partitions that read more than this share of them
+PRUNING_MIN_PARTITIONS = 100
+PRUNING_MAX_SCANNED = 0.8
+# Operators listed as the main time consumers of a query
+TOP_OPERATORS = 3
+
+def operator_stats_sql(query_id: str) -> str:
+    """SQL returning one row per operator of a finished query (last 14 days)."""
+    return f"SELECT * FROM TABLE(GET_QUERY_OPERATOR_STATS('{query_id}'))"
+
+def _variant(value: Any) -> Any:
+    # VARIANT/ARRAY columns arrive as JSON text
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return {}
+    return value
+
+def parse_operators(stats: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Flatten GET_QUERY_OPERATOR_STATS rows into plain operator dictionaries.
+
+    Returns:
+        List of {step_id, operator_id, parents, type, input_rows, output_rows,
+        time_pct, bytes_scanned, partitions_scanned, partitions_total,
+        spilled_local, spilled_remote, disk_io_pct, attributes}
+    """
+    operators = []
+    for row in stats.rename(columns=str.lower).to_dict('records'):
+        statistics = _variant(row.get('operator_statistics')) or {}
+        breakdown = _variant(row.get('execution_time_breakdown')) or {}
+        pruning = statistics.get('pruning', {})
+        spilling = statistics.get('spilling', {})
+        io = statistics.get('io', {})
+        time_pct = breakdown.get('overall_percentage', 0) or 0
+        operators.append({
+            'step_id': int(row['step_id']),
+            'operator_id': int(row['operator_id']),
+            'parents': [int(p) for p in (_variant(row.get('parent_operators')) or [])],
+            'type': row['operator_type'],
+            'input_rows': statistics.get('input_rows'),
+            'output_rows': statistics.get('output_rows'),
+            # overall_percentage is a fraction of the query's execution time in 0-100
+            'time_pct': float(time_pct),
+            'bytes_scanned': io.get('bytes_scanned', 0),
+            'partitions_scanned': pruning.get('partitions_scanned'),
+            'partitions_total': pruning.get('partitions_total'),
+            'spilled_local': spilling.get('bytes_spilled_local_storage', 0),
+            'spilled_remote': spilling.get('bytes_spilled_remote_storage', 0),
+            'disk_io_pct': float((breakdown.get('local_disk_io', 0) or 0) + (breakdown.get('remote_disk_io', 0) or 0)),
+            'attributes': _variant(row.get('operator_attributes')) or {},
+        })
+    return operators
+
+def analyze_profile(operators: List[Dict[str, Any]], execution_seconds: float) -> Dict[str, Any]:
+    """
+    Find fixable problems in an operator tree and estimate the time they cost.
+
+    Waste is the share of execution time spent in exploding joins, the disk
+    I/O share of spilling operators, and the over-read share of poorly pruned
+    scans (time x fraction of partitions beyond PRUNING_MAX_SCANNED). An
+    operator with several findings counts once, at its largest estimate.
+
+    Args:
+        operators: Output of parse_operators
+        execution_seconds: Query execution time
+
+    Returns:
+        Dictionary with findings (type, operator_id, detail, waste_seconds),
+        waste_seconds, top_operators and pruning_ratio over all scans
+    """
+    findings = []
+    for op in operators:
+        seconds = execution_seconds * op['time_pct'] / 100
+        kind = op['type'].lower()
+        if 'join' in kind and op['input_rows'] and op['output_rows'] is not None:
+            factor = op['output_rows'] / op['input_rows']
+            if factor >= EXPLOSION_FACTOR:
+                condition = op['attributes'].get('equality_join_condition') or op['attributes'].get('additional_join_condition')
+                findings.append({
+                    'type': 'exploding_join', 'operator_id': op['operator_id'], 'waste_seconds': seconds,
+                    'detail': f"{op['type']} #{op['operator_id']} outputs {factor:,.0f}x its input rows "
+                              f"({op['input_rows']:,} -> {op['output_rows']:,})"
+                              + (f" on {condition}" if condition else ""),
+                })
+        spilled = (op['spilled_local'] or 0) + (op['spilled_remote'] or 0)
+        if spilled:
+            findings.append({
+                'type': 'spill', 'operator_id': op['operator_id'],
+                'waste_seconds': execution_seconds * op['disk_io_pct'] / 100 if op['disk_io_pct'] else seconds,
+                'detail': f"{op['type']} #{op['operator_id']} spilled {op['spilled_local'] / 1024**3:.2f} GB local, "
+                          f"{op['spilled_remote'] / 1024**3:.2f} GB remote",
+            })
+        total = op['partitions_total'] or 0
+        if total >= PRUNING_MIN_PARTITIONS and op['partitions_scanned'] is not None:
+            scanned = op['partitions_scanned'] / total
+            if scanned > PRUNING_MAX_SCANNED:
+                table = op['attributes'].get('table_name', f"#{op['operator_id']}")
+                findings.append({
+                    'type': 'poor_pruning', 'operator_id': op['operator_id'],
+                    'waste_seconds': seconds * (scanned - PRUNING_MAX_SCANNED) / scanned,
+                    'detail': f"TableScan {table} read {op['partitions_scanned']:,}/{total:,} partitions",
+                })
+
+    waste = {}
+    for finding in findings:
+        waste[finding['operator_id']] = max(waste.get(finding['operator_id'], 0), finding['waste_seconds'])
+
+    scans = [op for op in operators if op['partitions_total']]
+    partitions_total = sum(op['partitions_total'] for op in scans)
+    partitions_scanned = sum(op['partitions_scanned'] or 0 for op in scans)
+    top = sorted(operators, key=lambda op: op['time_pct'], reverse=True)[:TOP_OPERATORS]
+    return {
+        'findings': sorted(findings, key=lambda f: f['waste_seconds'], reverse=True),
+        'waste_seconds': sum(waste.values()),
+        'top_operators': [{'operator_id': op['operator_id'], 'type': op['type'], 'time_pct': op['time_pct']}
+                          for op in top],
+        'pruning_ratio': partitions_scanned / partitions_total if partitions_total else None,
+    }
+
+class ProfileStore:
+    """Operator profiles saved as one JSON file per query id."""
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        """
+        Args:
+            profile_dir: Directory for profiles (default: <SNOWFLAKE_HISTORY_DIR>/profiles)
+        """
+        base = Path(os.getenv("SNOWFLAKE_HISTORY_DIR") or DEFAULT_HISTORY_DIR).expanduser()
+        self.profile_dir = Path(profile_dir).expanduser() if profile_dir else base / "profiles"
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, query_id: str) -> Path:
+        return self.profile_dir / f"{query_id}.json"
+
+    def get(self, query_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._path(query_id).read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, profile: Dict[str, Any]) -> None:
+        path = self._path(profile['query_id'])
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(profile, indent=1, default=str), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def by_fingerprint(self) -> Dict[str, List[Dict[str, Any]]]:
+        """All stored profiles grouped by query fingerprint, oldest run first."""
+        grouped = {}
+        for path in sorted(self.profile_dir.glob("*.json")):
+            try:
+                profile = json.loads(path.read_text(encoding='utf-8'))
+            except json.JSONDecodeError:
+                continue
+            grouped.setdefault(profile.get('fingerprint'), []).append(profile)
+        for profiles in grouped.values():
+            profiles.sort(key=lambda p: str(p['start_time']))
+        return grouped
+
+def build_profile(query: Dict[str, Any], stats: pd.DataFrame, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Combine a history row and its operator stats into a storable profile.
+
+    Args:
+        query: Row with query_id, start_time, execution_seconds (or execution_time in ms) and query_text
+        stats: GET_QUERY_OPERATOR_STATS result for the query
+        fingerprint: Optional query fingerprint used to compare runs
+
+    Returns:
+        Profile dictionary (operators plus analyze_profile output)
+    """
+    seconds = query.get('execution_seconds')
+    if seconds is None:
+        seconds = (query.get('execution_time') or 0) / 1000
+    operators = parse_operators(stats)
+    return {
+        'query_id': query['query_id'],
+        'fingerprint': fingerprint,
+        'start_time': str(query.get('start_time')),
+        'captured_at': datetime.utcnow().isoformat(),
+        'execution_seconds': float(seconds),
+        'query_text': str(query.get('query_text') or query.get('query_preview') or '')[:2000],
+        'operators': operators,
+        **analyze_profile(operators, float(seconds)),
+    }
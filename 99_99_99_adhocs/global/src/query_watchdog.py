@@ -0,0 +1,209 @@
+"""
+Runaway Query Watchdog
+Watches the current user's running queries under the current role, checks
+them against elapsed time, scan, credit and row-explosion budgets, and cancels
+offenders with SYSTEM$CANCEL_QUERY. Every decision is logged.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+import pandas as pd
+from src.history_store import DEFAULT_HISTORY_DIR
+from src.cost_model import credits_per_hour
+
+logger = logging.getLogger(__name__)
+
+# Default budgets; a value of None disables the check
+DEFAULT_BUDGETS = {
+    'max_elapsed_seconds': 3600,
+    'max_gb_scanned': 1024,
+    'max_credits': 10.0,
+    # Rows produced per MB scanned; far beyond what the scanned bytes can hold
+    # means a join is multiplying rows
+    'max_rows_per_mb': 1_000_000,
+}
+# Queries younger than this are never cancelled (their counters are not meaningful yet)
+MIN_ELAPSED_SECONDS = 60
+# The rows-per-MB budget applies only once this much has been scanned, so
+# GENERATOR and metadata-only queries (almost nothing scanned) are not flagged
+ROWS_PER_MB_MIN_MB = 100
+
+RUNNING_COLUMNS = ['query_id', 'query_text', 'user_name', 'role_name', 'warehouse_name', 'warehouse_size',
+                   'start_time', 'total_elapsed_time', 'execution_time', 'bytes_scanned', 'rows_produced']
+
+def running_queries_sql() -> str:
+    """
+    SQL for the current user's running queries under the current role
+    (INFORMATION_SCHEMA, no latency), excluding the watchdog's own session.
+    """
+    return f"""
+    SELECT {', '.join(RUNNING_COLUMNS)}
+    FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(USER_NAME => CURRENT_USER(), RESULT_LIMIT => 10000))
+    WHERE execution_status = 'RUNNING'
+        AND role_name = CURRENT_ROLE()
+        AND session_id::varchar <> CURRENT_SESSION()
+    """
+
+def cancel_sql(query_id: str) -> str:
+    """SQL that cancels a running query."""
+    return f"SELECT SYSTEM$CANCEL_QUERY('{query_id}')"
+
+def cancel_error(result: Dict[str, Any]) -> Optional[str]:
+    """
+    Error for a run_many result of cancel_sql, or None when the query was cancelled.
+
+    SYSTEM$CANCEL_QUERY answers with a message rather than an error when the
+    query had already finished or could not be cancelled; only a
+    "... terminated." message counts as success.
+    """
+    if result['error']:
+        return result['error']
+    data = result['data']
+    message = str(data.iloc[0, 0]) if data is not None and data.size else ''
+    return None if 'terminated' in message.lower() else message or 'no response from SYSTEM$CANCEL_QUERY'
+
+def evaluate(query: Dict[str, Any], budgets: Dict[str, Optional[float]]) -> List[str]:
+    """
+    Check one running query against the budgets.
+
+    Estimated credits charge the query the warehouse's full hourly rate for
+    its execution so far, an upper bound when other queries share the warehouse.
+
+    Args:
+        query: Row with RUNNING_COLUMNS (times in milliseconds)
+        budgets: Budget values keyed as DEFAULT_BUDGETS
+
+    Returns:
+        Descriptions of the budgets exceeded (empty when within budget)
+    """
+    elapsed = (query.get('total_elapsed_time') or 0) / 1000
+    if elapsed < MIN_ELAPSED_SECONDS:
+        return []
+    executing = (query.get('execution_time') or 0) / 1000
+    gb = (query.get('bytes_scanned') or 0) / 1024**3
+    credits = executing / 3600 * credits_per_hour(query.get('warehouse_size'))
+    rows = query.get('rows_produced') or 0
+    mb = (query.get('bytes_scanned') or 0) / 1024**2
+
+    violations = []
+    if budgets.get('max_elapsed_seconds') is not None and elapsed > budgets['max_elapsed_seconds']:
+        violations.append(f"elapsed {elapsed:,.0f}s > {budgets['max_elapsed_seconds']:,.0f}s")
+    if budgets.get('max_gb_scanned') is not None and gb > budgets['max_gb_scanned']:
+        violations.append(f"scanned {gb:,.1f} GB > {budgets['max_gb_scanned']:,.1f} GB")
+    if budgets.get('max_credits') is not None and credits > budgets['max_credits']:
+        violations.append(f"estimated {credits:.2f} credits > {budgets['max_credits']:.2f}")
+    if (budgets.get('max_rows_per_mb') is not None and mb >= ROWS_PER_MB_MIN_MB
+            and rows / mb > budgets['max_rows_per_mb']):
+        violations.append(f"{rows:,} rows from {mb:,.0f} MB scanned "
+                          f"({rows / mb:,.0f} rows/MB > {budgets['max_rows_per_mb']:,.0f})")
+    return violations
+
+class QueryWatchdog:
+    """Cancels the current user's queries that exceed their budgets."""
+
+    def __init__(self, source=None, budgets: Optional[Dict[str, Optional[float]]] = None,
+                 dry_run: bool = False, log_path: Optional[str] = None):
+        """
+        Initialize the watchdog.
+
+        Args:
+            source: Object with SnowflakeUtils' query_to_df and run_many that
+                supplies the running-query feed and runs cancellations
+                (default: SnowflakeUtils())
+            budgets: Overrides for DEFAULT_BUDGETS
+            dry_run: Log the decisions without cancelling anything
+            log_path: JSON-lines decision log (default: <SNOWFLAKE_HISTORY_DIR>/watchdog.jsonl)
+        """
+        if source is None:
+            from src.sf_utils import SnowflakeUtils
+            source = SnowflakeUtils()
+        self.source = source
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.dry_run = dry_run
+        base = Path(os.getenv("SNOWFLAKE_HISTORY_DIR") or DEFAULT_HISTORY_DIR).expanduser()
+        self.log_path = Path(log_path).expanduser() if log_path else base / "watchdog.jsonl"
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        # Running queries already acted on, so a slow cancellation is not issued twice
+        self.handled = set()
+
+    def _log(self, decision: Dict[str, Any]) -> None:
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(decision, default=str) + '\n')
+
+    def check(self) -> List[Dict[str, Any]]:
+        """
+        Evaluate the running queries once and cancel (or, in dry-run, report) offenders.
+
+        Returns:
+            Decisions made in this check: query_id, user_name, warehouse_name,
+            query_preview, violations, action ('cancelled', 'cancel_failed' or
+            'would_cancel') and error
+        """
+        feed = self.source.query_to_df(running_queries_sql(), use_cache=False)
+        feed = feed.rename(columns=str.lower)
+        # Queries no longer running cannot come back, so only live ids are remembered
+        self.handled &= set(feed.get('query_id', []))
+        offenders = {}
+        for query in feed.to_dict('records'):
+            if query['query_id'] in self.handled:
+                continue
+            violations = evaluate(query, self.budgets)
+            if violations:
+                offenders[query['query_id']] = (query, violations)
+
+        results = {}
+        if offenders and not self.dry_run:
+            results = self.source.run_many({query_id: cancel_sql(query_id) for query_id in offenders},
+                                           use_cache=False)
+
+        decisions = []
+        for query_id, (query, violations) in offenders.items():
+            error = cancel_error(results[query_id]) if query_id in results else None
+            action = 'would_cancel' if self.dry_run else 'cancel_failed' if error else 'cancelled'
+            decision = {
+                'checked_at': datetime.utcnow().isoformat(),
+                'query_id': query_id,
+                'user_name': query.get('user_name'),
+                'role_name': query.get('role_name'),
+                'warehouse_name': query.get('warehouse_name'),
+                'elapsed_seconds': (query.get('total_elapsed_time') or 0) / 1000,
+                'query_preview': ' '.join(str(query.get('query_text') or '').split())[:200],
+                'violations': violations,
+                'action': action,
+                'error': error,
+            }
+            self._log(decision)
+            log = logger.error if error else logger.warning
+            log(f"{action} {query_id} ({query.get('warehouse_name')}): {'; '.join(violations)}"
+                + (f" - {error}" if error else ""))
+            if action != 'cancel_failed':
+                self.handled.add(query_id)
+            decisions.append(decision)
+        return decisions
+
+    def run(self, interval: float = 30, checks: Optional[int] = None, on_decision=None) -> None:
+        """
+        Check every `interval` seconds until interrupted.
+
+        Args:
+            interval: Seconds between check starts
+            checks: Stop after this many checks (default: run until interrupted)
+            on_decision: Optional callback receiving each decision
+        """
+        count = 0
+        while checks is None or count < checks:
+            started = time.perf_counter()
+            try:
+                for decision in self.check():
+                    if on_decision:
+                        on_decision(decision)
+            except Exception as e:
+                logger.error(f"Watchdog check failed: {e}")
+            count += 1
+            if checks is None or count < checks:
+                time.sleep(max(0.0, interval - (time.perf_counter() - started)))
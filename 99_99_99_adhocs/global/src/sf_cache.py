@@ -0,0 +1,196 @@
+"""
+Local Query Result Cache
+Content-addressed on-disk cache for query results, stored as Parquet files
+with per-entry TTL, a total size budget (LRU eviction) and hit/miss statistics.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Any
+import pandas as pd
+from src.sql_parse import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "sf_query_cache"
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_MAX_MB = 2048
+
+def _float_env(name: str, default: float) -> float:
+    value = os.getenv(name)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+class QueryCache:
+    """Parquet-backed query result cache keyed by normalized SQL and connection context."""
+
+    def __init__(self, cache_dir: Optional[str] = None, default_ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (default: SNOWFLAKE_CACHE_DIR or ~/.cache/sf_query_cache)
+            default_ttl: Entry lifetime in seconds (default: SNOWFLAKE_CACHE_TTL or 6 hours)
+            max_bytes: Total size budget (default: SNOWFLAKE_CACHE_MAX_MB or 2 GB)
+        """
+        self.cache_dir = Path(cache_dir or os.getenv("SNOWFLAKE_CACHE_DIR") or DEFAULT_CACHE_DIR).expanduser()
+        self.default_ttl = default_ttl if default_ttl is not None else _float_env("SNOWFLAKE_CACHE_TTL", DEFAULT_TTL_SECONDS)
+        self.max_bytes = max_bytes if max_bytes is not None else int(_float_env("SNOWFLAKE_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024)
+        self.index_path = self.cache_dir / "index.json"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(query: str, context: Optional[Dict[str, Any]] = None) -> str:
+        """Build the content address for a query under a given role/warehouse/database context."""
+        payload = json.dumps({'sql': normalize_sql(query), 'context': context or {}},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'entries': {}, 'stats': {'hits': 0, 'misses': 0}}
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        tmp_path = self.index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(index, indent=1), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def _drop(self, index: Dict[str, Any], key: str) -> None:
+        index['entries'].pop(key, None)
+        self._entry_path(key).unlink(missing_ok=True)
+
+    def _record(self, index: Dict[str, Any], hit: bool) -> None:
+        if hit:
+            self.hits += 1
+            index['stats']['hits'] += 1
+        else:
+            self.misses += 1
+            index['stats']['misses'] += 1
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Return the cached DataFrame for key, or None if missing or expired."""
+        with self._lock:
+            index = self._load_index()
+            entry = index['entries'].get(key)
+            now = time.time()
+
+            if entry is None or entry['expires_at'] < now or not self._entry_path(key).exists():
+                if entry is not None:
+                    self._drop(index, key)
+                self._record(index, hit=False)
+                self._save_index(index)
+                return None
+
+            try:
+                df = pd.read_parquet(self._entry_path(key))
+            except Exception as e:
+                logger.warning(f"Discarding unreadable cache entry {key[:12]}: {e}")
+                self._drop(index, key)
+                self._record(index, hit=False)
+                self._save_index(index)
+                return None
+
+            entry['last_access'] = now
+            self._record(index, hit=True)
+            self._save_index(index)
+            return df
+
+    def put(self, key: str, df: pd.DataFrame, ttl: Optional[float] = None,
+            query: Optional[str] = None) -> bool:
+        """
+        Store a DataFrame under key and evict least-recently-used entries over budget.
+
+        The result is serialized to a file of its own and renamed into place
+        under the lock, so readers and concurrent writers of the same key
+        never see a partly written entry.
+
+        Returns:
+            True if the result was cached, False if it could not be serialized
+            or is larger than the size budget
+        """
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            df.to_parquet(tmp_path, index=False, compression='snappy')
+        except Exception as e:
+            logger.warning(f"Result not cached (Parquet serialization failed): {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+        now = time.time()
+        with self._lock:
+            os.replace(tmp_path, path)
+            index = self._load_index()
+            index['entries'][key] = {
+                'created_at': now,
+                'expires_at': now + (ttl if ttl is not None else self.default_ttl),
+                'last_access': now,
+                'bytes': path.stat().st_size,
+                'rows': len(df),
+                'query_preview': (query or '')[:120],
+            }
+            self._evict(index, now)
+            self._save_index(index)
+        return key in index['entries']
+
+    def _evict(self, index: Dict[str, Any], now: float) -> None:
+        """Remove expired entries, then least-recently-used ones until under max_bytes."""
+        entries = index['entries']
+        for key in [k for k, e in entries.items() if e['expires_at'] < now]:
+            self._drop(index, key)
+
+        total = sum(e['bytes'] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_access']):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]['bytes']
+            self._drop(index, key)
+
+    def invalidate(self, key: str) -> None:
+        """Remove a single entry."""
+        with self._lock:
+            index = self._load_index()
+            self._drop(index, key)
+            self._save_index(index)
+
+    def clear(self) -> None:
+        """Remove every cached result and reset statistics."""
+        with self._lock:
+            index = self._load_index()
+            for key in list(index['entries']):
+                self._drop(index, key)
+            index['stats'] = {'hits': 0, 'misses': 0}
+            self._save_index(index)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counts for this process and lifetime, plus cache size."""
+        with self._lock:
+            index = self._load_index()
+        lifetime = index['stats']
+        lookups = lifetime['hits'] + lifetime['misses']
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'lifetime_hits': lifetime['hits'],
+            'lifetime_misses': lifetime['misses'],
+            'lifetime_hit_rate': (lifetime['hits'] / lookups) * 100 if lookups else 0,
+            'entries': len(index['entries']),
+            'total_mb': sum(e['bytes'] for e in index['entries'].values()) / (1024 * 1024),
+            'max_mb': self.max_bytes / (1024 * 1024),
+        }
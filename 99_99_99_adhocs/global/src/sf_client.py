@@ -1,9 +1,15 @@
 import os
+import time
+import asyncio
+import atexit
+import threading
 import pandas as pd
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Iterator
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from snowflake.sqlalchemy import URL
+from snowflake.connector.errors import NotSupportedError, ProgrammingError
 
 # Load environment variables
 try:
@@ -16,77 +22,459 @@ except ImportError:
 def _env(name: str, default: Optional[str] = None) -> Optional[str]:
     return os.getenv(name, default)
 
+def _int_env(name: str, default: int) -> int:
+    value = _env(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+# Process-wide engine registry. Each distinct connection target gets one pooled
+# engine, so a script issuing many queries pays the SSO handshake once.
+_ENGINES: Dict[Tuple, Engine] = {}
+_ENGINE_LAST_USED: Dict[Tuple, float] = {}
+_ENGINE_LOCK = threading.Lock()
+# Dedicated connections for asynchronously submitted queries, kept open for
+# the life of the process so their results stay retrievable.
+_ASYNC_CONNECTIONS: Dict[Tuple, Any] = {}
+_ASYNC_QUERIES: Dict[str, Tuple] = {}
+_ASYNC_LOCK = threading.Lock()
+_ENGINE_STATS = {
+    'engines_created': 0,
+    'engines_evicted': 0,
+    'connections_opened': 0,
+    'connect_seconds': 0.0,
+}
+
+def connection_settings(database: Optional[str] = None, schema: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """
+    Resolve connection parameters from the environment.
+
+    Args:
+        database: Optional database override
+        schema: Optional schema override
+
+    Returns:
+        Dictionary of Snowflake connection parameters
+    """
+    return {
+        'account': _env("SNOWFLAKE_ACCOUNT", "CHIME"),
+        'user': _env("SNOWFLAKE_USER", "HAO.DING@CHIME.COM"),
+        'role': _env("SNOWFLAKE_ROLE", "SNOWFLAKE_PROD_ANALYTICS_PII_ROLE_OKTA"),
+        'warehouse': _env("SNOWFLAKE_WAREHOUSE", "RISK_WH"),
+        'database': database or _env("SNOWFLAKE_DATABASE", "RISK"),
+        'schema': schema or _env("SNOWFLAKE_SCHEMA", "TEST"),
+        'authenticator': _env("SNOWFLAKE_AUTHENTICATOR", "externalbrowser"),
+    }
+
+def _engine_key(settings: Dict[str, Optional[str]], session_params: Optional[Dict[str, Any]]) -> Tuple:
+    return (
+        settings['account'],
+        settings['user'],
+        settings['role'],
+        settings['warehouse'],
+        settings['database'],
+        settings['schema'],
+        settings['authenticator'],
+        tuple(sorted((session_params or {}).items())),
+    )
+
+def _track_connect_time(engine: Engine) -> None:
+    """Record how many DBAPI connections the pool opens and how long each takes."""
+
+    @event.listens_for(engine, "do_connect")
+    def _before_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info['connect_started'] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _after_connect(dbapi_connection, conn_rec):
+        started = conn_rec.info.pop('connect_started', None)
+        with _ENGINE_LOCK:
+            _ENGINE_STATS['connections_opened'] += 1
+            if started is not None:
+                _ENGINE_STATS['connect_seconds'] += time.perf_counter() - started
+
+def _sso_connect_args(settings: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """
+    Connector arguments that let externalbrowser logins reuse a cached ID token.
+
+    The connector keeps the token in the OS credential store (Keychain on macOS,
+    Credential Manager on Windows, a 0600 file under ~/.cache/snowflake on Linux),
+    checks its expiry on every login and falls back to the browser once it has
+    lapsed, so back-to-back script runs skip the SSO round trip. The account
+    must have ALLOW_ID_TOKEN = TRUE for Snowflake to issue the token.
+    Set SNOWFLAKE_CACHE_SSO_TOKEN=false to always authenticate in the browser.
+    """
+    if (settings['authenticator'] or '').lower() != 'externalbrowser':
+        return {}
+    if (_env("SNOWFLAKE_CACHE_SSO_TOKEN", "true") or '').lower() in ('0', 'false', 'no'):
+        return {}
+    return {'client_store_temporary_credential': True}
+
+def _build_engine(settings: Dict[str, Optional[str]], session_params: Optional[Dict[str, Any]]) -> Engine:
+    url = URL(
+        user=settings['user'],
+        authenticator=settings['authenticator'],
+        account=settings['account'],
+        warehouse=settings['warehouse'],
+        role=settings['role'],
+        database=settings['database'],
+        schema=settings['schema']
+    )
+
+    connect_args = _sso_connect_args(settings)
+    if session_params:
+        connect_args['session_parameters'] = dict(session_params)
+
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=_int_env("SNOWFLAKE_POOL_SIZE", 5),
+        max_overflow=_int_env("SNOWFLAKE_POOL_MAX_OVERFLOW", 5),
+        pool_recycle=_int_env("SNOWFLAKE_POOL_RECYCLE", 3600),
+        pool_pre_ping=True,
+    )
+    _track_connect_time(engine)
+    return engine
+
+def _evict_idle_engines(now: float) -> None:
+    """
+    Dispose engines that have not been used within SNOWFLAKE_POOL_IDLE_SECONDS.
+
+    An engine with connections checked out is still in use (callers may hold
+    the engine and connect without going through get_engine), so it is kept
+    and its idle time starts over.
+    """
+    idle_seconds = _int_env("SNOWFLAKE_POOL_IDLE_SECONDS", 1800)
+    for key, last_used in list(_ENGINE_LAST_USED.items()):
+        if now - last_used > idle_seconds:
+            if _ENGINES[key].pool.checkedout() > 0:
+                _ENGINE_LAST_USED[key] = now
+                continue
+            _ENGINES.pop(key).dispose()
+            del _ENGINE_LAST_USED[key]
+            _ENGINE_STATS['engines_evicted'] += 1
+
+def get_engine(database: Optional[str] = None, schema: Optional[str] = None,
+               session_params: Optional[Dict[str, Any]] = None) -> Engine:
+    """
+    Return the shared pooled engine for the current connection target.
+
+    Engines are keyed by account/user/role/warehouse/database/schema (plus any
+    session parameters) and reused for the lifetime of the process.
+
+    Args:
+        database: Optional database override
+        schema: Optional schema override
+        session_params: Optional Snowflake session parameters
+
+    Returns:
+        SQLAlchemy engine backed by a connection pool
+    """
+    settings = connection_settings(database, schema)
+    key = _engine_key(settings, session_params)
+    now = time.monotonic()
+
+    with _ENGINE_LOCK:
+        _evict_idle_engines(now)
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = _build_engine(settings, session_params)
+            _ENGINES[key] = engine
+            _ENGINE_STATS['engines_created'] += 1
+        _ENGINE_LAST_USED[key] = now
+
+    return engine
+
+def engine_stats() -> Dict[str, Any]:
+    """Return engine/connection counters for the current process."""
+    with _ENGINE_LOCK:
+        stats = dict(_ENGINE_STATS)
+        stats['engines_active'] = len(_ENGINES)
+    return stats
+
+@atexit.register
+def dispose_engines() -> None:
+    """Close every pooled connection and clear the engine registry."""
+    with _ASYNC_LOCK:
+        for raw in _ASYNC_CONNECTIONS.values():
+            raw.close()
+        _ASYNC_CONNECTIONS.clear()
+        _ASYNC_QUERIES.clear()
+    with _ENGINE_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+        _ENGINE_LAST_USED.clear()
+
 def get_connection(session_params: Optional[Dict[str, Any]] = None):
     """
     Create Snowflake connection using SQLAlchemy with external browser authentication.
     This matches the Chime standard connection pattern with SSO/OKTA authentication.
+
+    The connection is checked out of the shared engine pool; calling close()
+    returns it to the pool instead of ending the Snowflake session.
     """
-    
-    # Get connection parameters from environment
-    account = _env("SNOWFLAKE_ACCOUNT", "CHIME")
-    user = _env("SNOWFLAKE_USER", "HAO.DING@CHIME.COM")
-    role = _env("SNOWFLAKE_ROLE", "SNOWFLAKE_PROD_ANALYTICS_PII_ROLE_OKTA")
-    warehouse = _env("SNOWFLAKE_WAREHOUSE", "RISK_WH")
-    database = _env("SNOWFLAKE_DATABASE", "RISK")
-    schema = _env("SNOWFLAKE_SCHEMA", "TEST")
-    authenticator = _env("SNOWFLAKE_AUTHENTICATOR", "externalbrowser")
-    
-    # Create Snowflake SQLAlchemy URL
-    url = URL(
-        user=user,
-        authenticator=authenticator,
-        account=account,
-        warehouse=warehouse,
-        role=role,
-        database=database,
-        schema=schema
-    )
-    
-    # Create SQLAlchemy engine and connection
-    engine = create_engine(url)
-    connection = engine.connect()
-    
-    return connection
+    return get_engine(session_params=session_params).connect()
 
 def get_pandas_connection():
     """
     Get connection specifically optimized for pandas operations.
     Returns the SQLAlchemy engine for use with pd.read_sql().
     """
-    account = _env("SNOWFLAKE_ACCOUNT", "CHIME")
-    user = _env("SNOWFLAKE_USER", "HAO.DING@CHIME.COM")
-    role = _env("SNOWFLAKE_ROLE", "SNOWFLAKE_PROD_ANALYTICS_PII_ROLE_OKTA")
-    warehouse = _env("SNOWFLAKE_WAREHOUSE", "RISK_WH")
-    authenticator = _env("SNOWFLAKE_AUTHENTICATOR", "externalbrowser")
-    
-    url = URL(
-        user=user,
-        authenticator=authenticator,
-        account=account,
-        warehouse=warehouse,
-        role=role
-    )
-    
-    return create_engine(url)
+    return get_engine()
+
+def _normalize_column(name: str) -> str:
+    """Lowercase case-insensitive identifiers, matching what the SQLAlchemy dialect returns."""
+    return name.lower() if name == name.upper() else name
+
+def _cursor_to_dataframe(cursor) -> pd.DataFrame:
+    """
+    Fetch an executed connector cursor's result as a DataFrame via Arrow.
+
+    Arrow batches are converted straight to typed columns (NUMBER -> int64/float64,
+    TIMESTAMP -> datetime64) without building Python row tuples or Decimals.
+    Results that are not Arrow-encoded (SHOW/DESCRIBE, or pyarrow missing)
+    and DB-API cursors without fetch_pandas_all fall back to fetchall() on
+    the same cursor, so nothing runs twice.
+    """
+    columns = [_normalize_column(col[0]) for col in cursor.description or []]
+    if not hasattr(cursor, 'fetch_pandas_all'):
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    try:
+        df = cursor.fetch_pandas_all()
+    except (NotSupportedError, ProgrammingError):
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    if df.empty and len(df.columns) == 0:
+        return pd.DataFrame(columns=columns)
+    df.columns = [_normalize_column(str(col)) for col in df.columns]
+    return df
 
-def execute_query(query: str, database: str = None, schema: str = None) -> pd.DataFrame:
+def _read_arrow(query: str, engine: Engine) -> pd.DataFrame:
+    """Execute a query on a raw connector cursor and fetch the result as Arrow."""
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        try:
+            cursor.execute(query)
+            return _cursor_to_dataframe(cursor)
+        finally:
+            cursor.close()
+    finally:
+        raw.close()
+
+def iter_dataframes(query: str, engine: Optional[Engine] = None, batch_rows: int = 100_000,
+                    fetch_mode: Optional[str] = None, arrow: bool = False) -> Iterator[Any]:
+    """
+    Execute a query and yield the result in batches of at most batch_rows rows.
+
+    Only one batch (plus the server chunk being split) is held in memory at a
+    time, so result size does not affect peak memory. An empty result yields
+    one empty batch with the result's columns, so writers can still emit a
+    header or schema.
+
+    Args:
+        query: SQL query to execute
+        engine: Engine to run on (defaults to the shared engine)
+        batch_rows: Maximum rows per yielded batch
+        fetch_mode: 'arrow' or 'sqlalchemy'; defaults to SNOWFLAKE_FETCH_MODE
+        arrow: Yield pyarrow Tables instead of DataFrames (Arrow fetch mode only)
+
+    Yields:
+        pandas.DataFrame (or pyarrow.Table) batches
+    """
+    engine = engine or get_engine()
+    mode = (fetch_mode or _env("SNOWFLAKE_FETCH_MODE", "arrow")).lower()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        try:
+            cursor.execute(query)
+            columns = [_normalize_column(col[0]) for col in cursor.description or []]
+            chunks = None
+            fetch_batches = 'fetch_arrow_batches' if arrow else 'fetch_pandas_batches'
+            if mode == 'arrow' and hasattr(cursor, fetch_batches):
+                try:
+                    chunks = getattr(cursor, fetch_batches)()
+                except (NotSupportedError, ProgrammingError):
+                    chunks = None
+            yielded = False
+            if chunks is None:
+                while True:
+                    rows = cursor.fetchmany(batch_rows)
+                    if not rows:
+                        break
+                    yielded = True
+                    yield pd.DataFrame(rows, columns=columns)
+            else:
+                for chunk in chunks:
+                    for start in range(0, chunk.num_rows if arrow else len(chunk), batch_rows):
+                        yielded = True
+                        if arrow:
+                            yield chunk.slice(start, batch_rows).rename_columns(columns)
+                        else:
+                            batch = chunk.iloc[start:start + batch_rows]
+                            batch.columns = columns
+                            yield batch
+            if not yielded:
+                empty = pd.DataFrame(columns=columns)
+                if arrow and chunks is not None:
+                    import pyarrow as pa
+                    empty = pa.Table.from_pandas(empty, preserve_index=False)
+                yield empty
+        finally:
+            cursor.close()
+    finally:
+        raw.close()
+
+def read_dataframe(query: str, engine: Optional[Engine] = None,
+                   fetch_mode: Optional[str] = None) -> pd.DataFrame:
+    """
+    Execute a query and return the result as a pandas DataFrame.
+
+    Args:
+        query: SQL query to execute
+        engine: Engine to run on (defaults to the shared engine)
+        fetch_mode: 'arrow' for the columnar fetch path or 'sqlalchemy' for
+            pd.read_sql; defaults to SNOWFLAKE_FETCH_MODE (arrow)
+
+    Returns:
+        pandas.DataFrame with query results
+    """
+    engine = engine or get_engine()
+    mode = (fetch_mode or _env("SNOWFLAKE_FETCH_MODE", "arrow")).lower()
+    if mode == 'arrow':
+        return _read_arrow(query, engine)
+    return pd.read_sql(query, engine)
+
+def execute_query(query: str, database: str = None, schema: str = None,
+                  fetch_mode: Optional[str] = None) -> pd.DataFrame:
     """
     Execute a query and return results as a pandas DataFrame.
-    
+
     Args:
         query: SQL query to execute
         database: Optional database override
         schema: Optional schema override
-    
+        fetch_mode: Optional fetch path override ('arrow' or 'sqlalchemy')
+
     Returns:
         pandas.DataFrame with query results
     """
-    engine = get_pandas_connection()
-    
+    return read_dataframe(query, get_engine(database, schema), fetch_mode)
+
+def driver_connection(raw) -> Any:
+    """Underlying snowflake.connector connection of a pooled DBAPI connection."""
+    return getattr(raw, 'driver_connection', None) or raw.connection
+
+def _async_connection(database: Optional[str] = None, schema: Optional[str] = None):
+    key = _engine_key(connection_settings(database, schema), None)
+    with _ASYNC_LOCK:
+        raw = _ASYNC_CONNECTIONS.get(key)
+        if raw is None:
+            raw = get_engine(database, schema).raw_connection()
+            _ASYNC_CONNECTIONS[key] = raw
+    return key, raw
+
+def _connection_for(query_id: str):
+    with _ASYNC_LOCK:
+        key = _ASYNC_QUERIES.get(query_id)
+        raw = _ASYNC_CONNECTIONS.get(key) if key else None
+    if raw is None:
+        _, raw = _async_connection()
+    return raw
+
+def submit_query(query: str, database: Optional[str] = None, schema: Optional[str] = None) -> str:
+    """
+    Submit a query for server-side execution without waiting for it to finish.
+
+    Args:
+        query: SQL statement to execute
+        database: Optional database override
+        schema: Optional schema override
+
+    Returns:
+        Snowflake query id
+    """
+    key, raw = _async_connection(database, schema)
+    cursor = raw.cursor()
+    try:
+        cursor.execute_async(query)
+        query_id = cursor.sfqid
+    finally:
+        cursor.close()
+    with _ASYNC_LOCK:
+        _ASYNC_QUERIES[query_id] = key
+    return query_id
+
+def poll(query_id: str) -> str:
+    """
+    Return the current status name of a query (RUNNING, QUEUED, SUCCESS,
+    FAILED_WITH_ERROR, ...).
+    """
+    return driver_connection(_connection_for(query_id)).get_query_status(query_id).name
+
+def is_running(query_id: str) -> bool:
+    """True while a submitted query is queued, resuming a warehouse or executing."""
+    conn = driver_connection(_connection_for(query_id))
+    return conn.is_still_running(conn.get_query_status(query_id))
+
+def wait_all(query_ids, poll_interval: float = 2.0, timeout: Optional[float] = None) -> Dict[str, str]:
+    """
+    Block until every query has finished.
+
+    Args:
+        query_ids: Query ids returned by submit_query
+        poll_interval: Seconds between status checks
+        timeout: Optional maximum seconds to wait
+
+    Returns:
+        Mapping of query id to final status name
+    """
+    pending = list(query_ids)
+    final_status = {}
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    while pending:
+        for query_id in list(pending):
+            conn = driver_connection(_connection_for(query_id))
+            status = conn.get_query_status(query_id)
+            if not conn.is_still_running(status):
+                final_status[query_id] = status.name
+                pending.remove(query_id)
+        if not pending:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"{len(pending)} queries still running after {timeout}s: {pending}")
+        time.sleep(poll_interval)
+
+    return final_status
+
+def fetch_result(query_id: str) -> pd.DataFrame:
+    """
+    Fetch the result of a finished query as a DataFrame.
+
+    Raises the connector's ProgrammingError if the query failed.
+    """
+    raw = _connection_for(query_id)
+    conn = driver_connection(raw)
+    conn.get_query_status_throw_if_error(query_id)
+    cursor = raw.cursor()
     try:
-        # Use pandas read_sql directly with the engine
-        return pd.read_sql(query, engine)
-    except Exception as e:
-        # If that fails, try with a connection
-        with engine.connect() as conn:
-            return pd.read_sql(query, conn)
+        cursor.get_results_from_sfqid(query_id)
+        return _cursor_to_dataframe(cursor)
+    finally:
+        cursor.close()
+        with _ASYNC_LOCK:
+            _ASYNC_QUERIES.pop(query_id, None)
+
+async def fetch(query_id: str, poll_interval: float = 1.0) -> pd.DataFrame:
+    """
+    Await a submitted query and return its result as a DataFrame.
+
+    Status checks and the result download run in worker threads, so many
+    queries can be awaited concurrently with asyncio.gather().
+    """
+    while await asyncio.to_thread(is_running, query_id):
+        await asyncio.sleep(poll_interval)
+    return await asyncio.to_thread(fetch_result, query_id)
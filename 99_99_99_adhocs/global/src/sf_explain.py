@@ -0,0 +1,135 @@
+"""
+Snowflake EXPLAIN Plans
+Run EXPLAIN USING JSON, cache plans on disk by statement hash and summarize
+the partitions and bytes each table scan is expected to read.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+from sqlalchemy import text
+from src.sf_client import get_connection, connection_settings
+from src.sf_cache import QueryCache, DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS, _float_env
+
+logger = logging.getLogger(__name__)
+
+class ExplainCache:
+    """
+    JSON file cache of EXPLAIN plans keyed by normalized SQL and connection context.
+
+    Safe to share between threads: hit/miss counters are updated under a lock
+    and each writer stages its plan in its own temporary file.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (default: <SNOWFLAKE_CACHE_DIR>/explain)
+            ttl: Plan lifetime in seconds (default: SNOWFLAKE_CACHE_TTL or 6 hours);
+                plans go stale as tables gain partitions
+        """
+        base = Path(os.getenv("SNOWFLAKE_CACHE_DIR") or DEFAULT_CACHE_DIR).expanduser()
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else base / "explain"
+        self.ttl = ttl if ttl is not None else _float_env("SNOWFLAKE_CACHE_TTL", DEFAULT_TTL_SECONDS)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(query: str) -> str:
+        """Plan cache key: the plan depends on the SQL and on name resolution context."""
+        settings = connection_settings()
+        context = {k: settings[k] for k in ('account', 'role', 'database', 'schema')}
+        return QueryCache.make_key(query, context)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.cache_dir / f"{key}.json"
+        try:
+            if time.time() - path.stat().st_mtime <= self.ttl:
+                plan = json.loads(path.read_text(encoding='utf-8'))
+                with self._lock:
+                    self.hits += 1
+                return plan
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, plan: Dict[str, Any]) -> None:
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp_path.write_text(json.dumps(plan), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+def explain_plan(query: str, conn=None, cache: Optional[ExplainCache] = None) -> Dict[str, Any]:
+    """
+    Return the parsed EXPLAIN USING JSON plan for a statement.
+
+    Args:
+        query: A single SQL statement
+        conn: Optional open connection (a new one is opened and closed otherwise)
+        cache: Optional ExplainCache consulted before running EXPLAIN
+
+    Returns:
+        Plan dictionary with 'GlobalStats' and 'Operations'
+    """
+    key = ExplainCache.make_key(query) if cache is not None else None
+    if cache is not None:
+        plan = cache.get(key)
+        if plan is not None:
+            return plan
+
+    own_conn = conn is None
+    conn = conn or get_connection()
+    try:
+        content = conn.execute(text(f"EXPLAIN USING JSON {query}")).scalar()
+    finally:
+        if own_conn:
+            conn.close()
+
+    plan = json.loads(content) if isinstance(content, str) else content
+    if cache is not None:
+        cache.put(key, plan)
+    return plan
+
+def summarize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarize an EXPLAIN plan into totals and per-table scan figures.
+
+    Returns:
+        Dictionary with partitions_total, partitions_assigned, bytes_assigned,
+        pruning_pct and a 'scans' list (one entry per TableScan operation)
+    """
+    stats = plan.get('GlobalStats', {})
+    scans: List[Dict[str, Any]] = []
+    for step in plan.get('Operations', []):
+        for op in step:
+            if op.get('operation') != 'TableScan':
+                continue
+            total = op.get('partitionsTotal', 0) or 0
+            assigned = op.get('partitionsAssigned', 0) or 0
+            scans.append({
+                'table': ', '.join(op.get('objects', [])) or 'unknown',
+                'partitions_total': total,
+                'partitions_assigned': assigned,
+                'bytes_assigned': op.get('bytesAssigned', 0) or 0,
+                'pruning_pct': (1 - assigned / total) * 100 if total else 0,
+            })
+
+    total = stats.get('partitionsTotal', 0) or 0
+    assigned = stats.get('partitionsAssigned', 0) or 0
+    return {
+        'partitions_total': total,
+        'partitions_assigned': assigned,
+        'bytes_assigned': stats.get('bytesAssigned', 0) or 0,
+        'pruning_pct': (1 - assigned / total) * 100 if total else 0,
+        'scans': scans,
+    }
@@ -3,9 +3,17 @@ Snowflake Utility Functions for Data Analysis and Profiling
 Enhanced utilities for common Snowflake operations and data exploration.
 """
 
+import os
+import time
+import uuid
 import pandas as pd
-from typing import Dict, List, Optional, Tuple, Any
-from src.sf_client import get_connection
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterable, Iterator
+from src.sf_client import (get_engine, read_dataframe, iter_dataframes, connection_settings,
+                           driver_connection)
+from src.sf_cache import QueryCache
+from snowflake.connector.errors import ProgrammingError
 import logging
 
 # Configure logging
@@ -15,33 +23,129 @@ logger = logging.getLogger(__name__)
 class SnowflakeUtils:
     """Utility class for common Snowflake operations and data profiling."""
     
-    def __init__(self, session_params: Optional[Dict[str, Any]] = None):
-        """Initialize with optional session parameters."""
+    def __init__(self, session_params: Optional[Dict[str, Any]] = None,
+                 fetch_mode: Optional[str] = None, use_cache: bool = False,
+                 refresh_cache: bool = False, cache: Optional[QueryCache] = None):
+        """
+        Initialize with optional session parameters.
+
+        Args:
+            session_params: Optional Snowflake session parameters
+            fetch_mode: 'arrow' (typed columnar fetch) or 'sqlalchemy' (pd.read_sql);
+                defaults to SNOWFLAKE_FETCH_MODE
+            use_cache: Serve query_to_df results from the local result cache
+            refresh_cache: Skip cache lookups but still store fresh results
+            cache: Optional QueryCache instance (created on demand otherwise)
+        """
         self.session_params = session_params or {}
+        self.fetch_mode = fetch_mode
+        self.use_cache = use_cache or refresh_cache
+        self.refresh_cache = refresh_cache
+        self._cache = cache
+        if self.use_cache and self._cache is None:
+            self._cache = QueryCache()
+
+    @property
+    def cache(self) -> QueryCache:
+        """Local query result cache (created on first use)."""
+        if self._cache is None:
+            self._cache = QueryCache()
+        return self._cache
+
+    def cache_key(self, query: str) -> str:
+        """Cache key for a query under the current role/warehouse/database/schema."""
+        settings = connection_settings()
+        context = {
+            'role': settings['role'],
+            'warehouse': settings['warehouse'],
+            'database': settings['database'],
+            'schema': settings['schema'],
+            'session_params': self.session_params,
+        }
+        return QueryCache.make_key(query, context)
         
-    def query_to_df(self, query: str, limit: Optional[int] = None) -> pd.DataFrame:
+    def query_to_df(self, query: str, limit: Optional[int] = None,
+                    use_cache: Optional[bool] = None, cache_ttl: Optional[float] = None) -> pd.DataFrame:
         """
         Execute query and return results as pandas DataFrame.
         
         Args:
             query: SQL query to execute
             limit: Optional row limit for large result sets
+            use_cache: Override the instance cache setting for this call
+            cache_ttl: Optional cache lifetime in seconds for this result
             
         Returns:
             pandas.DataFrame with query results
         """
         if limit:
             query = f"SELECT * FROM ({query}) LIMIT {limit}"
+
+        cached = self.use_cache if use_cache is None else use_cache
+        key = self.cache_key(query) if cached else None
+        if cached and not self.refresh_cache:
+            df = self.cache.get(key)
+            if df is not None:
+                logger.info(f"Cache hit ({len(df)} rows): {query[:100]}...")
+                return df
             
-        conn = get_connection(self.session_params)
-        try:
-            logger.info(f"Executing query (limit={limit}): {query[:100]}...")
-            df = pd.read_sql(query, conn)
-            logger.info(f"Retrieved {len(df)} rows, {len(df.columns)} columns")
-            return df
-        finally:
-            conn.close()
+        engine = get_engine(session_params=self.session_params)
+        logger.info(f"Executing query (limit={limit}): {query[:100]}...")
+        df = read_dataframe(query, engine, self.fetch_mode)
+        logger.info(f"Retrieved {len(df)} rows, {len(df.columns)} columns")
+
+        if cached:
+            self.cache.put(key, df, ttl=cache_ttl, query=query)
+        return df
     
+    def run_many(self, queries: Dict[str, str], max_workers: Optional[int] = None,
+                 use_cache: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Execute independent queries concurrently on pooled connections.
+
+        A failing query does not affect the others; its error is reported in
+        its own result entry.
+
+        Args:
+            queries: Mapping of result name to SQL query
+            max_workers: Concurrency limit (default: SNOWFLAKE_MAX_CONCURRENCY or 4)
+            use_cache: Override the instance cache setting for these queries
+
+        Returns:
+            Mapping of name to {'data': DataFrame or None, 'error': str or None,
+            'elapsed_seconds': float}, in the order the queries were given
+        """
+        limit = max_workers or int(os.getenv("SNOWFLAKE_MAX_CONCURRENCY", "4"))
+
+        def _run(name: str, query: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                data, error = self.query_to_df(query, use_cache=use_cache), None
+            except Exception as e:
+                logger.error(f"Query '{name}' failed: {e}")
+                data, error = None, str(e)
+            return {'data': data, 'error': error, 'elapsed_seconds': time.perf_counter() - started}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(limit, len(queries) or 1))) as pool:
+            futures = {name: pool.submit(_run, name, query) for name, query in queries.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    def iter_query(self, query: str, batch_rows: int = 100_000, arrow: bool = False) -> Iterator[Any]:
+        """
+        Execute query and yield results in bounded-size batches.
+
+        Args:
+            query: SQL query to execute
+            batch_rows: Maximum rows per batch
+            arrow: Yield pyarrow Tables instead of DataFrames
+
+        Yields:
+            pandas.DataFrame (or pyarrow.Table) batches
+        """
+        engine = get_engine(session_params=self.session_params)
+        logger.info(f"Streaming query (batch_rows={batch_rows}): {query[:100]}...")
+        yield from iter_dataframes(query, engine, batch_rows, self.fetch_mode, arrow)
+
     def profile_table(self, table_name: str, sample_size: int = 1000) -> Dict[str, Any]:
         """
         Generate comprehensive data profile for a table.
@@ -87,50 +191,53 @@ class SnowflakeUtils:
         SELECT * FROM sample_data
         """
         
-        conn = get_connection(self.session_params)
-        try:
-            # Execute profiling queries
-            metadata_df = pd.read_sql(meta_query, conn)
-            stats_df = pd.read_sql(stats_query, conn)
-            sample_df = pd.read_sql(sample_query, conn)
-            
-            # Generate column-level profiles
-            column_profiles = {}
-            for col in sample_df.columns:
-                col_data = sample_df[col]
-                profile = {
-                    'data_type': str(col_data.dtype),
-                    'null_count': col_data.isnull().sum(),
-                    'null_percentage': (col_data.isnull().sum() / len(col_data)) * 100,
-                    'unique_count': col_data.nunique(),
-                    'sample_values': col_data.dropna().unique()[:5].tolist()
-                }
-                
-                # Add numeric statistics if applicable
-                if pd.api.types.is_numeric_dtype(col_data):
-                    profile.update({
-                        'min': col_data.min(),
-                        'max': col_data.max(),
-                        'mean': col_data.mean(),
-                        'median': col_data.median(),
-                        'std': col_data.std()
-                    })
-                
-                column_profiles[col] = profile
-            
-            return {
-                'table_name': table_name,
-                'total_rows': stats_df['TOTAL_ROWS'].iloc[0],
-                'unique_rows': stats_df['UNIQUE_ROWS'].iloc[0],
-                'duplicate_rows': stats_df['DUPLICATE_ROWS'].iloc[0],
-                'column_count': len(metadata_df),
-                'sample_size': len(sample_df),
-                'metadata': metadata_df.to_dict('records'),
-                'column_profiles': column_profiles
+        # Execute profiling queries concurrently
+        results = self.run_many({
+            'metadata': meta_query,
+            'stats': stats_query,
+            'sample': sample_query,
+        })
+        for name, result in results.items():
+            if result['error']:
+                raise RuntimeError(f"Profiling query '{name}' failed: {result['error']}")
+        metadata_df = results['metadata']['data']
+        stats_df = results['stats']['data']
+        sample_df = results['sample']['data']
+        
+        # Generate column-level profiles
+        column_profiles = {}
+        for col in sample_df.columns:
+            col_data = sample_df[col]
+            profile = {
+                'data_type': str(col_data.dtype),
+                'null_count': col_data.isnull().sum(),
+                'null_percentage': (col_data.isnull().sum() / len(col_data)) * 100,
+                'unique_count': col_data.nunique(),
+                'sample_values': col_data.dropna().unique()[:5].tolist()
             }
             
-        finally:
-            conn.close()
+            # Add numeric statistics if applicable
+            if pd.api.types.is_numeric_dtype(col_data):
+                profile.update({
+                    'min': col_data.min(),
+                    'max': col_data.max(),
+                    'mean': col_data.mean(),
+                    'median': col_data.median(),
+                    'std': col_data.std()
+                })
+            
+            column_profiles[col] = profile
+        
+        return {
+            'table_name': table_name,
+            'total_rows': stats_df['total_rows'].iloc[0],
+            'unique_rows': stats_df['unique_rows'].iloc[0],
+            'duplicate_rows': stats_df['duplicate_rows'].iloc[0],
+            'column_count': len(metadata_df),
+            'sample_size': len(sample_df),
+            'metadata': metadata_df.to_dict('records'),
+            'column_profiles': column_profiles
+        }
     
     def check_data_quality(self, table_name: str) -> Dict[str, Any]:
         """
@@ -171,6 +278,129 @@ class SnowflakeUtils:
         
         return self.query_to_df(quality_query).to_dict('records')[0]
     
+    def upload_df(self, df: pd.DataFrame, table_name: str, mode: str = 'append',
+                  key: Optional[List[str]] = None) -> int:
+        """
+        Bulk-load a DataFrame into a Snowflake table.
+
+        The frame is written to compressed Parquet, staged with PUT and loaded
+        with a single COPY INTO (connector write_pandas), instead of one
+        INSERT per row. Column names are uppercased to match unquoted
+        Snowflake identifiers; the table is created if it does not exist.
+
+        'replace' loads a copy of the table (same columns and grants) and
+        swaps it in with ALTER TABLE ... SWAP WITH, so readers see the old
+        rows until the new ones are complete and a failed load leaves the
+        table as it was.
+
+        Args:
+            df: Data to upload
+            table_name: Target table (DB.SCHEMA.TABLE, SCHEMA.TABLE or TABLE)
+            mode: 'append' adds rows, 'replace' swaps in a table holding only df,
+                'merge' upserts on the key columns via a temporary staging table
+            key: Key columns for mode='merge'; each key must appear once in df
+
+        Returns:
+            Number of rows loaded
+
+        Raises:
+            ValueError: For an unknown mode, or mode='merge' without key columns
+                or with duplicate keys (MERGE would fail or pick a row arbitrarily)
+        """
+        from snowflake.connector.pandas_tools import write_pandas
+
+        if mode not in ('append', 'replace', 'merge'):
+            raise ValueError(f"Unsupported upload mode: {mode}")
+        if mode == 'merge' and not key:
+            raise ValueError("mode='merge' requires key columns")
+
+        parts = table_name.split('.')
+        table = parts[-1]
+        schema = parts[-2] if len(parts) >= 2 else None
+        database = parts[-3] if len(parts) >= 3 else None
+
+        upload = df.copy()
+        upload.columns = [str(col).upper() for col in upload.columns]
+        key_cols = [col.upper() for col in key or []]
+        if mode == 'merge':
+            missing = [col for col in key_cols if col not in upload.columns]
+            if missing:
+                raise ValueError(f"Merge key columns not in DataFrame: {missing}")
+            duplicated = upload.duplicated(key_cols, keep=False)
+            if duplicated.any():
+                raise ValueError(f"{int(duplicated.sum())} rows share a merge key; deduplicate df first, "
+                                 f"e.g. df.drop_duplicates({key}, keep='last')")
+
+        raw = get_engine(session_params=self.session_params).raw_connection()
+        try:
+            conn = driver_connection(raw)
+            cursor = conn.cursor()
+            try:
+                swap = False
+                if mode == 'replace':
+                    staging = f"{table}_LOAD_{uuid.uuid4().hex[:8]}".upper()
+                    staging_name = '.'.join(parts[:-1] + [staging])
+                    try:
+                        cursor.execute(f"CREATE TABLE {staging_name} LIKE {table_name} COPY GRANTS")
+                        swap = True
+                    except ProgrammingError as e:
+                        # No table to replace yet (2003: object does not exist): the load creates it
+                        if e.errno != 2003:
+                            raise
+
+                if swap:
+                    try:
+                        success, _, rows, _ = write_pandas(
+                            conn, upload, staging, database=database, schema=schema,
+                            auto_create_table=False, quote_identifiers=False
+                        )
+                        if success:
+                            cursor.execute(f"ALTER TABLE {table_name} SWAP WITH {staging_name}")
+                    finally:
+                        # Holds the old rows after the swap, or the partial load if it failed
+                        cursor.execute(f"DROP TABLE IF EXISTS {staging_name}")
+                elif mode in ('append', 'replace'):
+                    success, _, rows, _ = write_pandas(
+                        conn, upload, table, database=database, schema=schema,
+                        auto_create_table=True, quote_identifiers=False
+                    )
+                else:
+                    staging = f"{table}_STAGE_{uuid.uuid4().hex[:8]}".upper()
+                    success, _, rows, _ = write_pandas(
+                        conn, upload, staging, database=database, schema=schema,
+                        auto_create_table=True, quote_identifiers=False, table_type='temporary'
+                    )
+                    staging_name = '.'.join(parts[:-1] + [staging])
+                    value_cols = [col for col in upload.columns if col not in key_cols]
+                    on_clause = ' AND '.join(f"t.{col} = s.{col}" for col in key_cols)
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} LIKE {staging_name}")
+                    merge_sql = f"""
+                    MERGE INTO {table_name} t
+                    USING {staging_name} s
+                        ON {on_clause}
+                    """
+                    if value_cols:
+                        merge_sql += f"""
+                    WHEN MATCHED THEN UPDATE SET {', '.join(f"t.{col} = s.{col}" for col in value_cols)}
+                    """
+                    merge_sql += f"""
+                    WHEN NOT MATCHED THEN INSERT ({', '.join(upload.columns)})
+                        VALUES ({', '.join(f"s.{col}" for col in upload.columns)})
+                    """
+                    cursor.execute(merge_sql)
+                    cursor.execute(f"DROP TABLE IF EXISTS {staging_name}")
+
+                conn.commit()
+            finally:
+                cursor.close()
+        finally:
+            raw.close()
+
+        if not success:
+            raise RuntimeError(f"COPY INTO {table_name} did not load all rows")
+        logger.info(f"Uploaded {rows} rows to {table_name} (mode={mode})")
+        return rows
+    
     def find_duplicates(self, table_name: str, key_columns: List[str], limit: int = 100) -> pd.DataFrame:
         """
         Find duplicate records based on specified key columns.
@@ -296,24 +526,148 @@ class SnowflakeUtils:
         # to get the actual column names
         return "*"  # Placeholder - would need actual implementation
     
-    def export_to_csv(self, query: str, filename: str, limit: Optional[int] = None) -> str:
+    def export_to_csv(self, query: str, filename: str, limit: Optional[int] = None,
+                      batch_rows: int = 100_000) -> str:
         """
-        Execute query and export results to CSV file.
+        Execute query and stream results to a CSV file.
         
         Args:
             query: SQL query to execute
             filename: Output CSV filename
             limit: Optional row limit
+            batch_rows: Rows fetched and written per batch
             
         Returns:
             Path to created CSV file
         """
-        df = self.query_to_df(query, limit)
+        if limit:
+            query = f"SELECT * FROM ({query}) LIMIT {limit}"
+        output_path = f"exports/{filename}"
+        rows = write_csv(self.iter_query(query, batch_rows), output_path)
+        logger.info(f"Exported {rows} rows to {output_path}")
+        return output_path
+
+    def export_to_parquet(self, query: str, filename: str, batch_rows: int = 100_000) -> str:
+        """
+        Execute query and stream results to a Parquet file.
+
+        Args:
+            query: SQL query to execute
+            filename: Output Parquet filename
+            batch_rows: Rows fetched and written per batch
+
+        Returns:
+            Path to created Parquet file
+        """
         output_path = f"exports/{filename}"
-        df.to_csv(output_path, index=False)
-        logger.info(f"Exported {len(df)} rows to {output_path}")
+        rows = write_parquet(self.iter_query(query, batch_rows, arrow=True), output_path)
+        logger.info(f"Exported {rows} rows to {output_path}")
         return output_path
 
+    def export_to_excel(self, query: str, filename: str, sheet_name: str = 'data',
+                        batch_rows: int = 100_000) -> str:
+        """
+        Execute query and stream results to an xlsx workbook.
+
+        Args:
+            query: SQL query to execute
+            filename: Output xlsx filename
+            sheet_name: Base sheet name (continued on new sheets past Excel's row limit)
+            batch_rows: Rows fetched and written per batch
+
+        Returns:
+            Path to created xlsx file
+        """
+        output_path = f"exports/{filename}"
+        rows = write_xlsx(self.iter_query(query, batch_rows), output_path, sheet_name)
+        logger.info(f"Exported {rows} rows to {output_path}")
+        return output_path
+
+# Streaming sinks: each consumes an iterable of batches and keeps only the
+# current batch in memory.
+EXCEL_MAX_ROWS = 1_048_576
+
+def write_csv(batches: Iterable[pd.DataFrame], path: str) -> int:
+    """
+    Write DataFrame batches to a single CSV file and return the row count.
+
+    The header comes from the first batch; iter_query yields an empty batch
+    with the result's columns for an empty result, so the file still gets one.
+    """
+    output_path = Path(path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        for i, batch in enumerate(batches):
+            batch.to_csv(f, index=False, header=(i == 0))
+            rows += len(batch)
+    return rows
+
+def write_parquet(batches: Iterable[Any], path: str) -> int:
+    """Write DataFrame or pyarrow Table batches to a Parquet file and return the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    output_path = Path(path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if isinstance(batch, pd.DataFrame):
+                table = pa.Table.from_pandas(batch, preserve_index=False,
+                                             schema=writer.schema if writer else None)
+            else:
+                table = batch.cast(writer.schema) if writer else batch
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema, compression='snappy')
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def _excel_value(value: Any) -> Any:
+    """Convert a cell value to something openpyxl can store (no NaN/NaT, naive datetimes)."""
+    if pd.isna(value) is True:
+        return None
+    if getattr(value, 'tzinfo', None) is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+def write_xlsx(batches: Iterable[pd.DataFrame], path: str, sheet_name: str = 'data') -> int:
+    """
+    Write DataFrame batches to an xlsx workbook and return the row count.
+
+    Uses openpyxl's write-only mode so rows are flushed to disk as they are
+    appended; output rolls over to a new sheet when Excel's row limit is hit.
+    """
+    from openpyxl import Workbook
+
+    output_path = Path(path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    workbook = Workbook(write_only=True)
+    sheet, sheet_rows, sheet_count, rows = None, 0, 0, 0
+    header = None
+    for batch in batches:
+        header = list(batch.columns)
+        for values in batch.itertuples(index=False, name=None):
+            if sheet is None or sheet_rows >= EXCEL_MAX_ROWS:
+                sheet_count += 1
+                sheet = workbook.create_sheet(sheet_name if sheet_count == 1 else f"{sheet_name}_{sheet_count}")
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append([_excel_value(v) for v in values])
+            sheet_rows += 1
+            rows += 1
+    if sheet is None:
+        sheet = workbook.create_sheet(sheet_name)
+        if header:
+            sheet.append(header)
+    workbook.save(output_path)
+    return rows
+
 # Convenience functions for common operations
 def quick_profile(table_name: str, sample_size: int = 1000) -> Dict[str, Any]:
     """Quick table profiling function."""
@@ -0,0 +1,182 @@
+"""
+AST-Based SQL Analysis
+Parse Snowflake SQL with sqlglot and derive the structural features used for
+cost estimation: physical tables, join graph, CTE reuse, window functions and
+DISTINCT / ORDER BY placement.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Any
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from src.sql_parse import split_sql, normalize_sql, is_session_statement
+
+DIALECT = 'snowflake'
+
+def parse_statement(stmt: str) -> exp.Expression:
+    """Parse a single statement with the Snowflake dialect (raises sqlglot errors)."""
+    return sqlglot.parse_one(stmt, read=DIALECT)
+
+def table_name(table: exp.Table) -> str:
+    """Dotted, lowercased name of a table reference as written (db.schema.table)."""
+    return '.'.join(part for part in (table.catalog, table.db, table.name) if part).lower()
+
+def _from(select: exp.Select) -> Optional[exp.From]:
+    # The FROM clause is stored under 'from_' in newer sqlglot releases
+    return select.args.get('from_') or select.args.get('from')
+
+def _source_name(node: exp.Expression) -> str:
+    if isinstance(node, exp.Table):
+        return table_name(node)
+    return node.alias_or_name or f"({node.key})"
+
+def _is_physical(table: exp.Table, ctes: set) -> bool:
+    """True for real tables; excludes CTE references and table functions."""
+    if not isinstance(table.this, exp.Identifier):
+        return False
+    return bool(table.db) or table.name.lower() not in ctes
+
+def _write_target(tree: exp.Expression) -> Optional[exp.Table]:
+    if isinstance(tree, (exp.Create, exp.Insert, exp.Merge, exp.Update, exp.Delete)):
+        target = tree.this
+        if isinstance(target, exp.Schema):
+            target = target.this
+        if isinstance(target, exp.Table):
+            return target
+    return None
+
+def analyze_tree(tree: exp.Expression) -> Dict[str, Any]:
+    """
+    Derive structural features from one parsed statement.
+
+    Returns:
+        Dictionary with tables (physical reads), writes, ctes (name -> reference
+        count), joins, window_functions, subqueries, select_star_tables,
+        cross_joins, distinct_with_order_by, inner_order_by and unfiltered_tables
+    """
+    ctes = {cte.alias.lower() for cte in tree.find_all(exp.CTE)}
+    target = _write_target(tree)
+
+    tables, cte_refs = set(), {name: 0 for name in ctes}
+    for table in tree.find_all(exp.Table):
+        if table is target:
+            continue
+        if _is_physical(table, ctes):
+            tables.add(table_name(table))
+        elif table.name.lower() in cte_refs:
+            cte_refs[table.name.lower()] += 1
+
+    features = {
+        'tables': tables,
+        'writes': {table_name(target)} if target is not None else set(),
+        'ctes': cte_refs,
+        'joins': [],
+        'window_functions': len(list(tree.find_all(exp.Window))),
+        'subqueries': len(list(tree.find_all(exp.Subquery))),
+        'select_star_tables': set(),
+        'cross_joins': 0,
+        'distinct_with_order_by': 0,
+        'inner_order_by': 0,
+        'unfiltered_tables': set(),
+    }
+
+    for select in tree.find_all(exp.Select):
+        from_clause = _from(select)
+        sources = [from_clause.this] if from_clause else []
+        left = _source_name(sources[0]) if sources else None
+        for join in select.args.get('joins') or []:
+            sources.append(join.this)
+            if isinstance(join.this, (exp.Lateral, exp.Unnest)) or (
+                    isinstance(join.this, exp.Table) and not isinstance(join.this.this, exp.Identifier)):
+                continue  # FLATTEN / table functions are row expansions, not joins
+            conditioned = join.args.get('on') is not None or bool(join.args.get('using'))
+            kind = ' '.join(part for part in (join.args.get('side'), join.args.get('kind')) if part) or 'INNER'
+            if not conditioned:
+                kind = 'CROSS'
+                features['cross_joins'] += 1
+            features['joins'].append({'left': left, 'right': _source_name(join.this),
+                                      'kind': kind, 'condition': conditioned})
+
+        physical = {table_name(s) for s in sources if isinstance(s, exp.Table) and _is_physical(s, ctes)}
+        if physical and select.args.get('where') is None:
+            features['unfiltered_tables'] |= physical
+        if physical and any(isinstance(e, exp.Star) for e in select.expressions):
+            features['select_star_tables'] |= physical
+
+        has_order = select.args.get('order') is not None
+        if select.args.get('distinct') and has_order:
+            features['distinct_with_order_by'] += 1
+        # ORDER BY only matters on the outermost query or together with LIMIT
+        outermost = isinstance(select.parent, (exp.Create, exp.Insert)) or select.parent is None
+        if has_order and not outermost and select.args.get('limit') is None:
+            features['inner_order_by'] += 1
+
+    return features
+
+@lru_cache(maxsize=4096)
+def parse_cached(normalized: str) -> exp.Expression:
+    """
+    parse_statement memoized on normalized SQL text.
+
+    The returned tree is shared; call .copy() before modifying it.
+    """
+    return parse_statement(normalized)
+
+@lru_cache(maxsize=4096)
+def _analyze_normalized(normalized: str) -> Dict[str, Any]:
+    return analyze_tree(parse_cached(normalized))
+
+def analyze_statement(stmt: str) -> Dict[str, Any]:
+    """
+    analyze_tree for one statement, memoized on its normalized text.
+
+    Identical statements (e.g. the same CTAS in several files) are parsed once
+    per process. The returned dictionary is shared; do not modify it.
+    """
+    return _analyze_normalized(normalize_sql(stmt))
+
+def analyze_sql(sql: str) -> Dict[str, Any]:
+    """
+    Parse every statement in a SQL text and combine their features.
+
+    Statements that fail to parse are reported in 'parse_errors' (statement
+    number and message) and contribute no features. CTE names are local to a
+    statement, so 'ctes' is a list of {statement, name, references}.
+
+    Returns:
+        Combined features from analyze_tree plus statements, parse_errors,
+        join_graph (distinct left/right/kind edges) and reused_ctes
+    """
+    combined: Dict[str, Any] = {
+        'statements': 0, 'parse_errors': [],
+        'tables': set(), 'writes': set(), 'ctes': [], 'joins': [],
+        'window_functions': 0, 'subqueries': 0, 'select_star_tables': set(),
+        'cross_joins': 0, 'distinct_with_order_by': 0, 'inner_order_by': 0,
+        'unfiltered_tables': set(),
+    }
+    for n, stmt in enumerate(split_sql(sql), 1):
+        if is_session_statement(stmt) or not normalize_sql(stmt):
+            continue
+        combined['statements'] += 1
+        try:
+            features = analyze_statement(stmt)
+        except SqlglotError as e:
+            combined['parse_errors'].append({'statement': n, 'error': str(e).splitlines()[0]})
+            continue
+        combined['ctes'].extend({'statement': n, 'name': name, 'references': refs}
+                                for name, refs in features['ctes'].items())
+        for key, value in features.items():
+            if key == 'ctes':
+                continue
+            if isinstance(value, set):
+                combined[key] |= value
+            elif isinstance(value, list):
+                combined[key].extend(value)
+            else:
+                combined[key] += value
+
+    combined['join_graph'] = sorted({(j['left'], j['right'], j['kind']) for j in combined['joins']},
+                                    key=lambda edge: tuple(str(part) for part in edge))
+    combined['reused_ctes'] = [cte for cte in combined['ctes'] if cte['references'] > 1]
+    return combined
@@ -0,0 +1,225 @@
+"""
+Lightweight SQL Text Utilities
+Statement splitting, normalization and table read/write extraction used to
+order and parallelize SQL files.
+"""
+
+import re
+import hashlib
+from typing import List, Optional, Set, Tuple, Dict
+
+# Tokens that must survive normalization untouched (string literals, quoted
+# identifiers) plus the runs of comments/whitespace that collapse to one space.
+_SQL_TOKEN_RE = re.compile(
+    r"('(?:[^']|'')*')"                        # string literal
+    r'|("(?:[^"]|"")*")'                       # quoted identifier
+    r"|((?:\s+|--[^\n]*|/\*.*?\*/)+)",          # comments and whitespace
+    re.DOTALL,
+)
+
+_LEADING_COMMENTS_RE = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/)*", re.DOTALL)
+
+# Tokens for parameterize_sql: literals become ?, comment/whitespace runs
+# become one space. Words are left to a single upper() pass (much faster than
+# a callback per word), so quoted identifiers that differ only in case share
+# a fingerprint.
+_PARAM_TOKEN_RE = re.compile(
+    r"(?=[\s'$\d./-])"  # cheap first-character test before trying the alternatives
+    r"(?:(?P<space>(?:\s+|--[^\n]*|//[^\n]*|/\*.*?\*/)+)"
+    r"|(?P<literal>'[^'\\]*(?:(?:''|\\.)[^'\\]*)*'|\$\$.*?\$\$"
+    r"|(?<![\w$])(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?))",
+    re.DOTALL,
+)
+# Lists of placeholders collapse to one so IN (1, 2) and IN (1, 2, 3) match
+_PARAM_LIST_RE = re.compile(r"\(\?(?:,\?)+\)")
+_PARAM_ROWS_RE = re.compile(r"\(\?\)(?:,\(\?\))+")
+_PARAM_PUNCT_RE = re.compile(r" ?([(),=<>+*/%|:;-]) ?")
+
+# Statements that change session context rather than data
+SESSION_PREFIXES = ("USE", "SET", "UNSET", "ALTER SESSION")
+
+_NAME = r'(?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*)){0,2}'
+
+_WRITE_PATTERNS = [
+    re.compile(r'\bCREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:LOCAL|GLOBAL)\s+)?'
+               r'(?:(?:TEMP|TEMPORARY|VOLATILE|TRANSIENT)\s+)?'
+               r'(?:TABLE|VIEW|MATERIALIZED\s+VIEW|DYNAMIC\s+TABLE)\s+(?:IF\s+NOT\s+EXISTS\s+)?(' + _NAME + ')', re.I),
+    re.compile(r'\bINSERT\s+(?:OVERWRITE\s+)?(?:ALL\s+)?INTO\s+(' + _NAME + ')', re.I),
+    re.compile(r'^\s*UPDATE\s+(' + _NAME + ')', re.I),
+    re.compile(r'\bDELETE\s+FROM\s+(' + _NAME + ')', re.I),
+    re.compile(r'\bMERGE\s+INTO\s+(' + _NAME + ')', re.I),
+    re.compile(r'\bTRUNCATE\s+(?:TABLE\s+)?(?:IF\s+EXISTS\s+)?(' + _NAME + ')', re.I),
+    re.compile(r'\bDROP\s+(?:TABLE|VIEW|MATERIALIZED\s+VIEW)\s+(?:IF\s+EXISTS\s+)?(' + _NAME + ')', re.I),
+    re.compile(r'\bALTER\s+(?:TABLE|VIEW)\s+(?:IF\s+EXISTS\s+)?(' + _NAME + ')', re.I),
+    re.compile(r'\bCOPY\s+INTO\s+(' + _NAME + ')', re.I),
+]
+# A name followed by "(" is a function call (TABLE(...), FLATTEN(...)), not a table;
+# the lookahead also rejects a name cut short by backtracking (TABL of TABLE(...))
+_READ_PATTERN = re.compile(r'\b(?:FROM|JOIN|USING|CLONE)\s+(' + _NAME + r')(?![\w$.]|\s*\()', re.I)
+# Keywords that can follow FROM/JOIN/USING without naming a table
+_NOT_TABLES = {'VALUES', 'LATERAL', 'TABLE', 'SELECT', 'DUAL'}
+_CTE_PATTERN = re.compile(r'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*(' + _NAME + r')\s*(?:\([^)]*\)\s*)?AS\s*\(', re.I)
+
+def split_sql(statements: str) -> List[str]:
+    parts, current, in_str = [], [], False
+    quote = None
+    for ch in statements:
+        if ch in ("'", '"'):
+            if in_str and ch == quote:
+                in_str = False
+                quote = None
+            elif not in_str:
+                in_str = True
+                quote = ch
+        if ch == ";" and not in_str:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    tail = "".join(current).strip()
+    if tail:
+        parts.append(tail)
+    return [p for p in parts if p]
+
+def split_sql_with_lines(statements: str) -> List[Tuple[int, str]]:
+    """Split like split_sql and pair each statement with the line of its first SQL token (1-based)."""
+    located, position = [], 0
+    for stmt in split_sql(statements):
+        index = statements.find(stmt, position)
+        code_start = index + _LEADING_COMMENTS_RE.match(stmt).end()
+        located.append((statements.count("\n", 0, code_start) + 1, stmt))
+        position = index + len(stmt)
+    return located
+
+def leading_comments(stmt: str) -> str:
+    """The comments and whitespace before a statement's first SQL token."""
+    return _LEADING_COMMENTS_RE.match(stmt).group(0)
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalize SQL text so formatting-only edits compare equal.
+
+    Comments are removed, whitespace runs collapse to a single space and a
+    trailing semicolon is dropped; literals and quoted identifiers are kept as is.
+    """
+    def _replace(match: re.Match) -> str:
+        if match.group(1) or match.group(2):
+            return match.group(0)
+        return ' '
+
+    normalized = _SQL_TOKEN_RE.sub(_replace, query).strip()
+    return normalized.rstrip(';').strip()
+
+def _parameterize_token(match: re.Match) -> str:
+    return '?' if match.lastgroup == 'literal' else ' '
+
+def parameterize_sql(query: str) -> str:
+    """
+    Reduce a query to its shape so executions that differ only in values compare equal.
+
+    String/number literals become ?, lists of them (IN-lists, VALUES rows)
+    collapse to a single ?, comments are removed, whitespace is collapsed and
+    the text is uppercased.
+    """
+    text = _PARAM_TOKEN_RE.sub(_parameterize_token, query).upper()
+    text = _PARAM_PUNCT_RE.sub(r'\1', text).strip().rstrip(';')
+    text = _PARAM_LIST_RE.sub('(?)', text)
+    return _PARAM_ROWS_RE.sub('(?)', text)
+
+def query_fingerprint(query: str) -> str:
+    """Stable 16-character hash of parameterize_sql(query)."""
+    return hashlib.sha1(parameterize_sql(query).encode('utf-8')).hexdigest()[:16]
+
+def _blank_literals(query: str) -> str:
+    """Normalize and replace string literal contents so keywords inside them are ignored."""
+    return re.sub(r"'(?:[^']|'')*'", "''", normalize_sql(query))
+
+def starts_with(stmt: str, prefixes) -> bool:
+    """True if the statement's first keywords match one of the prefixes."""
+    head = normalize_sql(stmt).upper()
+    return any(head == p or head.startswith(p + " ") for p in prefixes)
+
+def is_session_statement(stmt: str) -> bool:
+    """True for USE/SET/ALTER SESSION statements that change session context."""
+    return starts_with(stmt, SESSION_PREFIXES)
+
+def qualify(name: str, database: Optional[str] = None, schema: Optional[str] = None) -> str:
+    """Uppercase an object name and fill in the default database/schema."""
+    parts = [p.strip('"') if p.startswith('"') else p.upper() for p in name.split('.')]
+    if len(parts) == 1 and schema:
+        parts = [schema.upper()] + parts
+    if len(parts) == 2 and database:
+        parts = [database.upper()] + parts
+    return '.'.join(parts)
+
+def statement_tables(stmt: str, database: Optional[str] = None,
+                     schema: Optional[str] = None) -> Tuple[Set[str], Set[str]]:
+    """
+    Extract the tables a statement reads and writes.
+
+    CTE names are excluded from reads. The scan is regex based and errs on the
+    side of reporting extra reads (e.g. EXTRACT(... FROM col)), which only adds
+    ordering constraints.
+
+    Returns:
+        (reads, writes) as sets of qualified, uppercased names
+    """
+    sql = _blank_literals(stmt)
+    ctes = {m.group(1).upper() for m in _CTE_PATTERN.finditer(sql)}
+
+    writes = set()
+    for pattern in _WRITE_PATTERNS:
+        for match in pattern.finditer(sql):
+            writes.add(qualify(match.group(1), database, schema))
+
+    reads = set()
+    for match in _READ_PATTERN.finditer(sql):
+        name = match.group(1)
+        if name.upper() in ctes or name.upper() in _NOT_TABLES:
+            continue
+        reads.add(qualify(name, database, schema))
+    return reads, writes
+
+def build_dependencies(stmts: List[str], database: Optional[str] = None,
+                       schema: Optional[str] = None) -> List[Set[int]]:
+    """
+    Compute which earlier statements each statement must wait for.
+
+    Statement j depends on an earlier statement i when i writes something j
+    reads or writes, or j writes something i reads.
+
+    Returns:
+        List where entry j is the set of indices statement j depends on
+    """
+    tables = [statement_tables(stmt, database, schema) for stmt in stmts]
+    deps = []
+    for j, (reads_j, writes_j) in enumerate(tables):
+        deps_j = set()
+        for i in range(j):
+            reads_i, writes_i = tables[i]
+            if writes_i & (reads_j | writes_j) or reads_i & writes_j:
+                deps_j.add(i)
+        deps.append(deps_j)
+    return deps
+
+def critical_path(deps: List[Set[int]], durations: Dict[int, float]) -> Tuple[float, List[int]]:
+    """
+    Longest duration-weighted chain through the dependency graph.
+
+    Returns:
+        (total seconds, statement indices along the path)
+    """
+    finish, previous = {}, {}
+    for j in range(len(deps)):
+        best = max(deps[j], key=lambda i: finish.get(i, 0.0), default=None)
+        finish[j] = durations.get(j, 0.0) + (finish.get(best, 0.0) if best is not None else 0.0)
+        previous[j] = best
+    if not finish:
+        return 0.0, []
+    node = max(finish, key=finish.get)
+    total = finish[node]
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return total, list(reversed(path))
@@ -0,0 +1,305 @@
+"""
+Partition Pruning Anti-Patterns
+Find WHERE predicates that wrap a filter column in a cast or function
+(e.g. `created_at::date >= '2025-05-01'`), propose sargable range rewrites,
+emit the rewritten SQL and optionally verify a rewrite on sampled data.
+"""
+
+import re
+import logging
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from src.sql_ast import DIALECT, parse_cached, table_name
+from src.sql_parse import split_sql_with_lines, leading_comments, normalize_sql, is_session_statement
+
+logger = logging.getLogger(__name__)
+
+_COMPARISONS = (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.EQ)
+# Flipping sides of a comparison: '2025-01-01' <= col  ->  col >= '2025-01-01'
+_FLIPPED = {exp.GT: exp.LT, exp.GTE: exp.LTE, exp.LT: exp.GT, exp.LTE: exp.GTE, exp.EQ: exp.EQ}
+_DATE_LITERAL = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_TRUNC_UNITS = ('DAY', 'MONTH', 'YEAR')
+
+def _is_constant(node: exp.Expression) -> bool:
+    """True for expressions without column references or subqueries (literals, CURRENT_DATE(), ...)."""
+    return node.find(exp.Column, exp.Subquery, exp.Select) is None
+
+def _floor(day: date, unit: str) -> date:
+    if unit == 'MONTH':
+        return day.replace(day=1)
+    if unit == 'YEAR':
+        return day.replace(month=1, day=1)
+    return day
+
+def _add(day: date, unit: str) -> date:
+    if unit == 'MONTH':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    if unit == 'YEAR':
+        return date(day.year + 1, 1, 1)
+    return day + timedelta(days=1)
+
+def _date_literal(day: date) -> exp.Expression:
+    return exp.cast(exp.Literal.string(day.isoformat()), 'DATE')
+
+def _wrapped_column(node: exp.Expression) -> Tuple[Optional[exp.Column], Optional[str]]:
+    """
+    Classify the filter side of a predicate.
+
+    Returns:
+        (column, unit) when node truncates a column to DAY/MONTH/YEAR in a way
+        that can be rewritten; (column, None) for other functions/casts wrapping
+        a single column; (None, None) when node is a bare column, a VARIANT
+        path lookup or not a wrapper
+    """
+    if isinstance(node, exp.Column):
+        return None, None
+    # VARIANT path lookups have no column-level min/max to prune on either way
+    if node.find(exp.JSONExtract, exp.JSONExtractScalar) is not None:
+        return None, None
+    columns = list(node.find_all(exp.Column))
+    if len(columns) != 1:
+        return None, None
+    column = columns[0]
+    direct = node.this is column
+    if isinstance(node, exp.Cast) and node.to.is_type('date') and direct:
+        return column, 'DAY'
+    if isinstance(node, exp.TsOrDsToDate) and direct and node.args.get('format') is None:
+        return column, 'DAY'
+    if isinstance(node, (exp.DateTrunc, exp.TimestampTrunc)) and direct:
+        unit = node.args.get('unit')
+        unit = unit.name.upper() if unit is not None else ''
+        return column, unit if unit in _TRUNC_UNITS else None
+    if isinstance(node, exp.Year) and direct:
+        return column, 'YEAR_NUMBER'
+    return column, None
+
+def _is_date(value: exp.Expression) -> bool:
+    """True for constants known to be DATE-typed (CURRENT_DATE(), ::DATE, DATEADD(DAY, n, <date>))."""
+    if isinstance(value, exp.CurrentDate):
+        return True
+    if isinstance(value, exp.Cast):
+        return value.to.is_type('date')
+    if isinstance(value, (exp.DateAdd, exp.DateSub)):
+        unit = value.args.get('unit')
+        return (unit is None or unit.name.upper() in ('DAY', 'WEEK', 'MONTH', 'QUARTER', 'YEAR')) and _is_date(value.this)
+    return False
+
+def _bounds(value: exp.Expression, unit: str) -> Optional[Tuple[Any, Any, Optional[bool]]]:
+    """
+    (floor, next, aligned) range boundaries for a constant compared with a truncated column.
+
+    Literal dates are folded in Python; other constants only support DAY and
+    become CAST(... AS DATE) / DATEADD(DAY, 1, ...). aligned is None when it is
+    unknown whether the constant falls on a day boundary (CURRENT_TIMESTAMP(),
+    timestamp strings), which leaves only the `< next day` style rewrites safe.
+    """
+    if unit == 'YEAR_NUMBER':
+        if isinstance(value, exp.Literal) and not value.is_string and value.this.isdigit():
+            start = date(int(value.this), 1, 1)
+            return start, _add(start, 'YEAR'), True
+        return None
+    if isinstance(value, exp.Literal) and value.is_string and _DATE_LITERAL.match(value.this):
+        day = date.fromisoformat(value.this)
+        floor = _floor(day, unit)
+        return floor, _add(floor, unit), floor == day
+    if unit == 'DAY':
+        aligned = True if _is_date(value) else None
+        start = value if aligned else exp.cast(value.copy(), 'DATE')
+        return start, exp.DateAdd(this=start.copy(), expression=exp.Literal.number(1), unit=exp.var('DAY')), aligned
+    return None
+
+def _as_expr(bound: Any) -> exp.Expression:
+    return _date_literal(bound) if isinstance(bound, date) else bound.copy()
+
+def _range(column: exp.Column, op: type, value: exp.Expression, unit: str) -> Optional[exp.Expression]:
+    """Sargable equivalent of `trunc(column) <op> value`, or None if it cannot be derived."""
+    bounds = _bounds(value, unit)
+    if bounds is None:
+        return None
+    floor, following, aligned = bounds
+    # trunc(col) > v and trunc(col) <= v hold the same whether or not v is on a
+    # boundary; the other operators need to know
+    if aligned is None and op not in (exp.GT, exp.LTE):
+        return None
+    col = column.copy()
+    if op is exp.GTE:
+        # trunc(col) >= v  <=>  col >= v when v is on a unit boundary, else the next boundary
+        return exp.GTE(this=col, expression=_as_expr(floor if aligned else following))
+    if op is exp.GT:
+        return exp.GTE(this=col, expression=_as_expr(following))
+    if op is exp.LT:
+        return exp.LT(this=col, expression=_as_expr(floor if aligned else following))
+    if op is exp.LTE:
+        return exp.LT(this=col, expression=_as_expr(following))
+    if op is exp.EQ and aligned:
+        return exp.and_(exp.GTE(this=col, expression=_as_expr(floor)),
+                        exp.LT(this=column.copy(), expression=_as_expr(following)))
+    return None
+
+def _issue(predicate: exp.Expression, wrapper: exp.Expression, column: exp.Column,
+           replacement: Optional[exp.Expression]) -> Dict[str, Any]:
+    reason = (f"{wrapper.sql(DIALECT)} applies a function to {column.sql(DIALECT)} "
+              f"- micro-partition min/max metadata cannot be used")
+    return {
+        'column': column.sql(DIALECT),
+        'predicate': predicate.sql(DIALECT),
+        'rewrite': replacement.sql(DIALECT) if replacement is not None else None,
+        'reason': reason,
+        'node': predicate,
+        'replacement': replacement,
+    }
+
+def find_pruning_issues(tree: exp.Expression) -> List[Dict[str, Any]]:
+    """
+    Find WHERE predicates that apply a function or cast to a filter column.
+
+    Each issue has column, predicate, rewrite (SQL text or None when no safe
+    rewrite is known) and reason, plus the 'node'/'replacement' expressions
+    used by rewrite_tree. Rewrites assume the column is a DATE/TIMESTAMP.
+    """
+    issues, seen = [], set()
+    for where in tree.find_all(exp.Where):
+        for predicate in where.find_all(*_COMPARISONS, exp.Between):
+            # Predicates in subqueries are reached from both the outer and inner WHERE
+            if id(predicate) in seen:
+                continue
+            seen.add(id(predicate))
+            if isinstance(predicate, exp.Between):
+                column, unit = _wrapped_column(predicate.this)
+                low, high = predicate.args.get('low'), predicate.args.get('high')
+                if column is None or not (_is_constant(low) and _is_constant(high)):
+                    continue
+                replacement = None
+                if unit:
+                    lower, upper = _range(column, exp.GTE, low, unit), _range(column, exp.LTE, high, unit)
+                    replacement = exp.and_(lower, upper) if lower is not None and upper is not None else None
+                issues.append(_issue(predicate, predicate.this, column, replacement))
+                continue
+
+            left, right, op = predicate.this, predicate.expression, type(predicate)
+            if _is_constant(left) and not _is_constant(right):
+                left, right, op = right, left, _FLIPPED[op]
+            if not _is_constant(right):
+                continue
+            column, unit = _wrapped_column(left)
+            if column is None:
+                continue
+            replacement = _range(column, op, right, unit) if unit else None
+            issues.append(_issue(predicate, left, column, replacement))
+    return issues
+
+def rewrite_tree(tree: exp.Expression) -> Tuple[exp.Expression, List[Dict[str, Any]]]:
+    """Return a copy of tree with rewritable predicates replaced, and the issues found."""
+    rewritten = tree.copy()
+    issues = find_pruning_issues(rewritten)
+    for issue in issues:
+        if issue['replacement'] is not None:
+            replacement = issue['replacement']
+            # Keep AND-ed ranges grouped unless they sit directly in a WHERE or AND
+            if isinstance(replacement, exp.And) and not isinstance(issue['node'].parent,
+                                                                    (exp.And, exp.Where, exp.Paren)):
+                replacement = exp.paren(replacement)
+            issue['node'].replace(replacement)
+    return rewritten, issues
+
+def _public(issue: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in issue.items() if k not in ('node', 'replacement')}
+
+def pruning_report(sql: str) -> Dict[str, Any]:
+    """
+    Scan every statement in a SQL text for pruning anti-patterns.
+
+    Returns:
+        Dictionary with 'issues' (each with statement, line and the fields from
+        find_pruning_issues), 'rewritten_sql' (the full text with rewritable
+        statements regenerated) and 'rewritten_statements' (statement number ->
+        (original, rewritten) SQL)
+    """
+    issues, rewritten_statements = [], {}
+    output, position = [], 0
+    for n, (line, stmt) in enumerate(split_sql_with_lines(sql), 1):
+        if is_session_statement(stmt) or not normalize_sql(stmt):
+            continue
+        try:
+            tree = parse_cached(normalize_sql(stmt))
+        except SqlglotError:
+            continue
+        new_tree, found = rewrite_tree(tree)
+        for issue in found:
+            issues.append({'statement': n, 'line': line, **_public(issue)})
+        if any(issue['replacement'] is not None for issue in found):
+            new_sql = new_tree.sql(dialect=DIALECT, pretty=True)
+            rewritten_statements[n] = (stmt, new_sql)
+            index = sql.find(stmt, position)
+            # Header comments before the statement are kept; comments inside it are not
+            output.append(sql[position:index] + leading_comments(stmt) + new_sql)
+            position = index + len(stmt)
+    output.append(sql[position:])
+    return {'issues': issues, 'rewritten_sql': ''.join(output), 'rewritten_statements': rewritten_statements}
+
+def _query_part(tree: exp.Expression) -> exp.Expression:
+    if isinstance(tree, (exp.Create, exp.Insert)) and isinstance(tree.expression, exp.Query):
+        return tree.expression
+    if isinstance(tree, exp.Query):
+        return tree
+    raise ValueError(f"Only SELECT, CREATE ... AS SELECT and INSERT ... SELECT can be verified, got {tree.key}")
+
+def verify_rewrite(original: str, rewritten: str, utils=None, sample_rows: int = 10_000) -> Dict[str, Any]:
+    """
+    Check that a rewrite returns the same rows as the original on a local sample.
+
+    Each physical table the query reads is sampled from Snowflake
+    (SAMPLE (n ROWS)) into an in-memory DuckDB database, both queries are
+    transpiled to DuckDB and their results compared as multisets. Matching
+    results on a sample are evidence, not proof, of equivalence.
+
+    Args:
+        original: Original statement
+        rewritten: Rewritten statement
+        utils: SnowflakeUtils instance used for sampling (created on demand)
+        sample_rows: Rows sampled per table
+
+    Returns:
+        Dictionary with identical, row counts for both queries and rows sampled per table
+    """
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("Rewrite verification requires duckdb (pip install duckdb)") from e
+    if utils is None:
+        from src.sf_utils import SnowflakeUtils
+        utils = SnowflakeUtils()
+
+    queries = [_query_part(parse_cached(normalize_sql(sql)).copy()) for sql in (original, rewritten)]
+    ctes = {cte.alias.lower() for q in queries for cte in q.find_all(exp.CTE)}
+    local_names = {}
+    for query in queries:
+        for table in list(query.find_all(exp.Table)):
+            if not isinstance(table.this, exp.Identifier) or (not table.db and table.name.lower() in ctes):
+                continue
+            name = table_name(table)
+            local = local_names.setdefault(name, re.sub(r'\W', '_', name))
+            # Keep the original alias (or bare name) so qualified column references still resolve
+            table.replace(exp.to_table(local).as_(table.alias_or_name))
+
+    conn = duckdb.connect()
+    sampled = {}
+    try:
+        for name, local in local_names.items():
+            df = utils.query_to_df(f"SELECT * FROM {name} SAMPLE ({int(sample_rows)} ROWS)")
+            conn.register(local, df)
+            sampled[name] = len(df)
+        results = [conn.execute(query.sql(dialect='duckdb')).fetchall() for query in queries]
+    finally:
+        conn.close()
+
+    counts = [Counter(tuple(str(v) for v in row) for row in rows) for rows in results]
+    return {
+        'identical': counts[0] == counts[1],
+        'original_rows': len(results[0]),
+        'rewritten_rows': len(results[1]),
+        'sampled_rows': sampled,
+    }
@@ -0,0 +1,181 @@
+"""
+Table Metadata Cache
+Batched INFORMATION_SCHEMA.TABLES lookups (one query per database) backed by
+a local JSON cache with a time-to-live.
+
+Invalidation is by TTL: an entry younger than the TTL is served without
+contacting Snowflake, even if the table has changed since. Expired entries
+are re-read by the same batched query. LAST_ALTERED comes back in the same
+row as the row count and size, so a separate LAST_ALTERED probe would only
+add a round trip. Comparing it with the cached value tells whether the
+expired entry was still current (revalidated) or had changed.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Any
+import pandas as pd
+from src.sf_client import read_dataframe, connection_settings
+from src.sf_cache import DEFAULT_CACHE_DIR, _float_env
+from src.sql_parse import qualify
+
+logger = logging.getLogger(__name__)
+
+# Cached entries younger than this are served without contacting Snowflake
+DEFAULT_METADATA_TTL_SECONDS = 3600
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+class TableMetadataCache:
+    """Row counts, sizes and LAST_ALTERED for tables, cached on disk."""
+
+    def __init__(self, cache_path: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_path: JSON file (default: <SNOWFLAKE_CACHE_DIR>/table_metadata.json)
+            ttl: Seconds an entry is trusted before it is revalidated
+                (default: SNOWFLAKE_METADATA_TTL or 1 hour)
+        """
+        base = Path(os.getenv("SNOWFLAKE_CACHE_DIR") or DEFAULT_CACHE_DIR).expanduser()
+        self.cache_path = Path(cache_path).expanduser() if cache_path else base / "table_metadata.json"
+        self.ttl = ttl if ttl is not None else _float_env("SNOWFLAKE_METADATA_TTL", DEFAULT_METADATA_TTL_SECONDS)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, entries: Dict[str, Any]) -> None:
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(entries, indent=1, default=str), encoding='utf-8')
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def batch_sql(database: str, tables: List[str]) -> str:
+        """One INFORMATION_SCHEMA.TABLES query for several DB.SCHEMA.TABLE names in a database."""
+        pairs = ',\n            '.join(
+            f"({_sql_string(name.split('.')[1])}, {_sql_string(name.split('.')[2])})" for name in tables)
+        return f"""
+        SELECT
+            table_catalog,
+            table_schema,
+            table_name,
+            row_count,
+            bytes,
+            last_altered
+        FROM {database}.INFORMATION_SCHEMA.TABLES
+        WHERE (table_schema, table_name) IN (
+            {pairs}
+        )
+        """
+
+    def get(self, tables: Iterable[str], database: Optional[str] = None,
+            schema: Optional[str] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Look up metadata for table names, fetching expired or missing ones in one query per database.
+
+        Entries within the TTL are returned as cached (see the module docstring);
+        use ttl=0 to re-read every table on each call.
+
+        Args:
+            tables: Table names as written in SQL (1-3 part names)
+            database: Default database for unqualified names (default: connection setting)
+            schema: Default schema for unqualified names (default: connection setting)
+
+        Returns:
+            Mapping of each input name to {row_count, bytes, last_altered} or None if not found
+        """
+        settings = connection_settings()
+        database = database or settings['database']
+        schema = schema or settings['schema']
+        names = {table: qualify(table, database, schema) for table in tables}
+
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            stale = defaultdict(list)
+            for qualified in sorted(set(names.values())):
+                entry = entries.get(qualified)
+                if entry is not None and now - entry['fetched_at'] < self.ttl:
+                    self.hits += 1
+                elif qualified.count('.') == 2:
+                    stale[qualified.split('.')[0]].append(qualified)
+                else:
+                    self.misses += 1
+
+            for db, batch in stale.items():
+                self._refresh(db, batch, entries, now)
+            if stale:
+                self._save(entries)
+
+        return {table: self._public(entries.get(qualified)) for table, qualified in names.items()}
+
+    def _refresh(self, database: str, batch: List[str], entries: Dict[str, Any], now: float) -> None:
+        self.round_trips += 1
+        try:
+            df = read_dataframe(self.batch_sql(database, batch))
+        except Exception as e:
+            logger.warning(f"Metadata lookup failed for {database}: {e}")
+            self.misses += len(batch)
+            return
+
+        found = set()
+        for row in df.to_dict('records'):
+            qualified = f"{row['table_catalog']}.{row['table_schema']}.{row['table_name']}".upper()
+            found.add(qualified)
+            last_altered = str(row['last_altered'])
+            previous = entries.get(qualified)
+            if previous is not None and previous['last_altered'] == last_altered:
+                self.revalidated += 1
+            else:
+                self.changed += previous is not None
+                self.misses += 1
+            entries[qualified] = {
+                'row_count': None if pd.isna(row['row_count']) else int(row['row_count']),
+                'bytes': None if pd.isna(row['bytes']) else int(row['bytes']),
+                'last_altered': last_altered,
+                'fetched_at': now,
+            }
+        for qualified in set(batch) - found:
+            self.misses += 1
+            entries.pop(qualified, None)
+
+    @staticmethod
+    def _public(entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if entry is None:
+            return None
+        return {k: entry[k] for k in ('row_count', 'bytes', 'last_altered')}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Lookup counts for this instance.
+
+        hits were served from the cache without a query (within the TTL);
+        revalidated entries had expired and were re-fetched with an unchanged
+        LAST_ALTERED; misses were new, changed (also counted in changed) or not found.
+        """
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'changed': self.changed,
+            'misses': self.misses,
+            'round_trips': self.round_trips,
+            'hit_rate': (self.hits / lookups) * 100 if lookups else 0,
+        }
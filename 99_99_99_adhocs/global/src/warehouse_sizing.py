@@ -0,0 +1,174 @@
+"""
+Warehouse Sizing Advisor
+Aggregates spill, overload queueing and execution time from QUERY_HISTORY per
+warehouse and per query fingerprint, and recommends a warehouse size for each
+workload with the projected credit and latency change.
+"""
+
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+import numpy as np
+import pandas as pd
+from src.cost_model import WAREHOUSE_CREDITS, credits_per_hour
+
+logger = logging.getLogger(__name__)
+
+# Sizes from smallest to largest; each step doubles the credits per hour
+SIZES = list(WAREHOUSE_CREDITS)
+
+# A workload is undersized when this share of its queries spill to local storage
+SPILL_QUERY_SHARE = 0.05
+# Overload queueing above this share of elapsed time means too much concurrency
+QUEUE_SHARE = 0.10
+# Workloads whose p95 execution is below this are candidates for a smaller size
+DOWNSIZE_P95_SECONDS = 5
+# Executions shorter than this are dominated by fixed overhead and are assumed
+# not to speed up (or slow down) with the warehouse size
+SCALING_MIN_SECONDS = 1.0
+
+SIGNAL_COLUMNS = ['executions', 'execution_hours', 'p95_execution_seconds', 'queue_share_pct',
+                  'local_spill_share_pct', 'remote_spill_share_pct', 'spilled_gb']
+
+def resize(warehouse_size: Optional[str], steps: int) -> Optional[str]:
+    """Size `steps` steps up (positive) or down from `warehouse_size`, clamped to the range."""
+    size = str(warehouse_size or '').upper()
+    if size not in SIZES:
+        return None
+    return SIZES[min(max(SIZES.index(size) + steps, 0), len(SIZES) - 1)]
+
+def sizing_signals(df: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Aggregate the sizing signals of successful queries.
+
+    Args:
+        df: History rows with execution_time, total_elapsed_time and
+            queued_overload_time (milliseconds) and the two bytes_spilled columns
+        by: Grouping columns, e.g. ['warehouse_name', 'warehouse_size']
+
+    Returns:
+        DataFrame with the `by` columns and SIGNAL_COLUMNS
+    """
+    df = df.assign(
+        execution_seconds=df['execution_time'].fillna(0) / 1000,
+        overload_seconds=df['queued_overload_time'].fillna(0) / 1000,
+        elapsed_seconds=df['total_elapsed_time'].fillna(0) / 1000,
+        local_spill=df['bytes_spilled_to_local_storage'].fillna(0) > 0,
+        remote_spill=df['bytes_spilled_to_remote_storage'].fillna(0) > 0,
+        spilled=df['bytes_spilled_to_local_storage'].fillna(0) + df['bytes_spilled_to_remote_storage'].fillna(0),
+    )
+    groups = df.groupby(by, dropna=False)
+    signals = groups.agg(
+        executions=('execution_seconds', 'size'),
+        execution_seconds=('execution_seconds', 'sum'),
+        overload_seconds=('overload_seconds', 'sum'),
+        elapsed_seconds=('elapsed_seconds', 'sum'),
+        local_spill=('local_spill', 'mean'),
+        remote_spill=('remote_spill', 'mean'),
+        spilled=('spilled', 'sum'),
+    )
+    signals['p95_execution_seconds'] = groups['execution_seconds'].quantile(0.95)
+    signals['execution_hours'] = signals['execution_seconds'] / 3600
+    signals['queue_share_pct'] = (signals['overload_seconds'] / signals['elapsed_seconds'].where(
+        signals['elapsed_seconds'] > 0) * 100).fillna(0.0)
+    signals['local_spill_share_pct'] = signals['local_spill'] * 100
+    signals['remote_spill_share_pct'] = signals['remote_spill'] * 100
+    signals['spilled_gb'] = signals['spilled'] / 1024**3
+    return signals[SIGNAL_COLUMNS].reset_index()
+
+def recommend(warehouse_size: Optional[str], signals: Dict[str, Any]) -> Tuple[int, str]:
+    """
+    Choose a resize for one workload from its signals.
+
+    Spilling is fixed by more memory, so it moves the workload up: one size for
+    any remote spill or frequent local spill, two when remote spill is
+    frequent. Overload queueing is a concurrency problem and is answered with
+    more clusters, not a bigger size. Short, spill-free, unqueued workloads
+    move down one size.
+
+    Returns:
+        (steps, reason) where steps is the size change (0 keeps the size)
+    """
+    if str(warehouse_size or '').upper() not in SIZES:
+        return 0, f"unknown warehouse size {warehouse_size}"
+    remote = signals['remote_spill_share_pct'] / 100
+    local = signals['local_spill_share_pct'] / 100
+    if remote >= SPILL_QUERY_SHARE:
+        return 2, f"{signals['remote_spill_share_pct']:.1f}% of queries spill to remote storage"
+    if remote > 0 or local >= SPILL_QUERY_SHARE:
+        return 1, (f"{signals['local_spill_share_pct']:.1f}% of queries spill locally, "
+                   f"{signals['remote_spill_share_pct']:.1f}% remotely ({signals['spilled_gb']:,.1f} GB)")
+    if signals['queue_share_pct'] / 100 >= QUEUE_SHARE:
+        return 0, (f"{signals['queue_share_pct']:.1f}% of elapsed time queued on overload: "
+                   f"raise MAX_CLUSTER_COUNT or split workloads rather than resize")
+    if signals['p95_execution_seconds'] < DOWNSIZE_P95_SECONDS and str(warehouse_size).upper() != SIZES[0]:
+        return -1, (f"p95 execution {signals['p95_execution_seconds']:.1f}s with no spill or queueing")
+    return 0, "no spill, queueing or oversizing signal"
+
+def project(df: pd.DataFrame, steps: pd.Series) -> pd.DataFrame:
+    """
+    Project each query's execution time and compute credits after a resize.
+
+    Execution at or above SCALING_MIN_SECONDS scales inversely with the size
+    (half the time per step up), shorter executions are unchanged, and credits
+    are execution time at the new size's hourly rate. Idle time and the auto
+    suspend minimum are not modelled.
+
+    Args:
+        df: History rows with warehouse_size and execution_time (milliseconds)
+        steps: Size change per row (aligned with df)
+
+    Returns:
+        DataFrame with current/projected execution_seconds and credits per row
+    """
+    seconds = df['execution_time'].fillna(0).to_numpy(dtype=float) / 1000
+    steps = steps.to_numpy(dtype=float)
+    projected = np.where(seconds >= SCALING_MIN_SECONDS, seconds * np.exp2(-steps), seconds)
+    rate = df['warehouse_size'].map(credits_per_hour).to_numpy(dtype=float)
+    return pd.DataFrame({
+        'execution_seconds': seconds,
+        'projected_execution_seconds': projected,
+        'credits': seconds / 3600 * rate,
+        'projected_credits': projected / 3600 * rate * np.exp2(steps),
+    }, index=df.index)
+
+def _recommendations(df: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    signals = sizing_signals(df, by)
+    decisions = [recommend(row['warehouse_size'], row) for row in signals.to_dict('records')]
+    signals['steps'] = [steps for steps, _ in decisions]
+    signals['reason'] = [reason for _, reason in decisions]
+    signals['recommended_size'] = [(resize(size, steps) or size).title() for size, steps in
+                                   zip(signals['warehouse_size'], signals['steps'])]
+
+    # Project every query with its workload's decision, then aggregate back
+    steps = df[by].merge(signals[by + ['steps']], on=by, how='left')['steps'].fillna(0)
+    steps.index = df.index
+    projected = pd.concat([df[by], project(df, steps)], axis=1).groupby(by, dropna=False)
+    totals = projected[['credits', 'projected_credits']].sum()
+    totals['projected_p95_execution_seconds'] = projected['projected_execution_seconds'].quantile(0.95)
+    signals = signals.merge(totals.reset_index(), on=by, how='left')
+    signals['credit_change_pct'] = ((signals['projected_credits'] / signals['credits'] - 1) * 100).where(
+        signals['credits'] > 0, 0.0)
+    return signals
+
+def sizing_report(df: pd.DataFrame, top: int = 20) -> Dict[str, pd.DataFrame]:
+    """
+    Sizing recommendations per warehouse and per workload (fingerprint on a warehouse).
+
+    Args:
+        df: Successful history rows with a fingerprint column
+        top: Number of workloads returned, by execution hours
+
+    Returns:
+        Dictionary with 'warehouses' and 'workloads' DataFrames holding the
+        signals, steps, recommended_size, reason, current and projected credits,
+        credit_change_pct and current/projected p95 execution seconds
+    """
+    df = df[df['warehouse_name'].notna() & df['warehouse_size'].notna()]
+    warehouses = _recommendations(df, ['warehouse_name', 'warehouse_size'])
+    workloads = _recommendations(df, ['warehouse_name', 'warehouse_size', 'fingerprint'])
+    samples = df.groupby('fingerprint')['query_text'].last().rename('sample_query')
+    workloads = workloads.merge(samples, left_on='fingerprint', right_index=True, how='left')
+    return {
+        'warehouses': warehouses.sort_values('execution_hours', ascending=False).reset_index(drop=True),
+        'workloads': workloads.sort_values('execution_hours', ascending=False).head(top).reset_index(drop=True),
+    }
@@ -0,0 +1,232 @@
+"""
+Shared test setup: makes `src` importable, loads scripts as modules and
+stands in a local SQLite driver for the Snowflake connector behind sf_client.
+"""
+
+import gc
+import os
+import re
+import sys
+import time
+import threading
+import sqlite3
+import importlib.util
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+def load_script(name: str):
+    """Import scripts/<name>.py as a module (scripts/ is not a package)."""
+    spec = importlib.util.spec_from_file_location(name, ROOT / "scripts" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class _StandInCursor(sqlite3.Cursor):
+    # SQLite has no CREATE OR REPLACE; it is emulated as DROP IF EXISTS + CREATE
+    _REPLACE = re.compile(r"\s*CREATE\s+OR\s+REPLACE\s+(TABLE|VIEW)\s+([\w.]+)", re.I)
+    # A /* latency 0.3 */ comment delays the statement without holding SQLite's
+    # write lock, so writers to different tables overlap as they do in Snowflake
+    _LATENCY = re.compile(r"/\*\s*latency\s+([\d.]+)\s*\*/")
+    # CREATE TABLE ... LIKE copies the columns; a missing source fails like Snowflake (errno 2003)
+    _LIKE = re.compile(r"\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)\s+LIKE\s+(\w+)(\s+COPY\s+GRANTS)?\s*$", re.I)
+    # ALTER TABLE a SWAP WITH b exchanges the two tables' names
+    _SWAP = re.compile(r"\s*ALTER\s+TABLE\s+(\w+)\s+SWAP\s+WITH\s+(\w+)\s*$", re.I)
+    # DDL commits the open transaction first, as in Snowflake
+    _DDL = re.compile(r"\s*(CREATE|DROP|ALTER)\s", re.I)
+
+    def execute(self, sql, parameters=()):
+        self.connection.statements.append(sql)
+        latency = self._LATENCY.search(sql)
+        if latency:
+            time.sleep(float(latency.group(1)))
+            sql = (sql[:latency.start()] + sql[latency.end():]).strip()
+        if self._DDL.match(sql) and self.connection.in_transaction:
+            self.connection.commit()
+        match = self._REPLACE.match(sql)
+        if match:
+            super().execute(f"DROP {match.group(1)} IF EXISTS {match.group(2)}")
+            sql = f"CREATE {match.group(1)} {match.group(2)}{sql[match.end():]}"
+        like = self._LIKE.match(sql)
+        if like:
+            if not super().execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+                                   (like.group(3),)).fetchone():
+                from snowflake.connector.errors import ProgrammingError
+                raise ProgrammingError(msg=f"Object '{like.group(3).upper()}' does not exist or not authorized.",
+                                       errno=2003)
+            sql = f"CREATE TABLE {like.group(1) or ''}{like.group(2)} AS SELECT * FROM {like.group(3)} WHERE 0"
+        swap = self._SWAP.match(sql)
+        if swap:
+            super().execute(f"ALTER TABLE {swap.group(1)} RENAME TO _swapping")
+            super().execute(f"ALTER TABLE {swap.group(2)} RENAME TO {swap.group(1)}")
+            sql = f"ALTER TABLE _swapping RENAME TO {swap.group(2)}"
+        return super().execute(sql, parameters)
+
+class _StandInConnection(sqlite3.Connection):
+    statements = None
+
+    def cursor(self, factory=_StandInCursor):
+        return super().cursor(factory)
+
+class StandInDriver:
+    """
+    DB-API module standing in for snowflake.connector behind sf_client's engines.
+
+    Connections are SQLite (in-memory and private to each connection unless
+    `database` names a file) with a sleep(seconds) SQL function for injecting
+    query latency (or a /* latency seconds */ comment, for statements that
+    write); every statement executed is kept in `statements`. CREATE OR
+    REPLACE, CREATE TABLE ... LIKE and ALTER TABLE ... SWAP WITH are
+    emulated for unqualified names, and DDL commits as in Snowflake. Each
+    connect simulates an externalbrowser login: a browser round trip of
+    browser_seconds, or token_seconds when client_store_temporary_credential
+    is set and an unexpired ID token from an earlier login is in the
+    (simulated) credential store.
+    """
+
+    def __init__(self, browser_seconds: float = 0.05, token_seconds: float = 0.001,
+                 token_ttl: float = 4 * 3600, database: str = ':memory:'):
+        self.browser_seconds = browser_seconds
+        self.token_seconds = token_seconds
+        self.token_ttl = token_ttl
+        self.token_expires_at = None
+        self.database = database
+        self.connects = []
+        self.statements = []
+        self.browser_logins = 0
+
+    def __getattr__(self, name):
+        return getattr(sqlite3, name)
+
+    def connect(self, *args, **kwargs):
+        use_token = kwargs.pop('client_store_temporary_credential', False)
+        self.connects.append(kwargs.pop('session_parameters', None))
+        if use_token and self.token_expires_at is not None and time.monotonic() < self.token_expires_at:
+            time.sleep(self.token_seconds)
+        else:
+            time.sleep(self.browser_seconds)
+            self.browser_logins += 1
+            if use_token:
+                self.token_expires_at = time.monotonic() + self.token_ttl
+        conn = sqlite3.connect(self.database, timeout=10, check_same_thread=False, factory=_StandInConnection)
+        conn.statements = self.statements
+        conn.create_function('sleep', 1, lambda seconds: time.sleep(seconds) or seconds)
+        return conn
+
+@pytest.fixture
+def stand_in_engine(monkeypatch):
+    """Make sf_client build its pooled engines over a StandInDriver instead of Snowflake."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import QueuePool
+    import src.sf_client as sf_client
+
+    driver = StandInDriver()
+
+    def _create_engine(url, connect_args=None, **pool_options):
+        return create_engine('sqlite://', module=driver, connect_args=dict(connect_args or {}),
+                             poolclass=QueuePool, **pool_options)
+
+    sf_client.dispose_engines()
+    monkeypatch.setattr(sf_client, 'create_engine', _create_engine)
+    yield driver
+    sf_client.dispose_engines()
+
+def _rss_bytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def peak_rss_growth(fn, interval: float = 0.002):
+    """
+    Call fn() and return (result, seconds, peak RSS growth in bytes) sampled from
+    /proc while it runs; covers allocations outside Python (Arrow, numpy) too.
+    """
+    if not os.path.exists('/proc/self/statm'):
+        pytest.skip('RSS sampling needs /proc')
+    gc.collect()
+    baseline = peak = _rss_bytes()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, _rss_bytes())
+            done.wait(interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+        seconds = time.perf_counter() - started
+    finally:
+        done.set()
+        sampler.join()
+    return result, seconds, max(peak, _rss_bytes()) - baseline
+
+class AccountUsageStandIn:
+    """
+    SnowflakeUtils stand-in whose SNOWFLAKE.ACCOUNT_USAGE views are DuckDB tables.
+
+    Snowflake SQL is transpiled with sqlglot and run in an in-memory DuckDB
+    (UTC session), so the live *_sql reports and the mirror syncs run
+    unchanged against fixture rows. Every statement is kept in `executed`.
+    """
+
+    def __init__(self, **views):
+        import duckdb
+        from src.sf_utils import SnowflakeUtils
+        self.db = duckdb.connect()
+        self.db.execute("SET TimeZone = 'UTC'")
+        self.db.execute("ATTACH ':memory:' AS snowflake")
+        self.db.execute("CREATE SCHEMA snowflake.account_usage")
+        self.executed = []
+        self._lock = threading.Lock()
+        # run_many is SnowflakeUtils' own, running on top of query_to_df
+        self.run_many = SnowflakeUtils.run_many.__get__(self)
+        for name, df in views.items():
+            self.set_view(name, df)
+
+    def set_view(self, name: str, df) -> None:
+        """Replace ACCOUNT_USAGE.<name> with the rows of df (naive timestamps are UTC)."""
+        # ACCOUNT_USAGE times are TIMESTAMP_LTZ, so they are stored zoned like Snowflake's
+        df = df.assign(**{column: df[column].dt.tz_localize('UTC')
+                          for column in df.select_dtypes('datetime64[ns]').columns})
+        with self._lock:
+            self.db.register('_rows', df)
+            self.db.execute(f"CREATE OR REPLACE TABLE snowflake.account_usage.{name} AS SELECT * FROM _rows")
+            self.db.unregister('_rows')
+
+    def query_to_df(self, query: str, limit=None, use_cache=None, cache_ttl=None):
+        import sqlglot
+        with self._lock:
+            self.executed.append(query)
+            # DuckDB reads '... 12:00:00 +00:00' as a zone name; Snowflake allows the space
+            duck = re.sub(r" ([+-]\d\d:\d\d)'", r"\1'", query)
+            return self.db.execute(sqlglot.transpile(duck, read='snowflake', write='duckdb')[0]).df()
+
+    def iter_query(self, query: str, batch_rows: int = 100_000, arrow: bool = False):
+        df = self.query_to_df(query)
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows]
+
+class FakeInformationSchema:
+    """Answers TableMetadataCache.batch_sql from a dict of DB.SCHEMA.TABLE -> (row_count, bytes, last_altered), counting queries."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+
+    def read_dataframe(self, query, engine=None, fetch_mode=None):
+        import pandas as pd
+        self.queries.append(query)
+        database = re.search(r"FROM (\w+)\.INFORMATION_SCHEMA\.TABLES", query).group(1)
+        rows = []
+        for schema, table in re.findall(r"\('([^']*)', '([^']*)'\)", query):
+            entry = self.tables.get(f"{database}.{schema}.{table}")
+            if entry is not None:
+                rows.append({'table_catalog': database, 'table_schema': schema, 'table_name': table,
+                             'row_count': entry[0], 'bytes': entry[1], 'last_altered': entry[2]})
+        return pd.DataFrame(rows, columns=['table_catalog', 'table_schema', 'table_name',
+                                           'row_count', 'bytes', 'last_altered'])
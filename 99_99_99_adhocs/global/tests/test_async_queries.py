@@ -0,0 +1,144 @@
+"""Tests for sf_client's async submission API against a stub connector with simulated latency."""
+
+import re
+import time
+import uuid
+import asyncio
+import threading
+import pandas as pd
+import pytest
+from snowflake.connector.connection import SnowflakeConnection
+from snowflake.connector.constants import QueryStatus
+from snowflake.connector.errors import ProgrammingError
+import src.sf_client as sf_client
+
+_LATENCY = re.compile(r"/\* latency=([\d.]+)( fail)? \*/")
+
+class StubConnector:
+    """Runs each submitted query 'server side' for the latency given in its SQL comment."""
+
+    is_still_running = staticmethod(SnowflakeConnection.is_still_running)
+
+    def __init__(self):
+        self.queries = {}
+        self.lock = threading.Lock()
+
+    def submit(self, sql):
+        latency, fail = _LATENCY.search(sql).groups()
+        query_id = str(uuid.uuid4())
+        with self.lock:
+            self.queries[query_id] = (time.monotonic(), float(latency), bool(fail), sql)
+        return query_id
+
+    def get_query_status(self, query_id):
+        started, latency, fail, _ = self.queries[query_id]
+        if time.monotonic() - started < latency:
+            return QueryStatus.RUNNING
+        return QueryStatus.FAILED_WITH_ERROR if fail else QueryStatus.SUCCESS
+
+    def get_query_status_throw_if_error(self, query_id):
+        status = self.get_query_status(query_id)
+        if status == QueryStatus.FAILED_WITH_ERROR:
+            raise ProgrammingError(msg=f"query {query_id} failed")
+        return status
+
+    def peak_in_flight(self):
+        """Most queries running server side at the same moment."""
+        events = sorted([(start, 1) for start, _, _, _ in self.queries.values()]
+                        + [(start + latency, -1) for start, latency, _, _ in self.queries.values()])
+        running = peak = 0
+        for _, change in events:
+            running += change
+            peak = max(peak, running)
+        return peak
+
+class StubCursor:
+    def __init__(self, connector):
+        self.connector = connector
+        self.sfqid = None
+        self.description = [(name, None, None, None, None, None, True) for name in ('QUERY_ID', 'LATENCY')]
+
+    def execute_async(self, sql):
+        self.sfqid = self.connector.submit(sql)
+
+    def get_results_from_sfqid(self, query_id):
+        self.sfqid = query_id
+
+    def fetch_pandas_all(self):
+        return pd.DataFrame({'QUERY_ID': [self.sfqid], 'LATENCY': [self.connector.queries[self.sfqid][1]]})
+
+    def close(self):
+        pass
+
+class StubRaw:
+    def __init__(self, connector):
+        self.driver_connection = connector
+
+    def cursor(self):
+        return StubCursor(self.driver_connection)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def connector(monkeypatch):
+    stub = StubConnector()
+
+    class Engine:
+        def raw_connection(self):
+            return StubRaw(stub)
+
+    sf_client.dispose_engines()
+    monkeypatch.setattr(sf_client, 'get_engine', lambda database=None, schema=None, session_params=None: Engine())
+    yield stub
+    sf_client.dispose_engines()
+
+LATENCIES = [0.3, 0.1, 0.5, 0.2, 0.4]
+
+def submit_all(latencies=LATENCIES):
+    return [sf_client.submit_query(f"SELECT {i} /* latency={latency} */") for i, latency in enumerate(latencies)]
+
+def test_submitted_queries_run_concurrently(connector):
+    started = time.perf_counter()
+    query_ids = submit_all()
+    submitted = time.perf_counter() - started
+    statuses = sf_client.wait_all(query_ids, poll_interval=0.01)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{len(LATENCIES)} queries ({sum(LATENCIES):.1f}s of server time): submitted in "
+          f"{submitted * 1000:.1f}ms, all done in {elapsed:.2f}s, {connector.peak_in_flight()} in flight at once")
+    assert submitted < 0.05
+    assert statuses == {query_id: 'SUCCESS' for query_id in query_ids}
+    assert connector.peak_in_flight() == len(LATENCIES)
+    assert max(LATENCIES) <= elapsed < max(LATENCIES) + 0.2
+
+def test_poll_and_is_running_track_status(connector):
+    query_id, = submit_all([0.1])
+    assert sf_client.poll(query_id) == 'RUNNING' and sf_client.is_running(query_id)
+    time.sleep(0.15)
+    assert sf_client.poll(query_id) == 'SUCCESS' and not sf_client.is_running(query_id)
+
+def test_fetch_can_be_awaited_together(connector):
+    query_ids = submit_all()
+
+    async def fetch_all():
+        return await asyncio.gather(*(sf_client.fetch(query_id, poll_interval=0.01) for query_id in query_ids))
+
+    started = time.perf_counter()
+    frames = asyncio.run(fetch_all())
+    elapsed = time.perf_counter() - started
+    assert [df['latency'].iloc[0] for df in frames] == LATENCIES
+    assert [df['query_id'].iloc[0] for df in frames] == query_ids
+    assert elapsed < max(LATENCIES) + 0.2
+
+def test_failed_query_is_reported_and_raises_on_fetch(connector):
+    ok = sf_client.submit_query("SELECT 1 /* latency=0.05 */")
+    failed = sf_client.submit_query("SELECT 2 /* latency=0.05 fail */")
+    assert sf_client.wait_all([ok, failed], poll_interval=0.01) == {ok: 'SUCCESS', failed: 'FAILED_WITH_ERROR'}
+    with pytest.raises(ProgrammingError):
+        sf_client.fetch_result(failed)
+
+def test_wait_all_times_out(connector):
+    query_ids = submit_all([1.0])
+    with pytest.raises(TimeoutError):
+        sf_client.wait_all(query_ids, poll_interval=0.01, timeout=0.05)
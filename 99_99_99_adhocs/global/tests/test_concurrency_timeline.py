@@ -0,0 +1,101 @@
+"""Concurrency timeline on hand-built query intervals: per-second counts, queueing windows and contributors."""
+
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from src.concurrency_timeline import query_intervals, build_timeline, saturation_windows, concurrency_report
+
+T0 = datetime(2026, 10, 1, 12, 0, 0)
+
+def history(rows):
+    """Rows from (warehouse, user, text, queue start s, run start s, run end s) offsets after T0."""
+    return pd.DataFrame({
+        'warehouse_name': [r[0] for r in rows], 'user_name': [r[1] for r in rows], 'query_text': [r[2] for r in rows],
+        'end_time': [T0 + timedelta(seconds=r[5]) for r in rows],
+        'execution_time': [(r[5] - r[4]) * 1000 for r in rows],
+        'queued_overload_time': [(r[4] - r[3]) * 1000 for r in rows],
+    })
+
+ROWS = [
+    ('WH_A', 'ANA', 'report', 0, 0, 100),
+    ('WH_A', 'BEN', 'etl', 10, 50, 150),
+    ('WH_A', 'BEN', 'etl', 20, 120, 180),
+    ('WH_A', 'CHO', 'adhoc', 130, 140, 200),
+    # Queued for 20s much later: too short to be a window
+    ('WH_A', 'DAN', 'late', 300, 320, 330),
+    ('WH_B', 'ANA', 'report', 0, 0, 50),
+]
+
+def test_intervals_place_queueing_before_execution():
+    intervals = query_intervals(history(ROWS[1:2]))
+    row = intervals.iloc[0]
+    assert (row['queue_start'], row['run_start'], row['run_end']) == \
+        (pd.Timestamp(T0 + timedelta(seconds=10)), pd.Timestamp(T0 + timedelta(seconds=50)),
+         pd.Timestamp(T0 + timedelta(seconds=150)))
+
+def test_build_timeline_counts_by_hand():
+    timeline = build_timeline(query_intervals(history(ROWS)))
+    assert timeline['warehouses'] == ['WH_A', 'WH_B']
+    assert timeline['start'] == np.datetime64(T0, 's')
+    running, queued = timeline['running'], timeline['queued']
+    assert running.shape == (2, 331)
+    # WH_A seconds: 0-49 one running, 50-99 two, 100-119 one, 120-139 two, 140-149 three
+    assert [running[0, t] for t in (0, 49, 50, 99, 100, 120, 140, 149, 150, 180, 199, 200, 320, 330)] == \
+        [1, 1, 2, 2, 1, 2, 3, 3, 2, 1, 1, 0, 1, 0]
+    assert [queued[0, t] for t in (9, 10, 19, 20, 49, 50, 119, 120, 130, 139, 140, 300, 320)] == \
+        [0, 1, 1, 2, 2, 1, 1, 0, 1, 1, 0, 1, 0]
+    # Query-seconds are conserved: every execution and queueing second is counted once
+    assert running[0].sum() == 100 + 100 + 60 + 60 + 10 and queued[0].sum() == 40 + 100 + 10 + 20
+    assert running[1, :50].tolist() == [1] * 50 and running[1, 50:].sum() == 0 and queued[1].sum() == 0
+
+def test_build_timeline_rounds_partial_seconds_out_and_clips():
+    df = pd.DataFrame({'warehouse_name': ['WH'], 'end_time': [T0 + timedelta(seconds=2.2)],
+                       'execution_time': [1_700], 'queued_overload_time': [0]})
+    timeline = build_timeline(query_intervals(df), start=T0, end=T0 + timedelta(seconds=1))
+    # 0.5s-2.2s touches seconds 0, 1 and 2; the timeline stops after second 1
+    assert timeline['running'].tolist() == [[1, 1]]
+    empty = build_timeline(query_intervals(df.iloc[:0]))
+    assert empty['warehouses'] == [] and empty['running'].shape == (0, 0)
+
+def test_saturation_windows_merge_short_gaps_and_drop_short_runs():
+    queued = np.array([0, 1, 1, 0, 2, 0, 0, 0, 1, 1, 1])
+    # Runs [1,3), [4,5), [8,11): a 1s gap merges the first two, a 3s gap does not
+    assert saturation_windows(queued, gap=2, min_seconds=1) == [(1, 5), (8, 11)]
+    assert saturation_windows(queued, gap=2, min_seconds=4) == [(1, 5)]
+    assert saturation_windows(queued, gap=4, min_seconds=1) == [(1, 11)]
+    assert saturation_windows(np.zeros(5, np.int32)) == []
+
+def test_concurrency_report_by_hand():
+    fingerprinted = []
+
+    def fingerprint(text):
+        fingerprinted.append(text)
+        return text.upper()
+    report = concurrency_report(history(ROWS), fingerprint)
+
+    warehouses = report['warehouses'].set_index('warehouse_name')
+    assert warehouses.loc['WH_A', ['peak_running', 'peak_queued', 'queued_seconds']].tolist() == [3, 2, 140]
+    assert warehouses.loc['WH_A', 'peak_running_at'] == pd.Timestamp(T0 + timedelta(seconds=140))
+    assert warehouses.loc['WH_A', 'avg_running_when_active'] == pytest.approx(330 / 210)
+    assert warehouses.loc['WH_B', ['peak_running', 'peak_queued', 'queued_seconds']].tolist() == [1, 0, 0]
+
+    # Queueing 10-120 and 130-140 merge across the 10s gap; the 20s run at 300 is dropped
+    window, = report['windows']
+    assert (window['warehouse_name'], window['start'], window['end'], window['seconds']) == \
+        ('WH_A', pd.Timestamp(T0 + timedelta(seconds=10)), pd.Timestamp(T0 + timedelta(seconds=140)), 130)
+    assert (window['peak_queued'], window['peak_running'], window['queued_query_seconds']) == (2, 2, 150)
+    assert window['queries'] == 4
+    # Queued plus running seconds inside the window
+    assert window['users'] == [{'name': 'BEN', 'seconds': 250.0}, {'name': 'ANA', 'seconds': 90.0},
+                               {'name': 'CHO', 'seconds': 10.0}]
+    assert [(f['name'], f['seconds'], f['sample_query']) for f in window['fingerprints']] == \
+        [('ETL', 250.0, 'etl'), ('REPORT', 90.0, 'report'), ('ADHOC', 10.0, 'adhoc')]
+    # Only the texts overlapping the window are fingerprinted, each once
+    assert sorted(fingerprinted) == ['adhoc', 'etl', 'report']
+
+def test_windows_are_limited_to_the_worst():
+    rows = [('WH_A', 'ANA', 'x', 0, 100, 110), ('WH_A', 'ANA', 'x', 0, 100, 110),
+            ('WH_B', 'BEN', 'y', 0, 80, 90)]
+    report = concurrency_report(history(rows), str.upper, windows=1)
+    assert [(w['warehouse_name'], w['queued_query_seconds']) for w in report['windows']] == [('WH_A', 200)]
@@ -0,0 +1,58 @@
+"""RuntimeModel evaluated on the synthetic history fixture."""
+
+import json
+import numpy as np
+import pytest
+from src.cost_model import RuntimeModel, synthetic_history, history_matrix, TARGET
+
+@pytest.fixture(scope='module')
+def history():
+    return synthetic_history(3000, seed=1)
+
+def test_model_beats_the_constant_baseline(history):
+    metrics = RuntimeModel().evaluate(history, seed=1)
+    print(f"\nmodel {metrics['median_abs_pct_error']:.1f}% vs baseline "
+          f"{metrics['baseline_median_abs_pct_error']:.1f}% median abs error, R² {metrics['r2_log']:.3f}, "
+          f"coverage {metrics['interval_coverage']:.1f}%")
+    assert metrics['test_rows'] == 600
+    assert metrics['median_abs_pct_error'] < metrics['baseline_median_abs_pct_error'] / 2
+    assert metrics['r2_log'] > 0.9
+
+def test_ninety_percent_interval_covers_about_ninety_percent(history):
+    coverage = [RuntimeModel().evaluate(history, seed=seed)['interval_coverage'] for seed in range(5)]
+    assert 85 <= np.mean(coverage) <= 95
+    assert all(80 <= c <= 97 for c in coverage)
+
+def _predict(model, joins=0, mb=1024, size='Medium'):
+    # EXPLAIN reports bytes and partitions together, as the history does
+    return model.predict({'joins': [{}] * joins, 'tables': {'A'}}, bytes_scanned=mb * 2**20,
+                         partitions_scanned=np.ceil(mb / 16), warehouse_size=size)
+
+def test_predictions_follow_the_runtime_law(history):
+    model = RuntimeModel().fit(history)
+    small, bigger_scan = _predict(model), _predict(model, mb=100 * 1024)
+    more_joins, larger_wh = _predict(model, joins=4), _predict(model, mb=100 * 1024, size='Large')
+    assert 0 < small['expected_seconds'] < bigger_scan['expected_seconds']
+    assert small['expected_seconds'] < more_joins['expected_seconds']
+    assert larger_wh['expected_seconds'] < bigger_scan['expected_seconds']
+    assert small['low_seconds'] < small['expected_seconds'] < small['high_seconds']
+    # Credits charge the warehouse rate for the predicted elapsed time
+    assert larger_wh['expected_credits'] == pytest.approx(larger_wh['expected_seconds'] * 8 / 3600)
+
+def test_target_is_elapsed_time(history):
+    _, seconds = history_matrix(history)
+    assert TARGET == 'total_elapsed_time'
+    assert np.allclose(seconds, history['total_elapsed_time'] / 1000)
+    assert (history['total_elapsed_time'] > history['execution_time']).all()
+
+def test_saved_model_round_trips_and_rejects_other_targets(history, tmp_path):
+    model = RuntimeModel().fit(history)
+    path = model.save(tmp_path / 'model.json')
+    loaded = RuntimeModel.load(path)
+    assert _predict(loaded) == _predict(model)
+
+    data = json.loads(path.read_text())
+    del data['target']  # a model saved before the target was recorded predicted execution time
+    path.write_text(json.dumps(data))
+    with pytest.raises(ValueError, match='retrain'):
+        RuntimeModel.load(path)
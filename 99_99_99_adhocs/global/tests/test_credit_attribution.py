@@ -0,0 +1,147 @@
+"""Credit attribution: hand-computed apportioning, cached hours and queries that land after their hours settle."""
+
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from conftest import AccountUsageStandIn
+from src.history_store import QueryHistoryStore, HISTORY_COLUMNS
+from src.credit_attribution import CreditAttributor, attribute_credits, METERING_COLUMNS
+
+def _at(hour, minute=0):
+    return datetime(2026, 10, 1, hour, minute)
+
+def test_attribute_credits_by_hand():
+    queries = pd.DataFrame({
+        'query_id': ['q1', 'q2', 'q3', 'no_wh', 'cached', 'unmetered'],
+        'warehouse_name': ['WH', 'WH', 'WH', None, 'WH', 'WH'],
+        # q1 10:00-10:30, q2 10:45-11:15 (crosses the hour), q3 11:30-11:45, the last one at 13:00-13:10
+        'end_time': [_at(10, 30), _at(11, 15), _at(11, 45), _at(10, 30), _at(10, 50), _at(13, 10)],
+        'execution_time': [30 * 60_000, 30 * 60_000, 15 * 60_000, 60_000, 0, 10 * 60_000],
+    })
+    metering = pd.DataFrame({
+        'warehouse_name': ['WH', 'WH', 'WH'],
+        'start_time': [_at(10), _at(11), _at(12)],
+        'credits_used_compute': [2.0, 1.0, 4.0],
+    })
+    credits = attribute_credits(queries, metering)
+    got = {(row.query_id, row.hour.hour): (row.execution_seconds, row.compute_credits) for row in credits.itertuples()}
+    assert got == pytest.approx({
+        # 10:00: q1 ran 1800s and q2 900s of the 2700 busy seconds
+        ('q1', 10): (1800, 2.0 * 1800 / 2700),
+        ('q2', 10): (900, 2.0 * 900 / 2700),
+        # 11:00: half an hour idle, charged to q2 and q3 (900s each)
+        ('q2', 11): (900, 0.5),
+        ('q3', 11): (900, 0.5),
+    })
+    # Every busy hour is fully distributed; 12:00 had no queries, 13:00 no metering
+    per_hour = credits.groupby('hour')['compute_credits'].sum()
+    assert per_hour.to_dict() == pytest.approx({pd.Timestamp(_at(10)): 2.0, pd.Timestamp(_at(11)): 1.0})
+
+def test_attribute_credits_handles_empty_inputs():
+    empty = attribute_credits(pd.DataFrame(columns=['query_id', 'warehouse_name', 'end_time', 'execution_time']),
+                              pd.DataFrame(columns=['warehouse_name', 'start_time', 'credits_used_compute']))
+    assert empty.empty
+
+# Fixture times are relative to the real clock: settled_through() compares with utcnow()
+BASE = (datetime.utcnow() - timedelta(hours=30)).replace(minute=0, second=0, microsecond=0)
+
+def history(rows):
+    """QUERY_HISTORY rows from (query_id, warehouse, start hours after BASE, execution hours)."""
+    df = pd.DataFrame({column: None for column in HISTORY_COLUMNS}, index=range(len(rows)))
+    start = [BASE + timedelta(hours=offset) for _, _, offset, _ in rows]
+    end = [s + timedelta(hours=hours) for s, (_, _, _, hours) in zip(start, rows)]
+    return df.assign(query_id=[r[0] for r in rows], warehouse_name=[r[1] for r in rows],
+                     execution_status='SUCCESS', start_time=start, end_time=end,
+                     execution_time=[int(r[3] * 3_600_000) for r in rows],
+                     total_elapsed_time=[int(r[3] * 3_600_000) for r in rows], credits_used_cloud_services=0.0)
+
+def metering(hours):
+    starts = [BASE + timedelta(hours=h) for h in range(hours)]
+    return pd.DataFrame({
+        'warehouse_name': 'WH', 'start_time': starts, 'end_time': [s + timedelta(hours=1) for s in starts],
+        'credits_used': [1.0 + h % 3 for h in range(hours)], 'credits_used_compute': [1.0 + h % 3 for h in range(hours)],
+        'credits_used_cloud_services': 0.0,
+    })[METERING_COLUMNS]
+
+# One short query in every hour; the last one ends 4 hours ago, so hours up to BASE + 24h are settled
+FINISHED = [(f"q{h:02d}", 'WH', h + 0.25, 0.5) for h in range(26)]
+# Started at BASE + 20h and still running when those hours are first cached
+LONG = ('long', 'WH', 20.5, 6.0)
+
+@pytest.fixture
+def account(monkeypatch, tmp_path):
+    monkeypatch.setenv('SNOWFLAKE_HISTORY_DIR', str(tmp_path / 'history'))
+    return AccountUsageStandIn(query_history=history(FINISHED), warehouse_metering_history=metering(26))
+
+@pytest.fixture
+def attributor(account, tmp_path):
+    """Synced attributor whose _compute calls are recorded as (start, end)."""
+    store = QueryHistoryStore()
+    store.sync(account)
+    attributor = CreditAttributor(store, cache_dir=str(tmp_path / 'attribution'))
+    attributor.sync_metering(account)
+    attributor.computed = []
+    compute = attributor._compute
+
+    def _compute(start, end):
+        attributor.computed.append((start, end))
+        return compute(start, end)
+    attributor._compute = _compute
+    return attributor
+
+def _cached(attributor):
+    return pd.concat([pd.read_parquet(part) for part in attributor._parts()], ignore_index=True)
+
+def test_update_caches_settled_hours_once(attributor):
+    assert attributor.settled_through() == BASE + timedelta(hours=24)
+    first = attributor.update()
+    assert (first['hours'], first['rows'], first['recomputed_from']) == (24, 24, None)
+    assert attributor.computed == [(BASE, BASE + timedelta(hours=24))]
+
+    # Nothing new settled: no hour is recomputed
+    assert attributor.update()['hours'] == 0
+    assert len(attributor.computed) == 1
+
+    cached = _cached(attributor)
+    per_hour = cached.groupby('hour')['compute_credits'].sum()
+    assert per_hour.to_numpy() == pytest.approx([1.0 + h % 3 for h in range(24)])
+
+def test_query_credits_reads_cached_hours_and_computes_only_newer_ones(attributor):
+    attributor.update()
+    credits = attributor.query_credits(BASE).set_index('query_id')
+    # Cached hours are read back; only the unsettled hours from BASE + 24h are computed
+    assert attributor.computed[1:] == [(BASE + timedelta(hours=24), attributor.computed[1][1])]
+    assert len(credits) == 26
+    assert credits.loc['q05', 'compute_credits'] == pytest.approx(3.0)
+    assert credits.loc['q25', 'compute_credits'] == pytest.approx(2.0)
+
+def test_query_landing_after_its_hours_settled_recomputes_them(attributor, account, tmp_path):
+    attributor.update()
+    assert 'long' not in set(_cached(attributor)['query_id'])
+
+    # The long query ends and reaches QUERY_HISTORY; its first hours are already cached
+    account.set_view('query_history', history(FINISHED + [LONG]))
+    attributor.store.sync(account)
+    result = attributor.update()
+    assert result['recomputed_from'] == BASE + timedelta(hours=20)
+    assert attributor.computed[-1] == (BASE + timedelta(hours=20), BASE + timedelta(hours=24))
+
+    cached = _cached(attributor)
+    assert not cached.duplicated(['query_id', 'hour']).any()
+    assert sorted(cached.loc[cached['query_id'] == 'long', 'hour']) == \
+        [pd.Timestamp(BASE + timedelta(hours=h)) for h in range(20, 24)]
+    # Hour 21: q21 ran 30 minutes, the long query all 60
+    hour_21 = cached[cached['hour'] == pd.Timestamp(BASE + timedelta(hours=21))].set_index('query_id')
+    assert hour_21.loc['long', 'compute_credits'] == pytest.approx(1.0 * 60 / 90)
+    assert hour_21['compute_credits'].sum() == pytest.approx(1.0)
+
+    # Same cache as attributing from scratch with the complete history
+    fresh = CreditAttributor(attributor.store, cache_dir=str(tmp_path / 'fresh'))
+    fresh.sync_metering(account)
+    fresh.update()
+    columns = ['query_id', 'hour', 'compute_credits']
+    pd.testing.assert_frame_equal(cached.sort_values(columns[:2]).reset_index(drop=True)[columns],
+                                  _cached(fresh).sort_values(columns[:2]).reset_index(drop=True)[columns])
+
+    # And the recomputed hours are not revisited again
+    assert attributor.update()['hours'] == 0
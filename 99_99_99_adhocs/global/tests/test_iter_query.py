@@ -0,0 +1,117 @@
+"""Streaming export tests: peak RSS must not grow with the result size."""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import src.sf_utils as sf_utils
+from conftest import peak_rss_growth
+
+# Rows per simulated server result chunk
+CHUNK_ROWS = 200_000
+
+def chunk(start, rows):
+    ids = np.arange(start, start + rows, dtype=np.int64)
+    return pa.table({
+        'ID': ids,
+        'AMOUNT': (ids % 10_000) / 100.0,
+        'CARRIER': pa.array(np.char.add('carrier_', (ids % 997).astype(str)).astype(object)),
+    })
+
+class StreamingCursor:
+    """Connector-like cursor that produces its result chunk by chunk, never all at once."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = [(name, None, None, None, None, None, True) for name in ('ID', 'AMOUNT', 'CARRIER')]
+        self.position = 0
+
+    def execute(self, query):
+        pass
+
+    def _chunks(self):
+        for start in range(0, self.rows, CHUNK_ROWS):
+            yield chunk(start, min(CHUNK_ROWS, self.rows - start))
+
+    def fetch_arrow_batches(self):
+        return self._chunks()
+
+    def fetch_pandas_batches(self):
+        return (table.to_pandas() for table in self._chunks())
+
+    def fetchmany(self, size):
+        rows = min(size, self.rows - self.position)
+        if rows <= 0:
+            return []
+        table = chunk(self.position, rows)
+        self.position += rows
+        return list(zip(*(table.column(i).to_pylist() for i in range(3))))
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def result_rows(monkeypatch):
+    """Set the size of the stand-in result served to SnowflakeUtils.iter_query."""
+    size = {'rows': 0}
+
+    class Engine:
+        def raw_connection(self):
+            class Raw:
+                def cursor(self):
+                    return StreamingCursor(size['rows'])
+
+                def close(self):
+                    pass
+            return Raw()
+
+    monkeypatch.setattr(sf_utils, 'get_engine', lambda session_params=None: Engine())
+    return size
+
+def export_growth(result_rows, rows, export, **kwargs):
+    result_rows['rows'] = rows
+    written, seconds, growth = peak_rss_growth(lambda: export(sf_utils.SnowflakeUtils(**kwargs)))
+    return written, growth
+
+@pytest.mark.parametrize('sink, small, large, kwargs', [
+    ('parquet', 500_000, 4_000_000, {}),
+    ('csv', 125_000, 1_000_000, {}),
+    ('csv', 50_000, 400_000, {'fetch_mode': 'sqlalchemy'}),
+    ('xlsx', 5_000, 40_000, {}),
+])
+def test_peak_rss_stays_flat_as_result_grows(result_rows, tmp_path, sink, small, large, kwargs):
+    path = tmp_path / f"out.{sink}"
+    arrow = sink == 'parquet'
+    writer = {'parquet': sf_utils.write_parquet, 'csv': sf_utils.write_csv, 'xlsx': sf_utils.write_xlsx}[sink]
+
+    def export(utils):
+        return writer(utils.iter_query("SELECT * FROM big", batch_rows=50_000, arrow=arrow), str(path))
+
+    export_growth(result_rows, small, export, **kwargs)  # warm up allocator pools and imports
+    written_small, small_growth = export_growth(result_rows, small, export, **kwargs)
+    written_large, large_growth = export_growth(result_rows, large, export, **kwargs)
+    print(f"\n{sink}: {small:,} rows +{small_growth / 2**20:.0f} MB RSS, "
+          f"{large:,} rows +{large_growth / 2**20:.0f} MB RSS")
+    assert (written_small, written_large) == (small, large)
+    # 8x the rows, about the same peak: only one chunk and one batch are held at a time
+    assert large_growth < small_growth + 64 * 2**20
+
+def test_batches_are_bounded(result_rows):
+    result_rows['rows'] = 450_000
+    sizes = [len(batch) for batch in sf_utils.SnowflakeUtils().iter_query("SELECT * FROM big", batch_rows=100_000)]
+    assert sum(sizes) == 450_000 and max(sizes) == 100_000
+    assert all(isinstance(batch, pd.DataFrame) for batch in
+               sf_utils.SnowflakeUtils().iter_query("SELECT * FROM big", batch_rows=100_000))
+
+def test_empty_result_still_writes_the_header(result_rows, tmp_path):
+    result_rows['rows'] = 0
+    for kwargs in ({}, {'fetch_mode': 'sqlalchemy'}):
+        path = tmp_path / 'empty.csv'
+        assert sf_utils.write_csv(sf_utils.SnowflakeUtils(**kwargs).iter_query("SELECT * FROM big"), str(path)) == 0
+        assert path.read_text().splitlines() == ['id,amount,carrier']
+
+    utils = sf_utils.SnowflakeUtils()
+    assert sf_utils.write_parquet(utils.iter_query("SELECT * FROM big", arrow=True), str(tmp_path / 'empty.parquet')) == 0
+    assert pd.read_parquet(tmp_path / 'empty.parquet').columns.tolist() == ['id', 'amount', 'carrier']
+    assert sf_utils.write_xlsx(utils.iter_query("SELECT * FROM big"), str(tmp_path / 'empty.xlsx')) == 0
+    assert pd.read_excel(tmp_path / 'empty.xlsx').columns.tolist() == ['id', 'amount', 'carrier']
@@ -0,0 +1,125 @@
+"""Tests for the query health exporter against a stub history source."""
+
+import re
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+import src.metrics_exporter as metrics_exporter
+from src.metrics_exporter import QueryHealthExporter
+
+_RANGE = re.compile(r"END_TIME_RANGE_(START|END) => '([^']+) \+00:00'")
+
+def query(query_id, warehouse, ended_seconds_ago=30, status='SUCCESS', elapsed=2.0, queued=0.5, error_code=None):
+    now = datetime.utcnow()
+    end = None if status == 'RUNNING' else now - timedelta(seconds=ended_seconds_ago)
+    return {'QUERY_ID': query_id, 'WAREHOUSE_NAME': warehouse, 'EXECUTION_STATUS': status,
+            'ERROR_CODE': error_code, 'START_TIME': now - timedelta(seconds=ended_seconds_ago + elapsed),
+            'END_TIME': end, 'TOTAL_ELAPSED_TIME': elapsed * 1000, 'QUEUED_OVERLOAD_TIME': queued * 1000,
+            'QUEUED_PROVISIONING_TIME': 0, 'CREDITS_USED_CLOUD_SERVICES': 0.001}
+
+class StubSource:
+    """Answers the exporter's table-function SQL from in-memory rows, honouring the time range and RESULT_LIMIT."""
+
+    def __init__(self, rows, fail=()):
+        self.rows = rows
+        self.fail = set(fail)
+        self.calls = []
+
+    def run_many(self, queries, max_workers=None, use_cache=None):
+        self.calls.append(dict(queries))
+        results = {}
+        for name, sql in queries.items():
+            if name in self.fail:
+                results[name] = {'data': None, 'error': 'stub failure', 'elapsed_seconds': 0}
+            elif name == 'metering':
+                results[name] = {'data': pd.DataFrame({'WAREHOUSE_NAME': ['ETL_WH'], 'START_TIME': [datetime.utcnow()],
+                                                       'CREDITS_USED': [0.75]}), 'error': None, 'elapsed_seconds': 0}
+            else:
+                results[name] = {'data': self._history(name.split(':', 1)[1], sql), 'error': None,
+                                 'elapsed_seconds': 0}
+        return results
+
+    def _history(self, warehouse, sql):
+        bounds = {kind: datetime.fromisoformat(value) for kind, value in _RANGE.findall(sql)}
+        df = pd.DataFrame(self.rows)
+        df = df[df['WAREHOUSE_NAME'] == warehouse] if warehouse else df
+        ended = df['END_TIME'].notna()
+        keep = ~ended if 'END' not in bounds else pd.Series(False, index=df.index)
+        in_range = ended & (df['END_TIME'] >= bounds['START'])
+        if 'END' in bounds:
+            in_range &= df['END_TIME'] <= bounds['END']
+        # Newest first, cut at RESULT_LIMIT like the table functions
+        df = df[keep | in_range].sort_values('START_TIME', ascending=False)
+        return df.head(metrics_exporter.RESULT_LIMIT).reset_index(drop=True)
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+def test_poll_counts_finished_and_active_queries():
+    rows = [query(f'e{i}', 'ETL_WH', ended_seconds_ago=10 + i) for i in range(4)]
+    rows += [query('f1', 'ETL_WH', status='FAILED_WITH_ERROR', error_code='100038'),
+             query('r1', 'BI_WH', status='RUNNING'), query('q1', 'BI_WH', status='QUEUED')]
+    exporter = QueryHealthExporter(StubSource(rows), ['ETL_WH', 'BI_WH'])
+    result = exporter.poll()
+    assert (result['finished'], result['active'], result['errors']) == (5, 2, {})
+    text = exporter.render()
+    assert 'snowflake_queries_total{warehouse="ETL_WH",status="success"} 4' in text
+    assert 'snowflake_query_failures_total{warehouse="ETL_WH",error_code="100038"} 1' in text
+    assert 'snowflake_running_queries{warehouse="BI_WH"} 1' in text
+    assert 'snowflake_queued_queries{warehouse="BI_WH"} 1' in text
+    assert 'snowflake_query_elapsed_seconds_count{warehouse="ETL_WH"} 5' in text
+    assert 'snowflake_warehouse_credits_used_current_hour{warehouse="ETL_WH"} 0.75' in text
+    assert text.endswith('# EOF\n')
+
+def test_overlapping_polls_do_not_double_count():
+    source = StubSource([query(f'e{i}', 'ETL_WH') for i in range(3)])
+    exporter = QueryHealthExporter(source, ['ETL_WH'])
+    exporter.poll()
+    source.rows.append(query('late', 'ETL_WH', ended_seconds_ago=5))
+    assert exporter.poll()['finished'] == 1
+    assert 'snowflake_queries_total{warehouse="ETL_WH",status="success"} 4' in exporter.render()
+
+def test_failed_source_is_reported_and_retried():
+    source = StubSource([query('e1', 'ETL_WH'), query('b1', 'BI_WH')], fail={'history:BI_WH'})
+    exporter = QueryHealthExporter(source, ['ETL_WH', 'BI_WH'])
+    assert exporter.poll()['errors'] == {'history:BI_WH': 'stub failure'}
+    source.fail.clear()
+    assert exporter.poll()['finished'] == 1
+    assert 'snowflake_exporter_poll_errors_total 1' in exporter.render()
+
+def test_truncated_history_is_paged(monkeypatch):
+    monkeypatch.setattr(metrics_exporter, 'RESULT_LIMIT', 10)
+    source = StubSource([query(f'e{i}', 'ETL_WH', ended_seconds_ago=5 + i) for i in range(25)])
+    exporter = QueryHealthExporter(source, ['ETL_WH'])
+    assert exporter.poll()['finished'] == 25
+    # One full page, then pages ending at the oldest end_time seen, until one comes back short
+    history_calls = [call for call in source.calls if 'history:ETL_WH' in call]
+    assert len(history_calls) == 3
+    assert 'END_TIME_RANGE_END' not in history_calls[0]['history:ETL_WH']
+    assert 'END_TIME_RANGE_END' in history_calls[1]['history:ETL_WH']
+
+def test_prometheus_format_names_counter_families_total():
+    exporter = QueryHealthExporter(StubSource([query('e1', 'ETL_WH')]), ['ETL_WH'])
+    exporter.poll()
+    text = exporter.render(openmetrics=False)
+    assert sample(text, '# TYPE snowflake_queries') == ['# TYPE snowflake_queries_total counter']
+    assert '# EOF' not in text
+
+def test_serve_exposes_metrics_over_http():
+    exporter = QueryHealthExporter(StubSource([query('e1', 'ETL_WH')]), ['ETL_WH'])
+    port = 19464
+    thread = threading.Thread(target=exporter.serve, kwargs={'port': port, 'interval': 0.2, 'polls': 3}, daemon=True)
+    thread.start()
+    for _ in range(50):
+        if exporter.polls:
+            break
+        threading.Event().wait(0.05)
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/metrics',
+                                     headers={'Accept': 'application/openmetrics-text'})
+    with urllib.request.urlopen(request) as response:
+        assert response.headers['Content-Type'].startswith('application/openmetrics-text')
+        assert 'snowflake_queries_total' in response.read().decode()
+    thread.join(timeout=5)
+    assert exporter.polls == 3
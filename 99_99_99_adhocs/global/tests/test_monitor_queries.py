@@ -0,0 +1,177 @@
+"""Tests for the query monitor's mirror: sync defaults and parity with the live SQL reports."""
+
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import load_script, AccountUsageStandIn
+from src.history_store import QueryHistoryStore, HISTORY_COLUMNS, LATE_ARRIVAL
+
+def history_rows(n: int, now: datetime, seed: int = 0) -> pd.DataFrame:
+    """Finished QUERY_HISTORY rows over the last 48 hours, with no ties in any ranked column."""
+    rng = np.random.default_rng(seed)
+    # Distinct start offsets, none within 10 minutes of the 24-hour cutoff
+    offsets = rng.choice(np.r_[60:86_400 - 600, 86_400 + 600:172_800], n, replace=False)
+    start = pd.to_datetime(now) - pd.to_timedelta(offsets, unit='s')
+    elapsed = rng.permutation(n) * 997 + 1_000 + rng.integers(0, 900, n)
+    status = np.where(rng.random(n) < 0.15, 'FAIL', 'SUCCESS')
+    df = pd.DataFrame({column: None for column in HISTORY_COLUMNS}, index=range(n))
+    df = df.assign(
+        query_id=[f"01b{i:05d}" for i in range(n)],
+        query_text=[f"select * from t{i % 7} where id = {i}" for i in range(n)],
+        query_type='SELECT',
+        user_name=rng.choice(['ANA', 'BEN', 'CHO'], n),
+        role_name='ANALYST',
+        warehouse_name=rng.choice(['RISK_WH', 'ETL_WH', 'BI_WH'], n),
+        warehouse_size='Small',
+        warehouse_type='STANDARD',
+        session_id=rng.integers(1, 50, n),
+        execution_status=status,
+        error_code=np.where(status == 'FAIL', '000603', None),
+        error_message=np.where(status == 'FAIL', 'SQL execution internal error', None),
+        start_time=start,
+        end_time=start + pd.to_timedelta(elapsed, unit='ms'),
+        total_elapsed_time=elapsed,
+        compilation_time=elapsed // 10,
+        execution_time=elapsed - elapsed // 10,
+        queued_provisioning_time=rng.integers(0, 500, n),
+        queued_overload_time=rng.integers(0, 500, n),
+        bytes_scanned=rng.integers(0, 10**10, n),
+        bytes_spilled_to_local_storage=0,
+        bytes_spilled_to_remote_storage=0,
+        rows_produced=rng.integers(0, 10**6, n),
+        credits_used_cloud_services=rng.permutation(n) / 1000 + 0.0001,
+    )
+    return df
+
+def _same(local: pd.DataFrame, live: pd.DataFrame) -> None:
+    local, live = local.reset_index(drop=True), live.reset_index(drop=True)
+    # Snowflake returns zoned timestamps; the mirror stores them as naive UTC
+    live = live.assign(**{column: live[column].dt.tz_convert('UTC').dt.tz_localize(None)
+                          for column in live.select_dtypes('datetimetz').columns})
+    assert list(local.columns) == list(live.columns)
+    pd.testing.assert_frame_equal(local, live, check_dtype=False, check_exact=False, rtol=1e-9)
+
+@pytest.fixture
+def account(monkeypatch, tmp_path):
+    monkeypatch.setenv('SNOWFLAKE_HISTORY_DIR', str(tmp_path))
+    now = datetime.utcnow()
+    return AccountUsageStandIn(query_history=history_rows(400, now),
+                               warehouse_metering_history=pd.DataFrame({
+                                   'warehouse_name': pd.Series(dtype=str), 'start_time': pd.Series(dtype='datetime64[ns]'),
+                                   'end_time': pd.Series(dtype='datetime64[ns]'), 'credits_used': pd.Series(dtype=float),
+                                   'credits_used_compute': pd.Series(dtype=float),
+                                   'credits_used_cloud_services': pd.Series(dtype=float)}))
+
+@pytest.fixture
+def monitors(account):
+    """(mirror monitor, live monitor) over the same stand-in account, mirror synced."""
+    script = load_script('monitor_queries')
+    store = QueryHistoryStore()
+    store.sync(account)
+    mirror, live = script.QueryMonitor(store=store), script.QueryMonitor(live=True)
+    mirror.utils = live.utils = account
+    return mirror, live
+
+def test_history_matches_the_live_window(monitors, account):
+    mirror, _ = monitors
+    history = mirror.history(24)
+    expected = account.query_to_df("SELECT * FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY "
+                                    "WHERE start_time >= DATEADD('hour', -24, CURRENT_TIMESTAMP())")
+    assert 0 < len(history) < 400
+    assert sorted(history['query_id']) == sorted(expected['query_id'])
+    # Narrower windows are sliced from the cached read
+    assert sorted(mirror.history(6)['query_id']) == sorted(expected.loc[
+        expected['start_time'] >= pd.Timestamp.now(tz='UTC') - timedelta(hours=6), 'query_id'])
+
+@pytest.mark.parametrize('report, kwargs', [
+    ('recent_queries', {'hours': 24}),
+    ('recent_queries', {'hours': 48, 'user_name': 'ana', 'min_credits': 0.05}),
+    ('expensive_queries', {'hours': 24, 'min_credits': 0.01}),
+    ('slow_queries', {'hours': 24, 'min_seconds': 30}),
+    ('failed_queries', {'hours': 48}),
+    ('warehouse_utilization', {'hours': 24}),
+])
+def test_local_reports_match_the_live_sql(monitors, report, kwargs):
+    mirror, live = monitors
+    local = getattr(mirror, f"{report}_local")(**kwargs)
+    assert len(local)
+    _same(local, live.utils.query_to_df(getattr(live, f"{report}_sql")(**kwargs)))
+
+def test_summary_matches_the_live_sql_except_running(monitors):
+    mirror, live = monitors
+    results = {mode: monitor.run_reports({'summary': ('query_stats', {'hours': 24})})['summary']
+               for mode, monitor in (('mirror', mirror), ('live', live))}
+    assert not results['mirror']['error'] and not results['live']['error']
+    local, remote = (results[mode]['data'].drop(columns='running_queries') for mode in ('mirror', 'live'))
+    _same(local, remote)
+    assert results['mirror']['data']['running_queries'].isna().all()
+
+def test_sync_rereads_late_arrivals_and_dedups(account):
+    store = QueryHistoryStore()
+    rows = history_rows(50, datetime.utcnow(), seed=1)
+    account.set_view('query_history', rows)
+    assert store.sync(account)['rows_fetched'] == 50
+    watermark = store.watermark
+
+    latest = rows['end_time'].idxmax()
+    late = history_rows(2, datetime.utcnow(), seed=2).assign(query_id=['late-1', 'late-2'])
+    # late-1 lands inside the re-read window, late-2 too far behind the watermark
+    late['end_time'] = [watermark - LATE_ARRIVAL / 2, watermark - LATE_ARRIVAL * 2]
+    changed = rows.copy()
+    changed.loc[latest, 'credits_used_cloud_services'] = 99.0
+    account.set_view('query_history', pd.concat([changed, late], ignore_index=True))
+
+    result = store.sync(account)
+    assert result['since'] == watermark - LATE_ARRIVAL
+    stored = store.load()
+    assert len(stored) == 51 and stored['query_id'].is_unique
+    assert 'late-1' in set(stored['query_id']) and 'late-2' not in set(stored['query_id'])
+    assert stored.set_index('query_id').loc[rows.loc[latest, 'query_id'], 'credits_used_cloud_services'] == 99.0
+
+def _main(script, monkeypatch, account, *argv):
+    monkeypatch.setattr(script, 'SnowflakeUtils', lambda *args, **kwargs: account)
+    monkeypatch.setattr(sys, 'argv', ['monitor_queries.py', *argv])
+    script.main()
+
+def _syncs(account):
+    return [sql for sql in account.executed if 'end_time >' in sql and 'QUERY_HISTORY' in sql]
+
+def test_without_a_mirror_reports_live_and_does_not_backfill(account, monkeypatch, capsys):
+    script = load_script('monitor_queries')
+    _main(script, monkeypatch, account, '--hours', '24')
+    out = capsys.readouterr().out
+    assert _syncs(account) == []
+    assert QueryHistoryStore().watermark is None
+    assert 'No local mirror yet' in out and '--sync-history' in out
+    assert 'Running Queries: 0' in out
+    assert 'from Snowflake' in out
+
+def test_existing_mirror_is_synced_incrementally_by_default(account, monkeypatch, capsys):
+    script = load_script('monitor_queries')
+    store = QueryHistoryStore()
+    store.sync(account)
+    watermark = store.watermark
+    account.executed.clear()
+    _main(script, monkeypatch, account, '--hours', '24')
+    out = capsys.readouterr().out
+    assert len(_syncs(account)) == 1
+    assert f"{watermark - LATE_ARRIVAL:%Y-%m-%d %H:%M:%S}" in _syncs(account)[0]
+    assert 'Mirror synced' in out and 'from local mirror' in out
+    assert 'Running Queries: n/a' in out
+
+def test_no_sync_reports_from_the_mirror_as_it_is(account, monkeypatch, capsys):
+    script = load_script('monitor_queries')
+    QueryHistoryStore().sync(account)
+    account.executed.clear()
+    _main(script, monkeypatch, account, '--hours', '24', '--no-sync')
+    assert _syncs(account) == []
+    assert 'without syncing' in capsys.readouterr().out
+
+def test_sync_history_creates_the_mirror(account, monkeypatch, capsys):
+    script = load_script('monitor_queries')
+    _main(script, monkeypatch, account, '--hours', '24', '--sync-history')
+    assert len(_syncs(account)) == 1
+    assert QueryHistoryStore().watermark is not None
+    assert 'from local mirror' in capsys.readouterr().out
@@ -0,0 +1,94 @@
+"""query_cost_estimator.py directory mode: ranking, one shared metadata lookup and bad files."""
+
+import pytest
+import src.table_metadata as table_metadata
+from src.table_metadata import TableMetadataCache
+from conftest import load_script, FakeInformationSchema
+
+estimator_script = load_script("query_cost_estimator")
+
+GB = 1024 ** 3
+TABLES = {
+    'RISK.TEST.ORDERS': (1_000_000, 3 * GB, '2026-10-01 00:00:00'),
+    'RISK.TEST.CUSTOMERS': (50_000, 1 * GB, '2026-10-01 00:00:00'),
+    'RISK.TEST.PAYMENTS': (2_000_000, 2 * GB, '2026-10-01 00:00:00'),
+}
+
+FILES = {
+    'a_small.sql': "SELECT id, amount FROM orders WHERE order_date >= '2025-01-01';",
+    'b_heavy.sql': ("USE SCHEMA risk.test;\n"
+                    "SELECT * FROM orders o, customers c;\n"
+                    "\n"
+                    "SELECT DISTINCT region FROM customers WHERE active ORDER BY region;"),
+    'nested/c_mid.sql': "SELECT id FROM payments WHERE id IN (SELECT id FROM orders WHERE amount > 0);",
+    # Too deeply nested to parse: the analysis raises instead of reporting a parse error
+    'd_broken.sql': "SELECT " + "(" * 3000 + "1" + ")" * 3000 + " FROM orders;",
+}
+
+@pytest.fixture
+def schema(monkeypatch):
+    fake = FakeInformationSchema(dict(TABLES))
+    monkeypatch.setattr(table_metadata, 'read_dataframe', fake.read_dataframe)
+    monkeypatch.setattr(table_metadata, 'connection_settings', lambda: {'database': 'RISK', 'schema': 'TEST'})
+    return fake
+
+@pytest.fixture
+def sql_dir(tmp_path):
+    directory = tmp_path / 'sql'
+    for name, sql in FILES.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(sql, encoding='utf-8')
+    # A directory matching *.sql cannot be read as a file
+    (directory / 'e_folder.sql').mkdir()
+    return directory
+
+def test_statements_are_ranked_by_estimated_credits(schema, sql_dir, tmp_path):
+    estimator = estimator_script.QueryCostEstimator(metadata=TableMetadataCache(str(tmp_path / 'metadata.json')))
+    result = estimator.estimate_directory(sql_dir, workers=4)
+
+    ranked = [(item['file'], item['line'], item['analysis']['complexity_score']) for item in result['statements']]
+    # SELECT * + cross join + unfiltered; DISTINCT with ORDER BY; one subquery; nothing to flag
+    assert ranked == [('b_heavy.sql', 2, 11), ('b_heavy.sql', 4, 3), ('nested/c_mid.sql', 1, 1), ('a_small.sql', 1, 0)]
+    for item in result['statements']:
+        analysis = item['analysis']
+        # 30 seconds, +20% per complexity point, at 4 credits/hour on MEDIUM
+        assert analysis['estimated_credits'] == pytest.approx(0.5 * (1 + 0.2 * analysis['complexity_score']) / 60 * 4)
+    assert result['total_credits'] == pytest.approx(sum(i['analysis']['estimated_credits'] for i in result['statements']))
+    assert result['files'] == 5
+
+def test_table_stats_for_all_files_share_one_lookup(schema, sql_dir, tmp_path):
+    metadata = TableMetadataCache(str(tmp_path / 'metadata.json'))
+    result = estimator_script.QueryCostEstimator(metadata=metadata).estimate_directory(sql_dir)
+
+    assert len(schema.queries) == 1
+    assert all(f"'{table}'" in schema.queries[0] for table in ('ORDERS', 'CUSTOMERS', 'PAYMENTS'))
+    stats = result['metadata_stats']
+    assert (stats['misses'], stats['round_trips']) == (3, 1)
+    referenced = {(item['file'], item['line']): item['referenced_gb'] for item in result['statements']}
+    assert referenced == {('b_heavy.sql', 2): 4.0, ('b_heavy.sql', 4): 1.0,
+                          ('nested/c_mid.sql', 1): 5.0, ('a_small.sql', 1): 3.0}
+
+    # A second scan sharing the cache asks Snowflake nothing
+    again = estimator_script.QueryCostEstimator(metadata=metadata).estimate_directory(sql_dir)
+    assert len(schema.queries) == 1
+    assert again['metadata_stats']['hits'] == 3
+
+def test_bad_files_are_reported_without_aborting_the_scan(schema, sql_dir, tmp_path):
+    estimator = estimator_script.QueryCostEstimator(metadata=TableMetadataCache(str(tmp_path / 'metadata.json')))
+    result = estimator.estimate_directory(sql_dir, workers=2)
+
+    assert len(result['statements']) == 4
+    errors = [(error['file'], error['line']) for error in result['errors']]
+    assert errors == [('d_broken.sql', 1), ('e_folder.sql', None)]
+    assert 'RecursionError' in result['errors'][0]['error']
+
+    output = estimator_script.format_directory_output(result)
+    assert '2 files/statements skipped' in output
+    assert 'd_broken.sql:1: RecursionError' in output
+
+def test_no_table_stats_skips_the_lookup(schema, sql_dir, tmp_path):
+    estimator = estimator_script.QueryCostEstimator(metadata=TableMetadataCache(str(tmp_path / 'metadata.json')))
+    result = estimator.estimate_directory(sql_dir, table_stats=False)
+    assert schema.queries == [] and result['metadata_stats'] is None
+    assert all(item['referenced_gb'] == 0 for item in result['statements'])
@@ -0,0 +1,120 @@
+"""Operator profiles on hand-built GET_QUERY_OPERATOR_STATS rows: findings, waste and the ranking."""
+
+import json
+import pandas as pd
+import pytest
+from conftest import load_script
+from src.query_profile import ProfileStore, parse_operators, analyze_profile, build_profile
+
+GB = 1024 ** 3
+
+def operator(operator_id, kind, time_pct, parents=(), statistics=None, breakdown=None, attributes=None):
+    """One GET_QUERY_OPERATOR_STATS row; VARIANT columns arrive as JSON text."""
+    return {
+        'QUERY_ID': 'q', 'STEP_ID': 1, 'OPERATOR_ID': operator_id, 'OPERATOR_TYPE': kind,
+        'PARENT_OPERATORS': json.dumps(list(parents)),
+        'OPERATOR_STATISTICS': json.dumps(statistics or {}),
+        'EXECUTION_TIME_BREAKDOWN': json.dumps({'overall_percentage': time_pct, **(breakdown or {})}),
+        'OPERATOR_ATTRIBUTES': json.dumps(attributes or {}),
+    }
+
+def stats(join_output=50_000, spill=True, scanned=900):
+    return pd.DataFrame([
+        operator(0, 'Result', 5.0),
+        # 50x explosion that also spilled to remote storage
+        operator(1, 'Join', 40.0, [0], {'input_rows': 1_000, 'output_rows': join_output,
+                                        'spilling': {'bytes_spilled_remote_storage': GB if spill else 0}},
+                 {'remote_disk_io': 10.0}, {'equality_join_condition': '(O.CUSTOMER_ID = C.ID)'}),
+        operator(2, 'Aggregate', 30.0, [1], {'spilling': {'bytes_spilled_local_storage': 2 * GB if spill else 0}},
+                 {'local_disk_io': 20.0}),
+        operator(3, 'TableScan', 20.0, [1], {'pruning': {'partitions_scanned': scanned, 'partitions_total': 1_000},
+                                              'io': {'bytes_scanned': 5 * GB}},
+                 attributes={'table_name': 'RISK.TEST.ORDERS'}),
+        # Too few partitions to judge pruning; a 9x join is not exploding
+        operator(4, 'TableScan', 5.0, [5], {'pruning': {'partitions_scanned': 50, 'partitions_total': 50}}),
+        operator(5, 'Join', 0.0, [1], {'input_rows': 100, 'output_rows': 900}),
+    ])
+
+def test_parse_operators_reads_the_variant_columns():
+    ops = {op['operator_id']: op for op in parse_operators(stats())}
+    assert ops[1]['parents'] == [0] and ops[1]['output_rows'] == 50_000
+    assert ops[1]['spilled_remote'] == GB and ops[2]['spilled_local'] == 2 * GB
+    assert ops[3]['partitions_scanned'] == 900 and ops[3]['bytes_scanned'] == 5 * GB
+    assert ops[2]['disk_io_pct'] == 20.0 and ops[0]['partitions_total'] is None
+
+def test_findings_and_waste_by_hand():
+    result = analyze_profile(parse_operators(stats()), execution_seconds=100)
+    findings = [(f['type'], f['operator_id'], f['waste_seconds']) for f in result['findings']]
+    assert findings == pytest.approx([
+        ('exploding_join', 1, 40.0),   # 40% of 100s
+        ('spill', 2, 20.0),            # local disk I/O share
+        ('spill', 1, 10.0),            # remote disk I/O share
+        ('poor_pruning', 3, 20.0 * (0.9 - 0.8) / 0.9),
+    ])
+    assert 'outputs 50x its input rows (1,000 -> 50,000) on (O.CUSTOMER_ID = C.ID)' in result['findings'][0]['detail']
+    assert 'RISK.TEST.ORDERS read 900/1,000 partitions' in result['findings'][3]['detail']
+    # The join's spill is counted once, under its larger explosion estimate
+    assert result['waste_seconds'] == pytest.approx(40 + 20 + 20 * 0.1 / 0.9)
+    assert [op['operator_id'] for op in result['top_operators']] == [1, 2, 3]
+    assert result['pruning_ratio'] == pytest.approx(950 / 1050)
+
+def test_clean_profile_has_no_findings():
+    result = analyze_profile(parse_operators(stats(join_output=1_000, spill=False, scanned=100)), 100)
+    assert result['findings'] == [] and result['waste_seconds'] == 0
+
+class ProfilingUtils:
+    """run_many stand-in answering GET_QUERY_OPERATOR_STATS from prepared frames, counting fetches."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.fetched = []
+
+    def run_many(self, queries):
+        self.fetched.extend(queries)
+        return {key: {'data': self.frames[key], 'error': None} if key in self.frames else
+                {'data': None, 'error': 'Query not found'} for key in queries}
+
+SLOW = pd.DataFrame({
+    'query_id': ['clean', 'exploding', 'spilling', 'gone'],
+    'query_preview': ['select 1 from a', 'select * from o join c on o.id = c.id',
+                      'select k, count(*) from t group by k', 'select 2'],
+    'start_time': pd.to_datetime(['2026-10-02 10:00', '2026-10-02 11:00', '2026-10-02 12:00', '2026-10-02 13:00']),
+    'execution_seconds': [300.0, 100.0, 200.0, 50.0],
+})
+
+def test_profiles_are_ranked_by_waste_and_fetched_once(tmp_path):
+    script = load_script('monitor_queries')
+    monitor = script.QueryMonitor(live=True)
+    monitor.get_slow_queries = lambda hours, min_seconds: SLOW
+    monitor.utils = ProfilingUtils({
+        'clean': stats(join_output=1_000, spill=False, scanned=100),
+        'exploding': stats(spill=False, scanned=100),
+        'spilling': stats(join_output=1_000),
+    })
+    profiles = ProfileStore(str(tmp_path / 'profiles'))
+
+    ranked = monitor.profile_slow_queries(profiles=profiles)
+    # 40% of 100s exploding vs 20% + 10% spill disk I/O and over-read of 200s; the missing stats are skipped
+    assert [(p['query_id'], round(p['waste_seconds'], 2)) for p in ranked] == \
+        [('spilling', round(0.2 * 200 + 0.1 * 200 + 0.2 * 200 * 0.1 / 0.9, 2)), ('exploding', 40.0), ('clean', 0)]
+    assert sorted(monitor.utils.fetched) == ['clean', 'exploding', 'gone', 'spilling']
+
+    # Stored profiles are reused: only the query without stats is asked for again
+    monitor.utils.fetched.clear()
+    assert [p['query_id'] for p in monitor.profile_slow_queries(profiles=profiles)] == ['spilling', 'exploding', 'clean']
+    assert monitor.utils.fetched == ['gone']
+
+def test_previous_run_of_the_same_fingerprint_is_attached(tmp_path, monkeypatch):
+    profiles = ProfileStore(str(tmp_path / 'profiles'))
+    older = build_profile({'query_id': 'run-1', 'start_time': '2026-10-01 10:00:00', 'execution_seconds': 100},
+                          stats(), fingerprint='f1')
+    profiles.put(older)
+    script = load_script('monitor_queries')
+    monitor = script.QueryMonitor(live=True)
+    monitor.get_slow_queries = lambda hours, min_seconds: SLOW.iloc[[1]]
+    monitor.utils = ProfilingUtils({'exploding': stats(spill=False, scanned=100)})
+    monkeypatch.setattr(script, 'query_fingerprint', lambda text: 'f1')
+
+    profile, = monitor.profile_slow_queries(profiles=profiles)
+    assert profile['previous']['query_id'] == 'run-1'
+    assert profile['previous']['waste_seconds'] > profile['waste_seconds']
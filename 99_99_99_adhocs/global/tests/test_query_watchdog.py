@@ -0,0 +1,121 @@
+"""Tests for the runaway query watchdog against a simulated running-query feed."""
+
+import json
+import pandas as pd
+import pytest
+from src.query_watchdog import QueryWatchdog, evaluate, cancel_sql, running_queries_sql, MIN_ELAPSED_SECONDS
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+def running(query_id, elapsed=120, executing=None, bytes_scanned=GB, rows=1000, size='Small'):
+    """One running-query row as INFORMATION_SCHEMA returns it (uppercase columns, milliseconds)."""
+    return {
+        'QUERY_ID': query_id, 'QUERY_TEXT': f'select * from t_{query_id}', 'USER_NAME': 'ANALYST',
+        'ROLE_NAME': 'RISK', 'WAREHOUSE_NAME': 'RISK_WH', 'WAREHOUSE_SIZE': size, 'START_TIME': None,
+        'TOTAL_ELAPSED_TIME': elapsed * 1000,
+        'EXECUTION_TIME': (elapsed if executing is None else executing) * 1000,
+        'BYTES_SCANNED': bytes_scanned, 'ROWS_PRODUCED': rows,
+    }
+
+class FakeFeed:
+    """Stands in for SnowflakeUtils: a scripted feed per check and scripted cancel replies."""
+
+    def __init__(self, feeds, replies=None):
+        self.feeds = list(feeds)
+        self.replies = replies or {}
+        self.cancelled = []
+
+    def query_to_df(self, sql, use_cache=None):
+        assert sql == running_queries_sql()
+        return pd.DataFrame(self.feeds.pop(0) if len(self.feeds) > 1 else self.feeds[0])
+
+    def run_many(self, queries, max_workers=None, use_cache=None):
+        results = {}
+        for query_id, sql in queries.items():
+            assert sql == cancel_sql(query_id)
+            self.cancelled.append(query_id)
+            reply = self.replies.get(query_id, f'query [{query_id}] terminated.')
+            if isinstance(reply, Exception):
+                results[query_id] = {'data': None, 'error': str(reply), 'elapsed_seconds': 0}
+            else:
+                results[query_id] = {'data': pd.DataFrame({'STATUS': [reply]}), 'error': None,
+                                     'elapsed_seconds': 0}
+        return results
+
+@pytest.fixture
+def log_path(tmp_path):
+    return tmp_path / 'watchdog.jsonl'
+
+def lower(row):
+    return {key.lower(): value for key, value in row.items()}
+
+@pytest.mark.parametrize('row, budget', [
+    (running('a', elapsed=4000), 'elapsed'),
+    (running('b', bytes_scanned=2048 * GB), 'scanned'),
+    (running('c', elapsed=7200, size='4X-Large'), 'credits'),
+    (running('d', bytes_scanned=200 * MB, rows=10 ** 12), 'rows/MB'),
+])
+def test_each_budget_is_enforced(row, budget):
+    violations = evaluate(lower(row), {'max_elapsed_seconds': None, 'max_gb_scanned': 1024,
+                                       'max_credits': 10.0, 'max_rows_per_mb': 1_000_000}
+                          if budget != 'elapsed' else {'max_elapsed_seconds': 3600})
+    assert any(budget in v for v in violations), violations
+
+def test_within_budget_is_left_alone():
+    assert evaluate(lower(running('ok')), {'max_elapsed_seconds': 3600, 'max_gb_scanned': 1024,
+                                           'max_credits': 10.0, 'max_rows_per_mb': 1_000_000}) == []
+
+def test_young_queries_are_skipped():
+    row = running('young', elapsed=MIN_ELAPSED_SECONDS - 1, bytes_scanned=5000 * GB)
+    assert evaluate(lower(row), {'max_gb_scanned': 1}) == []
+
+def test_rows_per_mb_needs_a_minimum_scan():
+    # A GENERATOR query produces many rows from almost nothing scanned
+    row = running('gen', bytes_scanned=10 * 1024, rows=10 ** 9)
+    assert evaluate(lower(row), {'max_rows_per_mb': 1_000_000}) == []
+
+def test_dry_run_logs_without_cancelling(log_path):
+    feed = FakeFeed([[running('big', elapsed=4000), running('ok')]])
+    watchdog = QueryWatchdog(feed, dry_run=True, log_path=log_path)
+    decisions = watchdog.check()
+    assert [(d['query_id'], d['action']) for d in decisions] == [('big', 'would_cancel')]
+    assert feed.cancelled == []
+    logged = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert logged[0]['query_id'] == 'big' and logged[0]['violations']
+
+def test_cancelled_queries_are_not_cancelled_twice(log_path):
+    feed = FakeFeed([[running('big', elapsed=4000)]])
+    watchdog = QueryWatchdog(feed, log_path=log_path)
+    assert [d['action'] for d in watchdog.check()] == ['cancelled']
+    assert watchdog.check() == []
+    assert feed.cancelled == ['big']
+
+def test_failed_cancel_is_retried(log_path):
+    feed = FakeFeed([[running('big', elapsed=4000)]], replies={'big': RuntimeError('insufficient privileges')})
+    watchdog = QueryWatchdog(feed, log_path=log_path)
+    assert [d['action'] for d in watchdog.check()] == ['cancel_failed']
+    feed.replies = {}
+    assert [d['action'] for d in watchdog.check()] == ['cancelled']
+    assert feed.cancelled == ['big', 'big']
+
+def test_non_terminated_reply_is_a_failed_cancel(log_path):
+    feed = FakeFeed([[running('done', elapsed=4000)]],
+                    replies={'done': 'Identified SQL statement is not currently executing.'})
+    watchdog = QueryWatchdog(feed, log_path=log_path)
+    decision, = watchdog.check()
+    assert decision['action'] == 'cancel_failed'
+    assert 'not currently executing' in decision['error']
+    assert 'done' not in watchdog.handled
+
+def test_handled_ids_are_dropped_once_queries_stop(log_path):
+    feed = FakeFeed([[running('big', elapsed=4000)], [running('ok')]])
+    watchdog = QueryWatchdog(feed, log_path=log_path)
+    watchdog.check()
+    assert watchdog.handled == {'big'}
+    watchdog.check()
+    assert watchdog.handled == set()
+
+def test_own_session_is_excluded():
+    assert 'CURRENT_SESSION()' in running_queries_sql()
+    assert 'LAST_QUERY_ID' not in running_queries_sql()
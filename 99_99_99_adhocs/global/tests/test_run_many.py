@@ -0,0 +1,45 @@
+"""run_many against a latency-injecting local stand-in engine: wall time tracks the slowest query."""
+
+import time
+from src.sf_utils import SnowflakeUtils
+
+LATENCIES = {'metadata': 0.1, 'stats': 0.4, 'sample': 0.2, 'history': 0.3, 'warehouses': 0.25}
+
+def queries():
+    return {name: f"SELECT sleep({latency}) AS latency, '{name}' AS name" for name, latency in LATENCIES.items()}
+
+def timed_run_many(utils, batch, **kwargs):
+    started = time.perf_counter()
+    results = utils.run_many(batch, **kwargs)
+    return results, time.perf_counter() - started
+
+def test_wall_time_approaches_the_slowest_query(stand_in_engine):
+    utils = SnowflakeUtils(fetch_mode='sqlalchemy')
+    utils.run_many(queries(), max_workers=len(LATENCIES))  # open the pooled connections first
+    concurrent, concurrent_seconds = timed_run_many(utils, queries(), max_workers=len(LATENCIES))
+    serial, serial_seconds = timed_run_many(utils, queries(), max_workers=1)
+
+    print(f"\n{len(LATENCIES)} queries: concurrent {concurrent_seconds:.2f}s, serial {serial_seconds:.2f}s "
+          f"(slowest {max(LATENCIES.values())}s, sum {sum(LATENCIES.values()):.2f}s)")
+    assert list(concurrent) == list(LATENCIES)
+    for name, result in concurrent.items():
+        assert result['error'] is None
+        assert result['data'].to_dict('records') == [{'latency': LATENCIES[name], 'name': name}]
+        assert result['elapsed_seconds'] >= LATENCIES[name]
+    assert concurrent_seconds < max(LATENCIES.values()) + 0.15
+    assert serial_seconds >= sum(LATENCIES.values())
+
+def test_concurrency_is_bounded(stand_in_engine):
+    utils = SnowflakeUtils(fetch_mode='sqlalchemy')
+    batch = {f"q{i}": "SELECT sleep(0.1) AS v" for i in range(6)}
+    utils.run_many(batch, max_workers=2)
+    _, seconds = timed_run_many(utils, batch, max_workers=2)
+    # Six 0.1s queries, two at a time
+    assert 0.3 <= seconds < 0.45
+
+def test_failing_query_does_not_affect_the_others(stand_in_engine):
+    results = SnowflakeUtils(fetch_mode='sqlalchemy').run_many(
+        {'ok': "SELECT sleep(0.05) AS v", 'broken': "SELECT * FROM no_such_table", 'also_ok': "SELECT 2 AS v"})
+    assert results['broken']['data'] is None and 'no_such_table' in results['broken']['error']
+    assert results['ok']['data']['v'].tolist() == [0.05]
+    assert results['also_ok']['data']['v'].tolist() == [2]
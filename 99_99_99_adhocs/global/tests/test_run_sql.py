@@ -0,0 +1,71 @@
+"""Tests for run_sql.py result caching around statements that write tables."""
+
+import pytest
+from src.sf_cache import QueryCache
+from conftest import load_script
+
+run_sql = load_script("run_sql")
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchmany(self, n):
+        return self.rows[:n]
+
+    def keys(self):
+        return ['value']
+
+class FakeConnection:
+    """Returns the current row count of table X for SELECTs and counts executions."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def execute(self, clause):
+        sql = str(clause)
+        self.state['executed'].append(sql)
+        if sql.upper().startswith('CREATE'):
+            self.state['rows'] += 1
+            return FakeResult([])
+        return FakeResult([(self.state['rows'],)])
+
+    def close(self):
+        pass
+
+class FakeUtils:
+    def cache_key(self, stmt):
+        return QueryCache.make_key(stmt)
+
+@pytest.fixture
+def runner(monkeypatch, tmp_path):
+    state = {'rows': 0, 'executed': []}
+    monkeypatch.setattr(run_sql, 'get_connection', lambda: FakeConnection(state))
+    monkeypatch.setattr(run_sql, 'connection_settings', lambda: {'database': 'DB', 'schema': 'S'})
+    return state, QueryCache(cache_dir=str(tmp_path))
+
+def test_stale_reads_flags_reads_of_earlier_writes():
+    stmts = ["create or replace table x as select 1 a", "select count(*) from x", "select * from y",
+             "insert into y select * from z", "select * from db.s.y"]
+    assert run_sql.stale_reads(stmts, 'DB', 'S') == [False, True, False, False, True]
+
+def test_rerun_does_not_serve_stale_count(runner):
+    state, cache = runner
+    stmts = ["CREATE OR REPLACE TABLE x AS SELECT 1 a", "SELECT COUNT(*) FROM x"]
+    run_sql.run_sequential(stmts, FakeUtils(), cache, refresh=False)
+    run_sql.run_sequential(stmts, FakeUtils(), cache, refresh=False)
+    assert state['executed'].count("SELECT COUNT(*) FROM x") == 2
+    # The refreshed entry holds the second run's count
+    assert cache.get(FakeUtils().cache_key(stmts[1]))['value'].tolist() == [2]
+
+def test_unrelated_select_is_served_from_cache(runner):
+    state, cache = runner
+    stmts = ["CREATE OR REPLACE TABLE x AS SELECT 1 a", "SELECT * FROM other"]
+    run_sql.run_sequential(stmts, FakeUtils(), cache, refresh=False)
+    run_sql.run_sequential(stmts, FakeUtils(), cache, refresh=False)
+    assert state['executed'].count("SELECT * FROM other") == 1
+
+def test_cache_is_opt_in(runner):
+    state, _ = runner
+    run_sql.run_sequential(["SELECT * FROM other"] * 2, FakeUtils(), None, refresh=False)
+    assert len(state['executed']) == 2
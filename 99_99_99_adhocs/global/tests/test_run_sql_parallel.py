@@ -0,0 +1,93 @@
+"""run_sql.py --parallel on a latency-injecting stand-in engine: DAG ordering, failure propagation and the critical path."""
+
+import sys
+import time
+import pytest
+from src.sf_utils import SnowflakeUtils
+from conftest import load_script
+
+run_sql = load_script("run_sql")
+
+# a and b are independent; c reads a, d reads b, e reads c and d.
+# Critical path a -> c -> e = 0.30 + 0.20 + 0.05 = 0.55s of 1.00s serial.
+STATEMENTS = [
+    "/* latency 0.30 */ CREATE OR REPLACE TABLE a AS SELECT 1 AS v",
+    "/* latency 0.25 */ CREATE OR REPLACE TABLE b AS SELECT 2 AS v",
+    "/* latency 0.20 */ CREATE OR REPLACE TABLE c AS SELECT v * 10 AS v FROM a",
+    "/* latency 0.20 */ CREATE OR REPLACE TABLE d AS SELECT v * 10 AS v FROM b",
+    "/* latency 0.05 */ SELECT c.v + d.v AS total FROM c JOIN d",
+]
+LATENCIES = [0.30, 0.25, 0.20, 0.20, 0.05]
+
+@pytest.fixture
+def timed(stand_in_engine, tmp_path, monkeypatch):
+    """Shared stand-in database; records (start, end) per statement text as run_parallel executes them."""
+    stand_in_engine.database = str(tmp_path / 'warehouse.db')
+    spans = {}
+    execute = run_sql.execute_statement
+
+    def _execute(conn, stmt, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return execute(conn, stmt, *args, **kwargs)
+        finally:
+            spans[stmt] = (started, time.perf_counter())
+    monkeypatch.setattr(run_sql, 'execute_statement', _execute)
+    monkeypatch.setattr(run_sql, 'connection_settings', lambda: {'database': 'DB', 'schema': 'S'})
+    return spans
+
+def _run(stmts, workers=4):
+    deps = run_sql.build_dependencies(stmts, 'DB', 'S')
+    started = time.perf_counter()
+    durations = run_sql.run_parallel(stmts, deps, workers, SnowflakeUtils(fetch_mode='sqlalchemy'), None, False)
+    return deps, durations, time.perf_counter() - started
+
+def test_dependents_wait_for_their_writers(timed):
+    deps, durations, wall = _run(STATEMENTS)
+    assert deps == [set(), set(), {0}, {1}, {2, 3}]
+    spans = [timed[stmt] for stmt in STATEMENTS]
+    for j, upstream in enumerate(deps):
+        for i in upstream:
+            assert spans[j][0] >= spans[i][1], f"statement {j + 1} started before {i + 1} finished"
+    # Independent statements overlap
+    assert spans[1][0] < spans[0][1] and spans[3][0] < spans[0][1]
+    serial = sum(durations.values())
+    print(f"\nserial {serial:.2f}s, wall {wall:.2f}s, speedup {serial / wall:.2f}x")
+    assert serial >= sum(LATENCIES)
+    assert wall < sum(LATENCIES) - 0.25
+
+def test_critical_path_follows_the_slowest_chain(timed):
+    deps, durations, wall = _run(STATEMENTS)
+    seconds, path = run_sql.critical_path(deps, durations)
+    assert path == [0, 2, 4]
+    assert seconds == pytest.approx(sum(durations[i] for i in path))
+    assert 0.55 <= seconds <= wall
+
+def test_critical_path_on_hand_durations():
+    deps = [set(), set(), {0}, {1}, {2, 3}]
+    assert run_sql.critical_path(deps, {0: 1.0, 1: 5.0, 2: 1.0, 3: 1.0, 4: 2.0}) == (8.0, [1, 3, 4])
+    assert run_sql.critical_path(deps, {0: 3.0, 1: 1.0, 2: 1.0, 3: 1.0, 4: 2.0}) == (6.0, [0, 2, 4])
+    assert run_sql.critical_path([], {}) == (0.0, [])
+
+def test_failure_skips_dependents_and_lets_running_statements_finish(timed, capsys):
+    stmts = [
+        "/* latency 0.05 */ CREATE OR REPLACE TABLE a AS SELECT v FROM missing_table",
+        "/* latency 0.30 */ CREATE OR REPLACE TABLE b AS SELECT 2 AS v",
+        "CREATE OR REPLACE TABLE c AS SELECT v FROM a",
+        "CREATE OR REPLACE TABLE d AS SELECT v FROM b",
+    ]
+    with pytest.raises(Exception, match='missing_table'):
+        _run(stmts)
+    # b was already running and completes; c (reads a) and d (reads b) never start
+    assert stmts[1] in timed and stmts[2] not in timed and stmts[3] not in timed
+    assert 'Skipped 2 statements: 3, 4' in capsys.readouterr().out
+
+def test_main_reports_the_critical_path_and_speedup(timed, tmp_path, monkeypatch, capsys):
+    sql_file = tmp_path / 'dag.sql'
+    sql_file.write_text(';\n'.join(STATEMENTS) + ';\n', encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['run_sql.py', str(sql_file), '--parallel', '4'])
+    run_sql.main()
+    out = capsys.readouterr().out
+    assert 'Critical path: 1 -> 3 -> 5' in out
+    speedup = float(out.split('speedup ')[1].split('x')[0])
+    assert speedup > 1.3
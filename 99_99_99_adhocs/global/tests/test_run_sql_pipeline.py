@@ -0,0 +1,112 @@
+"""run_sql.py pipeline mode on the stand-in engine: checkpoint skips, invalidation, resume and bad state files."""
+
+import json
+import pytest
+from src.sf_utils import SnowflakeUtils
+from conftest import load_script
+
+run_sql = load_script("run_sql")
+
+PIPELINE = {
+    '010_raw.sql': "CREATE OR REPLACE TABLE raw AS SELECT 1 AS id, 10 AS amount UNION ALL SELECT 2, 20;",
+    '020_clean.sql': "CREATE OR REPLACE TABLE clean AS SELECT id, amount * 2 AS amount FROM raw;",
+    '030_lookup.sql': "CREATE OR REPLACE TABLE lookup AS SELECT 1 AS id, 'a' AS label;",
+    '040_report.sql': ("CREATE OR REPLACE TABLE report AS\n"
+                       "SELECT c.id, c.amount, l.label FROM clean c LEFT JOIN lookup l ON l.id = c.id;\n"
+                       "SELECT COUNT(*) FROM report;"),
+}
+
+@pytest.fixture
+def pipeline(stand_in_engine, tmp_path):
+    """Write PIPELINE into a directory and return a runner reporting (executed, skipped, statements run)."""
+    stand_in_engine.database = str(tmp_path / 'warehouse.db')
+    directory = tmp_path / 'sql'
+    directory.mkdir()
+    for name, sql in PIPELINE.items():
+        (directory / name).write_text(sql, encoding='utf-8')
+    state_path = directory / run_sql.STATE_FILENAME
+
+    def run(**kwargs):
+        before = len(stand_in_engine.statements)
+        executed, skipped = run_sql.run_pipeline(directory, state_path, SnowflakeUtils(fetch_mode='sqlalchemy'),
+                                                 None, False, **kwargs)
+        # Leave out the pool's connection checks
+        ran = [sql for sql in stand_in_engine.statements[before:] if sql != 'SELECT 1' and not sql.startswith('PRAGMA')]
+        return executed, skipped, ran
+    return directory, state_path, run
+
+def _report():
+    from src.sf_client import get_connection
+    from sqlalchemy import text
+    with get_connection() as conn:
+        return conn.execute(text("SELECT id, amount, label FROM report ORDER BY id")).fetchall()
+
+def test_unchanged_statements_are_skipped_on_rerun(pipeline):
+    directory, state_path, run = pipeline
+    assert run()[:2] == (5, 0)
+    assert len(json.loads(state_path.read_text())['completed']) == 4
+
+    executed, skipped, ran = run()
+    # Only the read-only SELECT runs again
+    assert (executed, skipped) == (1, 4)
+    assert ran == ["SELECT COUNT(*) FROM report"]
+    assert _report() == [(1, 20, 'a'), (2, 40, None)]
+
+def test_editing_upstream_reruns_only_its_dependents(pipeline):
+    directory, _, run = pipeline
+    run()
+    (directory / '010_raw.sql').write_text(
+        "CREATE OR REPLACE TABLE raw AS SELECT 1 AS id, 15 AS amount UNION ALL SELECT 2, 25;", encoding='utf-8')
+    executed, skipped, ran = run()
+    # raw, clean and report are rebuilt; lookup does not read raw
+    assert (executed, skipped) == (4, 1)
+    assert not any(sql.startswith("CREATE OR REPLACE TABLE lookup") for sql in ran)
+    assert _report() == [(1, 30, 'a'), (2, 50, None)]
+
+def test_formatting_edits_keep_checkpoints(pipeline):
+    directory, _, run = pipeline
+    run()
+    path = directory / '020_clean.sql'
+    path.write_text("-- doubled amounts\nCREATE OR REPLACE TABLE clean AS\n  SELECT id, amount * 2 AS amount\n  FROM raw;",
+                    encoding='utf-8')
+    assert run()[:2] == (1, 4)
+
+def test_statement_hashes_propagate_downstream():
+    stmts = [PIPELINE['010_raw.sql'], PIPELINE['020_clean.sql'], PIPELINE['030_lookup.sql'],
+             PIPELINE['040_report.sql'].split(';')[0]]
+    deps = run_sql.build_dependencies(stmts)
+    assert deps == [set(), {0}, set(), {1, 2}]
+    before = run_sql.statement_hashes(stmts, deps)
+    after = run_sql.statement_hashes([stmts[0].replace('10', '11')] + stmts[1:], deps)
+    assert [b != a for b, a in zip(before, after)] == [True, True, False, True]
+
+def test_failure_mid_directory_resumes_at_the_failed_statement(pipeline):
+    directory, state_path, run = pipeline
+    (directory / '080_summary.sql').write_text(
+        "CREATE OR REPLACE TABLE summary AS SELECT SUM(amount) AS total FROM reprot;", encoding='utf-8')
+    with pytest.raises(Exception, match='reprot'):
+        run()
+    completed = json.loads(state_path.read_text())['completed']
+    assert sorted(entry['file'] for entry in completed.values()) == sorted(PIPELINE)
+
+    (directory / '080_summary.sql').write_text(
+        "CREATE OR REPLACE TABLE summary AS SELECT SUM(amount) AS total FROM report;", encoding='utf-8')
+    executed, skipped, ran = run()
+    # Everything before 080 is checkpointed; only 080 and the read-only SELECT run
+    assert (executed, skipped) == (2, 4)
+    assert ran[-1].startswith("CREATE OR REPLACE TABLE summary")
+    assert run()[:2] == (1, 5)
+
+@pytest.mark.parametrize('content', ['{"completed": {"abc": ', '[]', '{"completed": []}', '\udcff'])
+def test_corrupt_state_file_reruns_everything(pipeline, content):
+    directory, state_path, run = pipeline
+    run()
+    state_path.write_bytes(content.encode('utf-8', 'surrogateescape'))
+    assert run()[:2] == (5, 0)
+    assert len(json.loads(state_path.read_text())['completed']) == 4
+    assert run()[:2] == (1, 4)
+
+def test_restart_ignores_checkpoints(pipeline):
+    _, _, run = pipeline
+    run()
+    assert run(restart=True)[:2] == (5, 0)
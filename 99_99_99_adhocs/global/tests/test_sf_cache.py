@@ -0,0 +1,114 @@
+"""QueryCache: TTL expiry, LRU eviction by size, hit/miss statistics and concurrent writers."""
+
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import src.sf_cache as sf_cache
+from src.sf_cache import QueryCache
+
+def frame(value, rows=1_000):
+    return pd.DataFrame({'id': np.arange(rows), 'value': np.full(rows, value, dtype=np.int64)})
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sf_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_round_trip_and_statistics(tmp_path):
+    cache = QueryCache(str(tmp_path), default_ttl=60)
+    key = QueryCache.make_key("select * from t", {'role': 'ANALYST'})
+    assert key == QueryCache.make_key("select *\n  from t;  -- comment", {'role': 'ANALYST'})
+    assert key != QueryCache.make_key("select * from t", {'role': 'ADMIN'})
+
+    assert cache.get(key) is None
+    assert cache.put(key, frame(1), query="select * from t")
+    pd.testing.assert_frame_equal(cache.get(key), frame(1))
+    cache.get(key)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['lifetime_hit_rate'] == pytest.approx(200 / 3)
+
+    # Lifetime counts live in the index; process counts start over
+    other = QueryCache(str(tmp_path))
+    other.get(key)
+    stats = other.stats()
+    assert (stats['hits'], stats['misses'], stats['lifetime_hits'], stats['lifetime_misses']) == (1, 0, 3, 1)
+
+    other.clear()
+    assert other.stats()['entries'] == 0 and other.stats()['lifetime_hits'] == 0
+    assert list(tmp_path.glob('*.parquet')) == []
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = QueryCache(str(tmp_path), default_ttl=60)
+    cache.put('default', frame(1))
+    cache.put('short', frame(2), ttl=10)
+    clock[0] += 30
+    assert cache.get('short') is None and cache.get('default') is not None
+    assert not (tmp_path / 'short.parquet').exists()
+    clock[0] += 31
+    assert cache.get('default') is None
+    assert cache.stats()['entries'] == 0 and cache.stats()['misses'] == 2
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path, clock):
+    cache = QueryCache(str(tmp_path), default_ttl=3600)
+    cache.put('a', frame(1))
+    size = cache.stats()['total_mb'] * 1024 * 1024
+    cache.max_bytes = int(size * 2.5)
+
+    clock[0] += 1
+    cache.put('b', frame(2))
+    clock[0] += 1
+    cache.get('a')  # a is now more recent than b
+    clock[0] += 1
+    cache.put('c', frame(3))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert sorted(p.stem for p in tmp_path.glob('*.parquet')) == ['a', 'c']
+
+    # Expired entries go first, whatever their recency
+    clock[0] += 3601
+    cache.put('d', frame(4), ttl=7200)
+    assert sorted(p.stem for p in tmp_path.glob('*.parquet')) == ['d']
+
+def test_result_larger_than_the_budget_is_not_kept(tmp_path):
+    cache = QueryCache(str(tmp_path), max_bytes=100)
+    assert not cache.put('big', frame(1))
+    assert cache.get('big') is None and list(tmp_path.glob('*.parquet')) == []
+
+def test_unserializable_result_leaves_no_file(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    assert not cache.put('bad', pd.DataFrame({'mixed': [1, 'a', object()]}))
+    assert list(tmp_path.iterdir()) == []
+
+def test_concurrent_writers_and_readers_never_see_a_partial_entry(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    frames = [frame(i, rows=200_000) for i in range(4)]
+    cache.put('shared', frames[0])
+    errors, reads = [], []
+
+    def write(i):
+        for _ in range(5):
+            cache.put('shared', frames[i])
+
+    def read():
+        for _ in range(20):
+            df = cache.get('shared')
+            if df is None:
+                errors.append('entry dropped')
+                return
+            reads.append(int(df['value'].iloc[0]))
+            if len(df) != 200_000 or df['value'].nunique() != 1:
+                errors.append('mixed entry')
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)] + \
+              [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == [] and len(reads) == 80
+    assert list(tmp_path.glob('*.tmp')) == []
+    assert cache.stats()['entries'] == 1
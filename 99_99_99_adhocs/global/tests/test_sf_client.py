@@ -0,0 +1,202 @@
+"""Tests and micro-benchmarks for sf_client's pooled engines against a local stand-in driver."""
+
+import os
+import time
+import warnings
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from snowflake.connector.errors import NotSupportedError
+from sqlalchemy import text
+import src.sf_client as sf_client
+from conftest import peak_rss_growth
+
+QUERIES = 20
+
+def run_queries(count=QUERIES):
+    for i in range(count):
+        conn = sf_client.get_connection()
+        try:
+            assert conn.execute(text(f"SELECT {i}")).scalar() == i
+        finally:
+            conn.close()
+
+def test_pooled_engine_pays_connection_setup_once(stand_in_engine, monkeypatch):
+    monkeypatch.setenv('SNOWFLAKE_CACHE_SSO_TOKEN', 'false')
+    before = sf_client.engine_stats()
+    started = time.perf_counter()
+    run_queries()
+    pooled_seconds = time.perf_counter() - started
+    stats = sf_client.engine_stats()
+
+    # What every query used to do: build a fresh engine and log in again
+    started = time.perf_counter()
+    settings = sf_client.connection_settings()
+    for i in range(QUERIES):
+        engine = sf_client._build_engine(settings, None)
+        with engine.connect() as conn:
+            conn.execute(text(f"SELECT {i}"))
+        engine.dispose()
+    per_query_seconds = time.perf_counter() - started
+
+    print(f"\n{QUERIES} queries: pooled {pooled_seconds * 1000:.0f}ms "
+          f"({stats['connections_opened'] - before['connections_opened']} handshakes, "
+          f"{(stats['connect_seconds'] - before['connect_seconds']) * 1000:.0f}ms), "
+          f"engine per query {per_query_seconds * 1000:.0f}ms ({QUERIES} handshakes)")
+    assert stats['engines_created'] - before['engines_created'] == 1
+    assert stats['connections_opened'] - before['connections_opened'] == 1
+    assert stats['connect_seconds'] - before['connect_seconds'] >= stand_in_engine.browser_seconds
+    assert stand_in_engine.browser_logins == 1 + QUERIES
+    assert pooled_seconds < per_query_seconds / 5
+
+def test_engines_are_keyed_by_target(stand_in_engine):
+    assert sf_client.get_engine() is sf_client.get_engine()
+    assert sf_client.get_engine(database='OTHER') is not sf_client.get_engine()
+    assert sf_client.get_engine(session_params={'QUERY_TAG': 'x'}) is not sf_client.get_engine()
+    assert sf_client.engine_stats()['engines_active'] == 3
+
+def test_idle_engines_are_evicted(stand_in_engine, monkeypatch):
+    monkeypatch.setenv('SNOWFLAKE_POOL_IDLE_SECONDS', '0')
+    first = sf_client.get_engine(database='OLD')
+    time.sleep(0.01)
+    before = sf_client.engine_stats()['engines_evicted']
+    sf_client.get_engine()
+    assert sf_client.engine_stats()['engines_evicted'] == before + 1
+    assert sf_client.get_engine(database='OLD') is not first
+
+def test_engines_with_checked_out_connections_are_not_evicted(stand_in_engine, monkeypatch):
+    monkeypatch.setenv('SNOWFLAKE_POOL_IDLE_SECONDS', '0')
+    busy = sf_client.get_engine(database='BUSY')
+    conn = busy.connect()
+    try:
+        time.sleep(0.01)
+        sf_client.get_engine()
+        assert sf_client.get_engine(database='BUSY') is busy
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        conn.close()
+    time.sleep(0.01)
+    sf_client.get_engine()
+    assert sf_client.get_engine(database='BUSY') is not busy
+
+def test_execute_query_reads_through_the_pool(stand_in_engine):
+    df = sf_client.execute_query("SELECT 1 AS a, 'x' AS b", fetch_mode='sqlalchemy')
+    assert df.to_dict('records') == [{'a': 1, 'b': 'x'}]
+    assert isinstance(df, pd.DataFrame)
+
+def reconnect_seconds(runs=3):
+    """Time to first result for `runs` back-to-back script runs (the registry is cleared between them)."""
+    timings = []
+    for _ in range(runs):
+        sf_client.dispose_engines()
+        started = time.perf_counter()
+        run_queries(1)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def test_cached_sso_token_skips_the_browser_on_reconnect(stand_in_engine, monkeypatch):
+    monkeypatch.setenv('SNOWFLAKE_AUTHENTICATOR', 'externalbrowser')
+    monkeypatch.delenv('SNOWFLAKE_CACHE_SSO_TOKEN', raising=False)
+    cached = reconnect_seconds()
+    assert stand_in_engine.browser_logins == 1
+
+    stand_in_engine.token_expires_at = None
+    stand_in_engine.browser_logins = 0
+    monkeypatch.setenv('SNOWFLAKE_CACHE_SSO_TOKEN', 'false')
+    uncached = reconnect_seconds()
+    assert stand_in_engine.browser_logins == 3
+
+    print(f"\nreconnect: cached token {[f'{t * 1000:.0f}ms' for t in cached]}, "
+          f"browser every run {[f'{t * 1000:.0f}ms' for t in uncached]}")
+    assert max(cached[1:]) < min(uncached) / 2
+
+def test_expired_token_falls_back_to_the_browser(stand_in_engine, monkeypatch):
+    monkeypatch.setenv('SNOWFLAKE_AUTHENTICATOR', 'externalbrowser')
+    stand_in_engine.token_ttl = 0
+    reconnect_seconds(2)
+    assert stand_in_engine.browser_logins == 2
+
+def test_token_cache_only_applies_to_externalbrowser(monkeypatch):
+    monkeypatch.setenv('SNOWFLAKE_AUTHENTICATOR', 'externalbrowser')
+    monkeypatch.delenv('SNOWFLAKE_CACHE_SSO_TOKEN', raising=False)
+    settings = sf_client.connection_settings()
+    assert sf_client._sso_connect_args(settings) == {'client_store_temporary_credential': True}
+    monkeypatch.setenv('SNOWFLAKE_AUTHENTICATOR', 'snowflake_jwt')
+    assert sf_client._sso_connect_args(sf_client.connection_settings()) == {}
+
+class SyntheticCursor:
+    """Connector-like cursor over a synthetic NUMBER(38,0) / NUMBER(12,2) / TIMESTAMP result."""
+
+    def __init__(self, table, arrow):
+        self.table = table
+        self.arrow = arrow
+        self.description = [(name.upper(), None, None, None, None, None, True) for name in table.column_names]
+
+    def execute(self, query):
+        pass
+
+    def fetch_pandas_all(self):
+        if not self.arrow:
+            raise NotSupportedError(msg="result is not in Arrow format")
+        return self.table.rename_columns([d[0] for d in self.description]).to_pandas()
+
+    def fetchall(self):
+        # The row path hands back Python ints, Decimals and datetimes, one tuple per row
+        ids, amounts, times = (self.table.column(i).to_pylist() for i in range(3))
+        return [(i, Decimal(f"{a:.2f}"), t) for i, a, t in zip(ids, amounts, times)]
+
+    def close(self):
+        pass
+
+class SyntheticEngine:
+    def __init__(self, table, arrow):
+        self.table, self.arrow = table, arrow
+
+    def raw_connection(self):
+        engine = self
+
+        class Raw:
+            def cursor(self):
+                return SyntheticCursor(engine.table, engine.arrow)
+
+            def close(self):
+                pass
+        return Raw()
+
+def test_cursor_without_arrow_fetch_falls_back_to_rows(stand_in_engine):
+    # SQLite cursors have no fetch_pandas_all / fetch_pandas_batches
+    df = sf_client.read_dataframe("SELECT 1 AS id, 'a' AS name UNION ALL SELECT 2, 'b'", fetch_mode='arrow')
+    assert df.to_dict('list') == {'id': [1, 2], 'name': ['a', 'b']}
+    batches = list(sf_client.iter_dataframes("SELECT 1 AS id UNION ALL SELECT 2", batch_rows=1))
+    assert [b['id'].tolist() for b in batches] == [[1], [2]]
+
+def test_arrow_fetch_is_typed_faster_and_smaller_than_read_sql():
+    # Set SF_BENCH_ROWS for a bigger run
+    rows = int(os.getenv('SF_BENCH_ROWS', '2000000'))
+    rng = np.random.default_rng(0)
+    table = pa.table({
+        'id': pa.array(np.arange(rows, dtype=np.int64)),
+        'amount': pa.array(np.round(rng.random(rows) * 1000, 2)),
+        'created_at': pa.array(np.datetime64('2025-01-01') + np.arange(rows).astype('timedelta64[s]')),
+    })
+    query = "SELECT id, amount, created_at FROM synthetic"
+    arrow_df, arrow_seconds, arrow_peak = peak_rss_growth(
+        lambda: sf_client.read_dataframe(query, SyntheticEngine(table, arrow=True), 'arrow'))
+
+    def read_sql():
+        # The 'sqlalchemy' fetch mode: pd.read_sql over the connector's row tuples
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # pandas warns about non-SQLAlchemy DB-API connections
+            return pd.read_sql(query, SyntheticEngine(table, arrow=False).raw_connection())
+    rows_df, rows_seconds, rows_peak = peak_rss_growth(read_sql)
+
+    print(f"\n{rows:,} rows: arrow {rows / arrow_seconds:,.0f} rows/s, peak RSS +{arrow_peak / 2**20:,.0f} MB; "
+          f"pd.read_sql {rows / rows_seconds:,.0f} rows/s, peak RSS +{rows_peak / 2**20:,.0f} MB")
+    assert list(arrow_df.columns) == ['id', 'amount', 'created_at']
+    assert arrow_df['id'].dtype == np.int64 and arrow_df['amount'].dtype == np.float64
+    assert str(arrow_df['created_at'].dtype).startswith('datetime64')
+    rows_df.columns = [c.lower() for c in rows_df.columns]
+    pd.testing.assert_frame_equal(arrow_df, rows_df, check_dtype=False)
+    assert arrow_seconds < rows_seconds
+    assert arrow_peak < rows_peak
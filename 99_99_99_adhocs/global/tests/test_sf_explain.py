@@ -0,0 +1,26 @@
+"""Tests for the EXPLAIN plan cache under concurrent use."""
+
+from concurrent.futures import ThreadPoolExecutor
+from src.sf_explain import ExplainCache
+
+def test_counters_are_exact_under_concurrent_lookups(tmp_path):
+    cache = ExplainCache(cache_dir=str(tmp_path))
+    for i in range(0, 20, 2):
+        cache.put(f"plan{i}", {'GlobalStats': {'partitionsTotal': i}, 'Operations': []})
+
+    def lookups(worker):
+        for i in range(20):
+            cache.get(f"plan{i}")
+            cache.put(f"plan{(i + worker) % 20}", {'GlobalStats': {}, 'Operations': []})
+
+    workers = 16
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lookups, range(workers)))
+    assert cache.hits + cache.misses == workers * 20
+    assert not list(tmp_path.glob('*.tmp'))
+
+def test_expired_plans_are_misses(tmp_path):
+    cache = ExplainCache(cache_dir=str(tmp_path), ttl=-1)
+    cache.put('plan', {'Operations': []})
+    assert cache.get('plan') is None
+    assert (cache.hits, cache.misses) == (0, 1)
@@ -0,0 +1,90 @@
+"""
+Regression corpus for the SQL AST analysis.
+
+Every .sql file in the repository's sql/ folders is analyzed and compared with
+the summary recorded in corpus/sql_ast.json. After an intended change to the
+analysis (or to the SQL files), regenerate the snapshot with:
+
+    UPDATE_SQL_CORPUS=1 python -m pytest -q tests/test_sql_ast.py
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+import pytest
+from src import sql_ast
+from src.sql_ast import analyze_sql
+
+REPO = Path(__file__).resolve().parents[3]
+SNAPSHOT = Path(__file__).parent / 'corpus' / 'sql_ast.json'
+SIMULATION = REPO / '25_08_19_session_replay_simulation' / 'sql' / 'simulation.sql'
+CORPUS = sorted(path.relative_to(REPO).as_posix() for path in REPO.rglob('sql/*.sql'))
+
+def summarize(sql: str) -> dict:
+    """analyze_sql output reduced to JSON: sets sorted, joins as counts."""
+    features = analyze_sql(sql)
+    return {
+        'statements': features['statements'],
+        'parse_errors': len(features['parse_errors']),
+        'tables': sorted(features['tables']),
+        'writes': sorted(features['writes']),
+        'ctes': len(features['ctes']),
+        'reused_ctes': sorted(c['name'] for c in features['reused_ctes']),
+        'joins': len(features['joins']),
+        'join_graph': [list(edge) for edge in features['join_graph']],
+        'window_functions': features['window_functions'],
+        'subqueries': features['subqueries'],
+        'select_star_tables': sorted(features['select_star_tables']),
+        'unfiltered_tables': sorted(features['unfiltered_tables']),
+        'cross_joins': features['cross_joins'],
+        'distinct_with_order_by': features['distinct_with_order_by'],
+        'inner_order_by': features['inner_order_by'],
+    }
+
+def _snapshot() -> dict:
+    if os.getenv('UPDATE_SQL_CORPUS'):
+        SNAPSHOT.parent.mkdir(exist_ok=True)
+        snapshot = {name: summarize((REPO / name).read_text(encoding='utf-8')) for name in CORPUS}
+        SNAPSHOT.write_text(json.dumps(snapshot, indent=1, sort_keys=True) + '\n', encoding='utf-8')
+    return json.loads(SNAPSHOT.read_text(encoding='utf-8'))
+
+@pytest.fixture(scope='module')
+def snapshot():
+    return _snapshot()
+
+def test_corpus_covers_the_sql_folders(snapshot):
+    if not CORPUS:
+        pytest.skip("no sql/ folders next to this package")
+    assert sorted(snapshot) == CORPUS
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_corpus_file(name, snapshot):
+    assert summarize((REPO / name).read_text(encoding='utf-8')) == snapshot[name]
+
+def test_simulation_analyzes_well_under_a_second():
+    if not SIMULATION.exists():
+        pytest.skip("simulation.sql not in this checkout")
+    sql = SIMULATION.read_text(encoding='utf-8')
+    sql_ast.parse_cached.cache_clear()
+    sql_ast._analyze_normalized.cache_clear()
+    started = time.perf_counter()
+    features = analyze_sql(sql)
+    elapsed = time.perf_counter() - started
+    print(f"\nsimulation.sql: {features['statements']} statements in {elapsed:.3f}s")
+    assert features['statements']
+    assert elapsed < 1.0
+
+@pytest.mark.parametrize('sql, key, expected', [
+    ("with c as (select * from s) select * from c join c c2 on c.id = c2.id", 'tables', {'s'}),
+    ("select a.x from a, b", 'cross_joins', 1),
+    ("select * from a join b using (id)", 'cross_joins', 0),
+    ("select * from t, lateral flatten(input => t.v) f", 'cross_joins', 0),
+    ("select x, row_number() over (partition by y order by z) from t", 'window_functions', 1),
+    ("select * from (select * from t order by x) s", 'inner_order_by', 1),
+    ("select * from (select * from t order by x limit 5) s", 'inner_order_by', 0),
+    ("insert into tgt select * from src", 'writes', {'tgt'}),
+    ("select * from t where x = 1", 'unfiltered_tables', set()),
+])
+def test_features(sql, key, expected):
+    assert analyze_sql(sql)[key] == expected
@@ -0,0 +1,20 @@
+"""Tests for statement table extraction."""
+
+import pytest
+from src.sql_parse import statement_tables, build_dependencies
+
+@pytest.mark.parametrize('sql, reads, writes', [
+    ("select * from table(flatten(x)) f", set(), set()),
+    ("select * from lateral flatten(input => t.v) f", set(), set()),
+    ("select * from db.sch.orders o join customers c using (id)", {'DB.SCH.ORDERS', 'CUSTOMERS'}, set()),
+    ('select * from "Mixed"."Case"', {'Mixed.Case'}, set()),
+    ("create table b clone a", {'A'}, {'B'}),
+    ("insert into t select * from s where x = 'from u'", {'S'}, {'T'}),
+    ("with c as (select * from s) select * from c", {'S'}, set()),
+])
+def test_statement_tables(sql, reads, writes):
+    assert statement_tables(sql) == (reads, writes)
+
+def test_clone_orders_after_the_source_is_built():
+    deps = build_dependencies(["create table a as select 1 x", "create table b clone a"])
+    assert deps == [set(), {0}]
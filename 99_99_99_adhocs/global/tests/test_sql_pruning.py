@@ -0,0 +1,44 @@
+"""Tests for the sargable range rewrites."""
+
+import pytest
+from src.sql_pruning import pruning_report
+
+def rewrite(where: str) -> str:
+    return ' '.join(pruning_report(f"select * from t where {where}")['rewritten_sql'].split())
+
+@pytest.mark.parametrize('where, expected', [
+    ("created_at::date >= '2025-05-01'", "created_at >= CAST('2025-05-01' AS DATE)"),
+    ("created_at::date > '2025-05-01'", "created_at >= CAST('2025-05-02' AS DATE)"),
+    ("date_trunc('month', created_at) = '2025-05-01'",
+     "created_at >= CAST('2025-05-01' AS DATE) AND created_at < CAST('2025-06-01' AS DATE)"),
+    ("created_at::date >= current_date()", "created_at >= CURRENT_DATE"),
+    ("created_at::date >= dateadd(day, -7, current_date())", "created_at >= DATEADD(DAY, -7, CURRENT_DATE)"),
+    # Whether CURRENT_TIMESTAMP() is on a day boundary is unknown: only the next-day forms are exact
+    ("created_at::date <= current_timestamp()",
+     "created_at < DATEADD(DAY, 1, CAST(CURRENT_TIMESTAMP() AS DATE))"),
+    ("created_at::date > current_timestamp()",
+     "created_at >= DATEADD(DAY, 1, CAST(CURRENT_TIMESTAMP() AS DATE))"),
+])
+def test_rewrites(where, expected):
+    assert rewrite(where) == f"SELECT * FROM t WHERE {expected}"
+
+@pytest.mark.parametrize('where', [
+    "created_at::date >= current_timestamp()",
+    "created_at::date = current_timestamp()",
+    "created_at::date < '2025-05-01 10:00'",
+])
+def test_unaligned_constants_are_reported_but_not_rewritten(where):
+    report = pruning_report(f"select * from t where {where}")
+    assert [issue['rewrite'] for issue in report['issues']] == [None]
+    assert report['rewritten_statements'] == {}
+
+@pytest.mark.parametrize('where, expected', [
+    ("not created_at::date = '2025-05-01'",
+     "NOT (created_at >= CAST('2025-05-01' AS DATE) AND created_at < CAST('2025-05-02' AS DATE))"),
+    ("created_at::date = '2025-05-01' or x = 1",
+     "(created_at >= CAST('2025-05-01' AS DATE) AND created_at < CAST('2025-05-02' AS DATE)) OR x = 1"),
+    ("x = 1 and created_at::date = '2025-05-01'",
+     "x = 1 AND created_at >= CAST('2025-05-01' AS DATE) AND created_at < CAST('2025-05-02' AS DATE)"),
+])
+def test_equality_ranges_keep_their_grouping(where, expected):
+    assert rewrite(where).replace('( ', '(').replace(' )', ')') == f"SELECT * FROM t WHERE {expected}"
@@ -0,0 +1,76 @@
+"""TableMetadataCache: one round trip per database, cache hits and TTL revalidation."""
+
+import pytest
+import src.table_metadata as table_metadata
+from src.table_metadata import TableMetadataCache
+from conftest import FakeInformationSchema
+
+TABLES = {f"RISK.TEST.T{i:02d}": (1000 * i, 4096 * i, '2026-10-01 00:00:00') for i in range(15)}
+
+@pytest.fixture
+def schema(monkeypatch):
+    fake = FakeInformationSchema(dict(TABLES))
+    monkeypatch.setattr(table_metadata, 'read_dataframe', fake.read_dataframe)
+    monkeypatch.setattr(table_metadata, 'connection_settings', lambda: {'database': 'RISK', 'schema': 'TEST'})
+    return fake
+
+def test_fifteen_tables_cost_one_round_trip_then_hit_the_cache(schema, tmp_path):
+    cache = TableMetadataCache(str(tmp_path / 'metadata.json'))
+    # Unqualified, schema-qualified and fully qualified spellings of the same database
+    names = [f"t{i:02d}" for i in range(5)] + [f"test.T{i:02d}" for i in range(5, 10)] + \
+            [f"risk.test.t{i:02d}" for i in range(10, 15)]
+
+    first = cache.get(names)
+    assert len(schema.queries) == 1 and cache.round_trips == 1
+    assert first['t03'] == {'row_count': 3000, 'bytes': 3 * 4096, 'last_altered': '2026-10-01 00:00:00'}
+    assert cache.stats()['misses'] == 15 and cache.stats()['hits'] == 0
+
+    second = cache.get(names)
+    assert second == first
+    assert len(schema.queries) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['round_trips']) == (15, 15, 1)
+    assert stats['hit_rate'] == pytest.approx(50.0)
+
+    # A new instance reads the file cache: no query at all
+    fresh = TableMetadataCache(str(tmp_path / 'metadata.json'))
+    fresh.get(names)
+    assert len(schema.queries) == 1 and fresh.stats()['hit_rate'] == 100
+
+def test_one_round_trip_per_database(schema, tmp_path):
+    schema.tables['OTHER.PUBLIC.X'] = (5, 50, '2026-10-01 00:00:00')
+    cache = TableMetadataCache(str(tmp_path / 'metadata.json'))
+    result = cache.get(['t01', 't02', 'other.public.x', 'missing_table'])
+    assert len(schema.queries) == 2
+    assert result['other.public.x']['row_count'] == 5
+    assert result['missing_table'] is None
+
+def test_expired_entries_are_revalidated_on_last_altered(schema, tmp_path, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(table_metadata.time, 'time', lambda: clock[0])
+    cache = TableMetadataCache(str(tmp_path / 'metadata.json'), ttl=3600)
+    cache.get(['t01', 't02'])
+
+    # Within the TTL a change is not seen: the cached entry is served
+    schema.tables['RISK.TEST.T02'] = (9999, 1, '2026-10-02 00:00:00')
+    clock[0] += 1800
+    assert cache.get(['t02'])['t02']['row_count'] == 2000
+    assert len(schema.queries) == 1
+
+    # Once expired, both are re-read in one query; only T02's LAST_ALTERED moved
+    clock[0] += 3600
+    result = cache.get(['t01', 't02'])
+    assert len(schema.queries) == 2
+    assert result['t02']['row_count'] == 9999
+    stats = cache.stats()
+    assert (stats['revalidated'], stats['changed']) == (1, 1)
+
+def test_failed_lookup_keeps_the_cached_entries(schema, tmp_path, monkeypatch):
+    cache = TableMetadataCache(str(tmp_path / 'metadata.json'), ttl=0)
+    cache.get(['t01'])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('warehouse suspended')
+    monkeypatch.setattr(table_metadata, 'read_dataframe', fail)
+    assert cache.get(['t01'])['t01']['row_count'] == 1000
+    assert cache.stats()['misses'] == 2
@@ -0,0 +1,25 @@
+"""Tests for the cost model training script."""
+
+import sys
+import pytest
+from conftest import load_script
+
+@pytest.fixture
+def train(monkeypatch, tmp_path):
+    script = load_script('train_cost_model')
+    monkeypatch.setattr(script, 'DEFAULT_MODEL_PATH', tmp_path / 'default_model.json')
+
+    def _run(*argv):
+        monkeypatch.setattr(sys, 'argv', ['train_cost_model.py', *argv])
+        script.main()
+    return script, _run
+
+def test_synthetic_run_does_not_replace_the_default_model(train):
+    script, run = train
+    run('--synthetic', '500')
+    assert not script.DEFAULT_MODEL_PATH.exists()
+
+def test_synthetic_run_saves_to_explicit_output(train, tmp_path):
+    _, run = train
+    run('--synthetic', '500', '--output', str(tmp_path / 'synthetic.json'))
+    assert (tmp_path / 'synthetic.json').exists()
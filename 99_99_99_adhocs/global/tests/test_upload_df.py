@@ -0,0 +1,205 @@
+"""SnowflakeUtils.upload_df: statements issued, the swap-based replace, and a benchmark against per-row INSERTs."""
+
+import time
+import sqlite3
+import pandas as pd
+import pytest
+import snowflake.connector.pandas_tools as pandas_tools
+from snowflake.connector.errors import ProgrammingError
+import src.sf_utils as sf_utils
+
+# Simulated network round trip per statement or staged load
+ROUND_TRIP_SECONDS = 0.001
+
+class FakeCursor:
+    def __init__(self, log, missing):
+        self.log = log
+        self.missing = missing
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self.log.append(sql)
+        if ' LIKE ' in sql and sql.split(' LIKE ')[1].split()[0] in self.missing:
+            raise ProgrammingError(msg="Object does not exist or not authorized.", errno=2003)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, log, missing):
+        self.log = log
+        self.missing = missing
+
+    def cursor(self):
+        return FakeCursor(self.log, self.missing)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Statements issued, the frames staged by write_pandas (with its options) and the set of missing tables."""
+    log, staged, missing = [], [], set()
+
+    def write_pandas(conn, df, table, **kwargs):
+        staged.append((table, df, kwargs))
+        log.append(f"COPY INTO {table}")
+        return True, 1, len(df), []
+
+    class Engine:
+        def raw_connection(self):
+            return FakeConnection(log, missing)
+
+    monkeypatch.setattr(pandas_tools, 'write_pandas', write_pandas)
+    monkeypatch.setattr(sf_utils, 'get_engine', lambda session_params=None: Engine())
+    monkeypatch.setattr(sf_utils, 'driver_connection', lambda raw: raw)
+    return log, staged, missing
+
+def frame(rows, offset=0):
+    return pd.DataFrame({'id': range(offset, offset + rows),
+                         'carrier': [f"carrier_{i % 997}" for i in range(rows)],
+                         'country_code': ['US', 'GB', 'DE', 'BR'] * (rows // 4) + ['US'] * (rows % 4)})
+
+def test_replace_loads_a_copy_and_swaps_it_in(uploads):
+    log, staged, _ = uploads
+    assert sf_utils.SnowflakeUtils().upload_df(frame(10), 'db.s.mapping', mode='replace') == 10
+    staging = staged[0][0]
+    assert staging.startswith('MAPPING_LOAD_')
+    assert log == [f"CREATE TABLE db.s.{staging} LIKE db.s.mapping COPY GRANTS",
+                   f"COPY INTO {staging}",
+                   f"ALTER TABLE db.s.mapping SWAP WITH db.s.{staging}",
+                   f"DROP TABLE IF EXISTS db.s.{staging}"]
+    # The copy has the table's own columns, so nothing is inferred from the frame
+    assert staged[0][2]['auto_create_table'] is False
+    assert list(staged[0][1].columns) == ['ID', 'CARRIER', 'COUNTRY_CODE']
+
+def test_replace_of_a_missing_table_creates_it(uploads):
+    log, staged, missing = uploads
+    missing.add('db.s.mapping')
+    sf_utils.SnowflakeUtils().upload_df(frame(10), 'db.s.mapping', mode='replace')
+    assert log[1:] == ["COPY INTO mapping"]
+    assert staged[0][2]['auto_create_table'] is True
+
+def test_replace_raises_other_errors(uploads, monkeypatch):
+    log, _, _ = uploads
+
+    def denied(self, sql, params=None):
+        raise ProgrammingError(msg="Insufficient privileges to operate on schema 'S'", errno=3001)
+    monkeypatch.setattr(FakeCursor, 'execute', denied)
+    with pytest.raises(ProgrammingError, match='Insufficient privileges'):
+        sf_utils.SnowflakeUtils().upload_df(frame(10), 'db.s.mapping', mode='replace')
+
+def test_merge_stages_then_merges_on_the_key(uploads):
+    log, staged, _ = uploads
+    sf_utils.SnowflakeUtils().upload_df(frame(10), 's.mapping', mode='merge', key=['id'])
+    staging = staged[0][0]
+    assert staging.startswith('MAPPING_STAGE_')
+    merge = next(sql for sql in log if sql.startswith('MERGE'))
+    assert f"USING s.{staging} s ON t.ID = s.ID" in merge
+    assert "UPDATE SET t.CARRIER = s.CARRIER, t.COUNTRY_CODE = s.COUNTRY_CODE" in merge
+    assert log[-1] == f"DROP TABLE IF EXISTS s.{staging}"
+
+def test_merge_rejects_duplicate_keys(uploads):
+    log, _, _ = uploads
+    df = pd.concat([frame(5), frame(2)])
+    with pytest.raises(ValueError, match='4 rows share a merge key'):
+        sf_utils.SnowflakeUtils().upload_df(df, 'mapping', mode='merge', key=['ID'])
+    assert log == []
+
+def test_merge_rejects_unknown_key(uploads):
+    with pytest.raises(ValueError, match='not in DataFrame'):
+        sf_utils.SnowflakeUtils().upload_df(frame(5), 'mapping', mode='merge', key=['missing'])
+
+# The same loads against the stand-in engine, where each round trip costs ROUND_TRIP_SECONDS
+
+@pytest.fixture
+def warehouse(stand_in_engine, tmp_path, monkeypatch):
+    """Stand-in database shared by all connections; write_pandas is one PUT and one COPY round trip."""
+    stand_in_engine.database = str(tmp_path / 'warehouse.db')
+    hooks = {}
+
+    def write_pandas(conn, df, table, auto_create_table=False, **kwargs):
+        cursor = conn.cursor()
+        columns = ', '.join(df.columns)
+        if auto_create_table:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+        cursor.execute(f"/* latency {ROUND_TRIP_SECONDS} */ SELECT 'PUT'")
+        cursor.execute(f"/* latency {ROUND_TRIP_SECONDS} */ SELECT 'COPY'")
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(df.columns))})",
+                           df.astype(object).values.tolist())
+        if 'after_copy' in hooks:
+            hooks['after_copy'](table)
+        return True, 1, len(df), []
+
+    monkeypatch.setattr(pandas_tools, 'write_pandas', write_pandas)
+    return stand_in_engine.database, hooks
+
+def _rows(database, sql):
+    with sqlite3.connect(database) as conn:
+        return conn.execute(sql).fetchall()
+
+def test_replace_on_the_stand_in_swaps_atomically(warehouse):
+    database, hooks = warehouse
+    utils = sf_utils.SnowflakeUtils()
+    assert utils.upload_df(frame(5), 'mapping', mode='replace') == 5
+
+    seen = []
+    # Another session reading while the new rows are being copied still sees the old ones
+    hooks['after_copy'] = lambda table: seen.append(_rows(database, "SELECT COUNT(*), MIN(id) FROM mapping")[0])
+    assert utils.upload_df(frame(3, offset=100), 'mapping', mode='replace') == 3
+    assert seen == [(5, 0)]
+    assert _rows(database, "SELECT id FROM mapping ORDER BY id") == [(100,), (101,), (102,)]
+    assert _rows(database, "SELECT name FROM sqlite_master WHERE type = 'table'") == [('mapping',)]
+
+def test_failed_replace_leaves_the_table_as_it_was(warehouse):
+    database, hooks = warehouse
+    utils = sf_utils.SnowflakeUtils()
+    utils.upload_df(frame(5), 'mapping', mode='replace')
+
+    def fail(table):
+        raise RuntimeError('PUT failed: connection reset')
+    hooks['after_copy'] = fail
+    with pytest.raises(RuntimeError, match='connection reset'):
+        utils.upload_df(frame(3, offset=100), 'mapping', mode='replace')
+    assert _rows(database, "SELECT COUNT(*), MIN(id) FROM mapping") == [(5, 0)]
+    assert _rows(database, "SELECT name FROM sqlite_master WHERE type = 'table'") == [('mapping',)]
+
+def row_by_row(conn, df, table):
+    """The per-row loop upload_df replaced in network_carrier_mapper (qmark parameters for SQLite)."""
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {table}")
+    for _, row in df.iterrows():
+        cursor.execute(f"/* latency {ROUND_TRIP_SECONDS} */ INSERT INTO {table} (id, carrier, country_code) "
+                       f"VALUES (?, ?, ?)", (row['id'], row['carrier'], row['country_code']))
+    conn.commit()
+    cursor.close()
+
+def test_bulk_load_against_row_by_row_inserts(warehouse):
+    database, _ = warehouse
+    from src.sf_client import get_engine
+    rows, sample = 100_000, 1_000
+
+    started = time.perf_counter()
+    assert sf_utils.SnowflakeUtils().upload_df(frame(rows), 'mapping', mode='replace') == rows
+    bulk = time.perf_counter() - started
+    assert _rows(database, "SELECT COUNT(*) FROM mapping") == [(rows,)]
+
+    # The per-row loop is measured on a sample; 100k rows at one round trip each would take minutes
+    _rows(database, "CREATE TABLE mapping_rows (id, carrier, country_code)")
+    raw = get_engine().raw_connection()
+    try:
+        started = time.perf_counter()
+        row_by_row(sf_utils.driver_connection(raw), frame(sample), 'mapping_rows')
+        per_row = time.perf_counter() - started
+    finally:
+        raw.close()
+    assert _rows(database, "SELECT COUNT(*) FROM mapping_rows") == [(sample,)]
+
+    bulk_rate, per_row_rate = rows / bulk, sample / per_row
+    print(f"\nupload_df: {rows:,} rows in {bulk:.2f}s ({bulk_rate:,.0f} rows/s); "
+          f"row-by-row: {sample:,} rows in {per_row:.2f}s ({per_row_rate:,.0f} rows/s, "
+          f"~{rows / per_row_rate:,.0f}s for {rows:,}); {bulk_rate / per_row_rate:,.0f}x")
+    assert bulk_rate > 50 * per_row_rate
@@ -0,0 +1,102 @@
+"""Warehouse sizing on hand-built history: signals, recommendations and projected credits."""
+
+import pandas as pd
+import pytest
+from src.warehouse_sizing import resize, recommend, project, sizing_signals, sizing_report
+
+GB = 1024 ** 3
+
+def rows(n, warehouse, size, fingerprint, execution_seconds, overload_seconds=0, local_spills=0, remote_spills=0):
+    """n identical successful queries; the first local_spills/remote_spills of them spill 1 GB."""
+    return pd.DataFrame({
+        'warehouse_name': warehouse, 'warehouse_size': size, 'fingerprint': fingerprint,
+        'query_text': f"select /* {fingerprint} */ 1",
+        'execution_time': [execution_seconds * 1000] * n,
+        'queued_overload_time': [overload_seconds * 1000] * n,
+        'total_elapsed_time': [(execution_seconds + overload_seconds) * 1000] * n,
+        'bytes_spilled_to_local_storage': [GB if i < local_spills else 0 for i in range(n)],
+        'bytes_spilled_to_remote_storage': [GB if i < remote_spills else 0 for i in range(n)],
+    })
+
+HISTORY = pd.concat([
+    rows(20, 'ETL_WH', 'Medium', 'etl', 60, local_spills=2),         # 10% spill locally
+    rows(10, 'BI_WH', 'Small', 'dash', 0.5),                          # short and clean
+    rows(4, 'REPORT_WH', 'Large', 'report', 80, overload_seconds=20), # 20% of elapsed queued
+    rows(10, 'ML_WH', 'X-Large', 'train', 600, remote_spills=1),      # 10% spill remotely
+    rows(5, 'ADHOC_WH', 'Small', 'adhoc', 30),                        # nothing to change
+], ignore_index=True)
+
+def test_resize_clamps_to_the_size_range():
+    assert resize('Medium', 1) == 'LARGE'
+    assert resize('x-small', -1) == 'X-SMALL'
+    assert resize('3X-Large', 3) == '4X-LARGE'
+    assert resize('Snowpark-Optimized', 1) is None
+
+def test_signals_by_hand():
+    signals = sizing_signals(HISTORY, ['warehouse_name']).set_index('warehouse_name')
+    assert signals.loc['ETL_WH', 'executions'] == 20
+    assert signals.loc['ETL_WH', 'execution_hours'] == pytest.approx(20 * 60 / 3600)
+    assert signals.loc['ETL_WH', 'local_spill_share_pct'] == pytest.approx(10.0)
+    assert signals.loc['ETL_WH', 'spilled_gb'] == pytest.approx(2.0)
+    assert signals.loc['REPORT_WH', 'queue_share_pct'] == pytest.approx(20.0)
+    assert signals.loc['ML_WH', 'remote_spill_share_pct'] == pytest.approx(10.0)
+    assert signals.loc['BI_WH', 'p95_execution_seconds'] == pytest.approx(0.5)
+
+@pytest.mark.parametrize('size, changes, steps, reason', [
+    ('X-Large', {'remote_spill_share_pct': 5.0}, 2, 'spill to remote'),
+    ('Medium', {'remote_spill_share_pct': 1.0}, 1, 'spill locally'),
+    ('Medium', {'local_spill_share_pct': 5.0}, 1, 'spill locally'),
+    ('Medium', {'local_spill_share_pct': 4.9}, 0, 'no spill'),
+    ('Large', {'queue_share_pct': 10.0}, 0, 'MAX_CLUSTER_COUNT'),
+    ('Small', {'p95_execution_seconds': 4.9}, -1, 'p95 execution 4.9s'),
+    ('X-Small', {'p95_execution_seconds': 1.0}, 0, 'no spill'),
+    ('Snowpark', {}, 0, 'unknown warehouse size'),
+])
+def test_recommend_rules(size, changes, steps, reason):
+    signals = {'remote_spill_share_pct': 0.0, 'local_spill_share_pct': 0.0, 'queue_share_pct': 0.0,
+               'p95_execution_seconds': 30.0, 'spilled_gb': 1.0, **changes}
+    got_steps, got_reason = recommend(size, signals)
+    assert got_steps == steps and reason in got_reason
+
+def test_project_halves_time_per_step_and_keeps_short_queries():
+    df = pd.DataFrame({'warehouse_size': ['Medium', 'Medium', 'Small', 'Large'],
+                       'execution_time': [60_000, 500, 10_000, 40_000]})
+    projected = project(df, pd.Series([1, 1, -1, 0]))
+    assert projected['projected_execution_seconds'].tolist() == pytest.approx([30, 0.5, 20, 40])
+    # Credits are execution time at the size's hourly rate, before and after
+    assert projected['credits'].tolist() == pytest.approx([60 / 3600 * 4, 0.5 / 3600 * 4, 10 / 3600 * 2, 40 / 3600 * 8])
+    assert projected['projected_credits'].tolist() == pytest.approx(
+        [30 / 3600 * 8, 0.5 / 3600 * 8, 20 / 3600 * 1, 40 / 3600 * 8])
+
+def test_sizing_report_by_hand():
+    report = sizing_report(HISTORY)
+    warehouses = report['warehouses'].set_index('warehouse_name')
+    decisions = warehouses[['steps', 'recommended_size']].to_dict('index')
+    assert decisions == {
+        'ML_WH': {'steps': 2, 'recommended_size': '3X-Large'},
+        'ETL_WH': {'steps': 1, 'recommended_size': 'Large'},
+        'REPORT_WH': {'steps': 0, 'recommended_size': 'Large'},
+        'ADHOC_WH': {'steps': 0, 'recommended_size': 'Small'},
+        'BI_WH': {'steps': -1, 'recommended_size': 'X-Small'},
+    }
+    # Ordered by execution hours
+    assert list(warehouses.index) == ['ML_WH', 'ETL_WH', 'REPORT_WH', 'ADHOC_WH', 'BI_WH']
+
+    # Scaling work costs the same credits in less time; sub-second work gets cheaper, not faster
+    assert warehouses.loc['ETL_WH', 'credits'] == pytest.approx(20 * 60 / 3600 * 4)
+    assert warehouses.loc['ETL_WH', 'credit_change_pct'] == pytest.approx(0.0)
+    assert warehouses.loc['ETL_WH', 'projected_p95_execution_seconds'] == pytest.approx(30)
+    assert warehouses.loc['ML_WH', 'projected_p95_execution_seconds'] == pytest.approx(150)
+    assert warehouses.loc['BI_WH', 'credit_change_pct'] == pytest.approx(-50.0)
+    assert warehouses.loc['BI_WH', 'projected_p95_execution_seconds'] == pytest.approx(0.5)
+
+    workloads = report['workloads'].set_index('fingerprint')
+    assert workloads.loc['etl', 'recommended_size'] == 'Large'
+    assert workloads.loc['etl', 'sample_query'] == 'select /* etl */ 1'
+    assert len(sizing_report(HISTORY, top=2)['workloads']) == 2
+
+def test_rows_without_a_warehouse_are_ignored():
+    history = pd.concat([HISTORY, rows(3, None, None, 'cloud_only', 0)], ignore_index=True)
+    report = sizing_report(history)
+    assert 'cloud_only' not in set(report['workloads']['fingerprint'])
+    assert len(report['warehouses']) == 5
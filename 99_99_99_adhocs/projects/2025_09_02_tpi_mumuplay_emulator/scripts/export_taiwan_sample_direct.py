@@ -35,7 +35,8 @@ def export_taiwan_sample():
             account='CHIME',
             warehouse='RISK_WH',
             role='SNOWFLAKE_PROD_ANALYTICS_PII_ROLE_OKTA',
-            authenticator='externalbrowser'
+            authenticator='externalbrowser',
+            client_store_temporary_credential=True
         )
         
         # Execute query
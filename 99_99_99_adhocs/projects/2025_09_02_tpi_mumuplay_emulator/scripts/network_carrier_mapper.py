@@ -9,6 +9,7 @@ import os
 sys.path.append('../global_snowflake_utils')
 
 from src.sf_client import get_connection
+from src.sf_utils import SnowflakeUtils
 import pandas as pd
 import requests
 from typing import Dict, List, Tuple
@@ -127,25 +128,15 @@ def create_mapping_table(carriers_df: pd.DataFrame) -> pd.DataFrame:
 
 def update_database_mapping(mapping_df: pd.DataFrame):
     """Update the database with the mapping"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Clear existing mapping table
-    cursor.execute("DELETE FROM risk.test.hding_network_carrier_country_mapping")
+    utils = SnowflakeUtils()
     
-    # Insert new mappings
-    for _, row in mapping_df.iterrows():
-        query = """
-        INSERT INTO risk.test.hding_network_carrier_country_mapping 
-        (network_carrier, country_code) 
-        VALUES (%s, %s)
-        """
-        cursor.execute(query, (row['network_carrier'], row['country_code']))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print(f"Updated database with {len(mapping_df)} carrier mappings")
+    # Replace existing mappings with one staged COPY instead of row-by-row INSERTs
+    rows = utils.upload_df(
+        mapping_df[['network_carrier', 'country_code']],
+        'risk.test.hding_network_carrier_country_mapping',
+        mode='replace'
+    )
+    print(f"Updated database with {rows} carrier mappings")
 
 def main():
     """Main function to process network carriers"""
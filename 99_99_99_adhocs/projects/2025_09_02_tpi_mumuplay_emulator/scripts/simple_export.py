@@ -18,6 +18,7 @@ def main():
             'user': 'HAO.DING@CHIME.COM',
             'account': 'CHIME',
             'authenticator': 'externalbrowser',
+            'client_store_temporary_credential': True,
             'warehouse': 'RISK_WH',
             'database': 'RISK',
             'schema': 'TEST',
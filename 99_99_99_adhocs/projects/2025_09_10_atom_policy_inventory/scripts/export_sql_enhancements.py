@@ -15,6 +15,7 @@ def main():
         user='HAO.DING@CHIME.COM',
         account='CHIME',
         authenticator='externalbrowser',
+        client_store_temporary_credential=True,
         warehouse='RISK_WH',
         role='SNOWFLAKE_PROD_ANALYTICS_PII_ROLE_OKTA'
     )